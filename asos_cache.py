@@ -0,0 +1,316 @@
+"""
+Shared on-disk cache of processed hourly ASOS observations, keyed by station and time window.
+
+Many gauges of a fleet resolve to the same nearest airport, and every gauge requests its chunks'
+windows from Mesonet. Each station's processed hourly frames are kept in one columnar store
+(:mod:`hourly_store`) under ``<cache_dir>/<station>/`` together with ``coverage.json``, the list of
+hour ranges already fetched. A window request is served from the store, and only the hours that are
+not yet covered are fetched (whole UTC days, as Mesonet serves them) and merged in: hours past the
+stored record are appended, and only a gap inside it rewrites the store.
+
+Hours within :data:`ARCHIVE_LAG` of now are stored but not marked covered, since late reports may still
+arrive; they are fetched again by the next request that needs them. Each station directory is guarded
+by an exclusive ``flock`` on ``.lock`` for the whole read-fetch-write cycle, so concurrent gauges and
+concurrent scraper processes never interleave writes, and a gauge waiting on the lock is served from the
+coverage its neighbour just fetched. A fleet fills one window of many stations with a single
+multi-station download (:func:`fill_asos_window`).
+
+The directory is read from ``ASOS_CACHE_DIR`` (default ``~/.cache/water/asos_cache``, see
+:func:`metadata_cache.user_cache_dir`); setting it to an empty string disables the cache.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from file_locks import directory_lock
+from hourly_store import (EPOCH, MANIFEST_FILE, append_hourly_store, load_manifest, read_hourly_store,
+                          to_hours, write_hourly_store)
+from metadata_cache import user_cache_dir
+COVERAGE_FILE = "coverage.json"
+# Hours this recent are not marked covered: Mesonet keeps ingesting late METARs for a while.
+ARCHIVE_LAG = timedelta(hours=48)
+
+_SETTINGS: Dict[str, Any] = {}
+
+
+def configure_asos_cache(cache_dir: str) -> None:
+    """
+    Overrides the cache directory (e.g. for tests or a cache shared by several fleets).
+
+    :param cache_dir: The cache root; an empty string disables caching.
+    :type cache_dir: str
+    :return: None
+    :rtype: None
+    """
+    _SETTINGS["cache_dir"] = cache_dir
+
+
+def cache_dir() -> str:
+    """
+    Returns the active cache root ("" when caching is disabled).
+
+    :return: The cache directory.
+    :rtype: str
+    """
+    if "cache_dir" in _SETTINGS:
+        return _SETTINGS["cache_dir"]
+    return os.environ.get("ASOS_CACHE_DIR", user_cache_dir("asos_cache"))
+
+
+def load_coverage(station_dir: str) -> List[List[int]]:
+    """
+    Loads the covered hour ranges of a station.
+
+    :param station_dir: The station's cache directory.
+    :type station_dir: str
+    :return: Sorted, non-overlapping [first_hour, end_hour) ranges (hours since the Unix epoch).
+    :rtype: List[List[int]]
+    """
+    path = os.path.join(station_dir, COVERAGE_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_coverage(station_dir: str, coverage: List[List[int]]) -> None:
+    """
+    Writes the covered hour ranges of a station atomically, merging overlapping ranges.
+
+    :param station_dir: The station's cache directory.
+    :type station_dir: str
+    :param coverage: [first_hour, end_hour) ranges in any order.
+    :type coverage: List[List[int]]
+    :return: None
+    :rtype: None
+    """
+    merged: List[List[int]] = []
+    for first, end in sorted(coverage):
+        if merged and first <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([first, end])
+    path = os.path.join(station_dir, COVERAGE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(merged, f)
+    os.replace(path + ".tmp", path)
+
+
+def missing_ranges(coverage: List[List[int]], first_hour: int, end_hour: int) -> List[List[int]]:
+    """
+    Returns the parts of [first_hour, end_hour) that no covered range contains.
+
+    :param coverage: Sorted, non-overlapping covered ranges.
+    :type coverage: List[List[int]]
+    :param first_hour: The first wanted hour.
+    :type first_hour: int
+    :param end_hour: The exclusive end of the wanted hours.
+    :type end_hour: int
+    :return: The uncovered [first, end) ranges in order.
+    :rtype: List[List[int]]
+    """
+    gaps = []
+    cursor = first_hour
+    for first, end in coverage:
+        if end <= cursor:
+            continue
+        if first >= end_hour:
+            break
+        if first > cursor:
+            gaps.append([cursor, first])
+        cursor = max(cursor, end)
+    if cursor < end_hour:
+        gaps.append([cursor, end_hour])
+    return gaps
+
+
+def _window_hours(start_time: datetime, end_time: datetime) -> Tuple[int, int]:
+    """
+    Returns the whole hours from ``start_time`` to ``end_time`` (inclusive) as a [first, end) range.
+
+    :param start_time: The first wanted hour (UTC).
+    :type start_time: datetime
+    :param end_time: The last wanted hour (UTC).
+    :type end_time: datetime
+    :return: The (first_hour, end_hour) hour indexes.
+    :rtype: Tuple[int, int]
+    """
+    first_hour = int(to_hours(pd.Series([pd.Timestamp(start_time).ceil("h")]))[0])
+    end_hour = int(to_hours(pd.Series([pd.Timestamp(end_time).floor("h")]))[0]) + 1
+    return first_hour, end_hour
+
+
+def _hour_time(hour: int) -> pd.Timestamp:
+    """
+    Converts an hour index back to its UTC timestamp.
+
+    :param hour: Hours since the Unix epoch.
+    :type hour: int
+    :return: The UTC timestamp.
+    :rtype: pd.Timestamp
+    """
+    return EPOCH + pd.Timedelta(hours=hour)
+
+
+def merge_fetched_ranges(station_dir: str, fetched_frames: List[pd.DataFrame],
+                         replaced: List[Tuple[int, int]]) -> None:
+    """
+    Merges freshly fetched hours into a station's store (the caller holds the directory lock).
+
+    Ranges past the stored record (the usual case of a scrape moving forward in time) are appended
+    without reading the stored history; a range that overlaps or precedes stored hours replaces them,
+    which rewrites the store.
+
+    :param station_dir: The station's (or series') cache directory.
+    :type station_dir: str
+    :param fetched_frames: The fetched hourly frames, each clipped to its range.
+    :type fetched_frames: List[pd.DataFrame]
+    :param replaced: The [low, high) hour ranges that were fetched.
+    :type replaced: List[Tuple[int, int]]
+    :return: None
+    :rtype: None
+    """
+    last_hour = None
+    if os.path.exists(os.path.join(station_dir, MANIFEST_FILE)):
+        last_hour = load_manifest(station_dir)["last_hour"]
+    fetched = (pd.concat(fetched_frames, ignore_index=True) if fetched_frames
+               else pd.DataFrame(columns=["datetime"]))
+    if last_hour is not None and min(low for low, _ in replaced) > last_hour:
+        append_hourly_store(fetched, station_dir)
+        return
+    stored = read_hourly_store(station_dir) if last_hour is not None else pd.DataFrame(columns=["datetime"])
+    stored_hours = to_hours(stored["datetime"])
+    keep = np.ones(len(stored), dtype=bool)
+    for low, high in replaced:
+        keep &= (stored_hours < low) | (stored_hours >= high)
+    frames = [frame for frame in [stored[keep], fetched] if not frame.empty]
+    write_hourly_store(pd.concat(frames, ignore_index=True) if frames
+                       else pd.DataFrame(columns=["datetime"]), station_dir)
+
+
+def _fetch_days(first_hour: int, end_hour: int) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """
+    Returns the whole UTC days whose reports make up the hours [first_hour, end_hour).
+
+    :param first_hour: The first hour (hours since the Unix epoch).
+    :type first_hour: int
+    :param end_hour: The hour after the last one.
+    :type end_hour: int
+    :return: The first day and the day the request ends on.
+    :rtype: Tuple[pd.Timestamp, pd.Timestamp]
+    """
+    return _hour_time(first_hour - 1).floor("D"), _hour_time(end_hour - 1).floor("D") + pd.Timedelta(days=1)
+
+
+def _fill_gaps(station_id: str, station_dir: str, first_hour: int, end_hour: int,
+               fetch: Callable[[str, datetime, datetime], pd.DataFrame]) -> None:
+    """
+    Fetches and stores the hours of [first_hour, end_hour) a station's cache does not cover (the caller
+    holds the directory lock).
+
+    Hour H aggregates the reports after H-1 up to H, so the days requested for an uncovered range start
+    one hour earlier; the range marked covered holds only complete hours.
+
+    :param station_id: The ASOS station id, e.g. "FNL".
+    :type station_id: str
+    :param station_dir: The station's cache directory.
+    :type station_dir: str
+    :param first_hour: The first wanted hour (hours since the Unix epoch).
+    :type first_hour: int
+    :param end_hour: The hour after the last wanted one.
+    :type end_hour: int
+    :param fetch: Fetches (station_id, first_day, end_day) -> the hourly frame (UTC "datetime" column)
+        aggregated from the reports of [first_day, end_day).
+    :type fetch: Callable[[str, datetime, datetime], pd.DataFrame]
+    :return: None
+    :rtype: None
+    """
+    coverage = load_coverage(station_dir)
+    gaps = missing_ranges(coverage, first_hour, end_hour)
+    if not gaps:
+        return
+    settled_hour = int(to_hours(pd.Series([pd.Timestamp.now(tz="UTC") - ARCHIVE_LAG]))[0])
+    fetched_frames, replaced = [], []
+    for gap_first, gap_end in gaps:
+        first_day, end_day = _fetch_days(gap_first, gap_end)
+        fetched = fetch(station_id, first_day.tz_localize(None).to_pydatetime(),
+                        end_day.tz_localize(None).to_pydatetime())
+        low = int(to_hours(pd.Series([first_day]))[0]) + 1
+        high = int(to_hours(pd.Series([end_day]))[0])
+        fetched_hours = to_hours(fetched["datetime"])
+        fetched_frames.append(fetched[(fetched_hours >= low) & (fetched_hours < high)])
+        replaced.append((low, high))
+        if min(high, settled_hour) > low:
+            coverage.append([low, min(high, settled_hour)])
+    merge_fetched_ranges(station_dir, [frame for frame in fetched_frames if not frame.empty], replaced)
+    save_coverage(station_dir, coverage)
+
+
+def cached_asos_window(station_id: str, start_time: datetime, end_time: datetime,
+                       fetch: Callable[[str, datetime, datetime], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Returns a station's hourly ASOS observations from ``start_time`` to ``end_time`` (inclusive, UTC),
+    fetching only the hours the cache does not cover.
+
+    :param station_id: The ASOS station id, e.g. "FNL".
+    :type station_id: str
+    :param start_time: The first wanted hour (UTC).
+    :type start_time: datetime
+    :param end_time: The last wanted hour (UTC).
+    :type end_time: datetime
+    :param fetch: Fetches (station_id, first_day, end_day) -> the hourly frame (UTC "datetime" column)
+        aggregated from the reports of [first_day, end_day).
+    :type fetch: Callable[[str, datetime, datetime], pd.DataFrame]
+    :return: The hourly dataframe with a UTC "datetime" column.
+    :rtype: pd.DataFrame
+    """
+    first_hour, end_hour = _window_hours(start_time, end_time)
+    if end_hour <= first_hour:
+        return pd.DataFrame(columns=["datetime"])
+    station_dir = os.path.join(cache_dir(), station_id)
+    with directory_lock(station_dir):
+        _fill_gaps(station_id, station_dir, first_hour, end_hour, fetch)
+        return read_hourly_store(station_dir, start=_hour_time(first_hour), end=_hour_time(end_hour))
+
+
+def fill_asos_window(station_ids: List[str], start_time: datetime, end_time: datetime,
+                     fetch_batch: Callable[[List[str], datetime, datetime], Dict[str, pd.DataFrame]]
+                     ) -> List[str]:
+    """
+    Caches a window of many stations at once: the stations with uncovered hours in the window are
+    fetched together for the whole window, then each one's gaps are filled from that download.
+
+    :param station_ids: The ASOS station ids.
+    :type station_ids: List[str]
+    :param start_time: The first wanted hour (UTC).
+    :type start_time: datetime
+    :param end_time: The last wanted hour (UTC).
+    :type end_time: datetime
+    :param fetch_batch: Fetches (station_ids, first_day, end_day) -> station id -> the hourly frame
+        aggregated from the reports of [first_day, end_day).
+    :type fetch_batch: Callable[[List[str], datetime, datetime], Dict[str, pd.DataFrame]]
+    :return: The stations that were fetched.
+    :rtype: List[str]
+    """
+    first_hour, end_hour = _window_hours(start_time, end_time)
+    if end_hour <= first_hour:
+        return []
+    # A coverage file is replaced atomically, so it can be read without the station lock.
+    uncovered = [station_id for station_id in station_ids if missing_ranges(
+        load_coverage(os.path.join(cache_dir(), station_id)), first_hour, end_hour)]
+    if not uncovered:
+        return []
+    first_day, end_day = _fetch_days(first_hour, end_hour)
+    fetched = fetch_batch(uncovered, first_day.tz_localize(None).to_pydatetime(),
+                          end_day.tz_localize(None).to_pydatetime())
+    for station_id in uncovered:
+        station_dir = os.path.join(cache_dir(), station_id)
+        # Every gap lies inside the downloaded days, and _fill_gaps clips the frame to each gap.
+        with directory_lock(station_dir):
+            _fill_gaps(station_id, station_dir, first_hour, end_hour,
+                       lambda station, gap_first_day, gap_end_day: fetched[station])
+    return uncovered
@@ -7,15 +7,31 @@ The AWDB REST API (https://wcc.sc.egov.usda.gov/awdbRestApi/) is the authoritati
 authentication is required.
 """
 import math
-from datetime import datetime
-from typing import Dict, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-import requests
+
+from host_limits import limited_get, map_in_context
+from metadata_cache import ENDPOINT_TTL_DAYS, cached_metadata
+from nldas_functions import split_period
+from station_index import StationIndex
 
 AWDB_BASE_URL = "https://wcc.sc.egov.usda.gov/awdbRestApi/services/v1"
+# Stations per element-metadata request (comma-separated triplets keep the URL well under 4 kB).
+AWDB_TRIPLETS_PER_REQUEST = 50
+# Period frequencies of the durations that can be returned as dense matrices.
+AWDB_DURATION_FREQ = {"DAILY": "D", "HOURLY": "h"}
+# Longer periods are split into windows of this many days, requested AWDB_WINDOW_WORKERS at a time
+# (the AWDB host concurrency cap in host_limits).
+AWDB_WINDOW_DAYS = {"HOURLY": 92, "DAILY": 3660}
+AWDB_WINDOW_WORKERS = 3
 
 
+@cached_metadata("awdb_stations")
 def get_awdb_stations(network: str = "SCAN", state_code: Optional[str] = None,
                       active_only: bool = True) -> pd.DataFrame:
     """
@@ -34,7 +50,7 @@ def get_awdb_stations(network: str = "SCAN", state_code: Optional[str] = None,
     """
     triplet_filter = "*:" + (state_code if state_code else "*") + ":" + network
     params = {"stationTriplets": triplet_filter, "activeOnly": str(active_only).lower()}
-    response = requests.get(AWDB_BASE_URL + "/stations", params=params, timeout=60)
+    response = limited_get(AWDB_BASE_URL + "/stations", params=params, timeout=60)
     response.raise_for_status()
     return pd.DataFrame(response.json())
 
@@ -67,6 +83,67 @@ def find_nearest_awdb_station(latitude: float, longitude: float, network: str =
     return nearest
 
 
+def _element_begin(station: Dict, element_code: str, duration: Optional[str]) -> Optional[str]:
+    """
+    Returns the earliest sensor begin date of an element from a station record of a
+    ``returnStationElements=true`` listing.
+
+    :param station: The station record with its "stationElements" list.
+    :type station: Dict
+    :param element_code: The element code, e.g. "SMS".
+    :type element_code: str
+    :param duration: Prefer sensors of this duration name (e.g. "HOURLY"); falls back to any duration
+        when no sensor matches. None accepts any duration.
+    :type duration: str, optional
+    :return: The earliest begin date as an ISO date string, or None when the station lacks the element.
+    :rtype: str, optional
+    """
+    elements = [element for element in station.get("stationElements") or []
+                if element["elementCode"] == element_code]
+    if duration is not None:
+        matching_duration = [element for element in elements
+                             if element.get("durationName") == duration]
+        elements = matching_duration or elements
+    begins = [element["beginDate"] for element in elements if element.get("beginDate")]
+    if not begins:
+        return None
+    return str(pd.Timestamp(min(begins)).date())
+
+
+def get_element_begin_dates(station_triplets: List[str], element_code: str = "SMS",
+                            duration: Optional[str] = "HOURLY",
+                            batch_size: int = AWDB_TRIPLETS_PER_REQUEST) -> Dict[str, Optional[str]]:
+    """
+    Returns the element begin dates of many stations, requesting the element metadata of up to
+    ``batch_size`` comma-separated station triplets at once.
+
+    :param station_triplets: The AWDB station triplets, e.g. ["2017:CO:SCAN", "2189:CO:SCAN"].
+    :type station_triplets: List[str]
+    :param element_code: The element code, defaults to "SMS" (soil moisture).
+    :type element_code: str, optional
+    :param duration: The preferred duration name (see :func:`get_element_begin_date`), defaults to
+        "HOURLY".
+    :type duration: str, optional
+    :param batch_size: The number of stations per request, defaults to
+        :data:`AWDB_TRIPLETS_PER_REQUEST`.
+    :type batch_size: int, optional
+    :return: A mapping of every requested triplet to its begin date (None when it lacks the element).
+    :rtype: Dict[str, Optional[str]]
+    """
+    begins: Dict[str, Optional[str]] = dict.fromkeys(station_triplets)
+    triplets = list(begins)
+    for offset in range(0, len(triplets), batch_size):
+        params = {"stationTriplets": ",".join(triplets[offset:offset + batch_size]),
+                  "returnStationElements": "true"}
+        response = limited_get(AWDB_BASE_URL + "/stations", params=params, timeout=120)
+        response.raise_for_status()
+        for station in response.json():
+            if station.get("stationTriplet") in begins:
+                begins[station["stationTriplet"]] = _element_begin(station, element_code, duration)
+    return begins
+
+
+@cached_metadata("awdb_element_begin")
 def get_element_begin_date(station_triplet: str, element_code: str = "SMS",
                            duration: Optional[str] = "HOURLY") -> Optional[str]:
     """
@@ -86,22 +163,93 @@ def get_element_begin_date(station_triplet: str, element_code: str = "SMS",
     :return: The earliest begin date as an ISO date string, or None when the station lacks the element.
     :rtype: str, optional
     """
-    params = {"stationTriplets": station_triplet, "returnStationElements": "true"}
-    response = requests.get(AWDB_BASE_URL + "/stations", params=params, timeout=60)
-    response.raise_for_status()
-    payload = response.json()
-    if not payload:
-        return None
-    elements = [element for element in payload[0].get("stationElements", [])
-                if element["elementCode"] == element_code]
-    if duration is not None:
-        matching_duration = [element for element in elements
-                             if element.get("durationName") == duration]
-        elements = matching_duration or elements
-    begins = [element["beginDate"] for element in elements if element.get("beginDate")]
-    if not begins:
-        return None
-    return str(pd.Timestamp(min(begins)).date())
+    return get_element_begin_dates([station_triplet], element_code, duration)[station_triplet]
+
+
+@cached_metadata("awdb_inventory")
+def get_awdb_inventory(network: str = "SCAN", element_code: str = "SMS",
+                       duration: Optional[str] = "HOURLY") -> pd.DataFrame:
+    """
+    Lists the stations of a network together with the begin date of one element, so station selection
+    for a whole fleet needs no per-candidate metadata requests.
+
+    The listing costs one request and the element metadata one request per
+    :data:`AWDB_TRIPLETS_PER_REQUEST` stations; the result is cached for the "awdb_inventory" TTL.
+
+    :param network: The AWDB network code, defaults to "SCAN".
+    :type network: str, optional
+    :param element_code: The element whose begin date is listed, defaults to "SMS".
+    :type element_code: str, optional
+    :param duration: The preferred duration name (see :func:`get_element_begin_date`), defaults to
+        "HOURLY".
+    :type duration: str, optional
+    :return: The :func:`get_awdb_stations` records with an added "element_begin" column (ISO date, or
+        missing when the station lacks the element).
+    :rtype: pd.DataFrame
+    """
+    stations = get_awdb_stations(network=network)
+    if stations.empty:
+        return stations.assign(element_begin=pd.Series(dtype=object))
+    begins = get_element_begin_dates(list(stations["stationTriplet"]), element_code, duration)
+    return stations.assign(element_begin=stations["stationTriplet"].map(begins))
+
+
+_AWDB_INDEXES: Dict[Tuple[str, str, Optional[str]], Tuple[float, StationIndex]] = {}
+
+
+def get_awdb_station_index(network: str = "SCAN", element_code: str = "SMS",
+                           duration: Optional[str] = "HOURLY") -> StationIndex:
+    """
+    Returns the spatial index of a network's inventory (see :func:`get_awdb_inventory`), built once per
+    process and rebuilt when older than the "awdb_inventory" cache TTL.
+
+    :param network: The AWDB network code, defaults to "SCAN".
+    :type network: str, optional
+    :param element_code: The element whose begin date the inventory lists, defaults to "SMS".
+    :type element_code: str, optional
+    :param duration: The preferred duration name, defaults to "HOURLY".
+    :type duration: str, optional
+    :return: The station index; its ``stations`` are the inventory records.
+    :rtype: StationIndex
+    """
+    key = (network, element_code, duration)
+    built = _AWDB_INDEXES.get(key)
+    if built is None or time.time() - built[0] > ENDPOINT_TTL_DAYS["awdb_inventory"] * 86400:
+        built = (time.time(), StationIndex(get_awdb_inventory(network, element_code, duration)))
+        _AWDB_INDEXES[key] = built
+    return built[1]
+
+
+def find_best_scan_stations(latitudes, longitudes, max_distance_km: float = 75.0,
+                            element_code: str = "SMS", candidates: int = 32) -> List[Optional[Dict]]:
+    """
+    Finds the SCAN station with the longest record of an element for many points (e.g. a whole gauge
+    fleet) in one query of the cached inventory.
+
+    :param latitudes: The latitudes of the points in decimal degrees.
+    :param longitudes: The longitudes of the points in decimal degrees.
+    :param max_distance_km: Only consider stations within this distance, defaults to 75.0.
+    :type max_distance_km: float, optional
+    :param element_code: The element whose record length is optimized, defaults to "SMS".
+    :type element_code: str, optional
+    :param candidates: The most stations considered per point, nearest first, defaults to 32.
+    :type candidates: int, optional
+    :return: Per point, the chosen station record (as :func:`find_best_scan_station`) or None.
+    :rtype: List[Optional[Dict]]
+    """
+    latitudes = np.atleast_1d(np.asarray(latitudes, dtype=float))
+    best: List[Optional[Dict]] = [None] * len(latitudes)
+    index = get_awdb_station_index("SCAN", element_code)
+    if len(index) == 0:
+        return best
+    nearest = index.nearest(latitudes, longitudes, k=min(candidates, len(index)),
+                            max_distance_km=max_distance_km)
+    nearest = nearest[nearest["element_begin"].notna()]
+    # Earliest begin first; the stable sort keeps ties in distance order.
+    nearest = nearest.sort_values(["query", "element_begin"], kind="stable").drop_duplicates("query")
+    for query, record in zip(nearest["query"], nearest.drop(columns=["query", "rank"]).to_dict("records")):
+        best[query] = record
+    return best
 
 
 def find_best_scan_station(latitude: float, longitude: float, max_distance_km: float = 75.0,
@@ -112,6 +260,7 @@ def find_best_scan_station(latitude: float, longitude: float, max_distance_km: f
     Pure nearest-distance selection can be costly: near the Cache la Poudre gauge, CPER (39.9 km) only
     records soil moisture from 2013 while Nunn #1 (41 km) records from 1997 — so among all stations
     within the distance cap this picks the earliest element begin date, breaking ties by distance.
+    Begin dates come from the cached inventory (:func:`get_awdb_inventory`).
 
     :param latitude: The latitude of the point in decimal degrees.
     :type latitude: float
@@ -125,35 +274,102 @@ def find_best_scan_station(latitude: float, longitude: float, max_distance_km: f
         when no station within range records the element.
     :rtype: Dict, optional
     """
-    stations = get_awdb_stations(network="SCAN")
-    lat1, lon1 = math.radians(latitude), math.radians(longitude)
-    lat2 = stations["latitude"].map(math.radians)
-    lon2 = stations["longitude"].map(math.radians)
-    hav = ((lat2 - lat1) / 2).map(math.sin) ** 2 + math.cos(lat1) * lat2.map(math.cos) * \
-        ((lon2 - lon1) / 2).map(math.sin) ** 2
-    stations = stations.assign(distance_km=2 * 6371.0 * hav.map(math.sqrt).map(math.asin))
-    candidates = stations[stations["distance_km"] <= max_distance_km].sort_values("distance_km")
-    best: Optional[Dict] = None
-    for _, candidate in candidates.iterrows():
-        begin = get_element_begin_date(candidate["stationTriplet"], element_code=element_code)
-        if begin is None:
+    return find_best_scan_stations([latitude], [longitude], max_distance_km, element_code)[0]
+
+
+def _station_data_frame(station: Dict) -> Optional[pd.DataFrame]:
+    """
+    Decodes the element blocks of one station of a ``/data`` response into a wide dataframe.
+
+    The date strings of all blocks are parsed once into a single sorted time index and every block's
+    values are written into its column by position, so the cost is linear in the number of sensors.
+    A repeated element/depth name (e.g. a replaced sensor) fills the gaps of the first one.
+
+    :param station: The station record with its "data" list of element blocks.
+    :type station: Dict
+    :return: A dataframe with one column per element/depth combination and a sorted "datetime" column,
+        or None when the station returned no values.
+    :rtype: pd.DataFrame, optional
+    """
+    names: List[str] = []
+    block_dates = []
+    block_values = []
+    for element_block in station.get("data", []):
+        values = element_block.get("values") or []
+        if not values:
             continue
-        if best is None or begin < best["element_begin"]:
-            record = candidate.to_dict()
-            record["element_begin"] = begin
-            best = record
-    return best
+        meta = element_block["stationElement"]
+        name = meta["elementCode"]
+        if meta.get("heightDepth") is not None:
+            name = name + "_" + str(meta["heightDepth"]) + "in"
+        names.append(name)
+        block_dates.append([value["date"] for value in values])
+        block_values.append(np.array([value.get("value") for value in values], dtype=float))
+    if not names:
+        return None
+    codes, unique_dates = pd.factorize(np.concatenate(block_dates))
+    # ISO date strings sort chronologically, so sorting the unique strings orders the time index.
+    order = np.argsort(unique_dates)
+    unique_dates = unique_dates[order]
+    positions = np.empty(len(order), dtype=np.intp)
+    positions[order] = np.arange(len(order))
+    positions = positions[codes]
+    columns = list(dict.fromkeys(names))
+    table = np.full((len(unique_dates), len(columns)), np.nan)
+    offset = 0
+    for name, values in zip(names, block_values):
+        rows = positions[offset:offset + len(values)]
+        offset += len(values)
+        column = table[:, columns.index(name)]
+        fill = np.isnan(column[rows])
+        column[rows[fill]] = values[fill]
+    frame = pd.DataFrame(table, columns=columns)
+    frame["datetime"] = pd.to_datetime(unique_dates)
+    return frame
+
+
+def _fetch_element_window(station_triplet: str, elements: List[str], start_time: datetime,
+                          end_time: datetime, duration: str) -> Optional[pd.DataFrame]:
+    """
+    Requests one time window of a station's elements from the ``/data`` endpoint.
+
+    :param station_triplet: The AWDB station triplet.
+    :type station_triplet: str
+    :param elements: The element codes to fetch.
+    :type elements: List[str]
+    :param start_time: The start of the window.
+    :type start_time: datetime
+    :param end_time: The end of the window (inclusive).
+    :type end_time: datetime
+    :param duration: The AWDB duration name.
+    :type duration: str
+    :return: The decoded window (see :func:`_station_data_frame`), or None when it has no values.
+    :rtype: pd.DataFrame, optional
+    """
+    params = {
+        "stationTriplets": station_triplet,
+        "elements": ",".join(elements),
+        "duration": duration,
+        "beginDate": start_time.strftime("%Y-%m-%d %H:%M"),
+        "endDate": end_time.strftime("%Y-%m-%d %H:%M"),
+    }
+    response = limited_get(AWDB_BASE_URL + "/data", params=params, timeout=120)
+    response.raise_for_status()
+    payload = response.json()
+    return _station_data_frame(payload[0]) if payload else None
 
 
 def get_awdb_element_data(station_triplet: str, elements: List[str], start_time: datetime,
                           end_time: datetime, duration: str = "HOURLY",
-                          utc_offset_hours: Optional[float] = None) -> pd.DataFrame:
+                          utc_offset_hours: Optional[float] = None, window_days: Optional[float] = None,
+                          max_workers: int = AWDB_WINDOW_WORKERS) -> pd.DataFrame:
     """
     Fetches element time series from the AWDB data endpoint as a wide dataframe.
 
     Column names combine the element code and the sensor depth in inches when a depth is present, e.g.
     ``SMS_-2in`` for soil moisture two inches below the surface, otherwise just the element code (e.g.
-    ``WTEQ``).
+    ``WTEQ``). Periods longer than ``window_days`` are requested as parallel time windows and stitched
+    back together.
 
     :param station_triplet: The AWDB station triplet, e.g. "2017:CO:SCAN" or "713:CO:SNTL".
     :type station_triplet: str
@@ -170,39 +386,82 @@ def get_awdb_element_data(station_triplet: str, elements: List[str], start_time:
         is subtracted to shift the "datetime" column to UTC (e.g. -8.0 for a station whose dataTimeZone
         is -8), defaults to None which leaves timestamps unshifted.
     :type utc_offset_hours: float, optional
+    :param window_days: The longest period per request, defaults to None which uses
+        :data:`AWDB_WINDOW_DAYS` for the duration.
+    :type window_days: float, optional
+    :param max_workers: The most windows requested at once, defaults to :data:`AWDB_WINDOW_WORKERS`.
+    :type max_workers: int, optional
     :return: A dataframe with a "datetime" column and one column per element/depth combination.
     :rtype: pd.DataFrame
     """
-    params = {
-        "stationTriplets": station_triplet,
-        "elements": ",".join(elements),
-        "duration": duration,
-        "beginDate": start_time.strftime("%Y-%m-%d %H:%M"),
-        "endDate": end_time.strftime("%Y-%m-%d %H:%M"),
-    }
-    response = requests.get(AWDB_BASE_URL + "/data", params=params, timeout=120)
-    response.raise_for_status()
-    payload = response.json()
-    if not payload:
+    windows = split_period(start_time, end_time,
+                           window_days if window_days is not None else AWDB_WINDOW_DAYS.get(duration),
+                           step=timedelta(hours=1) if duration == "HOURLY" else timedelta(days=1))
+    if len(windows) == 1:
+        frames = [_fetch_element_window(station_triplet, elements, start_time, end_time, duration)]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            frames = map_in_context(pool, lambda window: _fetch_element_window(
+                station_triplet, elements, window[0], window[1], duration), windows)
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
         return pd.DataFrame(columns=["datetime"])
-    merged: Optional[pd.DataFrame] = None
-    for element_block in payload[0].get("data", []):
-        meta = element_block["stationElement"]
-        name = meta["elementCode"]
-        if meta.get("heightDepth") is not None:
-            name = name + "_" + str(meta["heightDepth"]) + "in"
-        series = pd.DataFrame(element_block["values"])
-        if series.empty:
-            continue
-        series = series.rename(columns={"value": name})[["date", name]]
-        merged = series if merged is None else merged.merge(series, on="date", how="outer")
-    if merged is None:
-        return pd.DataFrame(columns=["datetime"])
-    merged["datetime"] = pd.to_datetime(merged["date"])
+    merged = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    merged = merged.drop_duplicates("datetime")
     if utc_offset_hours is not None:
         merged["datetime"] = merged["datetime"] - pd.Timedelta(hours=utc_offset_hours)
         merged["datetime"] = merged["datetime"].dt.tz_localize("UTC")
-    return merged.drop(columns=["date"]).sort_values("datetime").reset_index(drop=True)
+    return merged.sort_values("datetime").reset_index(drop=True)
+
+
+def get_awdb_element_matrix(station_triplets: List[str], element_code: str, start_time: datetime,
+                            end_time: datetime, duration: str = "DAILY",
+                            batch_size: int = AWDB_TRIPLETS_PER_REQUEST) -> pd.DataFrame:
+    """
+    Fetches one element of many stations as a dense station x time matrix, requesting up to
+    ``batch_size`` comma-separated station triplets per ``/data`` call.
+
+    :param station_triplets: The AWDB station triplets, e.g. ["713:CO:SNTL", "1123:CO:SNTL"].
+    :type station_triplets: List[str]
+    :param element_code: An element without sensor depths, e.g. "WTEQ".
+    :type element_code: str
+    :param start_time: The first period (floored to the duration).
+    :type start_time: datetime
+    :param end_time: The last period (inclusive).
+    :type end_time: datetime
+    :param duration: "DAILY" or "HOURLY", defaults to "DAILY".
+    :type duration: str, optional
+    :param batch_size: The number of stations per request, defaults to :data:`AWDB_TRIPLETS_PER_REQUEST`.
+    :type batch_size: int, optional
+    :return: A float dataframe indexed by triplet with one column per day (or hour) of the period; NaN
+        where a station reported no value.
+    :rtype: pd.DataFrame
+    """
+    if duration not in AWDB_DURATION_FREQ:
+        raise ValueError("Unsupported duration for a dense matrix: " + duration)
+    freq = AWDB_DURATION_FREQ[duration]
+    periods = pd.date_range(pd.Timestamp(start_time).floor(freq), pd.Timestamp(end_time).floor(freq),
+                            freq=freq)
+    triplets = list(dict.fromkeys(station_triplets))
+    matrix = pd.DataFrame(np.nan, index=pd.Index(triplets, name="stationTriplet"), columns=periods)
+    for offset in range(0, len(triplets), batch_size):
+        params = {
+            "stationTriplets": ",".join(triplets[offset:offset + batch_size]),
+            "elements": element_code,
+            "duration": duration,
+            "beginDate": periods[0].strftime("%Y-%m-%d %H:%M"),
+            "endDate": periods[-1].strftime("%Y-%m-%d %H:%M"),
+        }
+        response = limited_get(AWDB_BASE_URL + "/data", params=params, timeout=180)
+        response.raise_for_status()
+        for station in response.json():
+            triplet = station.get("stationTriplet")
+            frame = _station_data_frame(station)
+            if frame is None or element_code not in frame.columns or triplet not in matrix.index:
+                continue
+            values = pd.Series(frame[element_code].to_numpy(), index=frame["datetime"])
+            matrix.loc[triplet] = values.reindex(periods).to_numpy()
+    return matrix
 
 
 def get_scan_soil_moisture(station_triplet: str, start_time: datetime, end_time: datetime,
@@ -19,6 +19,8 @@ from typing import Dict
 
 from google.cloud import storage
 
+from host_limits import GCS_HOST, host_slot
+
 DEFAULT_BUCKET = "flow_hydro_2_data"
 DEFAULT_PROJECT = "hydro-earthnet-db"
 # All automated writes live under this namespace so they are auditable and safely disposable without
@@ -55,12 +57,13 @@ def upload_directory_to_gcs(local_dir: str, bucket_name: str = DEFAULT_BUCKET, p
             blob_name = "/".join(filter(None, [BACKUP_ROOT_PREFIX, prefix,
                                                relative.replace(os.sep, "/")]))
             size = os.path.getsize(local_path)
-            if skip_existing:
-                existing = bucket.get_blob(blob_name)
-                if existing is not None and existing.size == size:
-                    skipped += 1
-                    continue
-            bucket.blob(blob_name).upload_from_filename(local_path)
+            with host_slot(GCS_HOST):
+                if skip_existing:
+                    existing = bucket.get_blob(blob_name)
+                    if existing is not None and existing.size == size:
+                        skipped += 1
+                        continue
+                bucket.blob(blob_name).upload_from_filename(local_path)
             uploaded += 1
             bytes_uploaded += size
     return {"uploaded": uploaded, "skipped": skipped, "bytes_uploaded": bytes_uploaded}
@@ -85,7 +88,8 @@ def upload_file(local_path: str, blob_prefix: str, bucket_name: str = DEFAULT_BU
     client = storage.Client(project=project)
     blob_name = "/".join(filter(None, [BACKUP_ROOT_PREFIX, blob_prefix,
                                        os.path.basename(local_path)]))
-    client.bucket(bucket_name).blob(blob_name).upload_from_filename(local_path)
+    with host_slot(GCS_HOST):
+        client.bucket(bucket_name).blob(blob_name).upload_from_filename(local_path)
 
 
 def main() -> None:
@@ -20,22 +20,28 @@ from typing import Dict, List, Optional, Tuple
 import numpy as np
 import pandas as pd
 
+from hourly_store import read_hourly_store, store_path
+
 SLICE_HOURS = 92 * 24
 SEASON_STARTS = {"winter": (12, 1), "spring": (3, 1), "summer": (6, 1), "fall": (9, 1)}
 
 
 def load_hourly_flow(csv_path: str, end_date: Optional[str] = None) -> pd.Series:
     """
-    Loads a gauge's hourly cfs series from a fleet-scrape CSV.
+    Loads a gauge's hourly cfs series from a fleet scrape.
 
-    :param csv_path: Path to <site>_hourly_full.csv.
+    :param csv_path: Path to <site>_hourly_full.csv, or to a columnar <site>_hourly store directory
+        (read through memory maps, only the cfs column and the hours before end_date).
     :type csv_path: str
     :param end_date: Optional exclusive upper bound (e.g. a training cutoff), defaults to None.
     :type end_date: str, optional
     :return: An hourly cfs series with NaNs for missing hours.
     :rtype: pd.Series
     """
-    frame = pd.read_csv(csv_path, usecols=["datetime", "cfs"], parse_dates=["datetime"])
+    if os.path.isdir(csv_path):
+        frame = read_hourly_store(csv_path, columns=["cfs"], end=end_date)
+    else:
+        frame = pd.read_csv(csv_path, usecols=["datetime", "cfs"], parse_dates=["datetime"])
     frame = frame.set_index("datetime").sort_index()
     if frame.index.tz is not None:
         frame.index = frame.index.tz_convert("UTC").tz_localize(None)
@@ -149,7 +155,9 @@ def build_state(state: str, embedding_root: str, scrape_root: str, output_root:
         if os.path.exists(output_path):
             counts["already_done"] += 1
             continue
-        csv_path = os.path.join(scrape_root, state, site, "%s_hourly_full.csv" % site)
+        csv_path = store_path(os.path.join(scrape_root, state, site), site)
+        if not os.path.isdir(csv_path):
+            csv_path = os.path.join(scrape_root, state, site, "%s_hourly_full.csv" % site)
         if not os.path.exists(csv_path):
             counts["no_hourly_csv"] += 1
             continue
@@ -16,24 +16,28 @@ be built in any environment; ASOS weather joining remains the job of ``HydroScra
 """
 import json
 import os
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Callable, Dict, Iterable, Optional, Union
 
 import pandas as pd
-import pytz
-
 import requests
 
 from awdb_functions import find_best_scan_station, get_element_begin_date, get_scan_soil_moisture
 from gages2_functions import download_gages2, gauge_in_gages2, get_gages2_attributes
+from host_limits import on_slot_granted
 from nldas_functions import get_nldas_forcing
-from scrape_text import timezone_map
 from weather_scraping_functions import FIPS_TO_STATE, find_nearest_asos_station, get_hourly_asos
-from usgs_scraping_functions import (basin_bounding_box, get_basin_boundary, get_period_of_record,
-                                     get_site_metadata, make_usgs_data, rename_cols)
+from usgs_scraping_functions import (basin_bounding_box, drop_rdb_format_row, get_basin_boundary,
+                                     get_period_of_record, get_site_metadata, local_to_utc,
+                                     make_usgs_data, rename_cols)
 
 # NLDAS-2 primary forcing coverage begins here (hourly, CONUS-wide).
 NLDAS_BEGIN_DATE = "1979-01-02"
+# Wall-clock budget (seconds) of each source of a chunk; beyond it an optional source is left out.
+SOURCE_TIMEOUTS = {"usgs": 900.0, "asos": 300.0, "scan": 300.0, "nldas": 900.0}
 
 
 
@@ -41,7 +45,7 @@ def usgs_to_hourly_utc(df: pd.DataFrame) -> pd.DataFrame:
     """
     Converts a raw USGS instantaneous-values dataframe to an hourly UTC dataframe.
 
-    Mirrors ``HydroScraper.process_intermediate_csv`` (junk-row removal, timezone conversion, numeric
+    Mirrors ``HydroScraper.process_intermediate_csv`` (format-row removal, timezone conversion, numeric
     parsing, hourly filtering) without requiring the BigQuery/Redis imports of that module.
 
     :param df: The dataframe returned by :func:`usgs_scraping_functions.make_usgs_data` after
@@ -50,23 +54,24 @@ def usgs_to_hourly_utc(df: pd.DataFrame) -> pd.DataFrame:
     :return: An hourly dataframe with a tz-aware UTC "datetime" column and numeric flow columns.
     :rtype: pd.DataFrame
     """
-    if len(df) < 2 or "tz_cd" not in df.columns or "datetime" not in df.columns:
+    if "tz_cd" not in df.columns or "datetime" not in df.columns:
+        return pd.DataFrame(columns=["datetime", "cfs"])
+    df = drop_rdb_format_row(df).copy()
+    if df.empty:
         return pd.DataFrame(columns=["datetime", "cfs"])
-    df = df.iloc[1:].copy()
-    local_zone = pytz.timezone(timezone_map[df["tz_cd"].iloc[0]])
-    df["datetime"] = df["datetime"].map(
-        lambda x: local_zone.localize(datetime.strptime(x, "%Y-%m-%d %H:%M")).astimezone(pytz.UTC))
+    df["datetime"] = local_to_utc(df["datetime"], df["tz_cd"])
     for column in ("cfs", "height", "precip_usgs"):
         if column in df.columns:
             df[column] = pd.to_numeric(df[column], errors="coerce")
-    hourly = df[df["datetime"].map(lambda x: x.minute) == 0].reset_index(drop=True)
+    hourly = df[df["datetime"].dt.minute == 0].reset_index(drop=True)
     keep = ["datetime"] + [c for c in ("cfs", "height", "precip_usgs") if c in hourly.columns]
     return hourly[keep]
 
 
 def discover_catchment(site_number: str, include_basin: bool = True, include_asos: bool = True,
                        include_soil_moisture: bool = True,
-                       gages2_zip_path: Optional[str] = None) -> Dict:
+                       gages2_zip_path: Optional[str] = None,
+                       site_index: Optional[Dict[str, Dict]] = None) -> Dict:
     """
     Performs the one-time, time-independent discovery for a gauge: static attributes, basin polygon
     and nearest ASOS/SCAN stations.
@@ -85,11 +90,21 @@ def discover_catchment(site_number: str, include_basin: bool = True, include_aso
     :param gages2_zip_path: Optional GAGES-II archive path for the static attribute join,
         defaults to None.
     :type gages2_zip_path: str, optional
+    :param site_index: A state-wide index from :func:`usgs_scraping_functions.get_state_site_index`;
+        gauges found in it need no NWIS metadata requests, and gauges in its optional "asos_station"
+        entry (site number -> station record, see :func:`state_scrape.fleet_asos_stations`) no station
+        search, defaults to None.
+    :type site_index: Dict[str, Dict], optional
     :return: A dict with "static", "basin_geometry", "asos_station" and "scan_station" keys (the
-        latter three may be None when disabled or unavailable).
+        latter three may be None when disabled or unavailable), plus "period_of_record" when the
+        site index holds the gauge's series catalog.
     :rtype: Dict
     """
-    static = get_site_metadata(site_number)
+    site_index = dict({"metadata": {}, "period_of_record": {}, "asos_station": {}}, **(site_index or {}))
+    if site_number in site_index["metadata"]:
+        static = dict(site_index["metadata"][site_number])
+    else:
+        static = get_site_metadata(site_number)
     latitude, longitude = static["dec_lat_va"], static["dec_long_va"]
 
     if gages2_zip_path is not None:
@@ -111,7 +126,9 @@ def discover_catchment(site_number: str, include_basin: bool = True, include_aso
 
     asos_station = None
     if include_asos:
-        asos_station = find_nearest_asos_station(latitude, longitude, FIPS_TO_STATE[static["state_cd"]])
+        asos_station = site_index["asos_station"].get(site_number)
+        if asos_station is None:
+            asos_station = find_nearest_asos_station(latitude, longitude)
         static["asos_station_id"] = asos_station["station_id"]
         static["asos_distance_km"] = asos_station["distance_km"]
 
@@ -124,8 +141,11 @@ def discover_catchment(site_number: str, include_basin: bool = True, include_aso
             static["scan_distance_km"] = scan_station["distance_km"]
             static["scan_sms_begin"] = scan_station["element_begin"]
 
-    return {"static": static, "basin_geometry": basin_geometry, "asos_station": asos_station,
-            "scan_station": scan_station}
+    discovery = {"static": static, "basin_geometry": basin_geometry, "asos_station": asos_station,
+                 "scan_station": scan_station}
+    if site_number in site_index["period_of_record"]:
+        discovery["period_of_record"] = site_index["period_of_record"][site_number]
+    return discovery
 
 
 def get_data_availability(site_number: str, discovery: Optional[Dict] = None,
@@ -140,8 +160,9 @@ def get_data_availability(site_number: str, discovery: Optional[Dict] = None,
 
     :param site_number: The USGS gauge site number.
     :type site_number: str
-    :param discovery: A prior :func:`discover_catchment` result to reuse, defaults to None which runs
-        a minimal discovery (no basin, no GAGES-II).
+    :param discovery: A prior :func:`discover_catchment` result to reuse (its "period_of_record", when
+        present, spares the series catalog request), defaults to None which runs a minimal discovery
+        (no basin, no GAGES-II).
     :type discovery: Dict, optional
     :param include_sentinel: Whether to look up the tile's earliest Sentinel-2 scene, defaults to True.
     :type include_sentinel: bool, optional
@@ -159,7 +180,9 @@ def get_data_availability(site_number: str, discovery: Optional[Dict] = None,
                           "nldas_begin": NLDAS_BEGIN_DATE, "sentinel_begin": None,
                           "camera_begin": None}
 
-    catalog = get_period_of_record(site_number)
+    catalog = discovery.get("period_of_record")
+    if catalog is None:
+        catalog = get_period_of_record(site_number)
     if "uv_00060" in catalog:
         availability["usgs_hourly_begin"] = catalog["uv_00060"]["begin_date"]
 
@@ -197,12 +220,91 @@ def get_data_availability(site_number: str, discovery: Optional[Dict] = None,
     return availability
 
 
+def fetch_sources(sources: Dict[str, Callable[[], pd.DataFrame]], timeouts: Dict[str, float],
+                  required: Iterable[str] = ()) -> Dict[str, Union[pd.DataFrame, Exception]]:
+    """
+    Runs independent source fetches concurrently, each bounded by its own wall-clock timeout.
+
+    A source's clock starts when it is first granted a host request slot (see
+    :func:`host_limits.on_slot_granted`), so time queued behind other gauges' requests to a busy host
+    does not count against it. A source that raises or is still running at its deadline yields the
+    exception (a ``TimeoutError`` for the latter) instead of a frame; the others are unaffected, unless
+    a ``required`` source failed: then the rest yield a ``CancelledError`` at once and their remaining
+    requests are abandoned before they are sent. Timed-out and cancelled fetches finish in the
+    background rather than being waited for.
+
+    :param sources: Source name -> a callable returning the source's frame.
+    :type sources: Dict[str, Callable[[], pd.DataFrame]]
+    :param timeouts: Source name -> seconds allowed from its first request slot (sources without one
+        wait indefinitely).
+    :type timeouts: Dict[str, float]
+    :param required: The sources whose failure makes the others pointless, defaults to ().
+    :type required: Iterable[str], optional
+    :return: Source name -> the frame or the exception.
+    :rtype: Dict[str, Union[pd.DataFrame, Exception]]
+    """
+    if not sources:
+        return {}
+    changed = threading.Condition()
+    granted: Dict[str, float] = {}
+    cancelled = threading.Event()
+
+    def run(name: str, fetch: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        def on_slot() -> None:
+            if cancelled.is_set():
+                raise CancelledError("%s source cancelled after a required source failed" % name)
+            with changed:
+                granted.setdefault(name, time.monotonic())
+                changed.notify_all()
+        with on_slot_granted(on_slot):
+            return fetch()
+
+    def notify(_) -> None:
+        with changed:
+            changed.notify_all()
+    pool = ThreadPoolExecutor(max_workers=len(sources))
+    futures = {name: pool.submit(run, name, fetch) for name, fetch in sources.items()}
+    for future in futures.values():
+        future.add_done_callback(notify)
+    results: Dict[str, Union[pd.DataFrame, Exception]] = {}
+    with changed:
+        while len(results) < len(futures):
+            now, deadlines = time.monotonic(), []
+            for name in [name for name in futures if name not in results]:
+                deadline = granted[name] + timeouts[name] if name in granted and name in timeouts else None
+                if futures[name].done():
+                    results[name] = futures[name].exception() or futures[name].result()
+                elif deadline is not None and deadline <= now:
+                    results[name] = TimeoutError("%s source exceeded %g s" % (name, timeouts[name]))
+                elif deadline is not None:
+                    deadlines.append(deadline)
+            if any(isinstance(results.get(name), Exception) for name in required):
+                cancelled.set()
+                for name in futures:
+                    results.setdefault(name, CancelledError("%s source cancelled after a required source "
+                                                            "failed" % name))
+                break
+            if len(results) < len(futures):
+                changed.wait(timeout=min(deadlines) - now if deadlines else None)
+    pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
 def fetch_hourly_chunk(site_number: str, start_time: datetime, end_time: datetime, discovery: Dict,
                        include_nldas: bool = False, earthdata_token: Optional[str] = None,
-                       max_scan_distance_km: float = 75.0) -> pd.DataFrame:
+                       max_scan_distance_km: float = 75.0,
+                       usgs_raw: Optional[pd.DataFrame] = None,
+                       nldas_forcing: Optional[pd.DataFrame] = None,
+                       source_timeouts: Optional[Dict[str, float]] = None) -> pd.DataFrame:
     """
     Fetches and joins one time window of hourly data using a prior :func:`discover_catchment` result.
 
+    The sources (USGS, ASOS, SCAN, NLDAS) are fetched concurrently (see :func:`fetch_sources`), so a
+    chunk takes as long as its slowest source. USGS flow is required and its failure raises (without
+    waiting for the other sources); an optional source that fails or exceeds its timeout is reported,
+    its columns are left out and its exception is kept in the frame's ``attrs["failed_sources"]`` (source
+    name -> exception) so the caller can refetch the window later.
+
     :param site_number: The USGS gauge site number.
     :type site_number: str
     :param start_time: The start of the window.
@@ -217,34 +319,61 @@ def fetch_hourly_chunk(site_number: str, start_time: datetime, end_time: datetim
     :type earthdata_token: str, optional
     :param max_scan_distance_km: Skip the soil moisture join beyond this distance, defaults to 75.0.
     :type max_scan_distance_km: float, optional
+    :param usgs_raw: A raw instantaneous-values frame for this window that was already fetched (e.g.
+        by :func:`usgs_scraping_functions.fetch_usgs_fleet`), defaults to None which requests it.
+    :type usgs_raw: pd.DataFrame, optional
+    :param nldas_forcing: NLDAS-2 forcing for this window that was already extracted (e.g. from local
+        grid files by :func:`nldas_grid_extract.extract_gauge_forcing`), defaults to None which requests
+        it from Giovanni.
+    :type nldas_forcing: pd.DataFrame, optional
+    :param source_timeouts: Per-source overrides of :data:`SOURCE_TIMEOUTS` in seconds, defaults to None.
+    :type source_timeouts: Dict[str, float], optional
     :return: The joined hourly dataframe for the window (may be empty when the gauge has no data).
     :rtype: pd.DataFrame
     """
     static = discovery["static"]
-    hourly = usgs_to_hourly_utc(rename_cols(make_usgs_data(start_time, end_time, site_number)))
-    if hourly.empty:
-        return hourly
-
+    timeouts = dict(SOURCE_TIMEOUTS, **(source_timeouts or {}))
+    sources: Dict[str, Callable[[], pd.DataFrame]] = {}
+    if usgs_raw is None:
+        sources["usgs"] = lambda: make_usgs_data(start_time, end_time, site_number)
     if discovery.get("asos_station") is not None:
-        asos = get_hourly_asos(discovery["asos_station"]["station_id"], start_time, end_time)
-        if len(asos) > 0:
-            hourly = hourly.merge(asos, on="datetime", how="left")
-
+        sources["asos"] = lambda: get_hourly_asos(discovery["asos_station"]["station_id"], start_time,
+                                                  end_time)
     scan_station = discovery.get("scan_station")
     if scan_station is not None and scan_station["distance_km"] <= max_scan_distance_km:
-        soil = get_scan_soil_moisture(scan_station["stationTriplet"], start_time, end_time,
-                                      utc_offset_hours=scan_station.get("dataTimeZone"))
-        if len(soil) > 0:
-            hourly = hourly.merge(soil, on="datetime", how="left")
-
-    if include_nldas:
-        forcing = get_nldas_forcing(static["dec_lat_va"], static["dec_long_va"], start_time, end_time,
-                                    token=earthdata_token)
+        sources["scan"] = lambda: get_scan_soil_moisture(scan_station["stationTriplet"], start_time,
+                                                         end_time,
+                                                         utc_offset_hours=scan_station.get("dataTimeZone"))
+    if include_nldas and nldas_forcing is None:
+        sources["nldas"] = lambda: get_nldas_forcing(static["dec_lat_va"], static["dec_long_va"], start_time,
+                                                     end_time, token=earthdata_token)
+    results = fetch_sources(sources, timeouts, required=["usgs"])
+    if usgs_raw is None:
+        if isinstance(results["usgs"], Exception):
+            raise results["usgs"]
+        usgs_raw = results["usgs"]
+    hourly = usgs_to_hourly_utc(rename_cols(usgs_raw))
+    if hourly.empty:
+        return hourly
+
+    failed_sources = {name: results.pop(name) for name in ("asos", "scan", "nldas")
+                      if isinstance(results.get(name), Exception)}
+    for name, error in failed_sources.items():
+        print("  WARN %s source failed for %s; its columns are left out: %s"
+              % (name, site_number, str(error)[:200]))
+    for name in ("asos", "scan"):
+        frame = results.get(name)
+        if frame is not None and len(frame) > 0:
+            hourly = hourly.merge(frame, on="datetime", how="left")
+
+    forcing = nldas_forcing.copy() if nldas_forcing is not None else results.get("nldas")
+    if include_nldas and forcing is not None:
         if "potential_evaporation" in forcing.columns:
             # NLDAS-2 PotEvap is an hourly accumulation in kg/m^2, which equals mm; negative values
             # (condensation) are clipped since GR4 expects a non-negative PET forcing.
             forcing["pet_mm_hr"] = forcing["potential_evaporation"].clip(lower=0.0)
         hourly = hourly.merge(forcing, on="datetime", how="left")
+    hourly.attrs["failed_sources"] = failed_sources
     return hourly
 
 
@@ -3,9 +3,10 @@ Builds the v0 catchment *embedding* dataset: one record per gauge for contrastiv
 
 Unlike the full hourly scrape, the embedding module only needs a catchment's identity signature, so a
 record is deliberately light and fast to collect: one clear-sky Sentinel-2 patch, the GAGES-II static
-attribute vector, and a multi-year **daily** flow history (one NWIS ``dv`` request per gauge instead
-of hundreds of iv chunks). This lets a whole state be collected in hours, in parallel with the hourly
-fleet scrape, so embedding pretraining and representation analysis can start immediately.
+attribute vector, and a multi-year **daily** flow history (batched NWIS ``dv`` requests covering
+many gauges instead of hundreds of iv chunks). This lets a whole state be collected in hours, in
+parallel with the hourly fleet scrape, so embedding pretraining and representation analysis can
+start immediately.
 
 Per gauge, writes ``<site>.npz`` containing:
 
@@ -24,6 +25,7 @@ Example::
 import argparse
 import json
 import os
+import re
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
@@ -31,12 +33,73 @@ import numpy as np
 import pandas as pd
 import requests
 
-from gages2_functions import DEFAULT_TABLES, download_gages2, gauge_in_gages2, load_gages2_table
+from gages2_functions import download_gages2, gauge_in_gages2, open_gages2_store
+from host_limits import CircuitOpenError, limited_get
 from sentinel_functions import extract_patch, get_cloud_cover, latlon_to_mgrs_tile, list_sentinel_safes
 from state_scrape import list_state_gauges
+from usgs_scraping_functions import iter_rdb_tables
 
-DAILY_VALUES_URL = ("https://waterservices.usgs.gov/nwis/dv/?format=json&sites={}&parameterCd=00060"
-                    "&startDT={}&endDT={}")
+DAILY_VALUES_URL = ("https://waterservices.usgs.gov/nwis/dv/?format=rdb&sites={}&parameterCd=00060"
+                    "&statCd=00003&startDT={}&endDT={}&siteStatus=all")
+# Daily-mean discharge columns of a dv RDB table are named "<ts_id>_00060_00003".
+DAILY_MEAN_COLUMN = re.compile(r"^\d+_00060_00003$")
+
+
+def daily_flow_frame(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduces one site's NWIS daily-values RDB table to its mean daily discharge.
+
+    When a site has several discharge series the first one is used and its gaps are filled from the
+    others.
+
+    :param table: The typed RDB table of one site (see :func:`usgs_scraping_functions.iter_rdb_tables`).
+    :type table: pd.DataFrame
+    :return: A dataframe with "date" (ISO strings) and "cfs" columns (NaN for ice, equipment and other
+        non-numeric markers).
+    :rtype: pd.DataFrame
+    """
+    columns = [name for name in table.columns if DAILY_MEAN_COLUMN.match(str(name))]
+    if table.empty or not columns:
+        return pd.DataFrame(columns=["date", "cfs"])
+    cfs = table[columns[0]].to_numpy(dtype=np.float64)
+    for name in columns[1:]:
+        cfs = np.where(np.isnan(cfs), table[name].to_numpy(dtype=np.float64), cfs)
+    return pd.DataFrame({"date": table["datetime"].to_numpy(dtype=str), "cfs": cfs})
+
+
+def fetch_daily_values(site_numbers: List[str], start_time: datetime, end_time: datetime,
+                       timeout: float = 180) -> Dict[str, pd.DataFrame]:
+    """
+    Fetches mean daily discharge of several gauges in a single NWIS daily-values request.
+
+    :param site_numbers: The gauge site numbers to request together.
+    :type site_numbers: List[str]
+    :param start_time: The start of the requested period.
+    :type start_time: datetime
+    :param end_time: The end of the requested period.
+    :type end_time: datetime
+    :param timeout: The read timeout in seconds, defaults to 180.
+    :type timeout: float, optional
+    :return: Site number -> dataframe as returned by :func:`daily_flow_frame`; gauges without a daily
+        record map to an empty dataframe.
+    :rtype: Dict[str, pd.DataFrame]
+    """
+    url = DAILY_VALUES_URL.format(",".join(site_numbers), start_time.strftime("%Y-%m-%d"),
+                                  end_time.strftime("%Y-%m-%d"))
+    response = limited_get(url, timeout=timeout, stream=True)
+    # NWIS answers 404 when none of the requested sites has daily values in the period.
+    try:
+        if response.status_code == 404:
+            tables = {}
+        else:
+            response.raise_for_status()
+            response.encoding = response.encoding or "utf-8"
+            tables = {table["site_no"].iloc[0]: table
+                      for table in iter_rdb_tables(response.iter_lines(decode_unicode=True)) if len(table)}
+    finally:
+        response.close()
+    return {site: daily_flow_frame(tables[site]) if site in tables else pd.DataFrame(columns=["date", "cfs"])
+            for site in site_numbers}
 
 
 def get_daily_flow(site_number: str, start_time: datetime, end_time: datetime) -> pd.DataFrame:
@@ -52,37 +115,61 @@ def get_daily_flow(site_number: str, start_time: datetime, end_time: datetime) -
     :return: A dataframe with "date" and "cfs" columns (empty when the gauge has no daily record).
     :rtype: pd.DataFrame
     """
-    url = DAILY_VALUES_URL.format(site_number, start_time.strftime("%Y-%m-%d"),
-                                  end_time.strftime("%Y-%m-%d"))
-    response = requests.get(url, timeout=120)
-    response.raise_for_status()
-    series = response.json()["value"]["timeSeries"]
-    if not series:
-        return pd.DataFrame(columns=["date", "cfs"])
-    values = series[0]["values"][0]["value"]
-    df = pd.DataFrame({"date": [v["dateTime"][:10] for v in values],
-                       "cfs": [float(v["value"]) for v in values]})
-    no_data = series[0]["variable"].get("noDataValue")
-    if no_data is not None:
-        df.loc[df["cfs"] == no_data, "cfs"] = np.nan
-    return df
+    return fetch_daily_values([site_number], start_time, end_time, timeout=120)[site_number]
+
+
+def get_daily_flow_batch(site_numbers: List[str], start_time: datetime, end_time: datetime,
+                         batch_size: int = 50) -> Dict[str, pd.DataFrame]:
+    """
+    Fetches the daily-flow histories of a whole fleet, many gauges per request.
+
+    A batch that times out or fails is retried split in half; a single gauge that still fails is left
+    out of the result so the caller can fall back to :func:`get_daily_flow` for it. An open circuit stops
+    the fetch rather than failing every gauge in turn.
+
+    :param site_numbers: The gauge site numbers.
+    :type site_numbers: List[str]
+    :param start_time: The start of the requested period.
+    :type start_time: datetime
+    :param end_time: The end of the requested period.
+    :type end_time: datetime
+    :param batch_size: The number of gauges per request, defaults to 50.
+    :type batch_size: int, optional
+    :return: Site number -> dataframe with "date" and "cfs" columns for every gauge that was fetched.
+    :rtype: Dict[str, pd.DataFrame]
+    :raises CircuitOpenError: If the NWIS circuit is open (see :mod:`host_limits`).
+    """
+    pending = list(site_numbers)
+    histories: Dict[str, pd.DataFrame] = {}
+    while pending:
+        batch = pending[:batch_size]
+        try:
+            histories.update(fetch_daily_values(batch, start_time, end_time))
+        except CircuitOpenError:
+            # The host is backing off; splitting the batch would only fail every gauge in turn.
+            raise
+        except (requests.Timeout, requests.ConnectionError, requests.HTTPError) as error:
+            if len(batch) == 1:
+                print("NWIS daily-values fetch failed for " + batch[0] + ": " + str(error)[:200])
+                pending = pending[1:]
+                continue
+            batch_size = max(1, len(batch) // 2)
+            continue
+        pending = pending[len(batch):]
+    return histories
 
 
 def build_static_matrix(zip_path: str) -> Tuple[pd.DataFrame, List[str]]:
     """
-    Builds the numeric GAGES-II attribute matrix across all gauges (loaded once per state run).
+    Returns the numeric GAGES-II attribute matrix across all gauges (loaded once per state run), memory-mapped
+    from the binary store of :func:`gages2_functions.open_gages2_store`.
 
     :param zip_path: Path to the GAGES-II archive.
     :type zip_path: str
     :return: A tuple of (dataframe indexed by STAID with numeric attribute columns, column names).
     :rtype: Tuple[pd.DataFrame, List[str]]
     """
-    merged: Optional[pd.DataFrame] = None
-    for table_name in DEFAULT_TABLES:
-        table = load_gages2_table(table_name, zip_path).set_index("STAID")
-        numeric = table.select_dtypes(include=[np.number])
-        merged = numeric if merged is None else merged.join(numeric, how="outer", rsuffix="_dup")
-    return merged, list(merged.columns)
+    return open_gages2_store(zip_path).static_matrix()
 
 
 def collect_gauge_record(site_number: str, latitude: float, longitude: float,
@@ -90,7 +177,7 @@ def collect_gauge_record(site_number: str, latitude: float, longitude: float,
                          history_start: datetime, history_end: datetime,
                          scene_window: Tuple[datetime, datetime], patch_size: int = 128,
                          bands: Tuple[str, ...] = ("B02", "B03", "B04", "B08"),
-                         min_history_days: int = 1460) -> Dict:
+                         min_history_days: int = 1460, flow: Optional[pd.DataFrame] = None) -> Dict:
     """
     Collects and writes the embedding record of one gauge.
 
@@ -116,12 +203,16 @@ def collect_gauge_record(site_number: str, latitude: float, longitude: float,
     :type bands: Tuple[str, ...], optional
     :param min_history_days: Skip gauges with fewer daily-flow values, defaults to 1460 (4 years).
     :type min_history_days: int, optional
+    :param flow: The gauge's prefetched daily flow (see :func:`get_daily_flow_batch`), defaults to None
+        which fetches it.
+    :type flow: pd.DataFrame, optional
     :return: A manifest row dict with "status" ("ok" or a skip reason) and metadata.
     :rtype: Dict
     """
     if site_number not in static_matrix.index:
         return {"site_no": site_number, "status": "no_gages2"}
-    flow = get_daily_flow(site_number, history_start, history_end)
+    if flow is None:
+        flow = get_daily_flow(site_number, history_start, history_end)
     if flow["cfs"].notna().sum() < min_history_days:
         return {"site_no": site_number, "status": "short_history",
                 "history_days": int(flow["cfs"].notna().sum())}
@@ -162,6 +253,9 @@ def run_state_collection(state_abbrev: str, output_root: str = os.path.join("pil
     """
     Collects embedding records for every gauge of a state, resumably.
 
+    The daily-flow histories of all pending gauges are prefetched in batched NWIS requests before the
+    per-gauge Sentinel work starts, so collection is bound by image extraction rather than NWIS.
+
     :param state_abbrev: The two-letter state abbreviation.
     :type state_abbrev: str
     :param output_root: Root output directory, defaults to pilot_data/embedding_dataset.
@@ -188,16 +282,19 @@ def run_state_collection(state_abbrev: str, output_root: str = os.path.join("pil
     manifest: List[Dict] = pd.read_csv(manifest_path, dtype={"site_no": str}).to_dict("records") \
         if os.path.exists(manifest_path) else []
     done = {row["site_no"] for row in manifest}
+    pending = [gauge for _, gauge in gauges.iterrows() if str(gauge["site_no"]) not in done]
+    if limit is not None:
+        pending = pending[:limit]
+    to_fetch = [str(gauge["site_no"]) for gauge in pending if str(gauge["site_no"]) in static_matrix.index]
+    histories = get_daily_flow_batch(to_fetch, history_start, today)
+    print("Prefetched daily flow for %d of %d gauges" % (len(histories), len(to_fetch)))
     collected = 0
-    for _, gauge in gauges.iterrows():
+    for gauge in pending:
         site = str(gauge["site_no"])
-        if site in done:
-            continue
-        if limit is not None and collected >= limit:
-            break
         try:
             row = collect_gauge_record(site, float(gauge["dec_lat_va"]), float(gauge["dec_long_va"]),
-                                       static_matrix, state_dir, history_start, today, scene_window)
+                                       static_matrix, state_dir, history_start, today, scene_window,
+                                       flow=histories.get(site))
         except Exception as error:  # noqa: BLE001 - one bad gauge must not stop the fleet
             row = {"site_no": site, "status": "error", "error": str(error)[:200]}
         row["station_nm"] = gauge["station_nm"]
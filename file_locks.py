@@ -0,0 +1,34 @@
+"""
+Exclusive ``flock`` locks on cache and store directories, held across threads and processes alike.
+
+The on-disk caches (:mod:`asos_cache`, :mod:`nldas_cache`) and the GAGES-II store
+(:mod:`gages2_functions`) take them around their read-fetch-write cycles, so concurrent gauges and
+concurrent scraper processes never interleave writes to one directory.
+"""
+import fcntl
+import os
+from contextlib import contextmanager
+from typing import Iterator
+
+LOCK_FILE = ".lock"
+
+
+@contextmanager
+def directory_lock(directory: str, lock_name: str = LOCK_FILE) -> Iterator[None]:
+    """
+    Holds the exclusive lock of a directory (threads and processes alike).
+
+    :param directory: The locked directory (created when missing).
+    :type directory: str
+    :param lock_name: The lock file, defaults to :data:`LOCK_FILE` (the lock of the whole directory).
+    :type lock_name: str, optional
+    :return: A context manager for the duration of the locked section.
+    :rtype: Iterator[None]
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, lock_name), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
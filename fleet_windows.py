@@ -0,0 +1,132 @@
+"""
+Per-window sharing of downloads among the gauges of a fleet scrape that are in flight.
+
+Gauges scraped on a shared chunk grid (see :func:`state_scrape.run_state_scrape` with a common start)
+need the same windows from sources that serve many gauges per request, e.g. batched NWIS instantaneous
+values. A :class:`FleetWindows` knows the gauges currently holding a slot of
+:func:`state_scrape.scrape_fleet_async`: they :meth:`~FleetWindows.join` when they start and
+:meth:`~FleetWindows.release` when they finish. The first member to reach a window fetches it for
+every member that has not had it yet and the others take their frames from it, so frames are only
+fetched for, and held for, gauges in flight. A window's entry is deleted once each of its frames has
+been taken or released.
+"""
+import threading
+from typing import Dict, Hashable, List, Optional, Set
+
+import pandas as pd
+
+
+class FleetWindows:
+    """
+    Shares the window downloads of a source among the member gauges of a fleet; subclasses implement
+    :meth:`fetch_window`.
+    """
+
+    def __init__(self) -> None:
+        self._changed = threading.Condition()
+        self._members: Set[str] = set()
+        # Windows being fetched; a member asking for one waits for its frame instead of fetching it again.
+        self._fetching: Set[Hashable] = set()
+        self._frames: Dict[Hashable, Dict[str, pd.DataFrame]] = {}
+        # Member -> the windows fetched for it (taken or still held), so later fetches skip them.
+        self._served: Dict[str, Set[Hashable]] = {}
+
+    def fetch_window(self, window: Hashable, sites: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Fetches a window for several gauges at once.
+
+        :param window: The window key.
+        :type window: Hashable
+        :param sites: The gauges to fetch it for, the requesting one first.
+        :type sites: List[str]
+        :return: site -> frame (gauges without data may be missing).
+        :rtype: Dict[str, pd.DataFrame]
+        """
+        raise NotImplementedError
+
+    def join(self, site: str) -> None:
+        """
+        Adds a gauge that has started, so windows fetched from now on include it.
+
+        :param site: The gauge site number.
+        :type site: str
+        :return: None
+        :rtype: None
+        """
+        with self._changed:
+            self._members.add(site)
+            self._served.setdefault(site, set())
+
+    def release(self, site: str) -> None:
+        """
+        Removes a finished gauge and drops its remaining frames (e.g. windows it resumed from chunk files).
+
+        :param site: The gauge site number.
+        :type site: str
+        :return: None
+        :rtype: None
+        """
+        with self._changed:
+            self._members.discard(site)
+            self._served.pop(site, None)
+            for window in list(self._frames):
+                self._pop_frame(window, site)
+
+    def take(self, site: str, window: Hashable) -> Optional[pd.DataFrame]:
+        """
+        Returns a gauge's frame of a window, fetching the window for the members without it on first use.
+
+        :param site: The gauge site number.
+        :type site: str
+        :param window: The window key.
+        :type window: Hashable
+        :return: The frame, or None when the fetch returned nothing for the gauge or the gauge already
+            had the window.
+        :rtype: pd.DataFrame, optional
+        """
+        with self._changed:
+            while window in self._fetching:
+                self._changed.wait()
+            if site in self._frames.get(window, {}):
+                return self._pop_frame(window, site)
+            if window in self._served.get(site, ()):
+                # Its batch came back without it (or it asks again): the caller fetches it on its own.
+                return None
+            held = self._frames.get(window, {})
+            wanted = [site] + [member for member in sorted(self._members - {site})
+                               if member not in held and window not in self._served[member]]
+            self._fetching.add(window)
+        fetched: Optional[Dict[str, pd.DataFrame]] = None
+        try:
+            fetched = self.fetch_window(window, wanted)
+        finally:
+            # A failed fetch serves nobody: the next member to ask fetches the window again.
+            with self._changed:
+                for member in wanted if fetched is not None else []:
+                    if member in self._served:
+                        self._served[member].add(window)
+                        if member != site and member in fetched:
+                            self._frames.setdefault(window, {})[member] = fetched[member]
+                self._fetching.discard(window)
+                self._changed.notify_all()
+        return fetched.get(site)
+
+    def _pop_frame(self, window: Hashable, site: str) -> Optional[pd.DataFrame]:
+        """
+        Removes a gauge's frame of a window, deleting the window once no frame of it is left (the caller
+        holds the lock).
+
+        :param window: The window key.
+        :type window: Hashable
+        :param site: The gauge site number.
+        :type site: str
+        :return: The frame, or None when none was held.
+        :rtype: pd.DataFrame, optional
+        """
+        frames = self._frames.get(window)
+        if frames is None:
+            return None
+        frame = frames.pop(site, None)
+        if not frames:
+            del self._frames[window]
+        return frame
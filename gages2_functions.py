@@ -9,15 +9,28 @@ altitude) with the slope/soils attributes the catchment embedding needs, without
 The archive is a single ~55 MB zip hosted by USGS; download it once with :func:`download_gages2` and
 reuse the cached copy. Attribute tables live in a nested ``spreadsheets-in-csv-format.zip`` and are
 latin-1 encoded with the gauge id in a ``STAID`` column.
+
+Reading those nested zips costs seconds per table, so lookups go through a binary store converted from
+the archive once (see :func:`open_gages2_store`): a sorted STAID array shared by every table, one float64
+matrix and one unicode matrix per table aligned to it, and the numeric matrix of ``DEFAULT_TABLES``
+(for the gauges in at least one of them) ready to be memory-mapped. The store records the archive's
+size and modification time and is rebuilt when they change or the store layout does. A rebuild writes
+a new version of every array (``table_000_numeric.v2.npy``, ...), swaps the manifest in atomically and
+only then removes the previous version, so arrays and static matrices already memory-mapped stay valid.
 """
 import io
+import json
 import os
+import threading
 import zipfile
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import requests
 
+from file_locks import directory_lock
+
 GAGES2_URL = "https://water.usgs.gov/GIS/dsdl/basinchar_and_report_sept_2011.zip"
 INNER_ZIP_NAME = "spreadsheets-in-csv-format.zip"
 
@@ -25,6 +38,10 @@ INNER_ZIP_NAME = "spreadsheets-in-csv-format.zip"
 DEFAULT_TABLES = ["conterm_basinid.txt", "conterm_topo.txt", "conterm_soils.txt",
                   "conterm_climate.txt", "conterm_geology.txt", "conterm_hydro.txt"]
 
+STORE_MANIFEST = "manifest.json"
+# Bumped when the store layout changes, so stores written by older code are rebuilt.
+STORE_FORMAT = 3
+
 
 def download_gages2(zip_path: str) -> str:
     """
@@ -76,8 +93,7 @@ def gauge_in_gages2(site_number: str, zip_path: str) -> bool:
     :return: True when the gauge has GAGES-II attributes.
     :rtype: bool
     """
-    table = load_gages2_table("conterm_basinid.txt", zip_path)
-    return bool((table["STAID"] == site_number).any())
+    return open_gages2_store(zip_path).contains(site_number, "conterm_basinid.txt")
 
 
 def get_gages2_attributes(site_number: str, zip_path: str,
@@ -96,14 +112,315 @@ def get_gages2_attributes(site_number: str, zip_path: str,
     """
     if tables is None:
         tables = DEFAULT_TABLES
-    attributes: Dict = {}
-    for table_name in tables:
-        table = load_gages2_table(table_name, zip_path)
-        row = table[table["STAID"] == site_number]
-        if row.empty:
-            raise KeyError("Gauge " + site_number + " not found in GAGES-II table " + table_name +
-                           " (GAGES-II covers 9,067 conterminous-US gauges; this gauge is not one of them)")
-        record = row.iloc[0].to_dict()
-        record.pop("STAID", None)
-        attributes.update(record)
-    return attributes
+    return open_gages2_store(zip_path).attributes(site_number, tables)
+
+
+def gages2_store_dir(zip_path: str) -> str:
+    """
+    Returns the directory of the binary store converted from an archive.
+
+    :param zip_path: Path to the GAGES-II archive, e.g. "pilot_data/gages2.zip".
+    :type zip_path: str
+    :return: The store directory next to it, e.g. "pilot_data/gages2_store".
+    :rtype: str
+    """
+    return os.path.splitext(zip_path)[0] + "_store"
+
+
+def _archive_signature(zip_path: str) -> Dict:
+    """
+    Identifies the current contents of an archive without reading it.
+
+    :param zip_path: Path to the GAGES-II archive.
+    :type zip_path: str
+    :return: A dict with the archive's "size" and "mtime_ns".
+    :rtype: Dict
+    """
+    status = os.stat(zip_path)
+    return {"size": status.st_size, "mtime_ns": status.st_mtime_ns}
+
+
+def _present_rows(staids: np.ndarray, table_staids: pd.Index) -> np.ndarray:
+    """
+    Flags the store rows a table has a record for.
+
+    :param staids: The sorted STAIDs of the store.
+    :type staids: np.ndarray
+    :param table_staids: The STAIDs of the table.
+    :type table_staids: pd.Index
+    :return: A boolean array aligned to ``staids``.
+    :rtype: np.ndarray
+    """
+    return np.isin(staids, np.asarray(table_staids, dtype=str))
+
+
+def build_gages2_store(zip_path: str, store_dir: Optional[str] = None) -> Dict:
+    """
+    Converts every attribute table of the archive into the binary store.
+
+    Numeric columns go to a float64 matrix per table and text columns to a unicode matrix ("" when
+    missing), both aligned to the sorted union of STAIDs; a gauge missing from a table has NaN/"" rows
+    and is flagged absent. The numeric columns of ``DEFAULT_TABLES`` are also written as one matrix in
+    the layout of the former outer join (repeated column names get a "_dup" suffix), with rows only for
+    the gauges in at least one of those tables (e.g. not the Alaska/Hawaii/Puerto Rico-only ones). The
+    arrays are written as a new version next to the current one and the manifest is swapped in last
+    (see :func:`_publish_store`), so an interrupted build is redone and open memory maps are never
+    overwritten.
+
+    :param zip_path: Path to the GAGES-II archive.
+    :type zip_path: str
+    :param store_dir: The store directory, defaults to None which uses :func:`gages2_store_dir`.
+    :type store_dir: str, optional
+    :return: The written manifest.
+    :rtype: Dict
+    """
+    store_dir = store_dir or gages2_store_dir(zip_path)
+    os.makedirs(store_dir, exist_ok=True)
+    signature = _archive_signature(zip_path)
+    version = _stored_version(store_dir) + 1
+
+    def save(stem: str, values: np.ndarray) -> str:
+        file_name = "%s.v%d.npy" % (stem, version)
+        np.save(os.path.join(store_dir, file_name), values)
+        return file_name
+
+    with zipfile.ZipFile(zip_path) as outer:
+        with zipfile.ZipFile(io.BytesIO(outer.read(INNER_ZIP_NAME))) as inner:
+            names = [name for name in inner.namelist() if name.endswith(".txt")]
+            frames = {name: pd.read_csv(io.BytesIO(inner.read(name)), dtype={"STAID": str},
+                                        encoding="latin-1") for name in names}
+    frames = {name: frame.drop_duplicates("STAID").set_index("STAID")
+              for name, frame in frames.items() if "STAID" in frame.columns}
+    staids = np.array(sorted(set().union(*(frame.index for frame in frames.values()))), dtype=str)
+    tables = {}
+    for position, (name, frame) in enumerate(sorted(frames.items())):
+        frame = frame.reindex(staids)
+        columns, numeric, text = [], [], []
+        for column in frame.columns:
+            values = frame[column]
+            if pd.api.types.is_numeric_dtype(values):
+                # Taken before the reindex, whose missing rows would turn integer columns into floats.
+                kind = "int" if pd.api.types.is_integer_dtype(frames[name][column]) else "float"
+                columns.append({"name": str(column), "kind": kind, "index": len(numeric)})
+                numeric.append(values.to_numpy(dtype=np.float64, na_value=np.nan))
+            else:
+                columns.append({"name": str(column), "kind": "text", "index": len(text)})
+                text.append(values.fillna("").astype(str).to_numpy(dtype=str))
+        prefix = "table_%03d" % position
+        files = {"numeric": save(prefix + "_numeric",
+                                 np.column_stack(numeric) if numeric else np.empty((len(staids), 0))),
+                 "text": save(prefix + "_text",
+                              np.column_stack(text) if text else np.empty((len(staids), 0), dtype=str)),
+                 "present": save(prefix + "_present", _present_rows(staids, frames[name].index))}
+        tables[name] = {"files": files, "columns": columns}
+    static_columns, static_blocks = [], []
+    static_rows = np.zeros(len(staids), dtype=bool)
+    for name in [name for name in DEFAULT_TABLES if name in tables]:
+        static_rows |= np.load(os.path.join(store_dir, tables[name]["files"]["present"]))
+    for name in [name for name in DEFAULT_TABLES if name in tables]:
+        block = np.load(os.path.join(store_dir, tables[name]["files"]["numeric"]))[static_rows]
+        for column in tables[name]["columns"]:
+            if column["kind"] != "text":
+                label = column["name"] + "_dup" if column["name"] in static_columns else column["name"]
+                static_columns.append(label)
+                static_blocks.append(block[:, column["index"]])
+    files = {"staid": save("staid", staids),
+             "static_matrix": save("static_matrix", np.column_stack(static_blocks) if static_blocks
+                                   else np.empty((int(static_rows.sum()), 0))),
+             "static_staid": save("static_staid", staids[static_rows])}
+    manifest = {"archive": signature, "format": STORE_FORMAT, "version": version, "files": files,
+                "tables": tables, "static_columns": static_columns}
+    _publish_store(store_dir, manifest)
+    print("Converted %d GAGES-II tables for %d gauges into %s" % (len(tables), len(staids), store_dir))
+    return manifest
+
+
+def _stored_version(store_dir: str) -> int:
+    """
+    Returns the version of the arrays a store's manifest points to.
+
+    :param store_dir: The store directory.
+    :type store_dir: str
+    :return: The version, 0 when there is no (versioned) manifest.
+    :rtype: int
+    """
+    manifest_path = os.path.join(store_dir, STORE_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return 0
+    with open(manifest_path) as f:
+        return int(json.load(f).get("version", 0))
+
+
+def _publish_store(store_dir: str, manifest: Dict) -> None:
+    """
+    Swaps in a new store manifest atomically, then removes the arrays of earlier versions.
+
+    Removing is safe for arrays still memory-mapped by a :class:`Gages2Store` opened earlier: the unlinked
+    files live on until their maps are closed, whereas rewriting them in place would fault those maps.
+
+    :param store_dir: The store directory.
+    :type store_dir: str
+    :param manifest: The manifest describing the complete new arrays.
+    :type manifest: Dict
+    :return: None
+    :rtype: None
+    """
+    with open(os.path.join(store_dir, STORE_MANIFEST + ".tmp"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(store_dir, STORE_MANIFEST + ".tmp"), os.path.join(store_dir, STORE_MANIFEST))
+    current = set(manifest["files"].values())
+    for table in manifest["tables"].values():
+        current.update(table["files"].values())
+    for name in os.listdir(store_dir):
+        if name.endswith(".npy") and name not in current:
+            try:
+                os.remove(os.path.join(store_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+class Gages2Store:
+    """
+    Read access to a converted store: STAID lookups are a dict access and row reads are memory-map
+    slices, so nothing is parsed per gauge.
+
+    Every array of the manifest's version is mapped when the store is opened, so a store keeps reading
+    its own version after a rebuild has published the next one.
+    """
+
+    def __init__(self, store_dir: str) -> None:
+        """
+        :param store_dir: The store directory written by :func:`build_gages2_store`.
+        :type store_dir: str
+        """
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, STORE_MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.staids = np.load(os.path.join(store_dir, self.manifest["files"]["staid"]))
+        self.rows = {staid: row for row, staid in enumerate(self.staids.tolist())}
+        self._arrays = {file_name: np.load(os.path.join(store_dir, file_name), mmap_mode="r")
+                        for table in self.manifest["tables"].values()
+                        for file_name in table["files"].values()}
+        files = self.manifest["files"]
+        self._static = (np.load(os.path.join(store_dir, files["static_matrix"]), mmap_mode="r"),
+                        np.load(os.path.join(store_dir, files["static_staid"])))
+
+    def _array(self, table_name: str, part: str) -> np.ndarray:
+        """
+        Returns one memory-mapped array of a table.
+
+        :param table_name: The table file name, e.g. "conterm_topo.txt".
+        :type table_name: str
+        :param part: "numeric", "text" or "present".
+        :type part: str
+        :return: The memory-mapped array.
+        :rtype: np.ndarray
+        """
+        return self._arrays[self.manifest["tables"][table_name]["files"][part]]
+
+    def contains(self, site_number: str, table_name: str) -> bool:
+        """
+        Checks whether a table has a record for a gauge.
+
+        :param site_number: The USGS gauge site number.
+        :type site_number: str
+        :param table_name: The table file name.
+        :type table_name: str
+        :return: True when the table covers the gauge.
+        :rtype: bool
+        """
+        row = self.rows.get(site_number)
+        if row is None or table_name not in self.manifest["tables"]:
+            return False
+        return bool(self._array(table_name, "present")[row])
+
+    def attributes(self, site_number: str, tables: List[str]) -> Dict:
+        """
+        Reads a gauge's attributes across tables (text values missing upstream are NaN, as in a CSV read).
+
+        :param site_number: The USGS gauge site number.
+        :type site_number: str
+        :param tables: The table file names, merged in order.
+        :type tables: List[str]
+        :return: A dict of attribute name to value.
+        :rtype: Dict
+        """
+        attributes: Dict = {}
+        for table_name in tables:
+            if table_name not in self.manifest["tables"]:
+                raise KeyError("There is no item named '" + table_name + "' in the GAGES-II archive")
+            if not self.contains(site_number, table_name):
+                raise KeyError("Gauge " + site_number + " not found in GAGES-II table " + table_name +
+                               " (GAGES-II covers 9,067 conterminous-US gauges; this gauge is not one of"
+                               " them)")
+            row = self.rows[site_number]
+            numeric = self._array(table_name, "numeric")[row]
+            text = self._array(table_name, "text")[row]
+            for column in self.manifest["tables"][table_name]["columns"]:
+                if column["kind"] == "text":
+                    value = str(text[column["index"]])
+                    attributes[column["name"]] = value if value else float("nan")
+                else:
+                    value = float(numeric[column["index"]])
+                    attributes[column["name"]] = int(value) if column["kind"] == "int" else value
+        return attributes
+
+    def static_matrix(self) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        Returns the numeric attributes of ``DEFAULT_TABLES`` for the gauges in at least one of those
+        tables, backed by a memory map.
+
+        :return: A tuple of (dataframe indexed by STAID with numeric attribute columns, column names).
+        :rtype: Tuple[pd.DataFrame, List[str]]
+        """
+        columns = list(self.manifest["static_columns"])
+        values, staids = self._static
+        frame = pd.DataFrame(values, index=pd.Index(staids, name="STAID"), columns=columns, copy=False)
+        return frame, columns
+
+
+def _is_current(manifest: Dict, signature: Dict) -> bool:
+    """
+    Checks whether a store was built from this archive by the current store layout.
+
+    :param manifest: The store manifest.
+    :type manifest: Dict
+    :param signature: The archive signature from :func:`_archive_signature`.
+    :type signature: Dict
+    :return: True when the store can be reused.
+    :rtype: bool
+    """
+    return manifest.get("archive") == signature and manifest.get("format") == STORE_FORMAT
+
+
+_STORES: Dict[str, Gages2Store] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def open_gages2_store(zip_path: str) -> Gages2Store:
+    """
+    Returns the binary store of an archive, converting it first when it is missing or the archive has
+    changed since it was built.
+
+    :param zip_path: Path to the GAGES-II archive.
+    :type zip_path: str
+    :return: The store (shared per process).
+    :rtype: Gages2Store
+    """
+    store_dir = gages2_store_dir(zip_path)
+    signature = _archive_signature(zip_path)
+    with _STORES_LOCK:
+        store = _STORES.get(store_dir)
+        if store is not None and _is_current(store.manifest, signature):
+            return store
+        with directory_lock(store_dir):
+            manifest_path = os.path.join(store_dir, STORE_MANIFEST)
+            current = False
+            if os.path.exists(manifest_path):
+                with open(manifest_path) as f:
+                    current = _is_current(json.load(f), signature)
+            if not current:
+                build_gages2_store(zip_path, store_dir)
+            store = Gages2Store(store_dir)
+        _STORES[store_dir] = store
+        return store
@@ -0,0 +1,548 @@
+"""
+Per-host concurrency caps, politeness delays and circuit breakers for upstream HTTP requests.
+
+Fleet scrapes run many gauges at once (see :func:`state_scrape.scrape_fleet_async`), each of which
+calls NWIS, NLDI, Mesonet, AWDB, Giovanni and GCS. Every upstream request goes through
+:func:`limited_get` (or the :func:`host_slot` context manager for client libraries), which bounds the
+number of in-flight requests per host and spaces request starts to the same host by a minimum delay,
+no matter how many gauges are in flight.
+
+Limits are keyed by hostname in :data:`HOST_LIMITS`; unknown hosts use :data:`DEFAULT_HOST_LIMIT`.
+
+Each host also has a :class:`CircuitBreaker` fed by the outcome of every :func:`limited_get`. A 429 or
+503 response opens the circuit at once (honoring ``Retry-After``); other server errors, timeouts and
+connection errors open it after several consecutive failures or a high error rate. While a circuit is
+open, requests to that host only (other hosts are unaffected) wait out a short remaining backoff or fail
+fast with :class:`CircuitOpenError`; each consecutive opening doubles the backoff. After the backoff a
+single probe request is let through while other requests to the host wait for its outcome: success
+closes the circuit, failure re-opens it. :func:`circuit_report`
+exposes every non-closed circuit for the fleet registry report.
+
+Callers that budget time per upstream source (see :func:`catchment_dataset.fetch_sources`) register a
+callback with :func:`on_slot_granted`, so they can tell time spent queued for a slot from time spent
+on requests.
+"""
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Executor
+from contextvars import ContextVar, copy_context
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+NWIS_HOST = "waterservices.usgs.gov"
+NLDI_HOST = "api.water.usgs.gov"
+MESONET_HOST = "mesonet.agron.iastate.edu"
+AWDB_HOST = "wcc.sc.egov.usda.gov"
+GIOVANNI_HOST = "api.giovanni.earthdata.nasa.gov"
+GCS_HOST = "storage.googleapis.com"
+
+# "concurrency" caps simultaneous requests to the host; "delay_seconds" is the minimum spacing between
+# request starts. NWIS tolerates a few parallel requests; Mesonet and Giovanni ask for gentle use.
+HOST_LIMITS: Dict[str, Dict[str, float]] = {
+    NWIS_HOST: {"concurrency": 4, "delay_seconds": 0.25},
+    NLDI_HOST: {"concurrency": 2, "delay_seconds": 0.5},
+    MESONET_HOST: {"concurrency": 2, "delay_seconds": 1.0},
+    AWDB_HOST: {"concurrency": 3, "delay_seconds": 0.5},
+    GIOVANNI_HOST: {"concurrency": 2, "delay_seconds": 1.0},
+    GCS_HOST: {"concurrency": 8, "delay_seconds": 0.0},
+}
+DEFAULT_HOST_LIMIT = {"concurrency": 4, "delay_seconds": 0.0}
+
+# Responses that mean "slow down" and open a circuit immediately.
+THROTTLE_STATUS_CODES = {429, 503}
+
+# Called whenever the current context is granted a request slot (see :func:`on_slot_granted`).
+_SLOT_LISTENER: ContextVar[Optional[Callable[[], None]]] = ContextVar("slot_listener", default=None)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of a request while the host's circuit is open for longer than the caller waits."""
+
+
+class CircuitBreaker:
+    """
+    Tracks a host's recent request outcomes and opens the circuit with exponential backoff.
+
+    :param failure_threshold: Consecutive failures that open the circuit, defaults to 5.
+    :type failure_threshold: int, optional
+    :param error_rate_threshold: Error rate over the last ``window`` outcomes that opens the circuit,
+        defaults to 0.5.
+    :type error_rate_threshold: float, optional
+    :param window: The number of recent outcomes the error rate is computed over, defaults to 20.
+    :type window: int, optional
+    :param base_backoff_seconds: The first open duration, defaults to 30.0.
+    :type base_backoff_seconds: float, optional
+    :param max_backoff_seconds: The cap on the doubled open duration, defaults to 1800.0.
+    :type max_backoff_seconds: float, optional
+    """
+
+    def __init__(self, failure_threshold: int = 5, error_rate_threshold: float = 0.5, window: int = 20,
+                 base_backoff_seconds: float = 30.0, max_backoff_seconds: float = 1800.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.outcomes: deque = deque(maxlen=window)
+        self.lock = threading.Lock()
+        self.probe_done = threading.Condition(self.lock)
+        self.probing = False
+        self.consecutive_failures = 0
+        self.consecutive_opens = 0
+        self.open_until = 0.0
+        self.half_open = False
+        self.last_error: Optional[str] = None
+
+    def wait_seconds(self) -> float:
+        """
+        Returns how long the circuit stays open (0.0 when closed or ready for a probe).
+
+        :return: The remaining backoff in seconds.
+        :rtype: float
+        """
+        return max(0.0, self.open_until - time.time())
+
+    def state(self) -> str:
+        """
+        Returns "open", "half_open" (backoff elapsed, waiting for a probe result) or "closed".
+
+        :return: The circuit state.
+        :rtype: str
+        """
+        if self.wait_seconds() > 0:
+            return "open"
+        return "half_open" if self.half_open else "closed"
+
+    def before_request(self, max_wait_seconds: float) -> bool:
+        """
+        Waits out a short remaining backoff or raises when the circuit stays open longer.
+
+        Once the backoff has elapsed the first caller becomes the probe; the others wait (up to
+        ``max_wait_seconds``) until the probe's outcome is recorded, then proceed when it closed the
+        circuit or go back to waiting out the new backoff when it re-opened it.
+
+        :param max_wait_seconds: The longest backoff the caller is willing to sleep through.
+        :type max_wait_seconds: float
+        :return: Whether the caller is the probe of a half-open circuit.
+        :rtype: bool
+        """
+        deadline = time.monotonic() + max_wait_seconds
+        while True:
+            wait = self.wait_seconds()
+            if wait > 0 and wait > deadline - time.monotonic():
+                raise CircuitOpenError("Circuit open for another %.0fs after: %s" % (wait, self.last_error))
+            if wait > 0:
+                time.sleep(wait)
+            with self.lock:
+                if self.wait_seconds() > 0:
+                    continue
+                if not self.half_open:
+                    return False
+                if not self.probing:
+                    self.probing = True
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CircuitOpenError("Circuit half-open, probe still in flight after: %s"
+                                           % self.last_error)
+                self.probe_done.wait(remaining)
+
+    def cancel_probe(self) -> None:
+        """
+        Lets another request probe the circuit when the probe ended without an outcome (e.g. an invalid
+        request that never reached the host).
+
+        :return: None
+        :rtype: None
+        """
+        with self.lock:
+            self.probing = False
+            self.probe_done.notify_all()
+
+    def record_success(self) -> None:
+        """
+        Records a successful request, closing a half-open circuit.
+
+        :return: None
+        :rtype: None
+        """
+        with self.lock:
+            self.probing = False
+            self.probe_done.notify_all()
+            self.outcomes.append(False)
+            self.consecutive_failures = 0
+            if self.half_open:
+                self.half_open = False
+                self.consecutive_opens = 0
+
+    def record_failure(self, error: str, throttled: bool = False,
+                       retry_after: Optional[float] = None) -> None:
+        """
+        Records a failed request and opens the circuit when the failure pattern calls for it.
+
+        :param error: A short description of the failure (kept for the report).
+        :type error: str
+        :param throttled: Whether the host explicitly asked to slow down (429/503), which opens the
+            circuit at once, defaults to False.
+        :type throttled: bool, optional
+        :param retry_after: The host's ``Retry-After`` in seconds, used as the minimum backoff,
+            defaults to None.
+        :type retry_after: float, optional
+        :return: None
+        :rtype: None
+        """
+        with self.lock:
+            self.probing = False
+            self.probe_done.notify_all()
+            self.outcomes.append(True)
+            self.consecutive_failures += 1
+            self.last_error = error
+            error_rate = sum(self.outcomes) / len(self.outcomes)
+            window_full = len(self.outcomes) == self.outcomes.maxlen
+            tripped = self.consecutive_failures >= self.failure_threshold
+            tripped = tripped or (window_full and error_rate >= self.error_rate_threshold)
+            if not (throttled or self.half_open or tripped):
+                return
+            if self.wait_seconds() > 0:
+                return
+            backoff = min(self.max_backoff_seconds,
+                          self.base_backoff_seconds * 2 ** self.consecutive_opens)
+            backoff = max(backoff, retry_after or 0.0)
+            self.consecutive_opens += 1
+            self.consecutive_failures = 0
+            self.outcomes.clear()
+            self.half_open = True
+            self.open_until = time.time() + backoff
+
+    def snapshot(self) -> Dict:
+        """
+        Summarizes the circuit for reports.
+
+        :return: A dict with "state", "wait_seconds", "open_until" (epoch seconds), "consecutive_opens",
+            "error_rate" and "last_error".
+        :rtype: Dict
+        """
+        with self.lock:
+            error_rate = sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+            return {"state": self.state(), "wait_seconds": round(self.wait_seconds(), 1),
+                    "open_until": self.open_until, "consecutive_opens": self.consecutive_opens,
+                    "error_rate": round(error_rate, 3), "last_error": self.last_error}
+
+
+class HostLimiter:
+    """
+    Bounds concurrent requests to one host and spaces their starts by a minimum delay.
+
+    Thread-safe: the fleet engine runs each gauge's blocking source calls in worker threads, so the
+    limiter uses a bounded semaphore and a lock-guarded schedule of the next allowed start time.
+    """
+
+    def __init__(self, concurrency: int, delay_seconds: float) -> None:
+        """
+        :param concurrency: The maximum number of simultaneous requests.
+        :type concurrency: int
+        :param delay_seconds: The minimum spacing between request starts.
+        :type delay_seconds: float
+        """
+        self.concurrency = int(concurrency)
+        self.delay_seconds = float(delay_seconds)
+        self.semaphore = threading.BoundedSemaphore(self.concurrency)
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.breaker = CircuitBreaker()
+
+    def acquire(self) -> None:
+        """
+        Takes one of the host's request slots, waiting for a free slot and the politeness delay. Every
+        call must be paired with :meth:`release`. The slot listener of the context (see
+        :func:`on_slot_granted`) is then called; if it raises, the slot is returned and the error passed on.
+
+        :return: None
+        :rtype: None
+        """
+        self.semaphore.acquire()
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.delay_seconds
+        if start > now:
+            time.sleep(start - now)
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        listener = _SLOT_LISTENER.get()
+        if listener is not None:
+            try:
+                listener()
+            except BaseException:
+                self.release()
+                raise
+
+    def release(self) -> None:
+        """
+        Returns a slot taken with :meth:`acquire`.
+
+        :return: None
+        :rtype: None
+        """
+        with self.lock:
+            self.in_flight -= 1
+        self.semaphore.release()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Holds one of the host's request slots, waiting for a free slot and the politeness delay.
+
+        :return: A context manager for the duration of one request.
+        :rtype: Iterator[None]
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_LIMITERS: Dict[str, HostLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(host: str) -> HostLimiter:
+    """
+    Returns the shared limiter of a host, creating it from :data:`HOST_LIMITS` on first use.
+
+    :param host: The hostname (or a full URL).
+    :type host: str
+    :return: The host's limiter.
+    :rtype: HostLimiter
+    """
+    if "://" in host:
+        host = urlparse(host).hostname or host
+    with _LIMITERS_LOCK:
+        if host not in _LIMITERS:
+            limit = HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT)
+            _LIMITERS[host] = HostLimiter(limit["concurrency"], limit["delay_seconds"])
+        return _LIMITERS[host]
+
+
+def configure_host_limits(limits: Dict[str, Dict[str, float]]) -> None:
+    """
+    Overrides the limits of some hosts (e.g. a lower NWIS cap during an outage window).
+
+    Existing limiters of the given hosts are replaced; requests already holding a slot finish normally.
+
+    :param limits: Hostname -> {"concurrency": ..., "delay_seconds": ...}.
+    :type limits: Dict[str, Dict[str, float]]
+    :return: None
+    :rtype: None
+    """
+    with _LIMITERS_LOCK:
+        for host, limit in limits.items():
+            HOST_LIMITS[host] = dict(HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT), **limit)
+            _LIMITERS.pop(host, None)
+
+
+def circuit_report() -> Dict[str, Dict]:
+    """
+    Returns the breaker snapshot of every host whose circuit is not closed.
+
+    :return: Hostname -> :meth:`CircuitBreaker.snapshot`.
+    :rtype: Dict[str, Dict]
+    """
+    with _LIMITERS_LOCK:
+        limiters = dict(_LIMITERS)
+    snapshots = {host: limiter.breaker.snapshot() for host, limiter in limiters.items()}
+    return {host: snapshot for host, snapshot in snapshots.items() if snapshot["state"] != "closed"}
+
+
+def host_wait_seconds(host: str) -> float:
+    """
+    Returns how long a host's circuit stays open (0.0 when requests may proceed).
+
+    :param host: The hostname (or a full URL).
+    :type host: str
+    :return: The remaining backoff in seconds.
+    :rtype: float
+    """
+    return get_limiter(host).breaker.wait_seconds()
+
+
+@contextmanager
+def on_slot_granted(listener: Callable[[], None]) -> Iterator[None]:
+    """
+    Calls ``listener`` each time a request slot of any host is granted to code running in the block.
+
+    The listener runs in the requesting thread (worker threads see it when they run in a copy of the
+    caller's context, see :func:`map_in_context`); raising from it abandons the request before it is
+    sent.
+
+    :param listener: The callback.
+    :type listener: Callable[[], None]
+    :return: A context manager scoping the listener.
+    :rtype: Iterator[None]
+    """
+    token = _SLOT_LISTENER.set(listener)
+    try:
+        yield
+    finally:
+        _SLOT_LISTENER.reset(token)
+
+
+@contextmanager
+def host_slot(url_or_host: str) -> Iterator[None]:
+    """
+    Holds a request slot of a host for calls made through client libraries (e.g. GCS uploads).
+
+    :param url_or_host: A URL or hostname.
+    :type url_or_host: str
+    :return: A context manager for the duration of one request.
+    :rtype: Iterator[None]
+    """
+    with get_limiter(url_or_host).slot():
+        yield
+
+
+def map_in_context(pool: Executor, function: Callable, items: Iterable) -> List:
+    """
+    Maps a function over items on a pool, each call running in a copy of the caller's context.
+
+    Pool threads do not inherit context variables, so without the copy a caller's slot listener (see
+    :func:`on_slot_granted`) would not see the requests made on its behalf.
+
+    :param pool: The executor running the calls.
+    :type pool: Executor
+    :param function: Called with each item.
+    :type function: Callable
+    :param items: The items.
+    :type items: Iterable
+    :return: The results, in the order of the items.
+    :rtype: List
+    """
+    items = list(items)
+    contexts = [copy_context() for _ in items]
+    return list(pool.map(lambda context, item: context.run(function, item), contexts, items))
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """
+    Parses a numeric ``Retry-After`` header.
+
+    :param response: The response.
+    :type response: requests.Response
+    :return: The delay in seconds, or None when absent or given as a date.
+    :rtype: float, optional
+    """
+    value = (getattr(response, "headers", None) or {}).get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def limited_get(url: str, params: Optional[Dict] = None, max_wait_seconds: float = 60.0,
+                session: Optional[requests.Session] = None, **kwargs) -> requests.Response:
+    """
+    Issues ``requests.get`` (or ``session.get``) within the per-host concurrency cap, politeness delay
+    and circuit breaker.
+
+    The response (or error) is recorded on the host's breaker; the response is returned as is, so
+    callers keep their own ``raise_for_status`` handling. With ``stream=True`` the host slot is held
+    until the body has been read or the response is closed, so streaming callers should close the
+    response when they stop reading early.
+
+    :param url: The request URL.
+    :type url: str
+    :param params: Optional query parameters, defaults to None.
+    :type params: Dict, optional
+    :param max_wait_seconds: The longest remaining backoff of an open circuit to sleep through before
+        failing fast with :class:`CircuitOpenError`, defaults to 60.0.
+    :type max_wait_seconds: float, optional
+    :param session: A session to send the request through (e.g. a pooled, authenticated one), defaults
+        to None which uses ``requests.get``.
+    :type session: requests.Session, optional
+    :return: The response.
+    :rtype: requests.Response
+    """
+    limiter = get_limiter(url)
+    probe = limiter.breaker.before_request(max_wait_seconds)
+    try:
+        limiter.acquire()
+    except BaseException:
+        if probe:
+            limiter.breaker.cancel_probe()
+        raise
+    if params is not None:
+        kwargs["params"] = params
+    try:
+        response = (session.get if session is not None else requests.get)(url, **kwargs)
+    except (requests.ConnectionError, requests.Timeout) as error:
+        limiter.release()
+        limiter.breaker.record_failure(type(error).__name__ + ": " + str(error)[:200])
+        raise
+    except BaseException:
+        limiter.release()
+        if probe:
+            limiter.breaker.cancel_probe()
+        raise
+    if kwargs.get("stream"):
+        _hold_slot_until_consumed(response, limiter)
+    else:
+        limiter.release()
+    status = getattr(response, "status_code", 200)
+    if status in THROTTLE_STATUS_CODES or status >= 500:
+        limiter.breaker.record_failure("HTTP %d from %s" % (status, url[:200]),
+                                       throttled=status in THROTTLE_STATUS_CODES,
+                                       retry_after=_retry_after_seconds(response))
+    else:
+        limiter.breaker.record_success()
+    return response
+
+
+def _hold_slot_until_consumed(response: requests.Response, limiter: HostLimiter) -> None:
+    """
+    Keeps a streamed response's host slot until its body is read to the end or the response is closed,
+    so the concurrency cap also bounds body downloads rather than just the wait for headers.
+
+    The slot is released once, by whichever comes first: exhausting ``iter_content`` (which
+    ``iter_lines`` and ``content`` read through), ``close()``, or the response being garbage collected.
+
+    :param response: The response opened with ``stream=True``.
+    :type response: requests.Response
+    :param limiter: The limiter whose slot the request holds.
+    :type limiter: HostLimiter
+    :return: None
+    :rtype: None
+    """
+    released = threading.Lock()
+
+    def release_once() -> None:
+        if released.acquire(blocking=False):
+            limiter.release()
+
+    iter_content = getattr(response, "iter_content", None)
+    close = getattr(response, "close", None)
+    if iter_content is None and close is None:
+        release_once()
+        return
+    if iter_content is not None:
+        def iter_content_holding(*args, **kwargs) -> Iterator:
+            try:
+                yield from iter_content(*args, **kwargs)
+            finally:
+                release_once()
+        response.iter_content = iter_content_holding
+    if close is not None:
+        def close_releasing() -> None:
+            try:
+                close()
+            finally:
+                release_once()
+        response.close = close_releasing
+    weakref.finalize(response, release_once)
@@ -0,0 +1,603 @@
+"""
+Columnar, memory-mappable storage for per-gauge hourly records.
+
+A store is a directory (``<site>_hourly/`` next to ``<site>_hourly_full.csv``) holding one ``.npy``
+array per variable plus a shared int64 hour index (hours since 1970-01-01 UTC) and a ``manifest.json``
+describing the columns. Numeric variables keep their numpy dtype; text variables (e.g. ASOS sky cover
+codes) are stored as fixed-width unicode arrays with "" for missing values. Every array is opened with
+``mmap_mode="r"``, so :func:`read_hourly_store` only touches the requested columns and the time range
+located by a binary search of the hour index; nothing is parsed from text.
+
+Writes never modify the arrays a manifest points to: each write creates a new version of the files
+(``col_000.v3.npy``, ``hours.v3.npy``), swaps the manifest in atomically and only then removes the
+previous version, so a concurrent reader sees either the old or the new record, never a mix.
+
+The per-chunk files of a long-term scrape use the same arrays, one ``.npz`` per chunk (see
+:func:`write_hourly_chunk`), so merging them into a store never parses text either.
+
+Example::
+
+    flow = read_hourly_store("pilot_data/scrapes/CO/06752260/06752260_hourly", columns=["cfs"],
+                             start="2000-01-01", end="2010-01-01")
+"""
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+HOURS_FILE = "hours.npy"
+MANIFEST_FILE = "manifest.json"
+EPOCH = pd.Timestamp("1970-01-01", tz="UTC")
+
+TimeLike = Union[str, datetime, pd.Timestamp]
+
+
+def store_path(output_dir: str, site_number: str) -> str:
+    """
+    Returns the store directory of a gauge's hourly record.
+
+    :param output_dir: The gauge's scrape output directory.
+    :type output_dir: str
+    :param site_number: The USGS gauge site number.
+    :type site_number: str
+    :return: The ``<output_dir>/<site>_hourly`` path.
+    :rtype: str
+    """
+    return os.path.join(output_dir, site_number + "_hourly")
+
+
+def to_hours(datetimes: pd.Series) -> np.ndarray:
+    """
+    Converts datetimes (naive values are taken as UTC) to int64 hours since the Unix epoch.
+
+    :param datetimes: The datetimes (datetime64 values or parseable strings).
+    :type datetimes: pd.Series
+    :return: The hour index.
+    :rtype: np.ndarray
+    """
+    return ((pd.to_datetime(datetimes, utc=True) - EPOCH) // pd.Timedelta(hours=1)).to_numpy(np.int64)
+
+
+def _hour_of(value: TimeLike) -> int:
+    """
+    Converts a single time bound to its hour index.
+
+    :param value: The time bound (naive values are taken as UTC).
+    :type value: TimeLike
+    :return: Hours since the Unix epoch.
+    :rtype: int
+    """
+    return int(to_hours(pd.Series([value]))[0])
+
+
+def load_manifest(store_dir: str) -> Dict:
+    """
+    Loads a store's manifest ("columns" with name/file/dtype entries, "rows", "first_hour",
+    "last_hour").
+
+    :param store_dir: The store directory.
+    :type store_dir: str
+    :return: The manifest dict.
+    :rtype: Dict
+    """
+    with open(os.path.join(store_dir, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def _save_array(path: str, values: np.ndarray) -> None:
+    """
+    Writes one array atomically (temporary file then rename).
+
+    :param path: The ``.npy`` path.
+    :type path: str
+    :param values: The array.
+    :type values: np.ndarray
+    :return: None
+    :rtype: None
+    """
+    temp_path = path + ".tmp.npy"
+    np.save(temp_path, values)
+    os.replace(temp_path, path)
+
+
+def _column_values(series: pd.Series) -> np.ndarray:
+    """
+    Converts a dataframe column to its stored array (numeric dtype kept, text as unicode).
+
+    :param series: The column.
+    :type series: pd.Series
+    :return: The array to store.
+    :rtype: np.ndarray
+    """
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        if series.isna().any():
+            return series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return series.to_numpy()
+    return series.fillna("").astype(str).to_numpy(dtype=str)
+
+
+def _versioned_files(manifest: Optional[Dict], columns: int) -> Tuple[int, str, List[str]]:
+    """
+    Returns the file names of the next version of a store.
+
+    :param manifest: The current manifest, or None for a new store.
+    :type manifest: Dict, optional
+    :param columns: The number of variable columns.
+    :type columns: int
+    :return: The (version, hours file, column files).
+    :rtype: Tuple[int, str, List[str]]
+    """
+    version = (manifest or {}).get("version", 0) + 1
+    return (version, "hours.v%d.npy" % version,
+            ["col_%03d.v%d.npy" % (position, version) for position in range(columns)])
+
+
+def _publish(store_dir: str, manifest: Dict) -> None:
+    """
+    Swaps in a new manifest atomically, then removes the arrays of earlier versions.
+
+    :param store_dir: The store directory.
+    :type store_dir: str
+    :param manifest: The manifest describing the complete new arrays.
+    :type manifest: Dict
+    :return: None
+    :rtype: None
+    """
+    with open(os.path.join(store_dir, MANIFEST_FILE + ".tmp"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(store_dir, MANIFEST_FILE + ".tmp"), os.path.join(store_dir, MANIFEST_FILE))
+    current = {manifest["hours_file"]} | {entry["file"] for entry in manifest["columns"]}
+    for name in os.listdir(store_dir):
+        if name.endswith(".npy") and name not in current:
+            try:
+                os.remove(os.path.join(store_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+def _hours_file(manifest: Dict) -> str:
+    """
+    Returns the hour index file of a manifest (stores written before versioning use :data:`HOURS_FILE`).
+
+    :param manifest: The store manifest.
+    :type manifest: Dict
+    :return: The file name.
+    :rtype: str
+    """
+    return manifest.get("hours_file", HOURS_FILE)
+
+
+def write_hourly_store(frame: pd.DataFrame, store_dir: str) -> Dict:
+    """
+    Writes an hourly dataframe (with a "datetime" column) as a columnar store, replacing any previous
+    contents.
+
+    Rows are sorted by hour and duplicate hours keep their first row. The arrays are written as a new
+    version and the manifest is swapped in last, so readers never see a manifest describing arrays that
+    are not complete.
+
+    :param frame: The hourly records, e.g. the combined output of a long-term scrape.
+    :type frame: pd.DataFrame
+    :param store_dir: The store directory (created when missing).
+    :type store_dir: str
+    :return: The written manifest.
+    :rtype: Dict
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    previous = load_manifest(store_dir) if os.path.exists(os.path.join(store_dir, MANIFEST_FILE)) else None
+    hours = to_hours(frame["datetime"])
+    order = np.argsort(hours, kind="stable")
+    hours = hours[order]
+    keep = np.ones(len(hours), dtype=bool)
+    keep[1:] = hours[1:] != hours[:-1]
+    rows = order[keep]
+    names = [column for column in frame.columns if column != "datetime"]
+    version, hours_file, files = _versioned_files(previous, len(names))
+    columns = []
+    for name, file_name in zip(names, files):
+        values = _column_values(frame[name].iloc[rows].reset_index(drop=True))
+        _save_array(os.path.join(store_dir, file_name), values)
+        columns.append({"name": str(name), "file": file_name, "dtype": values.dtype.str})
+    _save_array(os.path.join(store_dir, hours_file), hours[keep])
+    manifest = {"version": version, "hours_file": hours_file, "columns": columns, "rows": int(keep.sum()),
+                "first_hour": int(hours[0]) if len(hours) else None,
+                "last_hour": int(hours[-1]) if len(hours) else None}
+    _publish(store_dir, manifest)
+    return manifest
+
+
+def last_store_timestamp(store_dir: str) -> Optional[pd.Timestamp]:
+    """
+    Returns the newest stored hour of a store from its manifest.
+
+    :param store_dir: The store directory.
+    :type store_dir: str
+    :return: The UTC timestamp of the last row, or None when the store is empty.
+    :rtype: pd.Timestamp, optional
+    """
+    last_hour = load_manifest(store_dir)["last_hour"]
+    return None if last_hour is None else EPOCH + pd.Timedelta(hours=last_hour)
+
+
+def read_hourly_store(store_dir: str, columns: Optional[List[str]] = None,
+                      start: Optional[TimeLike] = None, end: Optional[TimeLike] = None) -> pd.DataFrame:
+    """
+    Loads selected columns and a time range from a store without touching the rest of it.
+
+    :param store_dir: The store directory.
+    :type store_dir: str
+    :param columns: The variables to load, defaults to None which loads every stored variable.
+    :type columns: List[str], optional
+    :param start: The inclusive start (naive values are UTC), defaults to None (record start).
+    :type start: TimeLike, optional
+    :param end: The exclusive end (naive values are UTC), defaults to None (record end).
+    :type end: TimeLike, optional
+    :return: A dataframe with a UTC "datetime" column followed by the requested variables; missing
+        text values are NaN as in a CSV read.
+    :rtype: pd.DataFrame
+    """
+    # A writer may swap in a new version between the manifest read and the array opens; the old
+    # arrays are then gone, so the read starts over from the new manifest.
+    for _ in range(2):
+        try:
+            return _read_version(store_dir, load_manifest(store_dir), columns, start, end)
+        except FileNotFoundError:
+            continue
+    return _read_version(store_dir, load_manifest(store_dir), columns, start, end)
+
+
+def _read_version(store_dir: str, manifest: Dict, columns: Optional[List[str]], start: Optional[TimeLike],
+                  end: Optional[TimeLike]) -> pd.DataFrame:
+    """
+    Loads selected columns and a time range from the arrays of one manifest (see
+    :func:`read_hourly_store`).
+
+    :param store_dir: The store directory.
+    :type store_dir: str
+    :param manifest: The manifest read.
+    :type manifest: Dict
+    :param columns: The variables to load, None for every stored variable.
+    :type columns: List[str], optional
+    :param start: The inclusive start, None for the record start.
+    :type start: TimeLike, optional
+    :param end: The exclusive end, None for the record end.
+    :type end: TimeLike, optional
+    :return: The dataframe.
+    :rtype: pd.DataFrame
+    """
+    stored = {entry["name"]: entry for entry in manifest["columns"]}
+    columns = list(stored) if columns is None else columns
+    missing = [name for name in columns if name not in stored]
+    if missing:
+        raise KeyError("Columns not in store " + store_dir + ": " + str(missing))
+    hours = np.load(os.path.join(store_dir, _hours_file(manifest)), mmap_mode="r")
+    low = 0 if start is None else int(np.searchsorted(hours, _hour_of(start), side="left"))
+    high = len(hours) if end is None else int(np.searchsorted(hours, _hour_of(end), side="left"))
+    high = max(low, high)
+    data = {"datetime": pd.to_datetime(np.asarray(hours[low:high]) * 3600, unit="s", utc=True)}
+    for name in columns:
+        values = np.array(np.load(os.path.join(store_dir, stored[name]["file"]), mmap_mode="r")[low:high])
+        data[name] = _frame_values(values)
+    return pd.DataFrame(data)
+
+
+def _frame_values(values: np.ndarray) -> np.ndarray:
+    """
+    Converts a stored array back to dataframe values (missing text "" becomes NaN as in a CSV read).
+
+    :param values: The stored array.
+    :type values: np.ndarray
+    :return: The column values.
+    :rtype: np.ndarray
+    """
+    if values.dtype.kind == "U":
+        return pd.Series(values, dtype=object).replace("", np.nan).to_numpy()
+    return values
+
+
+def append_hourly_store(frame: pd.DataFrame, store_dir: str) -> int:
+    """
+    Appends the rows of an hourly dataframe that are newer than a store's last hour.
+
+    The rows are aligned to the stored columns (variables the store lacks are dropped, stored variables
+    the frame lacks are filled with missing values) and a new version of the arrays is written from the
+    memory maps of the current one plus the new tail, so the stored history is never parsed.
+
+    :param frame: The new hourly records with a "datetime" column.
+    :type frame: pd.DataFrame
+    :param store_dir: The store directory.
+    :type store_dir: str
+    :return: The number of appended rows.
+    :rtype: int
+    """
+    manifest = load_manifest(store_dir)
+    last_hour = manifest["last_hour"]
+    new_hours = to_hours(frame["datetime"])
+    newer = new_hours > last_hour if last_hour is not None else np.ones(len(frame), dtype=bool)
+    frame = frame[newer]
+    if frame.empty:
+        return 0
+    order = np.argsort(new_hours[newer], kind="stable")
+    frame = frame.iloc[order]
+    new_hours = new_hours[newer][order]
+    keep = np.ones(len(new_hours), dtype=bool)
+    keep[1:] = new_hours[1:] != new_hours[:-1]
+    frame, new_hours = frame[keep], new_hours[keep]
+    version, hours_file, files = _versioned_files(manifest, len(manifest["columns"]))
+    for entry, file_name in zip(manifest["columns"], files):
+        stored = np.load(os.path.join(store_dir, entry["file"]), mmap_mode="r")
+        if entry["name"] in frame.columns:
+            tail = _column_values(frame[entry["name"]].reset_index(drop=True))
+        else:
+            tail = np.full(len(frame), np.nan)
+        if stored.dtype.kind == "U" and tail.dtype.kind != "U":
+            tail = pd.Series(tail, dtype=object).fillna("").astype(str).to_numpy(dtype=str)
+        elif tail.dtype.kind == "U" and stored.dtype.kind != "U":
+            # A text column that was entirely missing so far was stored as float NaN.
+            stored = pd.Series(stored, dtype=object).fillna("").astype(str).to_numpy(dtype=str)
+        combined = np.concatenate([stored, tail])
+        del stored
+        _save_array(os.path.join(store_dir, file_name), combined)
+        entry["file"], entry["dtype"] = file_name, combined.dtype.str
+    hours = np.concatenate([np.load(os.path.join(store_dir, _hours_file(manifest))), new_hours])
+    _save_array(os.path.join(store_dir, hours_file), hours)
+    manifest.update({"version": version, "hours_file": hours_file, "rows": int(len(hours)),
+                     "first_hour": int(hours[0]), "last_hour": int(hours[-1])})
+    _publish(store_dir, manifest)
+    return int(len(frame))
+
+
+class HourlyStoreWriter:
+    """
+    Writes a new version of a store from batches of ascending rows, in memory bounded by one batch.
+
+    Each batch's columns are appended as raw bytes to one spill file per column, with the dtype of every
+    batch segment recorded (a column can be integer in one batch and float, or text, in another).
+    :meth:`close` then settles each column's dtype as a whole frame would (any text makes a text column,
+    otherwise the numpy promotion of the segments), copies the segments block by block into ``.npy``
+    files opened with :func:`numpy.lib.format.open_memmap` and publishes them. Opened with
+    ``append=True``, the arrays of the current version are the first segments, so new rows are added
+    without reading the stored history into memory.
+    """
+
+    def __init__(self, store_dir: str, columns: List[str], append: bool = False) -> None:
+        """
+        :param store_dir: The store directory (created when missing).
+        :type store_dir: str
+        :param columns: The variable names, in order (ignored when appending: the stored columns are
+            kept, variables they lack are dropped and missing ones filled).
+        :type columns: List[str]
+        :param append: Whether to add to the current rows instead of replacing them, defaults to False.
+        :type append: bool, optional
+        """
+        os.makedirs(store_dir, exist_ok=True)
+        self.store_dir = store_dir
+        exists = os.path.exists(os.path.join(store_dir, MANIFEST_FILE))
+        self.previous = load_manifest(store_dir) if exists else None
+        self.segments: Dict[str, List[Tuple[str, str, int, int]]] = {}
+        self.rows, self.last_hour = 0, None
+        if append and self.previous is not None:
+            self.names = [entry["name"] for entry in self.previous["columns"]]
+            self.last_hour = self.previous["last_hour"]
+            self.rows = int(self.previous["rows"])
+            hours_entry = {"name": "datetime", "file": _hours_file(self.previous)}
+            for entry in self.previous["columns"] + [hours_entry]:
+                stored = np.load(os.path.join(store_dir, entry["file"]), mmap_mode="r")
+                self.segments[entry["name"]] = [(stored.filename, stored.dtype.str, stored.offset,
+                                                 len(stored))]
+                del stored
+        else:
+            self.names = [name for name in columns if name != "datetime"]
+            self.segments = {name: [] for name in self.names + ["datetime"]}
+        self.spill_paths = {name: os.path.join(store_dir, ".spill_%03d.raw" % position)
+                            for position, name in enumerate(["datetime"] + self.names)}
+        for path in self.spill_paths.values():
+            open(path, "wb").close()
+
+    def add(self, frame: pd.DataFrame) -> None:
+        """
+        Appends a batch of rows, strictly after the rows written so far and ascending by hour.
+
+        :param frame: The rows with a "datetime" column.
+        :type frame: pd.DataFrame
+        :return: None
+        :rtype: None
+        :raises ValueError: If the batch is not ascending or overlaps the rows written before it.
+        """
+        if frame.empty:
+            return
+        hours = to_hours(frame["datetime"])
+        if np.any(hours[1:] <= hours[:-1]) or (self.last_hour is not None and hours[0] <= self.last_hour):
+            raise ValueError("Rows written to " + self.store_dir + " must be unique and ascending by hour")
+        frame = frame.reset_index(drop=True)
+        for name in ["datetime"] + self.names:
+            if name == "datetime":
+                values = hours
+            elif name in frame.columns:
+                values = _column_values(frame[name])
+            else:
+                values = np.full(len(frame), np.nan)
+            with open(self.spill_paths[name], "ab") as f:
+                offset = f.tell()
+                f.write(np.ascontiguousarray(values).tobytes())
+            self.segments[name].append((self.spill_paths[name], values.dtype.str, offset, len(values)))
+        self.rows += len(frame)
+        self.last_hour = int(hours[-1])
+
+    def close(self, block_rows: int = 100_000) -> Dict:
+        """
+        Writes the final arrays and publishes them as the store's new version.
+
+        :param block_rows: Rows copied at a time, defaults to 100000.
+        :type block_rows: int, optional
+        :return: The published manifest.
+        :rtype: Dict
+        """
+        version, hours_file, files = _versioned_files(self.previous, len(self.names))
+        columns = []
+        try:
+            for name, file_name in zip(["datetime"] + self.names, [hours_file] + files):
+                dtype = _settled_dtype([np.dtype(segment[1]) for segment in self.segments[name]])
+                _copy_segments(self.segments[name], dtype, self.rows, os.path.join(self.store_dir, file_name),
+                               block_rows)
+                if name != "datetime":
+                    columns.append({"name": str(name), "file": file_name, "dtype": dtype.str})
+        finally:
+            self.discard()
+        hours = np.load(os.path.join(self.store_dir, hours_file), mmap_mode="r")
+        manifest = {"version": version, "hours_file": hours_file, "columns": columns, "rows": self.rows,
+                    "first_hour": int(hours[0]) if self.rows else None,
+                    "last_hour": int(hours[-1]) if self.rows else None}
+        del hours
+        _publish(self.store_dir, manifest)
+        return manifest
+
+    def discard(self) -> None:
+        """
+        Removes the spill files (after :meth:`close`, or to abandon the write).
+
+        :return: None
+        :rtype: None
+        """
+        for path in self.spill_paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _copy_segments(segments: List[Tuple[str, str, int, int]], dtype: np.dtype, rows: int, path: str,
+                   block_rows: int) -> None:
+    """
+    Writes one column's segments into a ``.npy`` file atomically, a block at a time.
+
+    :param segments: The (file, dtype, byte offset, rows) of every segment, in row order.
+    :type segments: List[Tuple[str, str, int, int]]
+    :param dtype: The column's dtype (numeric segments of a text column become "" when missing).
+    :type dtype: np.dtype
+    :param rows: The total rows of the segments.
+    :type rows: int
+    :param path: The ``.npy`` path.
+    :type path: str
+    :param block_rows: Rows copied at a time.
+    :type block_rows: int
+    :return: None
+    :rtype: None
+    """
+    temp_path = path + ".tmp.npy"
+    if rows == 0:
+        np.save(temp_path, np.empty(0, dtype=dtype))
+        os.replace(temp_path, path)
+        return
+    target = np.lib.format.open_memmap(temp_path, mode="w+", dtype=dtype, shape=(rows,))
+    position = 0
+    for source_path, source_dtype, offset, count in segments:
+        if count == 0:
+            continue
+        source = np.memmap(source_path, dtype=np.dtype(source_dtype), mode="r", offset=offset, shape=(count,))
+        for first in range(0, count, block_rows):
+            block = np.asarray(source[first:first + block_rows])
+            if dtype.kind == "U" and block.dtype.kind != "U":
+                block = pd.Series(block, dtype=object).fillna("").astype(str).to_numpy(dtype=str)
+            target[position:position + len(block)] = block
+            position += len(block)
+        del source
+    target.flush()
+    del target
+    os.replace(temp_path, path)
+
+
+def _settled_dtype(dtypes: List[np.dtype]) -> np.dtype:
+    """
+    Returns the dtype a whole column takes from the dtypes of its batches.
+
+    :param dtypes: The batch dtypes.
+    :type dtypes: List[np.dtype]
+    :return: The widest unicode dtype when any batch is text, otherwise the numpy promotion (float64
+        for no batches).
+    :rtype: np.dtype
+    """
+    text = [dtype for dtype in dtypes if dtype.kind == "U"]
+    if text:
+        return max(text, key=lambda dtype: dtype.itemsize)
+    return np.result_type(*dtypes) if dtypes else np.dtype(np.float64)
+
+
+def export_hourly_csv(store_dir: str, csv_path: str) -> int:
+    """
+    Exports a store to the legacy ``<site>_hourly_full.csv`` layout for text-based consumers.
+
+    :param store_dir: The store directory.
+    :type store_dir: str
+    :param csv_path: The CSV path to write.
+    :type csv_path: str
+    :return: The number of exported rows.
+    :rtype: int
+    """
+    frame = read_hourly_store(store_dir)
+    frame.to_csv(csv_path, index=False)
+    return int(len(frame))
+
+
+def write_hourly_chunk(frame: pd.DataFrame, path: str) -> None:
+    """
+    Writes one chunk of hourly records as a single uncompressed ``.npz`` file, atomically.
+
+    The file holds the frame's header ("columns"), the int64 hour index ("hours") and one array per
+    variable ("col_000", ...) converted as in a store, with rows sorted by hour and duplicate hours
+    keeping their first row. A frame without a "datetime" column (an empty chunk) keeps only its header.
+
+    :param frame: The joined hourly frame of the chunk.
+    :type frame: pd.DataFrame
+    :param path: The ``.npz`` path.
+    :type path: str
+    :return: None
+    :rtype: None
+    """
+    names = [column for column in frame.columns if column != "datetime"]
+    hours = to_hours(frame["datetime"]) if "datetime" in frame.columns else np.zeros(0, dtype=np.int64)
+    order = np.argsort(hours, kind="stable")
+    hours = hours[order]
+    keep = np.ones(len(hours), dtype=bool)
+    keep[1:] = hours[1:] != hours[:-1]
+    rows = order[keep]
+    arrays = {"columns": np.array([str(column) for column in frame.columns], dtype=str), "hours": hours[keep]}
+    for position, name in enumerate(names):
+        arrays["col_%03d" % position] = _column_values(frame[name].iloc[rows].reset_index(drop=True))
+    temp_path = path + ".tmp.npz"
+    np.savez(temp_path, **arrays)
+    os.replace(temp_path, path)
+
+
+def hourly_chunk_index(path: str) -> Tuple[List[str], np.ndarray]:
+    """
+    Reads the header and hour index of a chunk file without loading its variables.
+
+    :param path: The ``.npz`` chunk path (see :func:`write_hourly_chunk`).
+    :type path: str
+    :return: The (column names, ascending int64 hours) pair.
+    :rtype: Tuple[List[str], np.ndarray]
+    """
+    with np.load(path, allow_pickle=False) as chunk:
+        return [str(name) for name in chunk["columns"]], chunk["hours"]
+
+
+def read_hourly_chunk(path: str) -> pd.DataFrame:
+    """
+    Loads a chunk file written by :func:`write_hourly_chunk`.
+
+    :param path: The ``.npz`` chunk path.
+    :type path: str
+    :return: The chunk's rows with a UTC "datetime" column; missing text values are NaN as in a CSV read.
+    :rtype: pd.DataFrame
+    """
+    with np.load(path, allow_pickle=False) as chunk:
+        header = [str(name) for name in chunk["columns"]]
+        if "datetime" not in header:
+            return pd.DataFrame(columns=header)
+        data = {"datetime": pd.to_datetime(chunk["hours"] * 3600, unit="s", utc=True)}
+        names = [name for name in header if name != "datetime"]
+        for position, name in enumerate(names):
+            data[name] = _frame_values(chunk["col_%03d" % position])
+    return pd.DataFrame(data, columns=header)
@@ -1,32 +1,75 @@
 """
 Resumable long-term scrape of a single gauge from its period-of-record start to the present.
 
-Splits the period into calendar chunks (default 12 months), fetches each chunk with
-:func:`catchment_dataset.fetch_hourly_chunk`, and writes one CSV per chunk under ``chunks/``. A chunk
+Splits the period into calendar chunks (12 months to start with), fetches each chunk with
+:func:`catchment_dataset.fetch_hourly_chunk`, and writes one binary ``.npz`` file per chunk under ``chunks/``
+(see :func:`hourly_store.write_hourly_chunk`; ``.csv`` chunks of older scrapes are still read). A few chunks
+are fetched concurrently and written as they complete; each file is written atomically and a chunk
 whose file already exists is skipped, so an interrupted multi-hour scrape resumes where it left off.
 Failed chunks are recorded and reported but do not stop the run (delete the bad chunk file, if any,
-and re-run to retry them). At the end all chunks are concatenated into ``<site>_hourly_full.csv`` and
-the output directory is incrementally backed up to GCS per the project backup rule.
+and re-run to retry them). Chunk lengths adapt per gauge (see :class:`ChunkPlanner`): a window that times
+out is retried in halves, large chunks shrink the following windows and small ones grow them. The
+boundaries used are recorded in ``chunks/chunk_plan.json`` so a resume reuses them. At the end the
+chunks are merged in time order (see :func:`merge_chunk_files`, memory does not grow with the record
+and nothing is parsed from text) into a columnar store ``<site>_hourly/`` (see :mod:`hourly_store`); the
+``<site>_hourly_full.csv`` export is kept for text-based consumers unless ``--no-csv`` is given. A re-run
+whose chunks only add hours after the combined record's end appends them instead of rebuilding it. The
+output directory is incrementally backed up to GCS per the project backup rule.
 
 The default start date is the gauge's instantaneous ("uv") streamflow begin date from the NWIS series
 catalog — the earliest date for which sub-daily flow exists (usually much later than the daily record).
 
+With ``--incremental`` a gauge that already has a combined record is only topped up: the last stored
+timestamp is read from the store manifest (or the tail of the CSV), the hours since then are fetched
+from every source, and the new rows are appended (and saved as an extra chunk file) without re-reading
+the history.
+
 Example::
 
     python long_term_scrape.py --site 06752260
 """
 import argparse
+import csv
 import json
 import os
-from datetime import datetime
-from typing import List, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
+import requests
 
 from backup_functions import upload_directory_to_gcs
 from build_pilot_dataset import load_dotenv
 from catchment_dataset import discover_catchment, fetch_hourly_chunk, get_data_availability
-from usgs_scraping_functions import get_period_of_record
+from fleet_windows import FleetWindows
+from host_limits import CircuitOpenError
+from hourly_store import (MANIFEST_FILE, HourlyStoreWriter, append_hourly_store, hourly_chunk_index,
+                          last_store_timestamp, load_manifest, read_hourly_chunk, store_path, to_hours,
+                          write_hourly_chunk)
+from usgs_scraping_functions import fetch_usgs_fleet, get_period_of_record
+
+# An incremental window starts this far before the last stored hour: requests take naive local times
+# while the store holds UTC, so the overlap guarantees no hour is missed (duplicates are filtered).
+INCREMENTAL_OVERLAP = timedelta(days=1)
+# Chunks of one gauge fetched concurrently; the per-host limits of host_limits still apply to each source.
+CHUNK_WORKERS = 3
+# Adaptive chunk sizing: the joined frame size (rows x columns) windows are steered towards, the longest
+# window, and the per-gauge record of the boundaries used (in ``chunks/``).
+TARGET_CHUNK_CELLS = 500_000
+MAX_CHUNK_MONTHS = 48
+CHUNK_PLAN_FILE = "chunk_plan.json"
+# Rows of the streamed chunk merge converted and written to the columnar store at a time.
+MERGE_BATCH_ROWS = 20_000
+# The chunk files (name -> [size, mtime_ns]) merged into a gauge's store, kept inside the store directory.
+MERGE_RECORD_FILE = "merged_chunks.json"
+
+# (start, end) of a chunk -> the gauge's NLDAS-2 forcing of that window, or None to ask Giovanni for it.
+NldasProvider = Callable[[datetime, datetime], Optional[pd.DataFrame]]
+# (start, end) of a chunk -> None, after caching the window's ASOS reports for the whole fleet.
+AsosPrefetch = Callable[[datetime, datetime], None]
 
 
 def chunk_bounds(start_time: datetime, end_time: datetime,
@@ -57,14 +100,916 @@ def chunk_bounds(start_time: datetime, end_time: datetime,
     return bounds
 
 
+def chunk_file_path(chunks_dir: str, site_number: str, chunk_start: datetime) -> str:
+    """
+    Returns the path of the chunk starting at a given time.
+
+    :param chunks_dir: The gauge's ``chunks/`` directory.
+    :type chunks_dir: str
+    :param site_number: The USGS gauge site number.
+    :type site_number: str
+    :param chunk_start: The start of the chunk.
+    :type chunk_start: datetime
+    :return: The ``<site>_<YYYYMMDD>.npz`` path.
+    :rtype: str
+    """
+    return os.path.join(chunks_dir, site_number + "_" + chunk_start.strftime("%Y%m%d") + ".npz")
+
+
+def load_chunk_plan(chunks_dir: str, site_number: str, start_time: datetime, end_time: datetime,
+                    chunk_months: int) -> Dict:
+    """
+    Loads the recorded chunk boundaries of a gauge so a resumed scrape reuses them.
+
+    Scrapes from before boundaries were recorded have chunk files on the fixed ``chunk_months`` grid,
+    which is reconstructed from the files present.
+
+    :param chunks_dir: The gauge's ``chunks/`` directory.
+    :type chunks_dir: str
+    :param site_number: The USGS gauge site number.
+    :type site_number: str
+    :param start_time: The start of the scrape.
+    :type start_time: datetime
+    :param end_time: The end of the scrape.
+    :type end_time: datetime
+    :param chunk_months: The initial chunk length in months.
+    :type chunk_months: int
+    :return: A dict with "chunk_months" (the adapted length), "chunks" ((start, end) of every
+        written chunk) and "partial" (chunk start -> the optional sources missing from that chunk).
+    :rtype: Dict
+    """
+    path = os.path.join(chunks_dir, CHUNK_PLAN_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            recorded = json.load(f)
+        return {"chunk_months": recorded["chunk_months"],
+                "chunks": [(datetime.fromisoformat(start), datetime.fromisoformat(end))
+                           for start, end in recorded["chunks"]],
+                "partial": {datetime.fromisoformat(start): sources
+                            for start, sources in recorded.get("partial", {}).items()}}
+    return {"chunk_months": chunk_months,
+            "chunks": [(chunk_start, chunk_end) for chunk_start, chunk_end in
+                       chunk_bounds(start_time, end_time, chunk_months)
+                       if existing_chunk_file(chunks_dir, site_number, chunk_start) is not None],
+            "partial": {}}
+
+
+def save_chunk_plan(chunks_dir: str, plan: Dict) -> None:
+    """
+    Records the chunk boundaries of a gauge (written atomically after every chunk).
+
+    :param chunks_dir: The gauge's ``chunks/`` directory.
+    :type chunks_dir: str
+    :param plan: The plan as returned by :func:`load_chunk_plan`.
+    :type plan: Dict
+    :return: None
+    :rtype: None
+    """
+    path = os.path.join(chunks_dir, CHUNK_PLAN_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"chunk_months": plan["chunk_months"],
+                   "chunks": [[start.isoformat(), end.isoformat()] for start, end in sorted(plan["chunks"])],
+                   "partial": {start.isoformat(): sources
+                               for start, sources in sorted(plan.get("partial", {}).items())}},
+                  f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def is_oversize_error(error: Exception) -> bool:
+    """
+    Tells whether a failed chunk is worth retrying as two smaller windows (timeouts, connections
+    dropped mid-transfer and payload-too-large or gateway-timeout answers). An open circuit is not: the
+    host is down, not overwhelmed by the window.
+
+    :param error: The exception raised by the chunk fetch.
+    :type error: Exception
+    :return: True for size-related failures.
+    :rtype: bool
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (requests.Timeout, TimeoutError, requests.ConnectionError,
+                          requests.exceptions.ChunkedEncodingError)):
+        return True
+    response = getattr(error, "response", None)
+    return isinstance(error, requests.HTTPError) and response is not None and \
+        response.status_code in (413, 504)
+
+
+class ChunkPlanner:
+    """
+    Hands out the windows of the uncovered parts of a period, sized from the feedback of finished chunks.
+
+    Like the batch sizing of :func:`usgs_scraping_functions.fetch_usgs_fleet`: a chunk larger than
+    :data:`TARGET_CHUNK_CELLS` halves the months of the next windows, one under half of it doubles them
+    (up to :data:`MAX_CHUNK_MONTHS`), a window that timed out is retried as two halves, and one written
+    after an optional source timed out halves the next windows too.
+    """
+
+    def __init__(self, gaps: List[Tuple[datetime, datetime]], chunk_months: int,
+                 adaptive: bool = True, refetch: Optional[List[Tuple[datetime, datetime]]] = None) -> None:
+        """
+        :param gaps: The (start, end) periods still to fetch, ascending.
+        :type gaps: List[Tuple[datetime, datetime]]
+        :param chunk_months: The initial window length in months.
+        :type chunk_months: int
+        :param adaptive: Whether sizes follow the feedback (False keeps the fixed calendar grid; timed-out
+            windows are still split), defaults to True.
+        :type adaptive: bool, optional
+        :param refetch: Written windows to fetch again as they are (e.g. chunks missing an optional
+            source), handed out first, defaults to None.
+        :type refetch: List[Tuple[datetime, datetime]], optional
+        """
+        self.gaps = list(gaps)
+        self.chunk_months = max(1, chunk_months)
+        self.adaptive = adaptive
+        self.retries: List[Tuple[datetime, datetime]] = list(refetch or [])
+
+    def next_window(self) -> Optional[Tuple[datetime, datetime]]:
+        """
+        Returns the next window to fetch (split halves first), or None when the period is planned.
+
+        :return: The (start, end) window.
+        :rtype: Tuple[datetime, datetime], optional
+        """
+        if self.retries:
+            return self.retries.pop(0)
+        if not self.gaps:
+            return None
+        gap_start, gap_end = self.gaps[0]
+        window = chunk_bounds(gap_start, gap_end, self.chunk_months)[0]
+        if window[1] >= gap_end:
+            self.gaps.pop(0)
+        else:
+            self.gaps[0] = (window[1], gap_end)
+        return window
+
+    def record(self, cells: int) -> None:
+        """
+        Adapts the window length to the size of a finished chunk.
+
+        :param cells: The chunk's rows times columns.
+        :type cells: int
+        """
+        if not self.adaptive:
+            return
+        if cells > TARGET_CHUNK_CELLS:
+            self.shrink()
+        elif cells < TARGET_CHUNK_CELLS // 2:
+            self.chunk_months = min(MAX_CHUNK_MONTHS, self.chunk_months * 2)
+
+    def shrink(self) -> None:
+        """
+        Halves the length of the next windows (e.g. after a source timed out on a window).
+
+        :return: None
+        :rtype: None
+        """
+        if self.adaptive:
+            self.chunk_months = max(1, self.chunk_months // 2)
+
+    def split(self, window: Tuple[datetime, datetime]) -> bool:
+        """
+        Schedules a window that was too large as two halves split at a midnight.
+
+        :param window: The (start, end) window that timed out.
+        :type window: Tuple[datetime, datetime]
+        :return: False when the window is too short to split.
+        :rtype: bool
+        """
+        start, end = window
+        middle = (start + (end - start) / 2).replace(hour=0, minute=0, second=0, microsecond=0)
+        if middle <= start:
+            return False
+        self.retries[:0] = [(start, middle), (middle, end)]
+        self.shrink()
+        return True
+
+
+class FleetUsgsPrefetch(FleetWindows):
+    """
+    Fetches each chunk window's instantaneous values once for the gauges of a fleet in flight.
+
+    Gauges scraped with the same start, end and chunk length share their chunk grid, so the first gauge
+    to reach a window requests it with batched NWIS requests
+    (:func:`usgs_scraping_functions.fetch_usgs_fleet`) for every started, unfinished gauge that has not
+    had it yet, and the others take their frames from it (see :class:`fleet_windows.FleetWindows`).
+    ``for_site(site)`` is passed to :func:`run_long_term_scrape` as ``usgs_prefetch``.
+    """
+
+    def __init__(self, bounds: List[Tuple[datetime, datetime]], batch_size: int = 10) -> None:
+        """
+        :param bounds: The shared (chunk_start, chunk_end) windows, e.g. from :func:`chunk_bounds`.
+        :type bounds: List[Tuple[datetime, datetime]]
+        :param batch_size: The initial gauges per request (adapted per window), defaults to 10.
+        :type batch_size: int, optional
+        """
+        super().__init__()
+        self.bounds = dict(bounds)
+        self.batch_size = batch_size
+
+    def fetch_window(self, window: datetime, sites: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Requests a window's raw iv frames of several gauges with batched NWIS requests.
+
+        :param window: The chunk start.
+        :type window: datetime
+        :param sites: The gauge site numbers.
+        :type sites: List[str]
+        :return: site number -> raw iv dataframe (gauges of failed batches are missing).
+        :rtype: Dict[str, pd.DataFrame]
+        """
+        return fetch_usgs_fleet(sites, window, self.bounds[window], batch_size=self.batch_size)
+
+    def take(self, site_number: str, chunk_start: datetime) -> Optional[pd.DataFrame]:
+        """
+        Returns a gauge's raw iv frame of a window, fetching the window for the fleet on first use.
+
+        :param site_number: The gauge site number.
+        :type site_number: str
+        :param chunk_start: The start of the window.
+        :type chunk_start: datetime
+        :return: The raw iv dataframe, or None when the window is not on the grid or the gauge's batch
+            failed (the caller then requests it on its own).
+        :rtype: pd.DataFrame, optional
+        """
+        if chunk_start not in self.bounds:
+            return None
+        return super().take(site_number, chunk_start)
+
+    def for_site(self, site_number: str) -> "SiteUsgsPrefetch":
+        """
+        Returns the view of one gauge for :func:`run_long_term_scrape`.
+
+        :param site_number: The gauge site number.
+        :type site_number: str
+        :return: The gauge's prefetch view.
+        :rtype: SiteUsgsPrefetch
+        """
+        return SiteUsgsPrefetch(self, site_number)
+
+
+class SiteUsgsPrefetch:
+    """
+    One gauge's view of a :class:`FleetUsgsPrefetch`, looked up by chunk start like a prefetch dict.
+    """
+
+    def __init__(self, fleet: FleetUsgsPrefetch, site_number: str) -> None:
+        self.fleet = fleet
+        self.site_number = site_number
+
+    def get(self, chunk_start: datetime) -> Optional[pd.DataFrame]:
+        """
+        Returns the gauge's raw iv frame of a window (see :meth:`FleetUsgsPrefetch.take`).
+
+        :param chunk_start: The start of the window.
+        :type chunk_start: datetime
+        :return: The raw iv dataframe, or None.
+        :rtype: pd.DataFrame, optional
+        """
+        return self.fleet.take(self.site_number, chunk_start)
+
+    def join(self) -> None:
+        """
+        Tells the fleet that this gauge has started.
+
+        :return: None
+        :rtype: None
+        """
+        self.fleet.join(self.site_number)
+
+    def release(self) -> None:
+        """
+        Tells the fleet that this gauge is finished.
+
+        :return: None
+        :rtype: None
+        """
+        self.fleet.release(self.site_number)
+
+
+def last_stored_timestamp(combined_path: str) -> Optional[pd.Timestamp]:
+    """
+    Reads the newest timestamp of a combined hourly CSV from its last line, without parsing the file.
+
+    :param combined_path: The path of a ``<site>_hourly_full.csv`` (sorted by datetime).
+    :type combined_path: str
+    :return: The UTC timestamp of the last row, or None when the file has no data rows.
+    :rtype: pd.Timestamp, optional
+    """
+    with open(combined_path, "rb") as f:
+        header = next(csv.reader([f.readline().decode()]))
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b""
+        while position > 0 and tail.strip().count(b"\n") < 1:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+    lines = tail.decode().strip().splitlines()
+    if "datetime" not in header or len(lines) == 0 or (position == 0 and len(lines) < 2):
+        return None
+    last_row = next(csv.reader([lines[-1]]))
+    timestamp = pd.Timestamp(last_row[header.index("datetime")])
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
+
+
+def existing_chunk_file(chunks_dir: str, site_number: str, chunk_start: datetime) -> Optional[str]:
+    """
+    Returns the file of a written chunk, accepting a ``.csv`` left by scrapes from before chunks were
+    binary.
+
+    :param chunks_dir: The gauge's ``chunks/`` directory.
+    :type chunks_dir: str
+    :param site_number: The USGS gauge site number.
+    :type site_number: str
+    :param chunk_start: The start of the chunk.
+    :type chunk_start: datetime
+    :return: The chunk path, or None when the chunk has not been written.
+    :rtype: str, optional
+    """
+    path = chunk_file_path(chunks_dir, site_number, chunk_start)
+    for candidate in (path, os.path.splitext(path)[0] + ".csv"):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def list_chunk_files(chunks_dir: str) -> List[str]:
+    """
+    Lists the chunk files of a gauge in chronological order, preferring the ``.npz`` of a chunk that a
+    re-run rewrote over its legacy ``.csv``.
+
+    :param chunks_dir: The gauge's ``chunks/`` directory.
+    :type chunks_dir: str
+    :return: The chunk paths.
+    :rtype: List[str]
+    """
+    chunks: Dict[str, str] = {}
+    for name in sorted(os.listdir(chunks_dir)):
+        stem, suffix = os.path.splitext(name)
+        if suffix == ".npz" or (suffix == ".csv" and stem not in chunks):
+            chunks[stem] = os.path.join(chunks_dir, name)
+    return [chunks[stem] for stem in sorted(chunks)]
+
+
+def _load_chunk(path: str) -> pd.DataFrame:
+    """
+    Loads the rows of one chunk file (see :func:`hourly_store.read_hourly_chunk`; legacy CSVs are read
+    as text).
+
+    :param path: The chunk path.
+    :type path: str
+    :return: The chunk's rows, in the order of :func:`chunk_index`.
+    :rtype: pd.DataFrame
+    """
+    if not path.endswith(".csv"):
+        return read_hourly_chunk(path)
+    frame = pd.read_csv(path)
+    if "datetime" in frame.columns:
+        frame = frame[frame["datetime"].notna()].reset_index(drop=True)
+    return frame
+
+
+def chunk_index(path: str) -> Tuple[List[str], np.ndarray]:
+    """
+    Reads the header and hour index of a chunk file without loading its variables.
+
+    :param path: The chunk path (``.npz``, or a legacy ``.csv``).
+    :type path: str
+    :return: The (column names, int64 hours) pair; hours are empty when the chunk has no "datetime".
+    :rtype: Tuple[List[str], np.ndarray]
+    :raises ValueError: If the chunk's rows are not in time order.
+    """
+    if not path.endswith(".csv"):
+        return hourly_chunk_index(path)
+    with open(path, newline="") as f:
+        header = next(csv.reader(f), [])
+    if "datetime" not in header:
+        return header, np.zeros(0, dtype=np.int64)
+    hours = to_hours(pd.read_csv(path, usecols=["datetime"])["datetime"].dropna())
+    if np.any(np.diff(hours) < 0):
+        raise ValueError("Chunk %s is not sorted by datetime" % path)
+    return header, hours
+
+
+def chunk_columns(headers: List[List[str]]) -> List[str]:
+    """
+    Returns the union of the chunk headers in order of first appearance (the layout of a concat).
+
+    :param headers: The chunk headers (see :func:`chunk_index`) in chronological order.
+    :type headers: List[List[str]]
+    :return: The merged column names.
+    :rtype: List[str]
+    """
+    columns: List[str] = []
+    for header in headers:
+        if "datetime" in header:
+            columns.extend(name for name in header if name not in columns)
+    return columns
+
+
+def iter_merged_batches(chunk_paths: List[str], chunk_hours: List[np.ndarray], columns: List[str],
+                        after: Optional[int] = None,
+                        batch_rows: int = MERGE_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Merges time-ordered chunks into ascending batches of rows, keeping the first row of each hour.
+
+    Chunks only overlap at their boundary hours, so the merge walks the hour indexes and takes each run
+    of rows that no other chunk precedes from one chunk at a time; a chunk is loaded when its first run
+    is reached and dropped once it is used up. Where chunks repeat an hour, the earlier chunk's row
+    wins, as in the former concat and ``drop_duplicates``.
+
+    :param chunk_paths: The chunk files in chronological order.
+    :type chunk_paths: List[str]
+    :param chunk_hours: The hour index of each chunk (see :func:`chunk_index`).
+    :type chunk_hours: List[np.ndarray]
+    :param columns: The merged column names (see :func:`chunk_columns`).
+    :type columns: List[str]
+    :param after: Only rows strictly after this hour are yielded, defaults to None (all rows).
+    :type after: int, optional
+    :param batch_rows: The most rows in one batch, defaults to MERGE_BATCH_ROWS.
+    :type batch_rows: int, optional
+    :return: An iterator of frames with the merged columns.
+    :rtype: Iterator[pd.DataFrame]
+    """
+    positions = [0 if after is None else int(np.searchsorted(hours, after, side="right"))
+                 for hours in chunk_hours]
+    loaded: Dict[int, pd.DataFrame] = {}
+    while True:
+        heads = sorted((int(hours[position]), index)
+                       for index, (hours, position) in enumerate(zip(chunk_hours, positions))
+                       if position < len(hours))
+        if not heads:
+            return
+        lead = heads[0][1]
+        hours, first = chunk_hours[lead], positions[lead]
+        end = len(hours)
+        if len(heads) > 1:
+            # The run stops at the next chunk's first hour, taking that hour too when this chunk is earlier.
+            limit, other = heads[1]
+            end = int(np.searchsorted(hours, limit, side="right" if lead < other else "left"))
+        if lead not in loaded:
+            loaded[lead] = _load_chunk(chunk_paths[lead])
+        keep = np.ones(end - first, dtype=bool)
+        keep[1:] = hours[first + 1:end] != hours[first:end - 1]
+        rows = loaded[lead].iloc[first:end][keep].reindex(columns=columns).reset_index(drop=True)
+        for offset in range(0, len(rows), batch_rows):
+            yield rows.iloc[offset:offset + batch_rows]
+        last = hours[end - 1]
+        positions = [max(position, int(np.searchsorted(hours, last, side="right")))
+                     for hours, position in zip(chunk_hours, positions)]
+        for index in [index for index in loaded if positions[index] >= len(chunk_hours[index])]:
+            del loaded[index]
+
+
+def _chunk_signature(path: str) -> List[int]:
+    """
+    Returns the size and modification time of a chunk file, which change whenever it is rewritten.
+
+    :param path: The chunk file path.
+    :type path: str
+    :return: [size in bytes, mtime in ns].
+    :rtype: List[int]
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _append_point(chunk_paths: List[str], chunk_hours: List[np.ndarray], columns: List[str],
+                  signatures: Dict[str, List[int]], store_dir: str,
+                  csv_path: Optional[str]) -> Optional[Tuple[int, List[str], List[str]]]:
+    """
+    Tells whether the chunks not yet merged can be appended to the combined record as it is.
+
+    That holds when the store's merge record lists chunks that are all unchanged, the store (and the
+    CSV, if one is kept) still end at the recorded hour with every column of the chunks, and each new
+    chunk sorts after the merged ones and starts no earlier than that hour.
+
+    :param chunk_paths: The chunk files in chronological order.
+    :type chunk_paths: List[str]
+    :param chunk_hours: The hour index of each chunk (see :func:`chunk_index`).
+    :type chunk_hours: List[np.ndarray]
+    :param columns: The merged column names (see :func:`chunk_columns`).
+    :type columns: List[str]
+    :param signatures: Chunk file name -> its current :func:`_chunk_signature`.
+    :type signatures: Dict[str, List[int]]
+    :param store_dir: The columnar store directory.
+    :type store_dir: str
+    :param csv_path: The CSV export, or None when none is kept.
+    :type csv_path: str, optional
+    :return: The (last stored hour, CSV header, new chunk paths), or None when the record must be
+        rebuilt.
+    :rtype: Tuple[int, List[str], List[str]], optional
+    """
+    record_path = os.path.join(store_dir, MERGE_RECORD_FILE)
+    if not os.path.exists(os.path.join(store_dir, MANIFEST_FILE)) or not os.path.exists(record_path):
+        return None
+    with open(record_path) as f:
+        record = json.load(f)
+    manifest = load_manifest(store_dir)
+    last_stored = last_store_timestamp(store_dir)
+    merged = record["chunks"]
+    if last_stored is None or manifest["last_hour"] != record["last_hour"]:
+        return None
+    if not set(columns) <= {"datetime"} | {entry["name"] for entry in manifest["columns"]}:
+        return None
+    if any(signatures.get(name) != signature for name, signature in merged.items()):
+        return None
+    new_paths = [path for path in chunk_paths if os.path.basename(path) not in merged]
+    if any(os.path.basename(path) <= max(merged, default="") for path in new_paths):
+        return None
+    csv_header = columns
+    if csv_path is not None:
+        if not os.path.exists(csv_path):
+            return None
+        with open(csv_path, newline="") as f:
+            csv_header = next(csv.reader(f), [])
+        if not set(columns) <= set(csv_header) or last_stored_timestamp(csv_path) != last_stored:
+            return None
+    for path, hours in zip(chunk_paths, chunk_hours):
+        if path in new_paths and len(hours) and hours[0] < manifest["last_hour"]:
+            return None
+    return int(manifest["last_hour"]), csv_header, new_paths
+
+
+def merge_chunk_files(chunk_paths: List[str], store_dir: str, csv_path: Optional[str] = None,
+                      batch_rows: int = MERGE_BATCH_ROWS) -> int:
+    """
+    Builds (or extends) the combined hourly record from chunk files by streaming, in bounded memory.
+
+    The chunks merged into the store are recorded in its :data:`MERGE_RECORD_FILE`. When only new chunks
+    after the recorded hour were added (see :func:`_append_point`), only those are merged and their rows
+    appended. Otherwise (e.g. a resumed scrape filled a gap, or a chunk brought a new column) both are
+    rebuilt; the CSV is written to a temporary file and renamed when complete. Rows go to the store
+    through a :class:`hourly_store.HourlyStoreWriter`, ``batch_rows`` at a time, so memory stays bounded
+    by one chunk however long the record is. Binary chunks go to the store without any text parsing;
+    legacy ``.csv`` chunks are still read.
+
+    :param chunk_paths: The chunk files in chronological order (see :func:`list_chunk_files`).
+    :type chunk_paths: List[str]
+    :param store_dir: The columnar store directory (see :mod:`hourly_store`).
+    :type store_dir: str
+    :param csv_path: The ``<site>_hourly_full.csv`` export, defaults to None (store only).
+    :type csv_path: str, optional
+    :param batch_rows: Rows converted and written to the store at a time, defaults to MERGE_BATCH_ROWS.
+    :type batch_rows: int, optional
+    :return: The number of rows in the combined record.
+    :rtype: int
+    """
+    headers, chunk_hours = zip(*(chunk_index(path) for path in chunk_paths)) if chunk_paths else ((), ())
+    columns = chunk_columns(list(headers))
+    signatures = {os.path.basename(path): _chunk_signature(path) for path in chunk_paths}
+    has_store = os.path.exists(os.path.join(store_dir, MANIFEST_FILE))
+    if not columns:
+        return int(load_manifest(store_dir)["rows"]) if has_store else 0
+    append = _append_point(chunk_paths, list(chunk_hours), columns, signatures, store_dir, csv_path)
+    after, csv_header, new_paths = append if append is not None else (None, columns, chunk_paths)
+    new_hours = [hours for path, hours in zip(chunk_paths, chunk_hours) if path in new_paths]
+    if after is None:
+        print("  Merging", len(chunk_paths), "chunk files into the combined record")
+    elif new_paths:
+        print("  Appending", len(new_paths), "new chunk files to the combined record")
+    if after is None or new_paths:
+        _write_merged_rows(new_paths, new_hours, columns, after, store_dir, csv_path, csv_header, batch_rows)
+    if not os.path.exists(os.path.join(store_dir, MANIFEST_FILE)):
+        return 0
+    manifest = load_manifest(store_dir)
+    _save_merge_record(store_dir, signatures, manifest["last_hour"])
+    return int(manifest["rows"])
+
+
+def _save_merge_record(store_dir: str, signatures: Dict[str, List[int]], last_hour: Optional[int]) -> None:
+    """
+    Writes the store's :data:`MERGE_RECORD_FILE` atomically.
+
+    :param store_dir: The columnar store directory.
+    :type store_dir: str
+    :param signatures: Merged chunk file name -> its :func:`_chunk_signature`.
+    :type signatures: Dict[str, List[int]]
+    :param last_hour: The store's last hour after the merge.
+    :type last_hour: int, optional
+    :return: None
+    :rtype: None
+    """
+    record_path = os.path.join(store_dir, MERGE_RECORD_FILE)
+    with open(record_path + ".tmp", "w") as f:
+        json.dump({"chunks": signatures, "last_hour": last_hour}, f, indent=2)
+    os.replace(record_path + ".tmp", record_path)
+
+
+def _record_appended_chunk(store_dir: str, chunk_path: str, previous_last_hour: Optional[int]) -> None:
+    """
+    Adds a chunk appended by :func:`run_incremental_update` to the store's merge record, so the next full
+    run appends after it (see :func:`_append_point`) instead of rebuilding the record from every chunk.
+
+    :param store_dir: The columnar store directory.
+    :type store_dir: str
+    :param chunk_path: The appended chunk file.
+    :type chunk_path: str
+    :param previous_last_hour: The store's last hour before the append; a record that was already out of
+        date then is left as it is.
+    :type previous_last_hour: int, optional
+    :return: None
+    :rtype: None
+    """
+    record_path = os.path.join(store_dir, MERGE_RECORD_FILE)
+    if not os.path.exists(record_path):
+        return
+    with open(record_path) as f:
+        record = json.load(f)
+    if record["last_hour"] != previous_last_hour:
+        return
+    record["chunks"][os.path.basename(chunk_path)] = _chunk_signature(chunk_path)
+    _save_merge_record(store_dir, record["chunks"], load_manifest(store_dir)["last_hour"])
+
+
+def _write_merged_rows(chunk_paths: List[str], chunk_hours: List[np.ndarray], columns: List[str],
+                       after: Optional[int], store_dir: str, csv_path: Optional[str], csv_header: List[str],
+                       batch_rows: int) -> None:
+    """
+    Streams the merged rows of chunks into the store and the CSV export (see :func:`merge_chunk_files`).
+
+    :param chunk_paths: The chunk files to merge, in chronological order.
+    :type chunk_paths: List[str]
+    :param chunk_hours: The hour index of each chunk.
+    :type chunk_hours: List[np.ndarray]
+    :param columns: The merged column names.
+    :type columns: List[str]
+    :param after: Append the rows after this hour, or None to rebuild the record.
+    :type after: int, optional
+    :param store_dir: The columnar store directory.
+    :type store_dir: str
+    :param csv_path: The CSV export, or None when none is kept.
+    :type csv_path: str, optional
+    :param csv_header: The CSV's columns (those of an existing export when appending).
+    :type csv_header: List[str]
+    :param batch_rows: Rows written to the store at a time.
+    :type batch_rows: int
+    :return: None
+    :rtype: None
+    """
+    csv_file = None
+    if csv_path is not None:
+        if after is not None:
+            csv_file = open(csv_path, "a", newline="")
+        else:
+            csv_file = open(csv_path + ".tmp", "w", newline="")
+            csv.writer(csv_file).writerow(csv_header)
+    writer = HourlyStoreWriter(store_dir, columns, append=after is not None)
+    try:
+        for batch in iter_merged_batches(chunk_paths, chunk_hours, columns, after=after, batch_rows=batch_rows):
+            if csv_file is not None:
+                batch.reindex(columns=csv_header).to_csv(csv_file, header=False, index=False)
+            writer.add(batch)
+    except BaseException:
+        writer.discard()
+        raise
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+    if writer.rows or after is None:
+        writer.close()
+    else:
+        writer.discard()
+    if csv_path is not None and after is None:
+        os.replace(csv_path + ".tmp", csv_path)
+
+
+def run_incremental_update(site_number: str, output_dir: str, end_time: Optional[datetime] = None,
+                           include_nldas: bool = True, gages2_zip_path: Optional[str] = None,
+                           backup: bool = True, site_index: Optional[Dict[str, Dict]] = None,
+                           nldas_provider: Optional[NldasProvider] = None) -> dict:
+    """
+    Appends the hours since the last stored timestamp to a gauge's existing combined record.
+
+    The last timestamp comes from the store manifest, or from the tail of ``<site>_hourly_full.csv``
+    when the gauge predates the columnar store. The new window (starting :data:`INCREMENTAL_OVERLAP`
+    before the last stored hour) is fetched from every source, rows not newer than the stored ones are
+    dropped, and the rest are appended to the store and the CSV (in their stored column order) and also
+    written as an extra chunk file so a later full rebuild from ``chunks/`` keeps them. The chunk is
+    added to the store's merge record too, so the next full run only appends the chunks after it. Data
+    availability is reused from the previous run's ``<site>_static.json`` rather than recomputed.
+
+    :param site_number: The USGS gauge site number.
+    :type site_number: str
+    :param output_dir: The gauge's output directory from a previous :func:`run_long_term_scrape`.
+    :type output_dir: str
+    :param end_time: The window end, defaults to None which uses the current hour.
+    :type end_time: datetime, optional
+    :param include_nldas: Whether to fetch NLDAS-2 forcing, defaults to True.
+    :type include_nldas: bool, optional
+    :param gages2_zip_path: Optional GAGES-II archive path for static attributes, defaults to None.
+    :type gages2_zip_path: str, optional
+    :param backup: Whether to back the output directory up to GCS at the end, defaults to True.
+    :type backup: bool, optional
+    :param site_index: A state-wide metadata index (see
+        :func:`usgs_scraping_functions.get_state_site_index`), defaults to None.
+    :type site_index: Dict[str, Dict], optional
+    :param nldas_provider: Returns the gauge's NLDAS-2 forcing of a window, or None to request it from
+        Giovanni (see :class:`nldas_grid_extract.FleetGridForcing`), defaults to None.
+    :type nldas_provider: NldasProvider, optional
+    :return: A summary dict like :func:`run_long_term_scrape`'s with "mode" and "appended_rows" keys.
+    :rtype: dict
+    """
+    combined_path = os.path.join(output_dir, site_number + "_hourly_full.csv")
+    summary_path = os.path.join(output_dir, site_number + "_scrape_summary.json")
+    store_dir = store_path(output_dir, site_number)
+    has_store = os.path.isdir(store_dir)
+    has_csv = os.path.exists(combined_path)
+    last_stored = last_store_timestamp(store_dir) if has_store else last_stored_timestamp(combined_path)
+    if last_stored is None:
+        raise ValueError("No stored rows to append to in " + output_dir)
+    if end_time is None:
+        end_time = datetime.now().replace(minute=0, second=0, microsecond=0)
+    start_time = last_stored.tz_localize(None).to_pydatetime() - INCREMENTAL_OVERLAP
+
+    discovery = discover_catchment(site_number, gages2_zip_path=gages2_zip_path, site_index=site_index)
+    static_path = os.path.join(output_dir, site_number + "_static.json")
+    availability = None
+    if os.path.exists(static_path):
+        with open(static_path) as f:
+            availability = json.load(f).get("data_availability")
+    failures, appended = [], 0
+    print("Appending", site_number, "since", last_stored)
+    try:
+        forcing = nldas_provider(start_time, end_time) if include_nldas and nldas_provider else None
+        chunk = fetch_hourly_chunk(site_number, start_time, end_time, discovery, include_nldas=include_nldas,
+                                   nldas_forcing=forcing)
+    except Exception as error:  # noqa: BLE001 - report like a failed chunk of a full scrape
+        failures.append({"chunk": start_time.strftime("%Y-%m-%d"), "error": str(error)[:300]})
+        print("  FAILED:", str(error)[:200])
+        chunk = pd.DataFrame()
+    source_failures = _source_failures(start_time, chunk.attrs.get("failed_sources") or {})
+    if not chunk.empty:
+        chunk = chunk[pd.to_datetime(chunk["datetime"], utc=True) > last_stored]
+    if not chunk.empty:
+        chunk = chunk.sort_values("datetime")
+        previous_last_hour = load_manifest(store_dir)["last_hour"] if has_store else None
+        if has_store:
+            append_hourly_store(chunk, store_dir)
+        if has_csv:
+            with open(combined_path) as f:
+                columns = next(csv.reader([f.readline()]))
+            dropped = sorted(set(chunk.columns) - set(columns))
+            if dropped:
+                print("  Columns not in the stored header are not appended:", dropped)
+            chunk = chunk.reindex(columns=columns)
+            chunk.to_csv(combined_path, mode="a", header=False, index=False)
+        chunk_name = site_number + "_" + chunk["datetime"].iloc[0].strftime("%Y%m%dT%H") + ".npz"
+        chunk_path = os.path.join(output_dir, "chunks", chunk_name)
+        write_chunk_file(chunk, chunk_path)
+        if has_store:
+            _record_appended_chunk(store_dir, chunk_path, previous_last_hour)
+        appended = len(chunk)
+
+    previous: Dict = {}
+    if os.path.exists(summary_path):
+        with open(summary_path) as f:
+            previous = json.load(f)
+    previous_rows = previous.get("combined_rows")
+    summary = {"site": site_number, "start": previous.get("start"), "end": str(end_time.date()),
+               "mode": "incremental", "appended_since": str(last_stored), "appended_rows": appended,
+               "chunks_fetched": int(appended > 0), "chunks_skipped_existing": 0,
+               "chunk_failures": failures, "source_failures": source_failures,
+               "combined_rows": None if previous_rows is None else int(previous_rows) + appended,
+               "data_availability": availability}
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    if backup:
+        backup_summary = upload_directory_to_gcs(output_dir,
+                                                 prefix=os.path.normpath(output_dir).replace(os.sep, "/"))
+        summary["backup"] = backup_summary
+    return summary
+
+
+def _source_failures(chunk_start: datetime, failed_sources: Dict[str, Exception]) -> List[Dict]:
+    """
+    Formats the optional sources a chunk was written without for the scrape summary.
+
+    :param chunk_start: The start of the chunk.
+    :type chunk_start: datetime
+    :param failed_sources: Source name -> exception, from the chunk's ``attrs["failed_sources"]``.
+    :type failed_sources: Dict[str, Exception]
+    :return: One {"chunk", "source", "error"} dict per failed source.
+    :rtype: List[Dict]
+    """
+    return [{"chunk": chunk_start.strftime("%Y-%m-%d"), "source": name,
+             "error": (type(error).__name__ + ": " + str(error))[:300]}
+            for name, error in sorted(failed_sources.items())]
+
+
+def write_chunk_file(chunk: pd.DataFrame, chunk_path: str) -> None:
+    """
+    Writes a chunk file atomically (see :func:`hourly_store.write_hourly_chunk`), so the file exists only
+    when complete, and removes the ``.csv`` an older scrape left for the same chunk.
+
+    Rows are written in time order, which the streamed merge of :func:`merge_chunk_files` relies on.
+
+    :param chunk: The joined hourly frame of the chunk.
+    :type chunk: pd.DataFrame
+    :param chunk_path: The chunk ``.npz`` path.
+    :type chunk_path: str
+    :return: None
+    :rtype: None
+    """
+    write_hourly_chunk(chunk, chunk_path)
+    legacy_path = os.path.splitext(chunk_path)[0] + ".csv"
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+
+def _run_chunk_pipeline(fetch: Callable[[datetime, datetime], pd.DataFrame], planner: ChunkPlanner,
+                        plan: Dict, chunks_dir: str, site_number: str, max_parallel_chunks: int,
+                        max_chunks: Optional[int]) -> Tuple[int, List[Dict], List[Dict]]:
+    """
+    Fetches the planner's windows and writes each finished chunk, recording it in the chunk plan.
+
+    Up to ``max_parallel_chunks`` chunks are in flight (each source still capped by host_limits) while
+    finished ones are written by the calling thread, which also feeds their sizes back to the planner.
+    A window that failed for its size is split; other failures are reported and skipped.
+
+    :param fetch: Returns the joined hourly frame of a (start, end) window.
+    :type fetch: Callable[[datetime, datetime], pd.DataFrame]
+    :param planner: The planner handing out the windows.
+    :type planner: ChunkPlanner
+    :param plan: The gauge's chunk plan (see :func:`load_chunk_plan`), updated and saved per chunk.
+    :type plan: Dict
+    :param chunks_dir: The gauge's ``chunks/`` directory.
+    :type chunks_dir: str
+    :param site_number: The USGS gauge site number.
+    :type site_number: str
+    :param max_parallel_chunks: The most chunks fetched at once.
+    :type max_parallel_chunks: int
+    :param max_chunks: Stop after this many fetched chunks, or None for no limit.
+    :type max_chunks: int, optional
+    :return: The number of chunks written, the chunk failures and the optional-source failures.
+    :rtype: Tuple[int, List[Dict], List[Dict]]
+    """
+    fetched, failures, source_failures = 0, [], []
+    in_flight: Deque = deque()
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel_chunks)) as pool:
+        while True:
+            while len(in_flight) < max(1, max_parallel_chunks) and \
+                    (max_chunks is None or fetched + len(in_flight) < max_chunks):
+                window = planner.next_window()
+                if window is None:
+                    break
+                print("Fetching chunk", window[0].date(), "->", window[1].date())
+                in_flight.append((window, pool.submit(fetch, *window)))
+            if not in_flight:
+                break
+            (chunk_start, chunk_end), future = in_flight.popleft()
+            try:
+                chunk = future.result()
+            except Exception as error:  # noqa: BLE001 - a multi-hour scrape must survive flaky sources
+                if is_oversize_error(error) and planner.split((chunk_start, chunk_end)):
+                    print("  Too large for one request, retrying in halves:", str(error)[:200])
+                    continue
+                failures.append({"chunk": chunk_start.strftime("%Y-%m-%d"), "error": str(error)[:300]})
+                print("  FAILED:", str(error)[:200])
+                continue
+            write_chunk_file(chunk, chunk_file_path(chunks_dir, site_number, chunk_start))
+            failed_sources = chunk.attrs.get("failed_sources") or {}
+            if any(is_oversize_error(error) for error in failed_sources.values()):
+                planner.shrink()
+            else:
+                planner.record(int(chunk.shape[0] * chunk.shape[1]))
+            source_failures.extend(_source_failures(chunk_start, failed_sources))
+            plan["chunks"] = [window for window in plan["chunks"] if window[0] != chunk_start]
+            plan["chunks"].append((chunk_start, chunk_end))
+            plan["partial"].pop(chunk_start, None)
+            if failed_sources:
+                plan["partial"][chunk_start] = sorted(failed_sources)
+            plan["chunk_months"] = planner.chunk_months
+            save_chunk_plan(chunks_dir, plan)
+            fetched += 1
+    return fetched, failures, source_failures
+
+
 def run_long_term_scrape(site_number: str, start_time: Optional[datetime] = None,
                          end_time: Optional[datetime] = None, output_dir: Optional[str] = None,
                          chunk_months: int = 12, include_nldas: bool = True,
                          gages2_zip_path: Optional[str] = None, backup: bool = True,
-                         max_chunks: Optional[int] = None) -> dict:
+                         max_chunks: Optional[int] = None,
+                         usgs_prefetch: Optional[Union[Dict[datetime, pd.DataFrame],
+                                                       SiteUsgsPrefetch]] = None,
+                         site_index: Optional[Dict[str, Dict]] = None,
+                         incremental: bool = False, write_csv: bool = True,
+                         max_parallel_chunks: int = CHUNK_WORKERS,
+                         nldas_provider: Optional[NldasProvider] = None,
+                         asos_prefetch: Optional[AsosPrefetch] = None) -> dict:
     """
     Runs (or resumes) the full scrape for one gauge and returns a summary dict.
 
+    Chunks are fetched by a small thread pool, so the next chunks are already in flight while a finished
+    one is written; each chunk file is written atomically, so an interrupted run never leaves a partial
+    chunk that a resume would skip. A chunk written without one of its optional sources (see
+    :func:`catchment_dataset.fetch_hourly_chunk`) is listed under "partial" in the chunk plan and fetched
+    again in place by the next resume. The chunks are then streamed into the combined record by
+    :func:`merge_chunk_files`.
+
     :param site_number: The USGS gauge site number.
     :type site_number: str
     :param start_time: The scrape start, defaults to None which uses the uv streamflow begin date.
@@ -73,7 +1018,7 @@ def run_long_term_scrape(site_number: str, start_time: Optional[datetime] = None
     :type end_time: datetime, optional
     :param output_dir: The output directory, defaults to None which uses pilot_data/<site>_full.
     :type output_dir: str, optional
-    :param chunk_months: Months per chunk, defaults to 12.
+    :param chunk_months: Months per chunk to start with (adapted from the chunk sizes), defaults to 12.
     :type chunk_months: int, optional
     :param include_nldas: Whether to fetch NLDAS-2 forcing (needs EARTHDATA_TOKEN), defaults to True.
     :type include_nldas: bool, optional
@@ -83,11 +1028,42 @@ def run_long_term_scrape(site_number: str, start_time: Optional[datetime] = None
     :type backup: bool, optional
     :param max_chunks: Stop after this many newly fetched chunks (for tests/pilots), defaults to None.
     :type max_chunks: int, optional
+    :param usgs_prefetch: Raw iv frames keyed by chunk start, or a gauge's view of a
+        :class:`FleetUsgsPrefetch`, used instead of a per-chunk NWIS request, defaults to None.
+    :type usgs_prefetch: Union[Dict[datetime, pd.DataFrame], SiteUsgsPrefetch], optional
+    :param site_index: A state-wide metadata index (see
+        :func:`usgs_scraping_functions.get_state_site_index`) that replaces the per-gauge NWIS site and
+        series catalog requests, defaults to None.
+    :type site_index: Dict[str, Dict], optional
+    :param incremental: Whether to only append the hours since the last stored timestamp (see
+        :func:`run_incremental_update`) when a combined record already exists, defaults to False.
+    :type incremental: bool, optional
+    :param write_csv: Whether to also export the combined record as ``<site>_hourly_full.csv`` next to
+        the columnar store, defaults to True.
+    :type write_csv: bool, optional
+    :param max_parallel_chunks: The most chunks fetched at once, defaults to CHUNK_WORKERS.
+    :type max_parallel_chunks: int, optional
+    :param nldas_provider: Returns the gauge's NLDAS-2 forcing of a chunk window (e.g. extracted from
+        local grid files by :class:`nldas_grid_extract.FleetGridForcing`), or None to request that
+        chunk from Giovanni, defaults to None.
+    :type nldas_provider: NldasProvider, optional
+    :param asos_prefetch: Caches a chunk window of every ASOS station of the fleet before the gauge reads
+        its own (see :class:`weather_scraping_functions.FleetAsosPrefetch`); only chunks of the shared
+        fixed grid are prefetched, defaults to None.
+    :type asos_prefetch: AsosPrefetch, optional
     :return: A summary dict with chunk counts, failures and the combined row count.
     :rtype: dict
     """
+    output_dir = output_dir or os.path.join("pilot_data", site_number + "_full")
+    if incremental and (os.path.isdir(store_path(output_dir, site_number)) or
+                        os.path.exists(os.path.join(output_dir, site_number + "_hourly_full.csv"))):
+        return run_incremental_update(site_number, output_dir, end_time=end_time,
+                                      include_nldas=include_nldas, gages2_zip_path=gages2_zip_path,
+                                      backup=backup, site_index=site_index, nldas_provider=nldas_provider)
+    catalog = (site_index or {}).get("period_of_record", {}).get(site_number)
     if start_time is None:
-        catalog = get_period_of_record(site_number)
+        if catalog is None:
+            catalog = get_period_of_record(site_number)
         flow_series = catalog.get("uv_00060")
         if flow_series is None:
             raise ValueError("Gauge " + site_number + " has no instantaneous (uv) streamflow record; "
@@ -95,11 +1071,12 @@ def run_long_term_scrape(site_number: str, start_time: Optional[datetime] = None
         start_time = datetime.strptime(flow_series["begin_date"], "%Y-%m-%d")
     if end_time is None:
         end_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    output_dir = output_dir or os.path.join("pilot_data", site_number + "_full")
     chunks_dir = os.path.join(output_dir, "chunks")
     os.makedirs(chunks_dir, exist_ok=True)
 
-    discovery = discover_catchment(site_number, gages2_zip_path=gages2_zip_path)
+    discovery = discover_catchment(site_number, gages2_zip_path=gages2_zip_path, site_index=site_index)
+    if catalog is not None:
+        discovery["period_of_record"] = catalog
     # Record when each source begins so training can pick a fully-aligned start per river.
     discovery["static"]["data_availability"] = get_data_availability(site_number, discovery=discovery)
     with open(os.path.join(output_dir, site_number + "_static.json"), "w") as f:
@@ -109,37 +1086,44 @@ def run_long_term_scrape(site_number: str, start_time: Optional[datetime] = None
             json.dump({"type": "Feature", "geometry": discovery["basin_geometry"],
                        "properties": {"site_no": site_number}}, f)
 
-    fetched, skipped, failures = 0, 0, []
-    for chunk_start, chunk_end in chunk_bounds(start_time, end_time, chunk_months):
-        chunk_path = os.path.join(chunks_dir, site_number + "_" + chunk_start.strftime("%Y%m%d") + ".csv")
-        if os.path.exists(chunk_path):
-            skipped += 1
-            continue
-        print("Fetching chunk", chunk_start.date(), "->", chunk_end.date())
-        try:
-            chunk = fetch_hourly_chunk(site_number, chunk_start, chunk_end, discovery,
-                                       include_nldas=include_nldas)
-        except Exception as error:  # noqa: BLE001 - a multi-hour scrape must survive flaky sources
-            failures.append({"chunk": chunk_start.strftime("%Y-%m-%d"), "error": str(error)[:300]})
-            print("  FAILED:", str(error)[:200])
-            continue
-        chunk.to_csv(chunk_path, index=False)
-        fetched += 1
-        if max_chunks is not None and fetched >= max_chunks:
-            break
-
-    chunk_files = sorted(os.path.join(chunks_dir, name) for name in os.listdir(chunks_dir)
-                         if name.endswith(".csv"))
-    frames = [pd.read_csv(path) for path in chunk_files]
-    frames = [frame for frame in frames if len(frame) > 0]
-    combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
-    if not combined.empty:
-        combined = combined.drop_duplicates(subset="datetime").sort_values("datetime")
-        combined.to_csv(os.path.join(output_dir, site_number + "_hourly_full.csv"), index=False)
+    plan = load_chunk_plan(chunks_dir, site_number, start_time, end_time, chunk_months)
+    written = [(chunk_start, chunk_end) for chunk_start, chunk_end in plan["chunks"]
+               if chunk_start < end_time and chunk_end > start_time and
+               existing_chunk_file(chunks_dir, site_number, chunk_start) is not None]
+    # Chunks written without an optional source are fetched again in place; the rest are kept.
+    refetch = [window for window in written if window[0] in plan["partial"]]
+    skipped = len(written) - len(refetch)
+    gaps, cursor = [], start_time
+    for chunk_start, chunk_end in sorted(written) + [(end_time, end_time)]:
+        if chunk_start > cursor:
+            gaps.append((cursor, min(chunk_start, end_time)))
+        cursor = max(cursor, chunk_end)
+    # Prefetched NWIS and ASOS windows belong to the shared fixed grid, so a prefetched scrape keeps it.
+    prefetching = bool(usgs_prefetch) or asos_prefetch is not None
+    prefetch_ends = dict(chunk_bounds(start_time, end_time, chunk_months)) if prefetching else {}
+    planner = ChunkPlanner(gaps, int(plan.get("chunk_months", chunk_months)), adaptive=not prefetching,
+                           refetch=refetch)
+
+    def fetch(chunk_start: datetime, chunk_end: datetime) -> pd.DataFrame:
+        on_grid = prefetch_ends.get(chunk_start) == chunk_end
+        prefetched = (usgs_prefetch or {}).get(chunk_start) if on_grid else None
+        if asos_prefetch is not None and on_grid and discovery.get("asos_station") is not None:
+            asos_prefetch(chunk_start, chunk_end)
+        forcing = nldas_provider(chunk_start, chunk_end) if include_nldas and nldas_provider else None
+        return fetch_hourly_chunk(site_number, chunk_start, chunk_end, discovery, include_nldas=include_nldas,
+                                  usgs_raw=prefetched, nldas_forcing=forcing)
+    fetched, failures, source_failures = _run_chunk_pipeline(fetch, planner, plan, chunks_dir, site_number,
+                                                             max_parallel_chunks, max_chunks)
+
+    combined_rows = merge_chunk_files(list_chunk_files(chunks_dir), store_path(output_dir, site_number),
+                                      csv_path=os.path.join(output_dir, site_number + "_hourly_full.csv")
+                                      if write_csv else None)
 
     summary = {"site": site_number, "start": str(start_time.date()), "end": str(end_time.date()),
                "chunks_fetched": fetched, "chunks_skipped_existing": skipped,
-               "chunk_failures": failures, "combined_rows": int(len(combined)),
+               "chunk_failures": failures, "source_failures": source_failures,
+               "partial_chunks": [start.strftime("%Y-%m-%d") for start in sorted(plan["partial"])],
+               "chunk_months": planner.chunk_months, "combined_rows": combined_rows,
                "data_availability": discovery["static"]["data_availability"]}
     with open(os.path.join(output_dir, site_number + "_scrape_summary.json"), "w") as f:
         json.dump(summary, f, indent=2)
@@ -168,6 +1152,12 @@ def main() -> None:
     parser.add_argument("--gages2-zip", default=os.path.join("pilot_data", "gages2.zip"))
     parser.add_argument("--no-nldas", action="store_true", help="Skip NLDAS-2 forcing")
     parser.add_argument("--no-backup", action="store_true", help="Skip the GCS backup at the end")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only append the hours since the last stored timestamp")
+    parser.add_argument("--no-csv", action="store_true",
+                        help="Only write the columnar store, not <site>_hourly_full.csv")
+    parser.add_argument("--parallel-chunks", type=int, default=CHUNK_WORKERS,
+                        help="Chunks fetched at once")
     args = parser.parse_args()
     load_dotenv()
     include_nldas = not args.no_nldas and bool(os.environ.get("EARTHDATA_TOKEN"))
@@ -178,7 +1168,8 @@ def main() -> None:
         start_time=datetime.strptime(args.start, "%Y-%m-%d") if args.start else None,
         end_time=datetime.strptime(args.end, "%Y-%m-%d") if args.end else None,
         output_dir=args.output_dir, chunk_months=args.chunk_months, include_nldas=include_nldas,
-        gages2_zip_path=args.gages2_zip, backup=not args.no_backup)
+        gages2_zip_path=args.gages2_zip, backup=not args.no_backup, incremental=args.incremental,
+        write_csv=not args.no_csv, max_parallel_chunks=args.parallel_chunks)
     print(json.dumps(summary, indent=2))
 
 
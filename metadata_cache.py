@@ -0,0 +1,284 @@
+"""
+Persistent on-disk cache for slowly-changing upstream metadata (NWIS, NLDI, Mesonet, AWDB).
+
+Station inventories, site attributes, basin polygons and sensor begin dates change on the order of
+months, yet a watchdog restart re-runs discovery for every unfinished gauge. Wrapping the lookup
+functions with :func:`cached_metadata` stores each result as one JSON file per call under
+``<cache_dir>/<endpoint>/`` so a restart costs no metadata traffic.
+
+Each endpoint has its own time-to-live (:data:`ENDPOINT_TTL_DAYS`); the cache directory is bounded in
+size by evicting the least recently used entries; entries can be dropped explicitly with
+:func:`invalidate`. Writes go through a temporary file and an atomic rename, so concurrent scrapers
+sharing the directory never read a partial entry. Exceptions are never cached.
+
+The directory and size bound are read from ``METADATA_CACHE_DIR`` (default
+``~/.cache/water/metadata_cache``, see :func:`user_cache_dir`) and ``METADATA_CACHE_MAX_MB``; setting
+``METADATA_CACHE_DIR`` to an empty string disables caching.
+"""
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+DEFAULT_MAX_MB = 512.0
+
+# Time-to-live per endpoint in days. Period-of-record end dates move daily but only begin dates are
+# used for scheduling, so a week is plenty; geometry and inventories are refreshed monthly or slower.
+ENDPOINT_TTL_DAYS = {
+    "nwis_site": 30.0,
+    "nwis_period_of_record": 7.0,
+    "nwis_state_index": 7.0,
+    "nldi_basin": 180.0,
+    "mesonet_asos_stations": 30.0,
+    "awdb_stations": 30.0,
+    "awdb_element_begin": 30.0,
+    "awdb_inventory": 30.0,
+}
+
+_SETTINGS: Dict[str, Any] = {}
+
+
+def user_cache_dir(name: str) -> str:
+    """
+    Returns the default directory of a shared cache, in the user's cache directory rather than the
+    working directory, so scrapes and test runs started anywhere share it and never write into a
+    checkout.
+
+    :param name: The cache name, e.g. "metadata_cache".
+    :type name: str
+    :return: ``$XDG_CACHE_HOME/water/<name>`` (``~/.cache/water/<name>`` when unset).
+    :rtype: str
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "water", name)
+
+
+def configure_cache(cache_dir: Optional[str] = None, max_mb: Optional[float] = None) -> None:
+    """
+    Overrides the cache directory and size bound (e.g. for tests or a shared fleet cache).
+
+    :param cache_dir: The cache root, defaults to None which keeps the current setting; an empty
+        string disables caching.
+    :type cache_dir: str, optional
+    :param max_mb: The size bound in megabytes, defaults to None which keeps the current setting.
+    :type max_mb: float, optional
+    :return: None
+    :rtype: None
+    """
+    if cache_dir is not None:
+        _SETTINGS["cache_dir"] = cache_dir
+    if max_mb is not None:
+        _SETTINGS["max_mb"] = max_mb
+
+
+def cache_dir() -> str:
+    """
+    Returns the active cache root ("" when caching is disabled).
+
+    :return: The cache directory.
+    :rtype: str
+    """
+    if "cache_dir" in _SETTINGS:
+        return _SETTINGS["cache_dir"]
+    return os.environ.get("METADATA_CACHE_DIR", user_cache_dir("metadata_cache"))
+
+
+def _max_bytes() -> int:
+    """
+    Returns the active size bound in bytes.
+
+    :return: The maximum total size of the cache directory.
+    :rtype: int
+    """
+    max_mb = _SETTINGS.get("max_mb", float(os.environ.get("METADATA_CACHE_MAX_MB", DEFAULT_MAX_MB)))
+    return int(max_mb * 1024 * 1024)
+
+
+def _entry_path(endpoint: str, args: Tuple, kwargs: Dict) -> str:
+    """
+    Builds the file path of a call's cache entry from a hash of its arguments.
+
+    :param endpoint: The endpoint name.
+    :type endpoint: str
+    :param args: The positional call arguments.
+    :type args: Tuple
+    :param kwargs: The keyword call arguments.
+    :type kwargs: Dict
+    :return: The JSON entry path.
+    :rtype: str
+    """
+    key = json.dumps([list(args), kwargs], sort_keys=True, default=str)
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(cache_dir(), endpoint, digest + ".json")
+
+
+def _encode(value: Any) -> Dict:
+    """
+    Wraps a result for JSON storage, recording whether it was a dataframe.
+
+    :param value: The function result.
+    :type value: Any
+    :return: A JSON-serializable payload.
+    :rtype: Dict
+    """
+    if isinstance(value, pd.DataFrame):
+        return {"kind": "dataframe", "columns": list(value.columns),
+                "records": value.to_dict("records")}
+    return {"kind": "json", "value": value}
+
+
+def _decode(payload: Dict) -> Any:
+    """
+    Restores a result stored by :func:`_encode`.
+
+    :param payload: The stored payload.
+    :type payload: Dict
+    :return: The original result.
+    :rtype: Any
+    """
+    if payload["kind"] == "dataframe":
+        return pd.DataFrame(payload["records"], columns=payload["columns"])
+    return payload["value"]
+
+
+def read_entry(path: str, ttl_days: float) -> Tuple[bool, Any]:
+    """
+    Reads a cache entry if it exists and is younger than its time-to-live.
+
+    :param path: The entry path.
+    :type path: str
+    :param ttl_days: The endpoint's time-to-live in days.
+    :type ttl_days: float
+    :return: A (hit, value) tuple.
+    :rtype: Tuple[bool, Any]
+    """
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return False, None
+    if time.time() - entry["stored_at"] > ttl_days * 86400:
+        return False, None
+    # Touch the file so eviction sees it as recently used.
+    os.utime(path)
+    return True, _decode(entry["payload"])
+
+
+def write_entry(path: str, value: Any) -> None:
+    """
+    Atomically writes a cache entry and enforces the size bound.
+
+    :param path: The entry path.
+    :type path: str
+    :param value: The result to store.
+    :type value: Any
+    :return: None
+    :rtype: None
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(handle, "w") as f:
+        json.dump({"stored_at": time.time(), "payload": _encode(value)}, f, default=str)
+    os.replace(temp_path, path)
+    evict()
+
+
+def evict(max_bytes: Optional[int] = None) -> int:
+    """
+    Deletes least recently used entries until the cache fits in its size bound.
+
+    :param max_bytes: The bound to enforce, defaults to None which uses the configured bound.
+    :type max_bytes: int, optional
+    :return: The number of entries deleted.
+    :rtype: int
+    """
+    root = cache_dir()
+    if not root or not os.path.isdir(root):
+        return 0
+    max_bytes = _max_bytes() if max_bytes is None else max_bytes
+    entries = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(".json"):
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    deleted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        deleted += 1
+    return deleted
+
+
+def invalidate(endpoint: Optional[str] = None, *args, **kwargs) -> int:
+    """
+    Drops cached entries: one call's entry, a whole endpoint, or (with no endpoint) everything.
+
+    :param endpoint: The endpoint name (see :data:`ENDPOINT_TTL_DAYS`), defaults to None which clears
+        every endpoint.
+    :type endpoint: str, optional
+    :return: The number of entries deleted.
+    :rtype: int
+    """
+    root = cache_dir()
+    if not root or not os.path.isdir(root):
+        return 0
+    if endpoint is not None and (args or kwargs):
+        paths = [_entry_path(endpoint, args, kwargs)]
+    else:
+        directories = [os.path.join(root, endpoint)] if endpoint is not None else \
+            [os.path.join(root, name) for name in os.listdir(root)]
+        paths = [os.path.join(directory, name) for directory in directories if os.path.isdir(directory)
+                 for name in os.listdir(directory) if name.endswith(".json")]
+    deleted = 0
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+            deleted += 1
+    return deleted
+
+
+def cached_metadata(endpoint: str) -> Callable:
+    """
+    Decorates a metadata lookup so its results are served from the on-disk cache.
+
+    The entry key is the call's arguments, so positional and keyword spellings of the same call are
+    cached separately. Pass ``refresh=True`` to a decorated function to bypass and overwrite its entry.
+
+    :param endpoint: The endpoint name, which selects the time-to-live in :data:`ENDPOINT_TTL_DAYS`.
+    :type endpoint: str
+    :return: The decorator.
+    :rtype: Callable
+    """
+    ttl_days = ENDPOINT_TTL_DAYS[endpoint]
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, refresh: bool = False, **kwargs):
+            if not cache_dir():
+                return function(*args, **kwargs)
+            path = _entry_path(endpoint, args, kwargs)
+            if not refresh:
+                hit, value = read_entry(path, ttl_days)
+                if hit:
+                    return value
+            value = function(*args, **kwargs)
+            write_entry(path, value)
+            return value
+        return wrapper
+    return decorator
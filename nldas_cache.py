@@ -0,0 +1,229 @@
+"""
+Shared on-disk cache of NLDAS-2 hourly forcing, keyed by grid cell and variable.
+
+NLDAS-2 is a 0.125 degree grid and many gauges of a fleet fall into the same cell, yet each gauge used to
+query Giovanni at its own coordinates for every chunk. Each cell's series of one variable is kept in a
+columnar store (:mod:`hourly_store`) under ``<cache_dir>/<cell>/<variable>/`` with the ``coverage.json``
+bookkeeping and ``flock`` locking of :mod:`asos_cache`. Requests are made at the cell center, so any
+gauge of the cell is served from the store and only hours no gauge has fetched yet are requested.
+Giovanni is queried outside the directory lock, under a lock of the requested hour range, so parallel
+chunks of a cell download concurrently; hours past the stored record are appended to the store.
+
+Hours within :data:`NLDAS_ARCHIVE_LAG` of now are stored but not marked covered, since NLDAS-2 forcing
+is published a few days behind real time. The directory is read from ``NLDAS_CACHE_DIR`` (default
+``~/.cache/water/nldas_cache``, see :func:`metadata_cache.user_cache_dir`); setting it to an empty string
+disables the cache.
+"""
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from asos_cache import load_coverage, merge_fetched_ranges, missing_ranges, save_coverage
+from file_locks import directory_lock
+from hourly_store import EPOCH, MANIFEST_FILE, read_hourly_store, to_hours
+from metadata_cache import user_cache_dir
+
+# Center of the south-west cell and spacing of the NLDAS-2 0.125 degree grid (224 rows x 464 columns).
+NLDAS_GRID_ORIGIN = (25.0625, -124.9375)
+NLDAS_GRID_STEP = 0.125
+# Hours this recent are not marked covered: NLDAS-2 forcing trails real time by about four days.
+NLDAS_ARCHIVE_LAG = timedelta(days=5)
+
+# (variable, cell_latitude, cell_longitude, first_hour, last_hour) -> "datetime"/variable frame.
+CellFetch = Callable[[str, float, float, datetime, datetime], pd.DataFrame]
+
+_SETTINGS: Dict[str, Any] = {}
+
+
+def configure_nldas_cache(cache_dir: str) -> None:
+    """
+    Overrides the cache directory (e.g. for tests or a cache shared by several fleets).
+
+    :param cache_dir: The cache root; an empty string disables caching.
+    :type cache_dir: str
+    :return: None
+    :rtype: None
+    """
+    _SETTINGS["cache_dir"] = cache_dir
+
+
+def cache_dir() -> str:
+    """
+    Returns the active cache root ("" when caching is disabled).
+
+    :return: The cache directory.
+    :rtype: str
+    """
+    if "cache_dir" in _SETTINGS:
+        return _SETTINGS["cache_dir"]
+    return os.environ.get("NLDAS_CACHE_DIR", user_cache_dir("nldas_cache"))
+
+
+def nldas_cells(latitudes, longitudes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the NLDAS-2 grid cells containing points.
+
+    :param latitudes: The latitudes in decimal degrees (scalar or array-like).
+    :param longitudes: The longitudes in decimal degrees.
+    :return: The (rows, columns) cell indexes.
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    rows = np.rint((np.asarray(latitudes, dtype=float) - NLDAS_GRID_ORIGIN[0]) / NLDAS_GRID_STEP)
+    columns = np.rint((np.asarray(longitudes, dtype=float) - NLDAS_GRID_ORIGIN[1]) / NLDAS_GRID_STEP)
+    return rows.astype(int), columns.astype(int)
+
+
+def cell_center(row: int, column: int) -> Tuple[float, float]:
+    """
+    Returns the center of a grid cell.
+
+    :param row: The cell row (south to north).
+    :type row: int
+    :param column: The cell column (west to east).
+    :type column: int
+    :return: The (latitude, longitude) of the center.
+    :rtype: Tuple[float, float]
+    """
+    return NLDAS_GRID_ORIGIN[0] + row * NLDAS_GRID_STEP, NLDAS_GRID_ORIGIN[1] + column * NLDAS_GRID_STEP
+
+
+def cell_sharing(latitudes, longitudes) -> Dict:
+    """
+    Summarizes how many gauges share NLDAS-2 cells (each shared cell is fetched once for all of them).
+
+    :param latitudes: The gauge latitudes in decimal degrees.
+    :param longitudes: The gauge longitudes in decimal degrees.
+    :return: A dict with "gauges", "cells" (distinct cells) and "sharing_ratio" (gauges per cell).
+    :rtype: Dict
+    """
+    rows, columns = nldas_cells(latitudes, longitudes)
+    cells = len(set(zip(rows.tolist(), columns.tolist())))
+    return {"gauges": len(rows), "cells": cells,
+            "sharing_ratio": round(len(rows) / cells, 2) if cells else 0.0}
+
+
+def _hour_time(hour: int) -> pd.Timestamp:
+    """
+    Converts an hour index back to its UTC timestamp.
+
+    :param hour: Hours since the Unix epoch.
+    :type hour: int
+    :return: The UTC timestamp.
+    :rtype: pd.Timestamp
+    """
+    return EPOCH + pd.Timedelta(hours=hour)
+
+
+def cached_nldas_series(latitude: float, longitude: float, variable: str, start_time: datetime,
+                        end_time: datetime, fetch: CellFetch) -> pd.DataFrame:
+    """
+    Returns one NLDAS-2 variable of the cell containing a point from ``start_time`` to ``end_time``
+    (inclusive, UTC), fetching only the hours the cell's cache does not cover.
+
+    :param latitude: The latitude of the point in decimal degrees.
+    :type latitude: float
+    :param longitude: The longitude of the point in decimal degrees.
+    :type longitude: float
+    :param variable: The friendly variable name, e.g. "precipitation".
+    :type variable: str
+    :param start_time: The first wanted hour (UTC).
+    :type start_time: datetime
+    :param end_time: The last wanted hour (UTC).
+    :type end_time: datetime
+    :param fetch: Fetches (variable, cell_latitude, cell_longitude, first_hour, last_hour) -> a frame with
+        "datetime" (UTC) and variable columns for the inclusive hour range.
+    :type fetch: CellFetch
+    :return: The hourly dataframe with "datetime" (UTC) and variable columns.
+    :rtype: pd.DataFrame
+    """
+    first_hour = int(to_hours(pd.Series([pd.Timestamp(start_time).ceil("h")]))[0])
+    end_hour = int(to_hours(pd.Series([pd.Timestamp(end_time).floor("h")]))[0]) + 1
+    if end_hour <= first_hour:
+        return pd.DataFrame(columns=["datetime", variable])
+    row, column = nldas_cells(latitude, longitude)
+    cell_latitude, cell_longitude = cell_center(int(row), int(column))
+    series_dir = os.path.join(cache_dir(), "y%03d_x%03d" % (row, column), variable)
+    with directory_lock(series_dir):
+        gaps = missing_ranges(load_coverage(series_dir), first_hour, end_hour)
+    for gap in gaps:
+        # The directory lock is only held to read and merge; the download holds the fetch lock of its
+        # hour range, so chunks of one cell download different ranges in parallel while gauges asking
+        # for the same range wait for one download and are then served from it.
+        with _range_lock(series_dir, *gap):
+            with directory_lock(series_dir):
+                remaining = missing_ranges(load_coverage(series_dir), *gap)
+            if remaining:
+                _fill_ranges(series_dir, variable, cell_latitude, cell_longitude, remaining, fetch)
+    served = pd.DataFrame(columns=["datetime"])
+    if os.path.exists(os.path.join(series_dir, MANIFEST_FILE)):
+        served = read_hourly_store(series_dir, start=_hour_time(first_hour), end=_hour_time(end_hour))
+    if variable not in served.columns:
+        served[variable] = np.nan
+    return served[["datetime", variable]]
+
+
+@contextmanager
+def _range_lock(series_dir: str, gap_first: int, gap_end: int) -> Iterator[None]:
+    """
+    Holds the fetch lock of one hour range of a series. The lock file is removed afterwards; a caller
+    that raced the removal at worst downloads the range again, since merges happen under the directory
+    lock.
+
+    :param series_dir: The variable's cache directory of the cell.
+    :type series_dir: str
+    :param gap_first: The first hour of the range.
+    :type gap_first: int
+    :param gap_end: The end hour (exclusive) of the range.
+    :type gap_end: int
+    :return: A context manager for the duration of the download.
+    :rtype: Iterator[None]
+    """
+    lock_name = ".fetch_%d_%d.lock" % (gap_first, gap_end)
+    with directory_lock(series_dir, lock_name):
+        yield
+    try:
+        os.remove(os.path.join(series_dir, lock_name))
+    except FileNotFoundError:
+        pass
+
+
+def _fill_ranges(series_dir: str, variable: str, cell_latitude: float, cell_longitude: float,
+                 ranges: List[List[int]], fetch: CellFetch) -> None:
+    """
+    Downloads hour ranges of a cell's variable without holding the directory lock, then merges them into
+    the store and marks the settled hours covered.
+
+    :param series_dir: The variable's cache directory of the cell.
+    :type series_dir: str
+    :param variable: The friendly variable name.
+    :type variable: str
+    :param cell_latitude: The latitude of the cell center.
+    :type cell_latitude: float
+    :param cell_longitude: The longitude of the cell center.
+    :type cell_longitude: float
+    :param ranges: The [first_hour, end_hour) ranges to download.
+    :type ranges: List[List[int]]
+    :param fetch: The Giovanni fetch (see :func:`cached_nldas_series`).
+    :type fetch: CellFetch
+    :return: None
+    :rtype: None
+    """
+    fetched_frames = []
+    for gap_first, gap_end in ranges:
+        fetched = fetch(variable, cell_latitude, cell_longitude,
+                        _hour_time(gap_first).tz_localize(None).to_pydatetime(),
+                        _hour_time(gap_end - 1).tz_localize(None).to_pydatetime())
+        fetched_hours = to_hours(fetched["datetime"])
+        fetched_frames.append(fetched[(fetched_hours >= gap_first) & (fetched_hours < gap_end)])
+    settled_hour = int(to_hours(pd.Series([pd.Timestamp.now(tz="UTC") - NLDAS_ARCHIVE_LAG]))[0])
+    with directory_lock(series_dir):
+        merge_fetched_ranges(series_dir, [frame for frame in fetched_frames if not frame.empty],
+                             [(gap_first, gap_end) for gap_first, gap_end in ranges])
+        coverage = load_coverage(series_dir)
+        coverage += [[gap_first, min(gap_end, settled_hour)] for gap_first, gap_end in ranges
+                     if min(gap_end, settled_hour) > gap_first]
+        save_coverage(series_dir, coverage)
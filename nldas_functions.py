@@ -9,13 +9,22 @@ under "Generate Token"). NLDAS-2 covers CONUS at 0.125 degrees hourly from 1979
 """
 import io
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+
+from host_limits import GIOVANNI_HOST, HOST_LIMITS, limited_get, map_in_context
+from nldas_cache import cache_dir, cached_nldas_series
 
 GIOVANNI_TIMESERIES_URL = "https://api.giovanni.earthdata.nasa.gov/timeseries"
+# Keep-alive connections per Giovanni session; the host concurrency cap in host_limits bounds use.
+GIOVANNI_POOL_SIZE = 8
 
 # Friendly name -> Giovanni data id for the NLDAS-2 primary forcing collection (v2.0).
 NLDAS_FORCING_VARIABLES = {
@@ -48,6 +57,30 @@ def get_earthdata_token(token: Optional[str] = None) -> str:
     return token
 
 
+_SESSIONS: Dict[str, requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def giovanni_session(token: Optional[str] = None) -> requests.Session:
+    """
+    Returns the shared keep-alive session for a token, with the bearer header set and a connection
+    pool large enough for concurrent variable requests.
+
+    :param token: An Earthdata bearer token, defaults to None which reads EARTHDATA_TOKEN.
+    :type token: str, optional
+    :return: The pooled, authenticated session.
+    :rtype: requests.Session
+    """
+    token = get_earthdata_token(token)
+    with _SESSIONS_LOCK:
+        if token not in _SESSIONS:
+            session = requests.Session()
+            session.headers["Authorization"] = "Bearer " + token
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=GIOVANNI_POOL_SIZE))
+            _SESSIONS[token] = session
+        return _SESSIONS[token]
+
+
 def parse_giovanni_csv(text: str, value_name: str) -> pd.DataFrame:
     """
     Parses the CSV payload returned by the Giovanni time series API into a dataframe.
@@ -103,8 +136,8 @@ def get_giovanni_time_series(data_id: str, latitude: float, longitude: float, st
         "location": "[" + str(latitude) + "," + str(longitude) + "]",
         "time": start_time.strftime("%Y-%m-%dT%H:%M:%S") + "/" + end_time.strftime("%Y-%m-%dT%H:%M:%S"),
     }
-    headers = {"Authorization": "Bearer " + get_earthdata_token(token)}
-    response = requests.get(GIOVANNI_TIMESERIES_URL, params=params, headers=headers, timeout=300)
+    response = limited_get(GIOVANNI_TIMESERIES_URL, params=params, session=giovanni_session(token),
+                           timeout=300)
     if response.status_code == 401:
         raise RuntimeError("Giovanni rejected the Earthdata token (401). Tokens expire after ~60 days; "
                            "regenerate one at https://urs.earthdata.nasa.gov.")
@@ -112,10 +145,70 @@ def get_giovanni_time_series(data_id: str, latitude: float, longitude: float, st
     return parse_giovanni_csv(response.text, value_name)
 
 
+def split_period(start_time: datetime, end_time: datetime, window_days: Optional[float],
+                 step: timedelta = timedelta(hours=1)) -> List[Tuple[datetime, datetime]]:
+    """
+    Splits an inclusive period into consecutive inclusive windows of at most ``window_days``, e.g. to
+    request a long record from a service in parallel pieces (Giovanni here, the AWDB ``/data`` endpoint
+    in :mod:`awdb_functions`).
+
+    :param start_time: The start of the period.
+    :type start_time: datetime
+    :param end_time: The end of the period (inclusive).
+    :type end_time: datetime
+    :param window_days: The window length, or None for a single window.
+    :type window_days: float, optional
+    :param step: The record spacing; a window ends one step before the next one starts, defaults to an
+        hour.
+    :type step: timedelta, optional
+    :return: The (start, end) pairs in order.
+    :rtype: List[Tuple[datetime, datetime]]
+    """
+    if not window_days or end_time - start_time <= timedelta(days=window_days):
+        return [(start_time, end_time)]
+    windows = []
+    window_start = start_time
+    while window_start <= end_time:
+        window_end = min(window_start + timedelta(days=window_days) - step, end_time)
+        windows.append((window_start, window_end))
+        window_start = window_end + step
+    return windows
+
+
+def align_hourly_series(series: Dict[str, List[pd.DataFrame]]) -> pd.DataFrame:
+    """
+    Aligns per-variable series (each possibly in several windows) on one shared time index.
+
+    :param series: Variable name -> its "datetime"/value frames, in any order.
+    :type series: Dict[str, List[pd.DataFrame]]
+    :return: A dataframe with a sorted "datetime" column (the union of all timestamps) and one column per
+        variable, NaN where a variable has no value.
+    :rtype: pd.DataFrame
+    """
+    stacked = {name: pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+               for name, frames in series.items()}
+    times = pd.DatetimeIndex(pd.concat([frame["datetime"] for frame in stacked.values()]))
+    times = times.unique().sort_values()
+    columns = {"datetime": times}
+    for name, frame in stacked.items():
+        frame = frame.drop_duplicates("datetime")
+        positions = times.get_indexer(frame["datetime"])
+        values = np.full(len(times), np.nan)
+        values[positions] = frame[name].to_numpy(float)
+        columns[name] = values
+    return pd.DataFrame(columns)
+
+
 def get_nldas_forcing(latitude: float, longitude: float, start_time: datetime, end_time: datetime,
-                      variables: Optional[List[str]] = None, token: Optional[str] = None) -> pd.DataFrame:
+                      variables: Optional[List[str]] = None, token: Optional[str] = None,
+                      window_days: Optional[float] = None, max_workers: Optional[int] = None) -> pd.DataFrame:
     """
-    Fetches multiple NLDAS-2 forcing variables for a point and merges them into one hourly dataframe.
+    Fetches multiple NLDAS-2 forcing variables for a point and aligns them into one hourly dataframe.
+
+    Variables (and, with ``window_days``, sub-windows of a long period) are requested concurrently
+    through the shared :func:`giovanni_session`. When the :mod:`nldas_cache` is enabled, each variable
+    is served from the cache of the point's grid cell and only the hours no gauge of the cell has
+    fetched yet are requested.
 
     :param latitude: The latitude of the point in decimal degrees.
     :type latitude: float
@@ -130,6 +223,12 @@ def get_nldas_forcing(latitude: float, longitude: float, start_time: datetime, e
     :type variables: List[str], optional
     :param token: An Earthdata bearer token, defaults to None which reads EARTHDATA_TOKEN.
     :type token: str, optional
+    :param window_days: Split the period into windows of at most this many days, defaults to None (one
+        request per variable).
+    :type window_days: float, optional
+    :param max_workers: The most requests in flight, defaults to None which uses the Giovanni host
+        concurrency from :data:`host_limits.HOST_LIMITS`.
+    :type max_workers: int, optional
     :return: A dataframe with a "datetime" column (UTC) and one column per requested variable. Units
         follow NLDAS-2 conventions: W/m^2 for radiation, K for temperature, kg/m^2 (i.e. mm) per hour
         for precipitation and potential evaporation, m/s for wind and kg/kg for humidity.
@@ -141,12 +240,37 @@ def get_nldas_forcing(latitude: float, longitude: float, start_time: datetime, e
     if unknown:
         raise KeyError("Unknown NLDAS variables " + str(unknown) + ". Valid options: " +
                        str(list(NLDAS_FORCING_VARIABLES)))
-    merged: Optional[pd.DataFrame] = None
-    for name in variables:
-        series = get_giovanni_time_series(NLDAS_FORCING_VARIABLES[name], latitude, longitude,
-                                          start_time, end_time, token=token, value_name=name)
-        merged = series if merged is None else merged.merge(series, on="datetime", how="outer")
-    return merged.sort_values("datetime").reset_index(drop=True)
+    if max_workers is None:
+        max_workers = int(HOST_LIMITS[GIOVANNI_HOST]["concurrency"])
+
+    series: Dict[str, List[pd.DataFrame]] = {name: [] for name in variables}
+    # Every Giovanni request, cached or not, runs on one pool of max_workers threads.
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as request_pool:
+        def fetch_window(task: Tuple[str, float, float, Tuple[datetime, datetime]]) -> pd.DataFrame:
+            name, point_latitude, point_longitude, (window_start, window_end) = task
+            return get_giovanni_time_series(NLDAS_FORCING_VARIABLES[name], point_latitude, point_longitude,
+                                            window_start, window_end, token=token, value_name=name)
+
+        def fetch_windows(name: str, point_latitude: float, point_longitude: float, first_time: datetime,
+                          last_time: datetime) -> pd.DataFrame:
+            return pd.concat(map_in_context(request_pool, fetch_window,
+                                            [(name, point_latitude, point_longitude, window)
+                                             for window in split_period(first_time, last_time, window_days)]),
+                             ignore_index=True)
+        if cache_dir():
+            # One task per variable waits on the cell cache, which sends only its uncovered windows to the
+            # request pool.
+            with ThreadPoolExecutor(max_workers=max(1, len(variables))) as variable_pool:
+                frames = map_in_context(variable_pool, lambda name: cached_nldas_series(
+                    latitude, longitude, name, start_time, end_time, fetch_windows), variables)
+            for name, frame in zip(variables, frames):
+                series[name].append(frame)
+        else:
+            tasks = [(name, latitude, longitude, window) for name in variables
+                     for window in split_period(start_time, end_time, window_days)]
+            for task, frame in zip(tasks, map_in_context(request_pool, fetch_window, tasks)):
+                series[task[0]].append(frame)
+    return align_hourly_series(series)
 
 
 def summarize_missing(df: pd.DataFrame) -> Dict[str, int]:
@@ -0,0 +1,407 @@
+"""
+Bulk extraction of hourly NLDAS-2 forcing for a whole gauge fleet from local hourly grid files.
+
+The Giovanni point API (see ``nldas_functions``) costs one request per variable per gauge per chunk,
+which dominates full-fleet backfills. This module reads the NLDAS-2 primary forcing files instead
+(``NLDAS_FORA0125_H.AYYYYMMDD.HH00.020.nc``, mirrored from GES DISC into
+``pilot_data/nldas_grid/<YYYY>/<DDD>/``). As with the SNODAS series builder, each gauge's grid cells
+are precomputed once with ``build_gauge_cells`` (the 0.125 degree grid never changes) and kept as flat
+indices: the gauge's own cell, or every cell inside its basin polygon when a boundary is available.
+Each hourly file is then read once and every gauge's forcing for that hour comes out of one array
+gather (basin means via ``np.add.reduceat``).
+
+The per-gauge frames have the columns ``fetch_hourly_chunk`` merges from ``get_nldas_forcing``: a UTC
+"datetime" plus one column per friendly variable name of ``NLDAS_FORCING_VARIABLES``. Hours whose file
+is missing locally are left NaN. During a scrape, :class:`FleetGridForcing` hands each gauge's chunk
+windows to ``run_long_term_scrape`` (``state_scrape.py --nldas-grid-dir``) so the grid replaces Giovanni.
+
+Usage:
+    python nldas_grid_extract.py cells --state CO --reference pilot_data/nldas_grid/2024/153/...nc
+    python nldas_grid_extract.py extract --state CO --range 2023-10-01:2024-09-30
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dem_functions import polygon_mask
+from fleet_windows import FleetWindows
+from nldas_functions import NLDAS_FORCING_VARIABLES
+
+GRID_DIR = os.path.join("pilot_data", "nldas_grid")
+SERIES_DIR = os.path.join("pilot_data", "nldas_series", "CO")
+CELLS_PATH = os.path.join(SERIES_DIR, "gauge_cells.npz")
+SCRAPES_DIR = os.path.join("pilot_data", "scrapes", "CO")
+NLDAS_FILE_PATTERN = "NLDAS_FORA0125_H.A%Y%m%d.%H00.020.nc"
+# Friendly name -> variable name inside the hourly netCDF files (the suffix of the Giovanni data id).
+NLDAS_FILE_VARIABLES = {name: data_id.split("_H_2_0_")[1]
+                        for name, data_id in NLDAS_FORCING_VARIABLES.items()}
+
+
+def nldas_file_path(hour: datetime, grid_dir: Optional[str] = None) -> str:
+    """
+    Builds the local path of one hour's NLDAS-2 forcing file (GES DISC ``<YYYY>/<DDD>/`` layout).
+
+    :param hour: The hour (UTC).
+    :type hour: datetime
+    :param grid_dir: The root of the mirrored files, defaults to None which uses "pilot_data/nldas_grid".
+    :type grid_dir: str, optional
+    :return: The netCDF path.
+    :rtype: str
+    """
+    return os.path.join(grid_dir or GRID_DIR, hour.strftime("%Y"), hour.strftime("%j"),
+                        hour.strftime(NLDAS_FILE_PATTERN))
+
+
+def read_grid_geometry(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reads the cell-center coordinates of an NLDAS-2 file.
+
+    :param path: Any hourly netCDF file.
+    :type path: str
+    :return: The (latitudes, longitudes) 1-D arrays, both ascending.
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    import netCDF4
+    with netCDF4.Dataset(path) as dataset:
+        return (np.asarray(dataset["lat"][:], dtype=float), np.asarray(dataset["lon"][:], dtype=float))
+
+
+def point_cell(latitude: float, longitude: float, lats: np.ndarray, lons: np.ndarray) -> Optional[int]:
+    """
+    Returns the flat index of the grid cell containing a point.
+
+    :param latitude: The latitude in decimal degrees.
+    :type latitude: float
+    :param longitude: The longitude in decimal degrees.
+    :type longitude: float
+    :param lats: The ascending, evenly spaced cell-center latitudes.
+    :type lats: np.ndarray
+    :param lons: The ascending, evenly spaced cell-center longitudes.
+    :type lons: np.ndarray
+    :return: The index into the raveled (rows * cols) grid, or None outside the grid.
+    :rtype: int, optional
+    """
+    row = int(np.rint((latitude - lats[0]) / (lats[1] - lats[0])))
+    column = int(np.rint((longitude - lons[0]) / (lons[1] - lons[0])))
+    if not (0 <= row < len(lats) and 0 <= column < len(lons)):
+        return None
+    return row * len(lons) + column
+
+
+def build_gauge_cells(gauges: pd.DataFrame, reference_path: str,
+                      geometries: Optional[Dict[str, Dict]] = None,
+                      cells_path: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Precomputes each gauge's flat grid-cell indices on the NLDAS-2 grid.
+
+    :param gauges: The gauge table with site_no, dec_lat_va and dec_long_va columns.
+    :type gauges: pd.DataFrame
+    :param reference_path: Any hourly file, which supplies the grid geometry.
+    :type reference_path: str
+    :param geometries: site id -> basin GeoJSON; those gauges are averaged over the cells inside the
+        basin (falling back to the gauge's cell for basins smaller than a cell), defaults to None.
+    :type geometries: Dict[str, Dict], optional
+    :param cells_path: Where the index archive is written, defaults to None which does not write it.
+    :type cells_path: str, optional
+    :return: site id -> flat indices into the raveled (rows * cols) grid.
+    :rtype: Dict[str, np.ndarray]
+    """
+    lats, lons = read_grid_geometry(reference_path)
+    geometries = geometries or {}
+    cells: Dict[str, np.ndarray] = {}
+    for site, latitude, longitude in zip(gauges["site_no"].astype(str), pd.to_numeric(gauges["dec_lat_va"]),
+                                         pd.to_numeric(gauges["dec_long_va"])):
+        indices = np.array([], dtype=np.int64)
+        if site in geometries:
+            indices = np.flatnonzero(polygon_mask(lats, lons, geometries[site]).ravel())
+        if len(indices) == 0:
+            cell = point_cell(latitude, longitude, lats, lons)
+            if cell is None:
+                print("WARN gauge " + site + " is outside the NLDAS-2 grid; skipping")
+                continue
+            indices = np.array([cell], dtype=np.int64)
+        cells[site] = indices
+    if cells_path:
+        os.makedirs(os.path.dirname(cells_path) or ".", exist_ok=True)
+        np.savez_compressed(cells_path, shape=np.array([len(lats), len(lons)]), **cells)
+    return cells
+
+
+def load_gauge_cells(cells_path: Optional[str] = None) -> Tuple[Dict[str, np.ndarray], Tuple[int, int]]:
+    """
+    Loads an index archive written by :func:`build_gauge_cells`.
+
+    :param cells_path: The archive path, defaults to None which uses the module's active state.
+    :type cells_path: str, optional
+    :return: The (site id -> flat indices, grid shape) pair.
+    :rtype: Tuple[Dict[str, np.ndarray], Tuple[int, int]]
+    """
+    archive = np.load(cells_path or CELLS_PATH)
+    return ({site: archive[site] for site in archive.files if site != "shape"},
+            tuple(int(size) for size in archive["shape"]))
+
+
+def read_hour_forcing(path: str, indices: np.ndarray, starts: np.ndarray, variables: List[str],
+                      expected_shape: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Reads one hourly file and extracts every gauge's forcing in a single gather.
+
+    :param path: The hourly netCDF file.
+    :type path: str
+    :param indices: The concatenated flat cell indices of all gauges.
+    :type indices: np.ndarray
+    :param starts: The offset of each gauge's first index in ``indices``.
+    :type starts: np.ndarray
+    :param variables: Friendly variable names (keys of ``NLDAS_FILE_VARIABLES``).
+    :type variables: List[str]
+    :param expected_shape: The (rows, cols) the indices were computed on; mismatching grids raise,
+        defaults to None (unchecked).
+    :type expected_shape: Tuple[int, int], optional
+    :return: A (gauges x variables) array of cell means, NaN where a gauge has no valid cells.
+    :rtype: np.ndarray
+    """
+    import netCDF4
+    with netCDF4.Dataset(path) as dataset:
+        grids = [np.ma.filled(dataset[NLDAS_FILE_VARIABLES[name]][0].astype(np.float64), np.nan)
+                 for name in variables]
+    if expected_shape is not None and tuple(grids[0].shape) != tuple(expected_shape):
+        raise ValueError("Grid shape changed: %s" % (grids[0].shape,))
+    values = np.stack([grid.ravel() for grid in grids])[:, indices]
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=1)
+    counts = np.add.reduceat(valid, starts, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan).T
+
+
+def extract_gauge_forcing(cells: Dict[str, np.ndarray], start_time: datetime, end_time: datetime,
+                          grid_dir: Optional[str] = None, variables: Optional[List[str]] = None,
+                          expected_shape: Optional[Tuple[int, int]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Extracts hourly forcing for every gauge from the local files between two hours (inclusive, UTC).
+
+    Files are read one after another: the netCDF-C library is not thread-safe, and with one gather per
+    file the read itself is the whole cost.
+
+    :param cells: site id -> flat cell indices from :func:`build_gauge_cells`.
+    :type cells: Dict[str, np.ndarray]
+    :param start_time: The first hour (UTC).
+    :type start_time: datetime
+    :param end_time: The last hour (UTC).
+    :type end_time: datetime
+    :param grid_dir: The root of the mirrored files, defaults to None which uses "pilot_data/nldas_grid".
+    :type grid_dir: str, optional
+    :param variables: Friendly variable names, defaults to None which extracts all of them.
+    :type variables: List[str], optional
+    :param expected_shape: The (rows, cols) the indices were computed on, defaults to None (unchecked).
+    :type expected_shape: Tuple[int, int], optional
+    :return: site id -> a dataframe with a "datetime" column (UTC) and one column per variable, in the
+        layout of :func:`nldas_functions.get_nldas_forcing`.
+    :rtype: Dict[str, pd.DataFrame]
+    """
+    if variables is None:
+        variables = list(NLDAS_FORCING_VARIABLES)
+    unknown = [v for v in variables if v not in NLDAS_FILE_VARIABLES]
+    if unknown:
+        raise KeyError("Unknown NLDAS variables " + str(unknown) + ". Valid options: " +
+                       str(list(NLDAS_FILE_VARIABLES)))
+    sites = list(cells)
+    hours = pd.date_range(pd.Timestamp(start_time).ceil("h"), pd.Timestamp(end_time).floor("h"), freq="h")
+    sizes = np.array([len(cells[site]) for site in sites], dtype=np.int64)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+    indices = np.concatenate([cells[site] for site in sites]) if sites else np.array([], dtype=np.int64)
+    cube = np.full((len(hours), len(sites), len(variables)), np.nan)
+    missing = 0
+    for position, hour in enumerate(hours if sites else []):
+        path = nldas_file_path(hour.to_pydatetime(), grid_dir)
+        if not os.path.exists(path):
+            missing += 1
+            continue
+        cube[position] = read_hour_forcing(path, indices, starts, variables, expected_shape)
+    if missing:
+        print("WARN %d of %d hourly NLDAS files missing under %s"
+              % (missing, len(hours), grid_dir or GRID_DIR))
+    datetimes = hours.tz_localize("UTC")
+    frames = {}
+    for position, site in enumerate(sites):
+        frame = pd.DataFrame(cube[:, position, :], columns=variables)
+        frame.insert(0, "datetime", datetimes)
+        frames[site] = frame
+    return frames
+
+
+class FleetGridForcing(FleetWindows):
+    """
+    Serves chunk windows of local grid forcing to the gauges of a fleet in flight, in place of the
+    per-gauge Giovanni requests of :func:`catchment_dataset.fetch_hourly_chunk`.
+
+    The first gauge to reach a window extracts it with one pass over the hourly files
+    (:func:`extract_gauge_forcing`) for every started, unfinished gauge that has not had it yet, and the
+    others take their frames from it (see :class:`fleet_windows.FleetWindows`). ``for_site(site)`` is
+    passed to :func:`long_term_scrape.run_long_term_scrape` as ``nldas_provider``.
+    """
+
+    def __init__(self, cells: Dict[str, np.ndarray], grid_dir: Optional[str] = None,
+                 expected_shape: Optional[Tuple[int, int]] = None) -> None:
+        """
+        :param cells: site id -> flat cell indices of the fleet's gauges (see :func:`load_gauge_cells`).
+        :type cells: Dict[str, np.ndarray]
+        :param grid_dir: The root of the mirrored files, defaults to None which uses "pilot_data/nldas_grid".
+        :type grid_dir: str, optional
+        :param expected_shape: The (rows, cols) the indices were computed on, defaults to None (unchecked).
+        :type expected_shape: Tuple[int, int], optional
+        """
+        super().__init__()
+        self.cells = dict(cells)
+        self.grid_dir = grid_dir
+        self.expected_shape = expected_shape
+
+    def fetch_window(self, window: Tuple[datetime, datetime], sites: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Extracts a window's forcing of several gauges in one pass over the hourly files.
+
+        :param window: The (first hour, last hour) of the window (UTC).
+        :type window: Tuple[datetime, datetime]
+        :param sites: The gauge site ids.
+        :type sites: List[str]
+        :return: site id -> forcing frame.
+        :rtype: Dict[str, pd.DataFrame]
+        """
+        return extract_gauge_forcing({site: self.cells[site] for site in sites if site in self.cells},
+                                     *window, grid_dir=self.grid_dir, expected_shape=self.expected_shape)
+
+    def take(self, site: str, start_time: datetime, end_time: datetime) -> Optional[pd.DataFrame]:
+        """
+        Returns a gauge's forcing of a window, extracting the window for the fleet on first use.
+
+        :param site: The gauge site id.
+        :type site: str
+        :param start_time: The first hour of the window (UTC).
+        :type start_time: datetime
+        :param end_time: The last hour of the window (UTC).
+        :type end_time: datetime
+        :return: The forcing frame, or None when the gauge has no cells or no local file covers the
+            window (the caller then falls back to Giovanni).
+        :rtype: pd.DataFrame, optional
+        """
+        if site not in self.cells:
+            return None
+        frame = super().take(site, (start_time, end_time))
+        if frame is None or frame.drop(columns=["datetime"]).isna().all().all():
+            return None
+        return frame
+
+    def for_site(self, site: str) -> "SiteGridForcing":
+        """
+        Returns the per-chunk provider of one gauge.
+
+        :param site: The gauge site id.
+        :type site: str
+        :return: The gauge's provider.
+        :rtype: SiteGridForcing
+        """
+        return SiteGridForcing(self, site)
+
+
+class SiteGridForcing:
+    """
+    One gauge's view of a :class:`FleetGridForcing`: called with a chunk window, it returns the gauge's
+    forcing frame or None.
+    """
+
+    def __init__(self, fleet: FleetGridForcing, site: str) -> None:
+        self.fleet = fleet
+        self.site = site
+
+    def __call__(self, start_time: datetime, end_time: datetime) -> Optional[pd.DataFrame]:
+        """
+        Returns the gauge's forcing of a window (see :meth:`FleetGridForcing.take`).
+
+        :param start_time: The first hour of the window (UTC).
+        :type start_time: datetime
+        :param end_time: The last hour of the window (UTC).
+        :type end_time: datetime
+        :return: The forcing frame, or None.
+        :rtype: pd.DataFrame, optional
+        """
+        return self.fleet.take(self.site, start_time, end_time)
+
+    def join(self) -> None:
+        """
+        Tells the fleet that this gauge has started.
+
+        :return: None
+        :rtype: None
+        """
+        self.fleet.join(self.site)
+
+    def release(self) -> None:
+        """
+        Tells the fleet that this gauge is finished.
+
+        :return: None
+        :rtype: None
+        """
+        self.fleet.release(self.site)
+
+
+def _basin_geometries(sites: List[str]) -> Dict[str, Dict]:
+    """
+    Loads the cached basin boundaries of a state scrape (sites without one are omitted).
+
+    :param sites: The site ids.
+    :type sites: List[str]
+    :return: site id -> basin GeoJSON.
+    :rtype: Dict[str, Dict]
+    """
+    geometries = {}
+    for site in sites:
+        path = os.path.join(SCRAPES_DIR, site, site + "_basin.geojson")
+        if os.path.exists(path):
+            with open(path) as f:
+                geometries[site] = json.load(f)
+    return geometries
+
+
+def main() -> None:
+    """
+    Command-line entry point: ``cells`` or ``extract``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("command", choices=["cells", "extract"])
+    parser.add_argument("--state", default="CO",
+                        help="Two-letter state whose scraped fleet (gauges.csv) is extracted")
+    parser.add_argument("--reference", help="Any local hourly file (cells: supplies the grid geometry)")
+    parser.add_argument("--range", action="append", default=[],
+                        help="start:end date pair, e.g. 2023-10-01:2024-09-30; repeatable")
+    parser.add_argument("--grid-dir", default=GRID_DIR)
+    args = parser.parse_args()
+    globals()["SERIES_DIR"] = os.path.join("pilot_data", "nldas_series", args.state)
+    globals()["CELLS_PATH"] = os.path.join("pilot_data", "nldas_series", args.state, "gauge_cells.npz")
+    globals()["SCRAPES_DIR"] = os.path.join("pilot_data", "scrapes", args.state)
+    if args.command == "cells":
+        gauges = pd.read_csv(os.path.join(SCRAPES_DIR, "gauges.csv"), dtype={"site_no": str})
+        cells = build_gauge_cells(gauges, args.reference, _basin_geometries(list(gauges["site_no"])),
+                                  cells_path=CELLS_PATH)
+        print("Wrote cell indices of %d gauges to %s" % (len(cells), CELLS_PATH))
+        return
+    cells, shape = load_gauge_cells()
+    for pair in args.range:
+        start, end = pair.split(":")
+        start_time = datetime.strptime(start, "%Y-%m-%d")
+        end_time = datetime.strptime(end, "%Y-%m-%d").replace(hour=23)
+        frames = extract_gauge_forcing(cells, start_time, end_time, grid_dir=args.grid_dir,
+                                       expected_shape=shape)
+        for site, frame in frames.items():
+            frame.to_csv(os.path.join(SERIES_DIR, "%s_nldas_%s_%s.csv" % (site, start.replace("-", ""),
+                                                                          end.replace("-", ""))), index=False)
+        print("Range %s -> %s: wrote %d gauge series" % (start, end, len(frames)))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,9 @@
 # running (a fresh run retries previously-failed gauges, so an outage batch is swept once the
 # network returns), and (3) mirrors the state to GCS every 30 minutes so backups happen without
 # a human. It backs off when a whole pass makes no progress (a sustained outage) so it does not
-# hammer, and exits once the state is essentially complete (final backup first).
+# hammer -- for as long as the scrape's per-host circuit breakers (circuits.json) say the failing
+# service is down, else a short growing delay -- and exits once the state is essentially complete
+# (final backup first).
 #
 # It does NOT survive a full reboot / battery death (the watchdog process itself dies) -- relaunch
 # it after power-on. It DOES survive session death and network outages, which are the common case.
@@ -23,6 +25,7 @@ REG=pilot_data/scrapes/$STATE/registry.json
 SCRAPE_LOG=$(echo $STATE | tr 'A-Z' 'a-z')_scrape.log
 
 count() { $PY -c "import json,os;p='$REG';r=json.load(open(p)) if os.path.exists(p) else {};print(sum(1 for v in r.values() if isinstance(v,dict) and v.get('status')=='$1'))" 2>/dev/null || echo 0; }
+circuit_wait() { $PY -c "import json,os,time;p='pilot_data/scrapes/$STATE/circuits.json';c=json.load(open(p)) if os.path.exists(p) else {};print(int(max([v['open_until']-time.time() for v in c.values()]+[0])))" 2>/dev/null || echo 0; }
 backup() { $PY backup_functions.py --dir pilot_data/scrapes/$STATE --prefix pilot_data/scrapes/$STATE >> $LOG 2>&1; }
 log() { echo "$(date '+%Y-%m-%d %H:%M:%S') $1" >> $LOG; }
 
@@ -40,7 +43,12 @@ while true; do
     if [ "$restarts" -ge 80 ]; then log "giving up after 80 restarts ($done completed, $failed failed)"; break; fi
     if [ "$done" -le "$last_done" ]; then dry=$((dry+1)); else dry=0; fi
     last_done=$done
-    if [ "$dry" -ge 2 ]; then log "no progress (dry=$dry) -- backoff 600s (likely network outage)"; sleep 600; fi
+    if [ "$dry" -ge 2 ]; then
+      pause=$(circuit_wait)
+      if [ "$pause" -le 0 ]; then pause=$((120 * dry)); [ "$pause" -gt 600 ] && pause=600; fi
+      log "no progress (dry=$dry) -- backoff ${pause}s (open circuits: $(cat pilot_data/scrapes/$STATE/circuits.json 2>/dev/null | tr -d ' \n' | cut -c1-200))"
+      sleep $pause
+    fi
     PYTHONUNBUFFERED=1 nohup $PY state_scrape.py --state $STATE --no-backup >> $SCRAPE_LOG 2>&1 &
     restarts=$((restarts+1)); log "restarted scrape #$restarts ($done completed, $failed failed)"
   fi
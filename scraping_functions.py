@@ -1,11 +1,9 @@
 from datetime import datetime, timedelta
 import json
-import requests
 from typing import Tuple, Dict
 import pandas as pd
-from usgs_scraping_functions import df_label, rename_cols
-from scrape_text import timezone_map
-from weather_scraping_functions import get_asos_data_from_url, process_asos_csv
+from usgs_scraping_functions import df_label, drop_rdb_format_row, local_to_utc, make_usgs_data, rename_cols
+from weather_scraping_functions import get_asos_data_from_stations
 import pytz
 from weather_scraping_functions import get_snotel_data
 from google.cloud import bigquery, storage
@@ -57,16 +55,12 @@ class HydroScraper(object):
         # https://mesonet.agron.iastate.edu/cgi-bin/request/asos.py?station=AIO&data=tmpf&data=dwpf&data=relh&data=feel&data=sknt&data=sped&data=alti&data=p01m&data=vsby&data=gust&data=skyc1&data=peak_wind_gust&data=snowdepth&year1=2024&month1=1&day1=1&year2=2024&month2=1&day2=25&tz=Etc%2FUTC&format=onlycomma&latlon=no&elev=no&missing=M&trace=T&direct=no&report_type=3&report_type=4
         # base_url = "https://mesonet.agron.iastate.edu/cgi-bin/request/asos.py?station={}&data=tmpf&data=dwpf&data=p01m&data=mslp&data=drct&data=ice_accretion_1hr&year1={}&month1={}&day1={}&year2={}&month2={}&day2={}&tz=Etc%2FUTC&format=onlycomma&latlon=no&missing=M&trace=T&direct=no&report_type=1&report_type=2"
         base_url = "https://mesonet.agron.iastate.edu/cgi-bin/request/asos.py?station={}&data=tmpf&data=dwpf&data=relh&data=feel&data=sknt&data=sped&data=alti&data=mslp&data=drct&data=ice_accretion_1hr&data=p01m&data=vsby&data=gust&data=skyc1&data=peak_wind_gust&data=snowdepth&year1={}&month1={}&day1={}&year2={}&month2={}&day2={}&tz=Etc%2FUTC&format=onlycomma&latlon=no&elev=no&missing=M&trace=T&direct=no&report_type=3&report_type=4"
-        i = 0
-        # Sometimes the ASOS data is not available for the first station, so we need to loop until we get data.
-        run_loop = True
-        while run_loop:
-            asos_path = get_asos_data_from_url(self.meta_data["stations"][i]["station_id"], base_url, self.start_time, self.end_time + timedelta(days=2), self.meta_data, self.meta_data)
-            self.asos_df, self.precip, self.temp = process_asos_csv(asos_path)
-            if len(self.asos_df) > 0:
-                run_loop = False
-            self.asos_df["station_id"] = self.meta_data["stations"][i]["station_id"]
-            i+=1
+        # Sometimes the ASOS data is not available for the first station, so all candidates are requested
+        # together and the first one with data is used.
+        candidates = [station["station_id"] for station in self.meta_data["stations"]]
+        station_id, self.asos_df, self.precip, self.temp = get_asos_data_from_stations(
+            candidates, base_url, self.start_time, self.end_time + timedelta(days=2), self.meta_data, self.meta_data)
+        self.asos_df["station_id"] = station_id
         print("Scraping completed")
         if use_bq:
             self.bq_connect = BiqQueryConnector()
@@ -83,15 +77,10 @@ class HydroScraper(object):
         """
         Converts local time to UTC time, counts NaN values, gets max/min flows.
         """
-        # Remove garbage first row
-        # TODO check if more rows are garbage
-        df = df.iloc[1:]
-        time_zone = df["tz_cd"].iloc[0]
-        time_zone = timezone_map[time_zone]
-        old_timezone = pytz.timezone(time_zone)
-        new_timezone = pytz.timezone("UTC")
-        # This assumes timezones are consistent throughout the USGS stream (this should be true)
-        df["datetime"] = df["datetime"].map(lambda x: old_timezone.localize(datetime.strptime(x, "%Y-%m-%d %H:%M")).astimezone(new_timezone))
+        # Remove the RDB format row when the frame still carries it
+        df = drop_rdb_format_row(df).copy()
+        # Parses every timestamp in one call and localizes per tz_cd zone (see local_to_utc)
+        df["datetime"] = local_to_utc(df["datetime"], df["tz_cd"])
         df["cfs"] = pd.to_numeric(df['cfs'], errors='coerce')
         if "height" in df.columns:
             df["height"] = pd.to_numeric(df['height'], errors='coerce')
@@ -106,27 +95,17 @@ class HydroScraper(object):
     def make_usgs_data(self, site_number: str) -> pd.DataFrame:
         """
         Function that scrapes data from gages from a specified start_time THROUGH
-        a specified end_time. Returns hourly df of river flow data. For instance:
+        a specified end_time. Returns the typed fifteen minute df of river flow data. For instance:
 
         ...
-        from datetime import datetime
-        df = make_usgs_data(datetime(2020, 5, 1), datetime(2021, 5, 1) "01010500")
-        df[1:] # would return time stamps of 5/1 in fifteen minute increments (e.g. 97)
-        len(df[1:]) # 96 The first row is a junk row and real data starts second row (e.g. 96)
+        scraper.make_usgs_data("01010500")
+        len(scraper.usgs_df) # 96 time stamps of a day in fifteen minute increments
         ..
 
+        Delegates to :func:`usgs_scraping_functions.make_usgs_data`, which parses the response in
+        memory instead of round-tripping it through ``<site>.txt`` and ``<site>data.tsv``.
         """
-        # //waterservices.usgs.gov/nwis/iv/?format=rdb,1.0&sites={}&startDT={}&endDT={}&parameterCd=00060,00065,00045&siteStatus=all
-        base_url = "http://waterservices.usgs.gov/nwis/iv/?format=rdb,1.0&sites={}&startDT={}&endDT={}&parameterCd=00060,00065,00045&siteStatus=all"
-        full_url = base_url.format(site_number, self.start_time.strftime("%Y-%m-%d"), self.end_time.strftime("%Y-%m-%d"))
-        print("Getting request from USGS")
-        print(full_url)
-        r = requests.get(full_url)
-        with open(site_number + ".txt", "w") as f:
-            f.write(r.text)
-        print("Request finished")
-        response_data = self.process_response_text(site_number + ".txt")
-        return self.create_csv(response_data[0], response_data[1], site_number)
+        return make_usgs_data(self.start_time, self.end_time, site_number)
 
     def combine_data(self) -> None:
         tz = pytz.timezone("UTC")
@@ -20,7 +20,8 @@ from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-import requests
+
+from host_limits import limited_get
 
 GCS_LIST_URL = "https://storage.googleapis.com/storage/v1/b/gcp-public-data-sentinel-2/o"
 GCS_HTTP_BASE = "https://storage.googleapis.com/gcp-public-data-sentinel-2/"
@@ -73,7 +74,7 @@ def list_gcs_prefixes(prefix: str) -> List[str]:
         params = {"prefix": prefix, "delimiter": "/"}
         if page_token:
             params["pageToken"] = page_token
-        response = requests.get(GCS_LIST_URL, params=params, timeout=60)
+        response = limited_get(GCS_LIST_URL, params=params, timeout=60)
         response.raise_for_status()
         payload = response.json()
         prefixes.extend(payload.get("prefixes", []))
@@ -159,7 +160,7 @@ def get_cloud_cover(safe_prefix: str) -> float:
     :return: The cloud coverage assessment in percent (0-100).
     :rtype: float
     """
-    response = requests.get(GCS_HTTP_BASE + safe_prefix + "MTD_MSIL1C.xml", timeout=60)
+    response = limited_get(GCS_HTTP_BASE + safe_prefix + "MTD_MSIL1C.xml", timeout=60)
     response.raise_for_status()
     match = re.search(r"<Cloud_Coverage_Assessment>([\d.]+)</Cloud_Coverage_Assessment>", response.text)
     if match is None:
@@ -8,6 +8,21 @@ search/marking: rerunning the command skips completed gauges, retries failed one
 chunk files make even a mid-gauge interruption resumable. The registry is mirrored to GCS after every
 gauge so progress is visible remotely.
 
+Gauges run concurrently on an asyncio engine (:func:`scrape_fleet_async`, ``--concurrency``): each
+gauge's blocking scrape runs in a worker thread while the event loop owns the registry, and every
+upstream request is bounded by the per-host caps and politeness delays of :mod:`host_limits`, so more
+gauges in flight never means more load on any one service than it tolerates. Upstream outages are
+handled by the per-host circuit breakers rather than a fixed sleep after each failed gauge: only the
+failing service backs off (exponentially), new gauges wait only while NWIS itself is down, and the
+breaker states are saved to ``circuits.json`` next to the registry and shown by ``--report``, along
+with how many gauges share each NLDAS-2 grid cell (each shared cell's forcing is fetched once, see
+:mod:`nldas_cache`). Given a common ``--start``, the gauges in flight share one chunk grid and request
+each NWIS window together in batches (see :class:`long_term_scrape.FleetUsgsPrefetch`), and each
+window's ASOS reports are cached for all the fleet's stations in a few multi-station requests (see
+:class:`weather_scraping_functions.FleetAsosPrefetch`). With ``--nldas-grid-dir`` the forcing comes from
+locally mirrored NLDAS-2 files instead of Giovanni, read once per window for the gauges in flight (see
+:class:`nldas_grid_extract.FleetGridForcing`).
+
 Registry statuses: "completed" (scrape finished; chunk_failures lists any windows that errored),
 "failed" (the gauge errored before finishing — the error is recorded; rerun retries it).
 
@@ -16,21 +31,34 @@ Examples::
     python state_scrape.py --state CO                  # scrape (or resume) all of Colorado
     python state_scrape.py --state CO --report         # print progress, no scraping
     python state_scrape.py --state CO --limit 5        # first five pending gauges only
+    python state_scrape.py --state CO --concurrency 8  # eight gauges in flight at once
+    python state_scrape.py --state CO --concurrency 8 --start 2015-01-01  # batched NWIS windows
+    python state_scrape.py --state CO --nldas-grid-dir pilot_data/nldas_grid  # local NLDAS-2 forcing
 """
 import argparse
+import asyncio
+import functools
 import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
-import requests
 
+import asos_cache
 from backup_functions import upload_file
 from build_pilot_dataset import load_dotenv
-from long_term_scrape import run_long_term_scrape
-
+from host_limits import NWIS_HOST, circuit_report, host_wait_seconds, limited_get
+from long_term_scrape import FleetUsgsPrefetch, chunk_bounds, run_long_term_scrape
+from nldas_cache import cell_sharing
+from nldas_grid_extract import FleetGridForcing, load_gauge_cells
+from usgs_scraping_functions import get_state_site_index
+from weather_scraping_functions import FleetAsosPrefetch, find_nearest_asos_stations
+
+# Chunk length of fleets scraped from a common start (their shared grid for batched NWIS requests).
+FLEET_CHUNK_MONTHS = 12
 STATE_SITES_URL = ("https://waterservices.usgs.gov/nwis/site/?format=rdb&stateCd={}&siteType=ST"
                    "&siteStatus=active&hasDataTypeCd=uv&parameterCd=00060")
 
@@ -44,7 +72,7 @@ def list_state_gauges(state_abbrev: str) -> pd.DataFrame:
     :return: A dataframe with site_no, station_nm, dec_lat_va, dec_long_va and huc_cd columns.
     :rtype: pd.DataFrame
     """
-    response = requests.get(STATE_SITES_URL.format(state_abbrev), timeout=120)
+    response = limited_get(STATE_SITES_URL.format(state_abbrev), timeout=120)
     response.raise_for_status()
     lines = [line for line in response.text.splitlines() if not line.startswith("#")]
     header = lines[0].split("\t")
@@ -87,25 +115,209 @@ def save_registry(registry: Dict, registry_path: str, gcs_prefix: Optional[str]
         upload_file(registry_path, gcs_prefix)
 
 
-def registry_report(registry: Dict) -> Dict[str, int]:
+def registry_report(registry: Dict, circuits: Optional[Dict[str, Dict]] = None,
+                    nldas_cells: Optional[Dict] = None) -> Dict:
     """
     Summarizes registry statuses.
 
     :param registry: The registry dict.
     :type registry: Dict
-    :return: Counts per status.
-    :rtype: Dict[str, int]
+    :param circuits: Non-closed circuit breakers (see :func:`host_limits.circuit_report`) to include
+        under "circuits" with their state and remaining wait, defaults to None which omits them.
+    :type circuits: Dict[str, Dict], optional
+    :param nldas_cells: The fleet's NLDAS-2 cell sharing (see :func:`nldas_cache.cell_sharing`) to
+        include under "nldas_cells", defaults to None which omits it.
+    :type nldas_cells: Dict, optional
+    :return: Counts per status (plus "circuits" and "nldas_cells" when given and non-empty).
+    :rtype: Dict
     """
-    counts: Dict[str, int] = {}
+    counts: Dict = {}
     for entry in registry.values():
         counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    if circuits:
+        counts["circuits"] = {host: {"state": circuit["state"],
+                                     "wait_seconds": round(max(0.0, circuit["open_until"] - time.time()),
+                                                           1),
+                                     "last_error": circuit["last_error"]}
+                              for host, circuit in circuits.items()}
+    if nldas_cells:
+        counts["nldas_cells"] = nldas_cells
     return counts
 
 
+def fleet_cell_sharing(gauges: pd.DataFrame) -> Dict:
+    """
+    Summarizes how many of a fleet's gauges share NLDAS-2 grid cells (shared cells are fetched once).
+
+    :param gauges: The gauge table with dec_lat_va and dec_long_va columns (see :func:`list_state_gauges`).
+    :type gauges: pd.DataFrame
+    :return: The :func:`nldas_cache.cell_sharing` summary.
+    :rtype: Dict
+    """
+    return cell_sharing(pd.to_numeric(gauges["dec_lat_va"]), pd.to_numeric(gauges["dec_long_va"]))
+
+
+def fleet_asos_stations(gauges: pd.DataFrame) -> Dict[str, Dict]:
+    """
+    Finds the nearest ASOS station of every gauge of a fleet with one national index query (see
+    :func:`weather_scraping_functions.find_nearest_asos_stations`), for discovery to reuse.
+
+    :param gauges: The gauge table with site_no, dec_lat_va and dec_long_va columns (see
+        :func:`list_state_gauges`).
+    :type gauges: pd.DataFrame
+    :return: site number -> station record with a "distance_km" key (gauges without coordinates are
+        omitted).
+    :rtype: Dict[str, Dict]
+    """
+    latitudes = pd.to_numeric(gauges["dec_lat_va"], errors="coerce")
+    longitudes = pd.to_numeric(gauges["dec_long_va"], errors="coerce")
+    located = (latitudes.notna() & longitudes.notna()).to_numpy()
+    if not located.any():
+        return {}
+    nearest = find_nearest_asos_stations(latitudes[located], longitudes[located])
+    sites = gauges["site_no"].to_numpy()[located]
+    return {sites[query]: station for query, station in zip(nearest["query"],
+                                                            nearest.drop(columns=["query", "rank"])
+                                                            .to_dict("records"))}
+
+
+def save_circuits(circuits_path: str) -> Dict[str, Dict]:
+    """
+    Writes the current non-closed circuit breakers next to the registry (for ``--report`` and the
+    watchdog, which run in other processes).
+
+    :param circuits_path: Path to circuits.json.
+    :type circuits_path: str
+    :return: The saved circuits.
+    :rtype: Dict[str, Dict]
+    """
+    circuits = circuit_report()
+    with open(circuits_path, "w") as f:
+        json.dump(circuits, f, indent=2)
+    return circuits
+
+
+def load_circuits(circuits_path: str) -> Dict[str, Dict]:
+    """
+    Loads saved circuit breakers, dropping those whose backoff has already elapsed.
+
+    :param circuits_path: Path to circuits.json.
+    :type circuits_path: str
+    :return: Hostname -> circuit snapshot.
+    :rtype: Dict[str, Dict]
+    """
+    if not os.path.exists(circuits_path):
+        return {}
+    with open(circuits_path) as f:
+        circuits = json.load(f)
+    return {host: circuit for host, circuit in circuits.items() if circuit["open_until"] > time.time()}
+
+
+def scrape_gauge(site: str, station_nm: str, state_dir: str, **scrape_kwargs) -> Dict:
+    """
+    Runs (or resumes) one gauge's long-term scrape and returns its registry entry.
+
+    :param site: The USGS gauge site number.
+    :type site: str
+    :param station_nm: The gauge's station name.
+    :type station_nm: str
+    :param state_dir: The state output directory; the gauge writes under ``<state_dir>/<site>``.
+    :type state_dir: str
+    :return: A "completed" or "failed" registry entry.
+    :rtype: Dict
+    """
+    try:
+        summary = run_long_term_scrape(site, output_dir=os.path.join(state_dir, site), **scrape_kwargs)
+    except Exception as error:  # noqa: BLE001 - one bad gauge must not stop the fleet
+        print("  %s FAILED: %s" % (site, str(error)[:200]))
+        return {"status": "failed", "station_nm": station_nm, "error": str(error)[:300],
+                "finished_at": datetime.now().isoformat(timespec="seconds")}
+    return {"status": "completed", "station_nm": station_nm,
+            "rows": summary["combined_rows"], "start": summary["start"],
+            "chunk_failures": len(summary["chunk_failures"]),
+            "data_availability": summary["data_availability"],
+            "finished_at": datetime.now().isoformat(timespec="seconds")}
+
+
+async def scrape_fleet_async(pending: List[Tuple[str, str]], state_dir: str, registry: Dict,
+                             registry_path: str, gcs_prefix: Optional[str] = None,
+                             max_concurrent_gauges: int = 4, site_kwargs: Optional[Dict[str, Dict]] = None,
+                             **scrape_kwargs) -> Dict:
+    """
+    Scrapes many gauges at once, recording each in the registry as it finishes.
+
+    Each gauge runs :func:`scrape_gauge` in a worker thread (the source functions are blocking), at
+    most ``max_concurrent_gauges`` at a time; per-host request caps and circuit breakers are enforced
+    underneath by :mod:`host_limits`. Every gauge needs NWIS, so a gauge only waits to start while the
+    NWIS circuit is open; an outage of another service just backs that service off. Registry updates
+    and saves happen on the event loop under one lock, so the registry file stays consistent and a
+    crash loses at most the gauges still in flight — which resume from their chunk files on the next
+    run.
+
+    :param pending: (site number, station name) pairs to scrape, in priority order.
+    :type pending: List[Tuple[str, str]]
+    :param state_dir: The state output directory.
+    :type state_dir: str
+    :param registry: The registry dict, updated in place.
+    :type registry: Dict
+    :param registry_path: Path to registry.json.
+    :type registry_path: str
+    :param gcs_prefix: The claude_data/ prefix to mirror the registry to, defaults to None.
+    :type gcs_prefix: str, optional
+    :param max_concurrent_gauges: The number of gauges in flight, defaults to 4.
+    :type max_concurrent_gauges: int, optional
+    :param site_kwargs: Extra :func:`long_term_scrape.run_long_term_scrape` arguments per site (e.g. its
+        ``usgs_prefetch`` or ``nldas_provider``; those with ``join`` and ``release`` methods are joined
+        when the gauge takes its slot and released when it finishes), defaults to None.
+    :type site_kwargs: Dict[str, Dict], optional
+    :return: The registry.
+    :rtype: Dict
+    """
+    loop = asyncio.get_running_loop()
+    gauge_slots = asyncio.Semaphore(max_concurrent_gauges)
+    registry_lock = asyncio.Lock()
+    started = [0]
+
+    circuits_path = os.path.join(os.path.dirname(registry_path), "circuits.json")
+
+    async def run_one(site: str, station_nm: str) -> None:
+        async with gauge_slots:
+            while host_wait_seconds(NWIS_HOST) > 0:
+                await asyncio.sleep(host_wait_seconds(NWIS_HOST))
+            started[0] += 1
+            print("[%d/%d] scraping %s (%s)" % (started[0], len(pending), site, station_nm))
+            extra = (site_kwargs or {}).get(site, {})
+            # Shared sources fetch each window for the gauges holding a slot, so a gauge joins only now.
+            for shared_source in extra.values():
+                if hasattr(shared_source, "join"):
+                    shared_source.join()
+            try:
+                entry = await loop.run_in_executor(
+                    executor, functools.partial(scrape_gauge, site, station_nm, state_dir, **scrape_kwargs,
+                                                **extra))
+            finally:
+                for shared_source in extra.values():
+                    if hasattr(shared_source, "release"):
+                        shared_source.release()
+            async with registry_lock:
+                registry[site] = entry
+                await loop.run_in_executor(executor, save_registry, dict(registry), registry_path,
+                                           gcs_prefix)
+                save_circuits(circuits_path)
+
+    # One extra worker so registry saves never wait behind a full set of running gauges.
+    with ThreadPoolExecutor(max_workers=max_concurrent_gauges + 1) as executor:
+        await asyncio.gather(*(run_one(site, station_nm) for site, station_nm in pending))
+    return registry
+
+
 def run_state_scrape(state_abbrev: str, output_root: str = os.path.join("pilot_data", "scrapes"),
                      limit: Optional[int] = None, include_nldas: bool = True,
                      gages2_zip_path: Optional[str] = os.path.join("pilot_data", "gages2.zip"),
-                     backup: bool = True, retry_failed: bool = True) -> Dict:
+                     backup: bool = True, retry_failed: bool = True,
+                     incremental: bool = False, max_concurrent_gauges: int = 1,
+                     start_time: Optional[datetime] = None, usgs_batch_size: int = 10,
+                     nldas_grid_dir: Optional[str] = None, nldas_cells_path: Optional[str] = None) -> Dict:
     """
     Scrapes (or resumes scraping) every enumerated gauge of a state.
 
@@ -124,6 +336,28 @@ def run_state_scrape(state_abbrev: str, output_root: str = os.path.join("pilot_d
     :type backup: bool, optional
     :param retry_failed: Whether to retry gauges previously marked failed, defaults to True.
     :type retry_failed: bool, optional
+    :param incremental: Whether to top up completed gauges with the hours since their last stored
+        timestamp instead of skipping them (a daily fleet refresh), defaults to False.
+    :type incremental: bool, optional
+    :param max_concurrent_gauges: The number of gauges scraped at once (see
+        :func:`scrape_fleet_async`), defaults to 1.
+    :type max_concurrent_gauges: int, optional
+    :param start_time: A common scrape start for every gauge, defaults to None which starts each gauge at
+        its uv begin date. With a common start the gauges share a chunk grid, so the gauges in flight
+        fetch their NWIS windows together with batched requests (see
+        :class:`long_term_scrape.FleetUsgsPrefetch`).
+    :type start_time: datetime, optional
+    :param usgs_batch_size: The initial gauges per batched NWIS request, defaults to 10.
+    :type usgs_batch_size: int, optional
+    :param nldas_grid_dir: The root of locally mirrored NLDAS-2 hourly files; when given, chunk forcing
+        is extracted from them (see :class:`nldas_grid_extract.FleetGridForcing`, once per window for
+        the gauges in flight with a common start) and Giovanni is only asked for windows the
+        files do not cover, defaults to None.
+    :type nldas_grid_dir: str, optional
+    :param nldas_cells_path: The gauge cell index of the state (see
+        :func:`nldas_grid_extract.build_gauge_cells`), defaults to None which uses
+        ``pilot_data/nldas_series/<state>/gauge_cells.npz``.
+    :type nldas_cells_path: str, optional
     :return: The status counts after the run.
     :rtype: Dict
     """
@@ -133,41 +367,60 @@ def run_state_scrape(state_abbrev: str, output_root: str = os.path.join("pilot_d
     gcs_prefix = os.path.normpath(state_dir).replace(os.sep, "/") if backup else None
     gauges = list_state_gauges(state_abbrev)
     gauges.to_csv(os.path.join(state_dir, "gauges.csv"), index=False)
+    # One state-wide metadata/catalog prefetch instead of several NWIS site requests per gauge.
+    site_index = get_state_site_index(state_abbrev)
     registry = load_registry(registry_path)
     print("State", state_abbrev, "has", len(gauges), "gauges; registry:", registry_report(registry))
 
-    attempted = 0
+    pending = []
     for _, gauge in gauges.iterrows():
-        site = gauge["site_no"]
-        entry = registry.get(site)
-        if entry is not None and entry["status"] == "completed":
+        entry = registry.get(gauge["site_no"])
+        if entry is not None and entry["status"] == "completed" and not incremental:
             continue
         if entry is not None and entry["status"] == "failed" and not retry_failed:
             continue
-        if limit is not None and attempted >= limit:
-            break
-        attempted += 1
-        print("[%s %d/%d] scraping %s (%s)" % (state_abbrev, attempted,
-                                               limit or len(gauges), site, gauge["station_nm"]))
-        try:
-            summary = run_long_term_scrape(site, output_dir=os.path.join(state_dir, site),
-                                           include_nldas=include_nldas,
-                                           gages2_zip_path=gages2_zip_path, backup=backup)
-            registry[site] = {"status": "completed", "station_nm": gauge["station_nm"],
-                              "rows": summary["combined_rows"], "start": summary["start"],
-                              "chunk_failures": len(summary["chunk_failures"]),
-                              "data_availability": summary["data_availability"],
-                              "finished_at": datetime.now().isoformat(timespec="seconds")}
-        except Exception as error:  # noqa: BLE001 - one bad gauge must not stop the fleet
-            registry[site] = {"status": "failed", "station_nm": gauge["station_nm"],
-                              "error": str(error)[:300],
-                              "finished_at": datetime.now().isoformat(timespec="seconds")}
-            print("  FAILED:", str(error)[:200])
-            # Back off after a failure: a 503 usually means an NWIS outage window, and racing
-            # through the gauge list during one just converts the whole list to failures.
-            time.sleep(120)
-        save_registry(registry, registry_path, gcs_prefix)
-    report = registry_report(registry)
+        pending.append((gauge["site_no"], gauge["station_nm"]))
+    pending = pending[:limit] if limit is not None else pending
+    # One nearest-station query for the fleet instead of a station search per gauge.
+    try:
+        asos_stations = fleet_asos_stations(gauges[gauges["site_no"].isin([site for site, _ in pending])])
+    except RuntimeError as error:
+        print("No fleet ASOS station index, gauges search their own: %s" % error)
+        asos_stations = {}
+    site_index = dict(site_index, asos_station=asos_stations)
+    shared: Dict = {}
+    site_kwargs: Dict[str, Dict] = {site: {} for site, _ in pending}
+    if start_time is not None:
+        end_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        shared = {"start_time": start_time, "end_time": end_time, "chunk_months": FLEET_CHUNK_MONTHS}
+        if asos_cache.cache_dir() and asos_stations:
+            # Each window's ASOS reports are cached for the fleet's stations with multi-station requests.
+            shared["asos_prefetch"] = FleetAsosPrefetch([station["station_id"]
+                                                         for station in asos_stations.values()])
+        if max_concurrent_gauges > 1:
+            # The gauges in flight share each window's batched NWIS requests.
+            prefetch = FleetUsgsPrefetch(chunk_bounds(start_time, end_time, FLEET_CHUNK_MONTHS),
+                                         batch_size=usgs_batch_size)
+            for site, _ in pending:
+                site_kwargs[site]["usgs_prefetch"] = prefetch.for_site(site)
+    if nldas_grid_dir is not None:
+        cells, shape = load_gauge_cells(nldas_cells_path or os.path.join("pilot_data", "nldas_series",
+                                                                         state_abbrev, "gauge_cells.npz"))
+        fleet_forcing = None
+        if start_time is not None:
+            # The gauges in flight share each window's extraction.
+            fleet_forcing = FleetGridForcing({site: cells[site] for site, _ in pending if site in cells},
+                                             grid_dir=nldas_grid_dir, expected_shape=shape)
+        for site, _ in pending:
+            forcing = fleet_forcing or FleetGridForcing({site: cells[site]} if site in cells else {},
+                                                        grid_dir=nldas_grid_dir, expected_shape=shape)
+            site_kwargs[site]["nldas_provider"] = forcing.for_site(site)
+    asyncio.run(scrape_fleet_async(pending, state_dir, registry, registry_path, gcs_prefix,
+                                   max_concurrent_gauges=max_concurrent_gauges, site_kwargs=site_kwargs,
+                                   include_nldas=include_nldas, gages2_zip_path=gages2_zip_path,
+                                   backup=backup, site_index=site_index, incremental=incremental, **shared))
+    report = registry_report(registry, circuit_report(),
+                             fleet_cell_sharing(gauges) if include_nldas else None)
     print("State", state_abbrev, "registry now:", report)
     return report
 
@@ -187,20 +440,35 @@ def main() -> None:
     parser.add_argument("--no-retry-failed", action="store_true", help="Do not retry failed gauges")
     parser.add_argument("--no-snodas", action="store_true",
                         help="Skip the automatic SNODAS SWE series companion for snow states")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Append the hours since the last scrape to completed gauges")
+    parser.add_argument("--concurrency", type=int, default=1, help="Gauges scraped at once")
+    parser.add_argument("--start", default=None,
+                        help="Common start date YYYY-MM-DD for every gauge (batches the NWIS requests)")
+    parser.add_argument("--nldas-grid-dir", default=None,
+                        help="Extract NLDAS-2 forcing from hourly files mirrored here instead of Giovanni")
     parser.add_argument("--report", action="store_true", help="Print registry status and exit")
     args = parser.parse_args()
     load_dotenv()
     if args.report:
-        registry = load_registry(os.path.join("pilot_data", "scrapes", args.state, "registry.json"))
-        print(json.dumps({"counts": registry_report(registry),
+        state_dir = os.path.join("pilot_data", "scrapes", args.state)
+        registry = load_registry(os.path.join(state_dir, "registry.json"))
+        circuits = load_circuits(os.path.join(state_dir, "circuits.json"))
+        gauges_path = os.path.join(state_dir, "gauges.csv")
+        nldas_cells = (fleet_cell_sharing(pd.read_csv(gauges_path, dtype=str))
+                       if os.path.exists(gauges_path) else None)
+        print(json.dumps({"counts": registry_report(registry, circuits, nldas_cells),
                           "failed": {site: entry["error"] for site, entry in registry.items()
                                      if entry["status"] == "failed"}}, indent=2))
         return
-    include_nldas = not args.no_nldas and bool(os.environ.get("EARTHDATA_TOKEN"))
+    include_nldas = not args.no_nldas and bool(os.environ.get("EARTHDATA_TOKEN") or args.nldas_grid_dir)
     if not args.no_nldas and not include_nldas:
         print("WARNING: EARTHDATA_TOKEN not set; scraping without NLDAS-2 forcing.")
     run_state_scrape(args.state, limit=args.limit, include_nldas=include_nldas,
-                     backup=not args.no_backup, retry_failed=not args.no_retry_failed)
+                     backup=not args.no_backup, retry_failed=not args.no_retry_failed,
+                     incremental=args.incremental, max_concurrent_gauges=args.concurrency,
+                     start_time=datetime.strptime(args.start, "%Y-%m-%d") if args.start else None,
+                     nldas_grid_dir=args.nldas_grid_dir if include_nldas else None)
     if args.state in SNOW_STATES and not args.no_snodas:
         launch_snodas_companion(args.state)
 
@@ -0,0 +1,117 @@
+"""
+Vectorized nearest-station search over point networks (ASOS, SNOTEL/SCAN).
+
+Stations are placed on the unit sphere and indexed with a :class:`scipy.spatial.cKDTree`; a k-nearest
+query for a whole fleet of gauges is a single tree call, and the chord distances it returns convert
+exactly to great-circle (haversine) kilometres.
+
+Example::
+
+    index = StationIndex(get_national_asos_stations())
+    distances_km, positions = index.query(gauges["dec_lat_va"], gauges["dec_long_va"], k=3)
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Computes great-circle distances between points given in decimal degrees (numpy broadcasting).
+
+    :param lat1: Latitude(s) of the first points.
+    :param lon1: Longitude(s) of the first points.
+    :param lat2: Latitude(s) of the second points.
+    :param lon2: Longitude(s) of the second points.
+    :return: The distances in kilometres.
+    :rtype: np.ndarray
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64))
+                              for value in (lat1, lon1, lat2, lon2))
+    hav = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0)))
+
+
+def unit_vectors(latitudes, longitudes) -> np.ndarray:
+    """
+    Converts decimal-degree coordinates to 3D points on the unit sphere.
+
+    :param latitudes: The latitudes.
+    :param longitudes: The longitudes.
+    :return: An (n, 3) array.
+    :rtype: np.ndarray
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+class StationIndex:
+    """
+    A spatial index over a station table with "latitude" and "longitude" columns.
+
+    Stations without coordinates are dropped; :attr:`stations` holds the indexed rows (positions returned
+    by :meth:`query` refer to it).
+    """
+
+    def __init__(self, stations: pd.DataFrame) -> None:
+        """
+        :param stations: The station table.
+        :type stations: pd.DataFrame
+        """
+        valid = stations["latitude"].notna() & stations["longitude"].notna()
+        self.stations = stations[valid].reset_index(drop=True)
+        self.tree = cKDTree(unit_vectors(self.stations["latitude"], self.stations["longitude"]))
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def query(self, latitudes, longitudes, k: int = 1,
+              max_distance_km: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k nearest stations of many points in one call.
+
+        :param latitudes: The query latitudes in decimal degrees (scalar or array-like).
+        :param longitudes: The query longitudes in decimal degrees.
+        :param k: The number of neighbours per point, defaults to 1.
+        :type k: int, optional
+        :param max_distance_km: Ignore stations farther than this, defaults to None (no cap).
+        :type max_distance_km: float, optional
+        :return: A tuple of (distances in km, station positions), both shaped (n_points, k) and sorted by
+            distance; missing neighbours (beyond the cap or the index size) have distance inf and
+            position ``len(self)``.
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        points = unit_vectors(np.atleast_1d(latitudes), np.atleast_1d(longitudes))
+        upper = np.inf if max_distance_km is None else \
+            2 * np.sin(min(max_distance_km / EARTH_RADIUS_KM, np.pi) / 2)
+        chords, positions = self.tree.query(points, k=k, distance_upper_bound=upper)
+        chords, positions = chords.reshape(len(points), k), positions.reshape(len(points), k)
+        distances = np.full(chords.shape, np.inf)
+        found = np.isfinite(chords)
+        distances[found] = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chords[found] / 2, 1.0))
+        return distances, positions
+
+    def nearest(self, latitudes, longitudes, k: int = 1,
+                max_distance_km: Optional[float] = None) -> pd.DataFrame:
+        """
+        Returns the k nearest station records of many points as one long table.
+
+        :param latitudes: The query latitudes in decimal degrees (scalar or array-like).
+        :param longitudes: The query longitudes in decimal degrees.
+        :param k: The number of neighbours per point, defaults to 1.
+        :type k: int, optional
+        :param max_distance_km: Ignore stations farther than this, defaults to None (no cap).
+        :type max_distance_km: float, optional
+        :return: The station rows with added "query" (position of the query point), "rank" (0 for the
+            nearest) and "distance_km" columns, ordered by query then rank.
+        :rtype: pd.DataFrame
+        """
+        distances, positions = self.query(latitudes, longitudes, k=k, max_distance_km=max_distance_km)
+        queries, ranks = np.nonzero(np.isfinite(distances))
+        matches = self.stations.iloc[positions[queries, ranks]].reset_index(drop=True)
+        return matches.assign(query=queries, rank=ranks, distance_km=distances[queries, ranks])
@@ -7,19 +7,58 @@ bands derived from the basin's GAGES-II elevation statistics. The result initial
 banded snow states of the hybrid model with *observed* antecedent conditions — resolving the
 point-to-basin scaling that a single site cannot (e.g. Cache la Poudre, June 5 2024: sites below
 10,000 ft all read 0 mm while sites above hold 96-417 mm).
+
+For a fleet over a season, :func:`estimate_band_swe_series` samples all basins' sites over the whole
+date range in a few batched AWDB requests and fits every day and basin with array operations.
 """
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
-from awdb_functions import get_awdb_element_data, get_awdb_stations
+from awdb_functions import get_awdb_element_matrix, get_awdb_station_index
 
 FEET_TO_M = 0.3048
 INCHES_TO_MM = 25.4
 
 
+def sample_snotel_swe_matrix(bboxes: List[List[float]], start_date: datetime, end_date: datetime,
+                             state_code: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Reads daily SWE at every SNOTEL site inside any of several bounding boxes over a date range, in
+    one ``/data`` request per :data:`awdb_functions.AWDB_TRIPLETS_PER_REQUEST` sites.
+
+    :param bboxes: Bounding boxes as (min_lon, min_lat, max_lon, max_lat), e.g. one per basin.
+    :type bboxes: List[List[float]]
+    :param start_date: The first day to sample.
+    :type start_date: datetime
+    :param end_date: The last day to sample (inclusive).
+    :type end_date: datetime
+    :param state_code: Optional two-letter state filter, defaults to None.
+    :type state_code: str, optional
+    :return: The site table (triplet, name, elevation_m, latitude, longitude) and the dense site x day
+        SWE matrix in mm (rows in site order, NaN where a site has no value).
+    :rtype: Tuple[pd.DataFrame, pd.DataFrame]
+    """
+    stations = get_awdb_station_index("SNTL", "WTEQ", "DAILY").stations
+    inside = np.zeros(len(stations), dtype=bool)
+    for min_lon, min_lat, max_lon, max_lat in bboxes:
+        inside |= ((stations.longitude >= min_lon) & (stations.longitude <= max_lon) &
+                   (stations.latitude >= min_lat) & (stations.latitude <= max_lat)).to_numpy()
+    if state_code:
+        inside &= (stations["stationTriplet"].str.split(":").str[1] == state_code).to_numpy()
+    # Sites whose SWE record starts after the period cannot have a value.
+    begins = pd.to_datetime(stations["element_begin"])
+    inside &= (begins.notna() & (begins <= pd.Timestamp(end_date))).to_numpy()
+    stations = stations[inside].reset_index(drop=True)
+    sites = pd.DataFrame({"triplet": stations["stationTriplet"], "name": stations["name"],
+                          "elevation_m": stations["elevation"].astype(float) * FEET_TO_M,
+                          "latitude": stations["latitude"], "longitude": stations["longitude"]})
+    swe = get_awdb_element_matrix(list(sites["triplet"]), "WTEQ", start_date, end_date, duration="DAILY")
+    return sites, swe * INCHES_TO_MM
+
+
 def sample_basin_snotel(basin_bbox: List[float], date: datetime,
                         state_code: Optional[str] = None) -> pd.DataFrame:
     """
@@ -29,26 +68,14 @@ def sample_basin_snotel(basin_bbox: List[float], date: datetime,
     :type basin_bbox: List[float]
     :param date: The date to sample.
     :type date: datetime
-    :param state_code: Optional two-letter state filter to reduce the station listing,
-        defaults to None.
+    :param state_code: Optional two-letter state filter, defaults to None.
     :type state_code: str, optional
     :return: A dataframe with name, elevation_m and swe_mm per in-basin site (NaN SWE dropped).
     :rtype: pd.DataFrame
     """
-    min_lon, min_lat, max_lon, max_lat = basin_bbox
-    stations = get_awdb_stations(network="SNTL", state_code=state_code)
-    inside = stations[(stations.longitude >= min_lon) & (stations.longitude <= max_lon) &
-                      (stations.latitude >= min_lat) & (stations.latitude <= max_lat)]
-    records = []
-    for _, station in inside.iterrows():
-        swe = get_awdb_element_data(station["stationTriplet"], ["WTEQ"], date, date,
-                                    duration="DAILY")
-        if len(swe) == 0 or "WTEQ" not in swe.columns or swe["WTEQ"].isna().all():
-            continue
-        records.append({"name": station["name"], "triplet": station["stationTriplet"],
-                        "elevation_m": float(station["elevation"]) * FEET_TO_M,
-                        "swe_mm": float(swe["WTEQ"].iloc[0]) * INCHES_TO_MM})
-    return pd.DataFrame(records)
+    sites, swe = sample_snotel_swe_matrix([basin_bbox], date, date, state_code=state_code)
+    samples = sites[["name", "triplet", "elevation_m"]].assign(swe_mm=swe.iloc[:, 0].to_numpy())
+    return samples.dropna(subset=["swe_mm"]).reset_index(drop=True)
 
 
 def equal_area_bands(elev_mean_m: float, elev_std_m: float, n_bands: int = 5) -> Dict:
@@ -75,6 +102,40 @@ def equal_area_bands(elev_mean_m: float, elev_std_m: float, n_bands: int = 5) ->
             "area_fractions": [1.0 / n_bands] * n_bands}
 
 
+def fit_swe_elevation_profiles(elevations_m: np.ndarray, swe_mm: np.ndarray,
+                               band_elevations_m: List[float]) -> np.ndarray:
+    """
+    Fits the snow-line profile of :func:`fit_swe_elevation_profile` for many days at once.
+
+    :param elevations_m: The site elevations in meters, shape (sites,).
+    :type elevations_m: np.ndarray
+    :param swe_mm: The sampled SWE in mm, shape (days, sites); NaN marks a missing sample.
+    :type swe_mm: np.ndarray
+    :param band_elevations_m: Elevations at which to evaluate the profile.
+    :type band_elevations_m: List[float]
+    :return: Estimated SWE in mm, shape (days, bands).
+    :rtype: np.ndarray
+    """
+    elevations = np.asarray(elevations_m, dtype=float)
+    swe = np.atleast_2d(np.asarray(swe_mm, dtype=float))
+    bands = np.asarray(band_elevations_m, dtype=float)
+    observed = ~np.isnan(swe)
+    snowy = observed & (swe > 1.0)
+    dry = observed & (swe <= 1.0)
+    has_snow = snowy.any(axis=1)
+    lowest_snowy = np.min(np.where(snowy, elevations, np.inf), axis=1, initial=np.inf)
+    highest_dry = np.max(np.where(dry, elevations, -np.inf), axis=1, initial=-np.inf)
+    snow_line = np.where(lowest_snowy > highest_dry,
+                         (highest_dry + np.minimum(lowest_snowy, highest_dry + 400.0)) / 2.0, highest_dry)
+    snow_line = np.where(dry.any(axis=1), snow_line, lowest_snowy - 200.0)
+    snow_line = np.where(has_snow, snow_line, 0.0)
+    above = np.where(snowy, np.clip(elevations - snow_line[:, None], 1.0, None), 0.0)
+    numerator = (above * np.where(snowy, swe, 0.0)).sum(axis=1)
+    denominator = (above * above).sum(axis=1)
+    slope = np.maximum(numerator / np.where(has_snow, denominator, 1.0), 0.0)
+    return np.maximum(slope[:, None] * (bands - snow_line[:, None]), 0.0)
+
+
 def fit_swe_elevation_profile(samples: pd.DataFrame, band_elevations_m: List[float]) -> List[float]:
     """
     Fits a snow-line profile to SNOTEL samples and evaluates it at band elevations.
@@ -92,22 +153,8 @@ def fit_swe_elevation_profile(samples: pd.DataFrame, band_elevations_m: List[flo
     """
     if samples.empty:
         return [0.0] * len(band_elevations_m)
-    snowy = samples[samples["swe_mm"] > 1.0]
-    dry = samples[samples["swe_mm"] <= 1.0]
-    if snowy.empty:
-        return [0.0] * len(band_elevations_m)
-    if dry.empty:
-        snow_line = float(snowy["elevation_m"].min()) - 200.0
-    else:
-        highest_dry = float(dry["elevation_m"].max())
-        lowest_snowy = float(snowy["elevation_m"].min())
-        snow_line = (highest_dry + min(lowest_snowy, highest_dry + 400.0)) / 2.0 \
-            if lowest_snowy > highest_dry else highest_dry
-    above = (snowy["elevation_m"] - snow_line).to_numpy()
-    above = np.clip(above, 1.0, None)
-    slope = float((above * snowy["swe_mm"].to_numpy()).sum() / (above * above).sum())
-    slope = max(slope, 0.0)
-    return [max(0.0, slope * (z - snow_line)) for z in band_elevations_m]
+    swe = samples["swe_mm"].to_numpy()[None, :]
+    return fit_swe_elevation_profiles(samples["elevation_m"].to_numpy(), swe, band_elevations_m)[0].tolist()
 
 
 def estimate_band_swe(static: Dict, date: datetime, n_bands: int = 5,
@@ -135,3 +182,47 @@ def estimate_band_swe(static: Dict, date: datetime, n_bands: int = 5,
     basin_mean = float(np.dot(band_swe, bands["area_fractions"]))
     return {"band_elevations_m": bands["elevations_m"], "area_fractions": bands["area_fractions"],
             "band_swe_mm": band_swe, "basin_mean_swe_mm": basin_mean, "samples": samples}
+
+
+def estimate_band_swe_series(statics: Dict[str, Dict], start_date: datetime, end_date: datetime,
+                             n_bands: int = 5, state_code: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Daily basin snow-state estimates for many basins over a date range (e.g. a fleet's season).
+
+    All basins' SNOTEL sites are sampled once as a site x day matrix
+    (:func:`sample_snotel_swe_matrix`); the profile of every day is then fitted per basin in one array
+    pass (:func:`fit_swe_elevation_profiles`).
+
+    :param statics: The static attribute dicts keyed by gauge id (see :func:`estimate_band_swe`).
+    :type statics: Dict[str, Dict]
+    :param start_date: The first day to estimate.
+    :type start_date: datetime
+    :param end_date: The last day to estimate (inclusive).
+    :type end_date: datetime
+    :param n_bands: The number of elevation bands, defaults to 5.
+    :type n_bands: int, optional
+    :param state_code: Optional state filter for the station listing, defaults to None.
+    :type state_code: str, optional
+    :return: Per gauge, a dict with "band_elevations_m", "area_fractions", "band_swe_mm" (a day x band
+        dataframe) and "basin_mean_swe_mm" (a daily series).
+    :rtype: Dict[str, Dict]
+    """
+    sites, swe = sample_snotel_swe_matrix([static["basin_bbox"] for static in statics.values()],
+                                          start_date, end_date, state_code=state_code)
+    days = swe.columns
+    day_site_swe = swe.to_numpy().T
+    estimates = {}
+    for gauge_id, static in statics.items():
+        min_lon, min_lat, max_lon, max_lat = static["basin_bbox"]
+        inside = ((sites.longitude >= min_lon) & (sites.longitude <= max_lon) &
+                  (sites.latitude >= min_lat) & (sites.latitude <= max_lat)).to_numpy()
+        bands = equal_area_bands(float(static["gages2_ELEV_MEAN_M_BASIN"]),
+                                 float(static["gages2_ELEV_STD_M_BASIN"]), n_bands=n_bands)
+        band_swe = fit_swe_elevation_profiles(sites["elevation_m"].to_numpy()[inside],
+                                              day_site_swe[:, inside], bands["elevations_m"])
+        estimates[gauge_id] = {
+            "band_elevations_m": bands["elevations_m"], "area_fractions": bands["area_fractions"],
+            "band_swe_mm": pd.DataFrame(band_swe, index=days,
+                                        columns=["band_%d" % band for band in range(n_bands)]),
+            "basin_mean_swe_mm": pd.Series(band_swe @ np.asarray(bands["area_fractions"]), index=days)}
+    return estimates
@@ -0,0 +1,76 @@
+"""
+Offline stand-ins for the HTTP layer, shared by the tests of the modules that fetch through
+:mod:`host_limits`.
+
+:class:`FakeResponse` answers like a :class:`requests.Response`; :func:`reset_host_limits` gives a test
+fresh per-host limiters (and circuit breakers) and, optionally, a fake ``requests.get`` for its duration.
+"""
+from typing import Callable, Dict, Optional
+from unittest.mock import patch
+
+import requests
+
+import host_limits
+
+
+class FakeResponse:
+    """A minimal stand-in for a (streamed) :class:`requests.Response` carrying text or a JSON payload."""
+
+    def __init__(self, text: str = "", status_code: int = 200, headers: Optional[Dict[str, str]] = None,
+                 payload=None) -> None:
+        self.text = text
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.payload = payload
+        self.encoding = "utf-8"
+
+    def json(self):
+        return self.payload
+
+    def iter_lines(self, decode_unicode: bool = False):
+        return iter(self.text.splitlines())
+
+    def close(self) -> None:
+        pass
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError("HTTP %d" % self.status_code)
+
+
+def start_patches(test_case, *patchers) -> None:
+    """
+    Starts patchers for the duration of a test.
+
+    :param test_case: The running test.
+    :type test_case: unittest.TestCase
+    :param patchers: The ``unittest.mock.patch`` objects to start.
+    :return: None
+    :rtype: None
+    """
+    for patcher in patchers:
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+
+
+def reset_host_limits(test_case, *patchers, fake_get: Optional[Callable] = None,
+                      limits: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+    """
+    Gives a test its own per-host limiters, so no slot, delay or open circuit leaks between tests.
+
+    :param test_case: The running test.
+    :type test_case: unittest.TestCase
+    :param patchers: Further patchers started (and stopped) with the limiters.
+    :param fake_get: Stands in for ``requests.get`` when given, defaults to None.
+    :type fake_get: Callable, optional
+    :param limits: Per-host limits overriding :data:`host_limits.HOST_LIMITS`, defaults to None.
+    :type limits: Dict[str, Dict[str, float]], optional
+    :return: None
+    :rtype: None
+    """
+    own = [patch.dict(host_limits._LIMITERS, clear=True)]
+    if fake_get is not None:
+        own.append(patch.object(host_limits.requests, "get", side_effect=fake_get))
+    if limits is not None:
+        own.append(patch.dict(host_limits.HOST_LIMITS, limits))
+    start_patches(test_case, *own, *patchers)
@@ -0,0 +1,133 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+import asos_cache
+import weather_scraping_functions
+from asos_cache import load_coverage, missing_ranges
+from weather_scraping_functions import FleetAsosPrefetch, get_hourly_asos
+
+
+def hour_values(hours: pd.DatetimeIndex) -> np.ndarray:
+    """A deterministic per-hour value, so served hours can be checked against what was fetched."""
+    return ((hours - pd.Timestamp("1970-01-01", tz="UTC")) // pd.Timedelta(hours=1) % 1000).to_numpy(float)
+
+
+class FakeMesonet:
+    """Serves hourly frames as :func:`weather_scraping_functions.fetch_asos_days` would, recording calls."""
+
+    def __init__(self) -> None:
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, station_id, first_day, end_day):
+        with self.lock:
+            self.calls.append((station_id, first_day, end_day))
+        # Reports of [first_day, end_day) ceil to the hours first_day .. end_day.
+        hours = pd.date_range(first_day, end_day, freq="h", tz="UTC")
+        return pd.DataFrame({"datetime": hours, "tmpf": hour_values(hours),
+                             "skyc1": np.where(hours.hour % 2 == 0, "CLR", "OVC")})
+
+
+class TestAsosCache(unittest.TestCase):
+    """Offline tests of the per-station ASOS window cache."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.fake = FakeMesonet()
+        for patcher in (patch.dict(asos_cache._SETTINGS, {"cache_dir": self.temp_dir.name}),
+                        patch.object(weather_scraping_functions, "fetch_asos_days", side_effect=self.fake)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def assert_window(self, df, start, end):
+        expected = pd.date_range(start, end, freq="h", tz="UTC")
+        self.assertEqual(list(df["datetime"]), list(expected))
+        np.testing.assert_array_equal(df["tmpf"].to_numpy(), hour_values(expected))
+
+    def test_repeat_and_overlapping_windows_fetch_only_gaps(self):
+        first = get_hourly_asos("FNL", datetime(2020, 1, 2), datetime(2020, 1, 3, 23))
+        self.assert_window(first, "2020-01-02", "2020-01-03 23:00")
+        self.assertEqual(self.fake.calls, [("FNL", datetime(2020, 1, 1), datetime(2020, 1, 4))])
+        again = get_hourly_asos("FNL", datetime(2020, 1, 2, 6), datetime(2020, 1, 3, 12))
+        self.assert_window(again, "2020-01-02 06:00", "2020-01-03 12:00")
+        self.assertEqual(len(self.fake.calls), 1)
+        overlap = get_hourly_asos("FNL", datetime(2020, 1, 3), datetime(2020, 1, 5, 23))
+        self.assert_window(overlap, "2020-01-03", "2020-01-05 23:00")
+        self.assertEqual(self.fake.calls[1], ("FNL", datetime(2020, 1, 3), datetime(2020, 1, 6)))
+        self.assertEqual(set(overlap["skyc1"]), {"CLR", "OVC"})
+        station_dir = os.path.join(self.temp_dir.name, "FNL")
+        self.assertEqual(len(load_coverage(station_dir)), 1)
+
+    def test_concurrent_gauges_share_one_download(self):
+        def gauge_window(_):
+            return get_hourly_asos("FNL", datetime(2020, 1, 2), datetime(2020, 1, 9))
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            frames = list(pool.map(gauge_window, range(8)))
+        self.assertEqual(len(self.fake.calls), 1)
+        for frame in frames:
+            self.assert_window(frame, "2020-01-02", "2020-01-09")
+
+    def test_recent_hours_are_refetched(self):
+        end = datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+        get_hourly_asos("FNL", end - timedelta(days=10), end)
+        get_hourly_asos("FNL", end - timedelta(days=10), end)
+        self.assertEqual(len(self.fake.calls), 2)
+        self.assertGreaterEqual(self.fake.calls[1][1], end - timedelta(days=3))
+
+    def test_later_windows_are_appended(self):
+        with patch.object(asos_cache, "write_hourly_store", wraps=asos_cache.write_hourly_store) as rewrites, \
+                patch.object(asos_cache, "append_hourly_store", wraps=asos_cache.append_hourly_store) as appends:
+            get_hourly_asos("FNL", datetime(2020, 1, 2), datetime(2020, 1, 3, 23))
+            later = get_hourly_asos("FNL", datetime(2020, 1, 5), datetime(2020, 1, 6, 23))
+            self.assertEqual((rewrites.call_count, appends.call_count), (1, 1))
+            # A window before the stored record replaces hours inside it and rewrites the store.
+            earlier = get_hourly_asos("FNL", datetime(2019, 12, 30), datetime(2019, 12, 31, 23))
+            self.assertEqual((rewrites.call_count, appends.call_count), (2, 1))
+        self.assert_window(later, "2020-01-05", "2020-01-06 23:00")
+        self.assert_window(earlier, "2019-12-30", "2019-12-31 23:00")
+        self.assert_window(get_hourly_asos("FNL", datetime(2020, 1, 2), datetime(2020, 1, 3, 23)),
+                           "2020-01-02", "2020-01-03 23:00")
+        self.assertEqual(len(self.fake.calls), 3)
+
+    def test_fleet_windows_are_cached_with_multi_station_requests(self):
+        batches = []
+
+        def fake_batch(station_ids, first_day, end_day):
+            batches.append((tuple(station_ids), first_day, end_day))
+            return {station_id: self.fake(station_id, first_day, end_day) for station_id in station_ids}
+        window = (datetime(2020, 1, 2), datetime(2020, 1, 9))
+        get_hourly_asos("FNL", *window)
+        prefetch = FleetAsosPrefetch(["FNL", "DEN", "GXY", "DEN"])
+        with patch.object(weather_scraping_functions, "fetch_asos_days_batch", side_effect=fake_batch), \
+                ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda _: prefetch(*window), range(4)))
+        # One download for the window, of the stations the cache did not cover yet.
+        self.assertEqual(batches, [(("DEN", "GXY"), datetime(2020, 1, 1), datetime(2020, 1, 10))])
+        self.assertEqual(prefetch._window_locks, {})
+        self.fake.calls.clear()
+        for station_id in prefetch.station_ids:
+            self.assert_window(get_hourly_asos(station_id, *window), "2020-01-02", "2020-01-09")
+        self.assertEqual(self.fake.calls, [])
+
+    def test_default_directory_is_outside_the_working_directory(self):
+        with patch.dict(asos_cache._SETTINGS, clear=True), patch.dict(os.environ, {"XDG_CACHE_HOME": "/cache"}):
+            os.environ.pop("ASOS_CACHE_DIR", None)
+            self.assertEqual(asos_cache.cache_dir(), os.path.join("/cache", "water", "asos_cache"))
+
+    def test_missing_ranges(self):
+        self.assertEqual(missing_ranges([[10, 20], [30, 40]], 0, 50), [[0, 10], [20, 30], [40, 50]])
+        self.assertEqual(missing_ranges([[10, 20]], 12, 18), [])
+        self.assertEqual(missing_ranges([[10, 20]], 15, 25), [[20, 25]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+Offline tests for the typed single-pass ASOS CSV reader and multi-station Mesonet requests.
+
+``legacy_process_asos_csv`` is the previous per-column implementation (minus its debug printing), kept
+here as the reference the vectorized reader must reproduce.
+"""
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import asos_cache
+from http_fakes import FakeResponse, reset_host_limits
+from weather_scraping_functions import (ASOS_BASE_URL, fetch_asos_days_batch, format_dt,
+                                        get_asos_data_from_stations, process_asos_csv)
+
+COLUMNS = ["station", "valid", "tmpf", "dwpf", "relh", "feel", "sknt", "sped", "alti", "mslp", "drct",
+           "ice_accretion_1hr", "p01m", "vsby", "gust", "skyc1", "peak_wind_gust", "snowdepth"]
+
+
+def legacy_process_asos_csv(path):
+    df = pd.read_csv(path)
+    if df.empty:
+        return pd.DataFrame(), 0, 0
+    missing_precip = df['p01m'][df['p01m'] == 'M'].count()
+    missing_temp = df['tmpf'][df['tmpf'] == 'M'].count()
+    df['hour_updated'] = df['valid'].map(format_dt)
+    for column in ["tmpf", "dwpf", "p01m", "feel", "relh", "sknt", "sped", "alti", "gust", "mslp", "vsby",
+                   "peak_wind_gust", "snowdepth", "ice_accretion_1hr", "drct"]:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    df['skyc1'] = df['skyc1'].astype(str)
+    df = df.groupby(by=['hour_updated'], as_index=False).agg({
+        'p01m': 'sum', 'valid': 'first', 'tmpf': 'mean', 'dwpf': 'mean', 'ice_accretion_1hr': 'first',
+        'mslp': 'first', 'drct': 'first', 'sped': 'first', 'alti': 'first', 'relh': 'first', 'sknt': 'first',
+        'feel': 'first', 'vsby': 'first', 'gust': 'first', 'skyc1': 'first', 'peak_wind_gust': 'first',
+        'snowdepth': 'first'})
+    return df, int(missing_precip), int(missing_temp)
+
+
+def mesonet_csv(years: float, seed: int = 0) -> str:
+    """
+    Builds a Mesonet-style ASOS CSV with routine and special reports, "M" gaps and "T" traces.
+
+    :param years: The length of the record.
+    :type years: float
+    :param seed: The random seed, defaults to 0.
+    :type seed: int, optional
+    :return: The CSV text.
+    :rtype: str
+    """
+    rng = np.random.default_rng(seed)
+    valid = pd.date_range("2015-01-01 00:53", periods=int(years * 8766), freq="h")
+    valid = valid.append(valid[rng.random(len(valid)) < 0.3] + pd.Timedelta(minutes=-20)).sort_values()
+    count = len(valid)
+    data = {"station": "FNL", "valid": valid.strftime("%Y-%m-%d %H:%M")}
+    for column in COLUMNS[2:]:
+        values = pd.Series(rng.normal(50, 10, count).round(1)).astype(str)
+        values[rng.random(count) < 0.1] = "M"
+        data[column] = values
+    data["p01m"] = pd.Series(rng.exponential(0.5, count).round(2)).astype(str)
+    data["p01m"][rng.random(count) < 0.1] = "M"
+    data["p01m"][rng.random(count) < 0.05] = "T"
+    data["skyc1"] = rng.choice(["CLR", "OVC", "BKN", "M"], count)
+    return pd.DataFrame(data)[COLUMNS].to_csv(index=False)
+
+
+class TestProcessAsosCsv(unittest.TestCase):
+    """The vectorized reader against the legacy implementation."""
+
+    def test_matches_legacy_implementation(self):
+        text = mesonet_csv(0.1)
+        df, missing_precip, missing_temp = process_asos_csv(io.StringIO(text))
+        legacy, legacy_precip, legacy_temp = legacy_process_asos_csv(io.StringIO(text))
+        self.assertEqual((missing_precip, missing_temp), (legacy_precip, legacy_temp))
+        self.assertEqual(list(df.columns), list(legacy.columns))
+        pd.testing.assert_frame_equal(df, legacy, check_dtype=False)
+        self.assertEqual(df["hour_updated"].iloc[0], pd.Timestamp("2015-01-01 01:00"))
+
+    def test_empty_file(self):
+        df, missing_precip, missing_temp = process_asos_csv(io.StringIO(",".join(COLUMNS) + "\n"))
+        self.assertTrue(df.empty)
+        self.assertEqual((missing_precip, missing_temp), (0, 0))
+
+    def test_multi_year_matches_legacy(self):
+        text = mesonet_csv(5)
+        df, missing_precip, missing_temp = process_asos_csv(io.StringIO(text))
+        legacy, legacy_precip, legacy_temp = legacy_process_asos_csv(io.StringIO(text))
+        self.assertEqual((missing_precip, missing_temp), (legacy_precip, legacy_temp))
+        pd.testing.assert_frame_equal(df, legacy, check_dtype=False)
+
+
+class FakeMesonetService:
+    """Answers asos.py requests for any set of ``station=`` parameters from per-station report tables."""
+
+    def __init__(self, reports) -> None:
+        self.reports = reports
+        self.requested = []
+
+    def __call__(self, url, **kwargs):
+        stations = parse_qs(urlparse(url).query)["station"]
+        self.requested.append(stations)
+        frames = [self.reports[station] for station in stations if station in self.reports]
+        text = pd.concat(frames).to_csv(index=False) if frames else ",".join(COLUMNS) + "\n"
+        return FakeResponse(text)
+
+
+def station_reports(station: str, seed: int) -> pd.DataFrame:
+    """Builds a week of raw reports of one station."""
+    reports = pd.read_csv(io.StringIO(mesonet_csv(0.02, seed=seed)), dtype=str)
+    return reports.assign(station=station)
+
+
+class TestMultiStationRequests(unittest.TestCase):
+    """Multi-station windows and fallback scans request many stations at once."""
+
+    def setUp(self):
+        reports = {"FNL": station_reports("FNL", 1), "DEN": station_reports("DEN", 2)}
+        self.service = FakeMesonetService(reports)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        reset_host_limits(self, patch.dict(asos_cache._SETTINGS, {"cache_dir": self.temp_dir.name}),
+                          fake_get=self.service)
+
+    def test_batch_is_split_by_station(self):
+        frames = fetch_asos_days_batch(["FNL", "DEN", "XXX"], datetime(2015, 1, 1), datetime(2015, 1, 8))
+        self.assertEqual(self.service.requested, [["FNL", "DEN", "XXX"]])
+        single, _, _ = process_asos_csv(io.StringIO(self.service.reports["DEN"].to_csv(index=False)))
+        np.testing.assert_array_equal(frames["DEN"]["tmpf"].to_numpy(), single["tmpf"].to_numpy())
+        self.assertEqual(str(frames["FNL"]["datetime"].dt.tz), "UTC")
+        self.assertTrue(frames["XXX"].empty)
+
+    def test_fallback_scan_costs_one_request(self):
+        cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        try:
+            meta = {}
+            station_id, df, missing_precip, _ = get_asos_data_from_stations(
+                ["AAA", "DEN", "FNL"], ASOS_BASE_URL, datetime(2015, 1, 1), datetime(2015, 1, 8), meta, meta)
+            self.assertEqual(station_id, "DEN")
+            single, single_precip, _ = process_asos_csv(io.StringIO(self.service.reports["DEN"].to_csv(index=False)))
+            pd.testing.assert_frame_equal(df, single)
+            self.assertEqual(missing_precip, single_precip)
+            self.assertIn("DEN", meta["saved_complete"])
+            # Nothing is written to the working directory.
+            self.assertEqual(os.listdir(self.temp_dir.name), [])
+            with self.assertRaises(ValueError):
+                get_asos_data_from_stations(["AAA", "BBB"], ASOS_BASE_URL, datetime(2015, 1, 1),
+                                            datetime(2015, 1, 8))
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(self.service.requested, [["AAA", "DEN", "FNL"], ["AAA", "BBB"]])
+
+if __name__ == "__main__":
+    unittest.main()
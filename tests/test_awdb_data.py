@@ -0,0 +1,126 @@
+"""
+Offline tests for the one-pass AWDB ``/data`` decoder and windowed requests.
+
+``legacy_station_frame`` is the previous per-block outer-merge implementation, kept here as the
+reference the decoder must reproduce.
+"""
+import threading
+import time
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import host_limits
+from awdb_functions import _station_data_frame, get_awdb_element_data
+from http_fakes import FakeResponse, reset_host_limits
+
+DEPTHS = [-2, -4, -8, -20, -40]
+
+
+def legacy_station_frame(station):
+    merged = None
+    for element_block in station.get("data", []):
+        meta = element_block["stationElement"]
+        name = meta["elementCode"]
+        if meta.get("heightDepth") is not None:
+            name = name + "_" + str(meta["heightDepth"]) + "in"
+        series = pd.DataFrame(element_block["values"])
+        if series.empty:
+            continue
+        series = series.rename(columns={"value": name})[["date", name]]
+        merged = series if merged is None else merged.merge(series, on="date", how="outer")
+    merged["datetime"] = pd.to_datetime(merged["date"])
+    return merged.drop(columns=["date"]).sort_values("datetime").reset_index(drop=True)
+
+
+def soil_station(start: str, end: str, seed: int = 0):
+    """Builds a ``/data`` station record of hourly soil moisture at several depths with gaps."""
+    rng = np.random.default_rng(seed)
+    hours = pd.date_range(start, end, freq="h")
+    blocks = []
+    for depth in DEPTHS:
+        kept = hours[rng.random(len(hours)) > 0.05]
+        blocks.append({"stationElement": {"elementCode": "SMS", "heightDepth": depth},
+                       "values": [{"date": hour.strftime("%Y-%m-%d %H:%M"), "value": round(value, 1)}
+                                  for hour, value in zip(kept, rng.uniform(5, 40, len(kept)))]})
+    return {"stationTriplet": "2017:CO:SCAN", "data": blocks}
+
+
+class FakeAwdbData:
+    """Serves ``/data`` windows from one station record, recording the windows and peak concurrency."""
+
+    def __init__(self, station) -> None:
+        self.station = station
+        self.windows = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, url, params=None, **kwargs):
+        with self.lock:
+            self.windows.append((params["beginDate"], params["endDate"]))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        blocks = [dict(block, values=[value for value in block["values"]
+                                      if params["beginDate"] <= value["date"] <= params["endDate"]])
+                  for block in self.station["data"]]
+        with self.lock:
+            self.active -= 1
+        return FakeResponse(payload=[dict(self.station, data=blocks)])
+
+
+class TestAwdbDecoding(unittest.TestCase):
+    """The one-pass decoder against the legacy merge."""
+
+    def test_matches_legacy_merge(self):
+        station = soil_station("2023-01-01", "2023-02-01")
+        station["data"].append({"stationElement": {"elementCode": "TOBS"}, "values": []})
+        frame = _station_data_frame(station)
+        pd.testing.assert_frame_equal(frame, legacy_station_frame(station), check_like=True)
+        self.assertEqual(list(frame.columns)[-1], "datetime")
+
+    def test_repeated_sensor_fills_gaps(self):
+        station = {"data": [
+            {"stationElement": {"elementCode": "WTEQ"}, "values": [{"date": "2024-01-01", "value": 1.0},
+                                                                   {"date": "2024-01-02", "value": None}]},
+            {"stationElement": {"elementCode": "WTEQ"}, "values": [{"date": "2024-01-02", "value": 2.0},
+                                                                   {"date": "2024-01-03", "value": 3.0}]}]}
+        frame = _station_data_frame(station)
+        self.assertEqual(list(frame["WTEQ"]), [1.0, 2.0, 3.0])
+        self.assertIsNone(_station_data_frame({"data": []}))
+
+    def test_multi_year_matches_legacy(self):
+        station = soil_station("2021-01-01", "2022-12-31", seed=1)
+        pd.testing.assert_frame_equal(_station_data_frame(station), legacy_station_frame(station),
+                                      check_like=True)
+
+
+class TestWindowedRequests(unittest.TestCase):
+    """Long periods are requested as parallel windows and stitched back together."""
+
+    def setUp(self):
+        self.service = FakeAwdbData(soil_station("2022-12-01", "2024-01-31", seed=2))
+        limits = {host_limits.AWDB_HOST: {"concurrency": 3, "delay_seconds": 0.0}}
+        reset_host_limits(self, fake_get=self.service, limits=limits)
+
+    def test_twelve_month_pull_is_windowed(self):
+        start, end = datetime(2023, 1, 1), datetime(2023, 12, 31, 23)
+        df = get_awdb_element_data("2017:CO:SCAN", ["SMS:*"], start, end, utc_offset_hours=-7.0)
+        self.assertEqual(len(self.service.windows), 4)
+        self.assertEqual(self.service.windows[0], ("2023-01-01 00:00", "2023-04-02 23:00"))
+        self.assertEqual(self.service.windows[1][0], "2023-04-03 00:00")
+        self.assertEqual(self.service.windows[-1][1], "2023-12-31 23:00")
+        self.assertLessEqual(self.service.peak, 3)
+        single = get_awdb_element_data("2017:CO:SCAN", ["SMS:*"], start, end, utc_offset_hours=-7.0,
+                                       window_days=400)
+        self.assertEqual(len(self.service.windows), 5)
+        pd.testing.assert_frame_equal(df, single)
+        self.assertTrue(df["datetime"].is_monotonic_increasing)
+        self.assertEqual(df["datetime"].iloc[0], pd.Timestamp("2023-01-01 07:00", tz="UTC"))
+
+
+if __name__ == "__main__":
+    unittest.main()
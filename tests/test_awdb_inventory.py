@@ -0,0 +1,122 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import pandas as pd
+
+import awdb_functions
+import metadata_cache
+from awdb_functions import (find_best_scan_station, find_best_scan_stations, get_awdb_element_matrix,
+                            get_awdb_inventory, get_element_begin_dates)
+from http_fakes import FakeResponse, reset_host_limits
+from swe_assimilation import sample_basin_snotel
+
+STATIONS = [
+    {"stationTriplet": "2017:CO:SCAN", "name": "Nunn #1", "latitude": 40.87, "longitude": -104.73,
+     "elevation": 5400.0},
+    {"stationTriplet": "2189:CO:SCAN", "name": "CPER", "latitude": 40.82, "longitude": -104.76,
+     "elevation": 5350.0},
+    {"stationTriplet": "2190:CO:SCAN", "name": "No soil", "latitude": 40.60, "longitude": -105.07,
+     "elevation": 5000.0},
+    {"stationTriplet": "2001:WY:SCAN", "name": "Far", "latitude": 44.0, "longitude": -107.0,
+     "elevation": 6000.0},
+    {"stationTriplet": "713:CO:SNTL", "name": "Joe Wright", "latitude": 40.54, "longitude": -105.89,
+     "elevation": 10120.0},
+    {"stationTriplet": "1123:CO:SNTL", "name": "New site", "latitude": 40.60, "longitude": -105.80,
+     "elevation": 10500.0},
+]
+ELEMENTS = {
+    "2017:CO:SCAN": [{"elementCode": "SMS", "durationName": "HOURLY", "beginDate": "1997-03-17 00:00"},
+                     {"elementCode": "SMS", "durationName": "DAILY", "beginDate": "1990-01-01 00:00"}],
+    "2189:CO:SCAN": [{"elementCode": "SMS", "durationName": "HOURLY", "beginDate": "2013-06-01 00:00"}],
+    "2190:CO:SCAN": [{"elementCode": "TOBS", "durationName": "HOURLY", "beginDate": "2000-01-01 00:00"}],
+    "2001:WY:SCAN": [{"elementCode": "SMS", "durationName": "HOURLY", "beginDate": "1995-01-01 00:00"}],
+    "713:CO:SNTL": [{"elementCode": "WTEQ", "durationName": "DAILY", "beginDate": "1978-10-01 00:00"}],
+    "1123:CO:SNTL": [{"elementCode": "WTEQ", "durationName": "DAILY", "beginDate": "2023-10-01 00:00"}],
+}
+
+
+# Daily WTEQ (inches) served by /data: 713 reports every day, 1123 has no record before its begin.
+SWE_INCHES = {"713:CO:SNTL": 10.0}
+
+
+class FakeAwdb:
+    """Answers AWDB ``/stations`` listings, element metadata and ``/data`` requests for comma-separated
+    station triplets."""
+
+    def __init__(self) -> None:
+        self.requests = []
+
+    def __call__(self, url, params=None, **kwargs):
+        self.requests.append(dict(params))
+        triplets = params["stationTriplets"].split(",")
+        if url.endswith("/data"):
+            days = pd.date_range(params["beginDate"], params["endDate"], freq="D")
+            return FakeResponse(payload=[{"stationTriplet": triplet, "data": [{
+                "stationElement": {"elementCode": "WTEQ"},
+                "values": [{"date": str(day.date()), "value": SWE_INCHES[triplet] + number}
+                           for number, day in enumerate(days)]}]}
+                for triplet in triplets if triplet in SWE_INCHES])
+        if len(triplets) == 1 and triplets[0].startswith("*"):
+            network = triplets[0].split(":")[2]
+            return FakeResponse(payload=[station for station in STATIONS
+                                         if station["stationTriplet"].endswith(":" + network)])
+        return FakeResponse(payload=[dict(station, stationElements=ELEMENTS[station["stationTriplet"]])
+                                     for station in STATIONS if station["stationTriplet"] in triplets])
+
+
+class TestAwdbInventory(unittest.TestCase):
+    """Offline tests of the cached AWDB inventory and one-pass station selection."""
+
+    def setUp(self):
+        self.service = FakeAwdb()
+        reset_host_limits(self, patch.dict(metadata_cache._SETTINGS, {"cache_dir": ""}),
+                          patch.dict(awdb_functions._AWDB_INDEXES, clear=True), fake_get=self.service)
+
+    def test_begin_dates_are_requested_in_batches(self):
+        triplets = ["2017:CO:SCAN", "2189:CO:SCAN", "2190:CO:SCAN", "2017:CO:SCAN"]
+        begins = get_element_begin_dates(triplets, batch_size=2)
+        self.assertEqual(begins, {"2017:CO:SCAN": "1997-03-17", "2189:CO:SCAN": "2013-06-01",
+                                  "2190:CO:SCAN": None})
+        self.assertEqual([request["stationTriplets"] for request in self.service.requests],
+                         ["2017:CO:SCAN,2189:CO:SCAN", "2190:CO:SCAN"])
+
+    def test_inventory_lists_element_begin(self):
+        inventory = get_awdb_inventory("SCAN")
+        self.assertEqual(list(inventory["element_begin"].fillna("")),
+                         ["1997-03-17", "2013-06-01", "", "1995-01-01"])
+        self.assertEqual(len(self.service.requests), 2)
+
+    def test_fleet_selection_runs_offline_after_first_build(self):
+        best = find_best_scan_station(40.588, -105.069)
+        self.assertEqual(best["stationTriplet"], "2017:CO:SCAN")
+        self.assertEqual(best["element_begin"], "1997-03-17")
+        self.assertLess(best["distance_km"], 75.0)
+        self.assertNotIn("query", best)
+        requests_made = len(self.service.requests)
+        fleet = find_best_scan_stations([40.588, 40.80, 30.0], [-105.069, -104.70, -90.0])
+        self.assertEqual([record and record["stationTriplet"] for record in fleet],
+                         ["2017:CO:SCAN", "2017:CO:SCAN", None])
+        self.assertEqual(len(self.service.requests), requests_made)
+
+    def test_basin_sampling_skips_sites_without_record(self):
+        samples = sample_basin_snotel([-106.0, 40.0, -105.5, 41.0], datetime(2022, 1, 1))
+        self.assertEqual(list(samples["triplet"]), ["713:CO:SNTL"])
+        self.assertAlmostEqual(samples["swe_mm"].iloc[0], 254.0)
+        data_requests = [request for request in self.service.requests if "elements" in request]
+        self.assertEqual([request["stationTriplets"] for request in data_requests], ["713:CO:SNTL"])
+
+    def test_element_matrix_is_dense_and_batched(self):
+        triplets = ["713:CO:SNTL", "1123:CO:SNTL", "713:CO:SNTL"]
+        matrix = get_awdb_element_matrix(triplets, "WTEQ", datetime(2024, 1, 1), datetime(2024, 1, 5, 12),
+                                         batch_size=1)
+        self.assertEqual(list(matrix.index), ["713:CO:SNTL", "1123:CO:SNTL"])
+        self.assertEqual(list(matrix.columns), list(pd.date_range("2024-01-01", "2024-01-05")))
+        self.assertEqual(list(matrix.loc["713:CO:SNTL"]), [10.0, 11.0, 12.0, 13.0, 14.0])
+        self.assertTrue(matrix.loc["1123:CO:SNTL"].isna().all())
+        self.assertEqual([request["stationTriplets"] for request in self.service.requests],
+                         ["713:CO:SNTL", "1123:CO:SNTL"])
+
+
+if __name__ == "__main__":
+    unittest.main()
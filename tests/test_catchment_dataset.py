@@ -2,11 +2,46 @@ from datetime import datetime
 import json
 import os
 import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import CancelledError
+from unittest.mock import patch
 
 import pandas as pd
 
-from catchment_dataset import build_catchment_bundle, usgs_to_hourly_utc
+import catchment_dataset
+import host_limits
+from catchment_dataset import build_catchment_bundle, fetch_hourly_chunk, usgs_to_hourly_utc
+from host_limits import host_slot
+from http_fakes import reset_host_limits, start_patches
+
+HOURS = pd.date_range("2023-06-01 00:00", "2023-06-01 05:00", freq="h", tz="UTC")
+DISCOVERY = {"static": {"dec_lat_va": 40.0, "dec_long_va": -105.0},
+             "asos_station": {"station_id": "FNL"},
+             "scan_station": {"stationTriplet": "2017:CO:SCAN", "distance_km": 10.0, "dataTimeZone": -7.0}}
+
+
+FAKE_HOST = "example.test"
+
+
+def slow_source(seconds: float, frame: pd.DataFrame):
+    """
+    Returns a fake fetch that holds a request slot of :data:`FAKE_HOST` for a while before returning a
+    frame (or raising an exception instance).
+    """
+    def fetch(*args, **kwargs):
+        with host_slot(FAKE_HOST):
+            time.sleep(seconds)
+        if isinstance(frame, Exception):
+            raise frame
+        return frame.copy()
+    return fetch
+
+
+def usgs_raw_frame() -> pd.DataFrame:
+    local = HOURS.tz_convert("America/Denver").strftime("%Y-%m-%d %H:%M")
+    return pd.DataFrame({"tz_cd": "MST", "datetime": local, "cfs": "100"})
 
 
 class TestCatchmentBundle(unittest.TestCase):
@@ -68,6 +103,72 @@ class TestCatchmentBundle(unittest.TestCase):
         self.assertLess(daily_pet, 20.0)
 
 
+class TestConcurrentChunkSources(unittest.TestCase):
+    """Offline tests of the concurrent per-source fetch of one chunk."""
+
+    def setUp(self):
+        reset_host_limits(self, limits={FAKE_HOST: {"concurrency": 4, "delay_seconds": 0.0}})
+
+    def run_chunk(self, asos=None, scan=None, nldas=None, delay=0.2, **kwargs):
+        asos = pd.DataFrame({"datetime": HOURS, "tmpf": 60.0}) if asos is None else asos
+        scan = pd.DataFrame({"datetime": HOURS, "SMS_-2in": 20.0}) if scan is None else scan
+        nldas = pd.DataFrame({"datetime": HOURS, "potential_evaporation": -0.1}) if nldas is None else nldas
+        fakes = {"make_usgs_data": usgs_raw_frame(), "get_hourly_asos": asos, "get_scan_soil_moisture": scan,
+                 "get_nldas_forcing": nldas}
+        start_patches(self, *(patch.object(catchment_dataset, name, side_effect=slow_source(delay, frame))
+                              for name, frame in fakes.items()))
+        return fetch_hourly_chunk("06752260", HOURS[0].to_pydatetime(), HOURS[-1].to_pydatetime(),
+                                  DISCOVERY, include_nldas=True, **kwargs)
+
+    def test_sources_overlap(self):
+        hourly = self.run_chunk()
+        self.assertEqual(host_limits.get_limiter(FAKE_HOST).max_in_flight, 4)
+        self.assertEqual(list(hourly.columns)[:4], ["datetime", "cfs", "tmpf", "SMS_-2in"])
+        self.assertEqual(hourly["pet_mm_hr"].iloc[0], 0.0)
+        self.assertEqual(len(hourly), len(HOURS))
+        self.assertEqual(hourly.attrs["failed_sources"], {})
+
+    def test_failing_and_slow_sources_are_left_out(self):
+        hourly = self.run_chunk(asos=ConnectionError("IEM down"), delay=0.1, source_timeouts={"nldas": 0.05})
+        self.assertNotIn("tmpf", hourly.columns)
+        self.assertNotIn("pet_mm_hr", hourly.columns)
+        self.assertIn("SMS_-2in", hourly.columns)
+        failed = hourly.attrs["failed_sources"]
+        self.assertEqual(sorted(failed), ["asos", "nldas"])
+        self.assertIsInstance(failed["nldas"], TimeoutError)
+
+    def test_time_queued_for_a_host_slot_is_not_counted(self):
+        host_limits.HOST_LIMITS[FAKE_HOST]["concurrency"] = 1
+        # Four sources take turns on the one slot (0.4 s in all); each only needs 0.1 s once it has it.
+        hourly = self.run_chunk(delay=0.1, source_timeouts={"asos": 0.3, "scan": 0.3, "nldas": 0.3})
+        self.assertEqual(hourly.attrs["failed_sources"], {})
+        self.assertIn("pet_mm_hr", hourly.columns)
+
+    def test_usgs_failure_raises_and_cancels_the_other_sources(self):
+        release, finished, outcomes = threading.Event(), threading.Semaphore(0), []
+
+        def blocked_source(*args, **kwargs):
+            outcomes.append("waited out" if not release.wait(5.0) else "released")
+            try:
+                with host_slot(FAKE_HOST):
+                    outcomes.append("sent")
+            except CancelledError:
+                outcomes.append("cancelled")
+            finally:
+                finished.release()
+            return pd.DataFrame()
+
+        with patch.object(catchment_dataset, "make_usgs_data", side_effect=ValueError("NWIS 503")), \
+                patch.object(catchment_dataset, "get_hourly_asos", side_effect=blocked_source), \
+                patch.object(catchment_dataset, "get_scan_soil_moisture", side_effect=blocked_source):
+            with self.assertRaises(ValueError):
+                fetch_hourly_chunk("06752260", HOURS[0].to_pydatetime(), HOURS[-1].to_pydatetime(), DISCOVERY)
+            release.set()
+            for _ in range(2):
+                self.assertTrue(finished.acquire(timeout=5.0))
+        self.assertEqual(sorted(outcomes), ["cancelled", "cancelled", "released", "released"])
+
+
 class TestUsgsHourlyConversion(unittest.TestCase):
     """Offline test of the USGS raw-to-hourly-UTC conversion."""
 
@@ -80,9 +181,8 @@ class TestUsgsHourlyConversion(unittest.TestCase):
         hourly = usgs_to_hourly_utc(raw)
         self.assertEqual(len(hourly), 2)
         self.assertEqual(hourly["cfs"].iloc[0], 100.0)
-        # The repo's timezone_map maps MST to America/Denver, which observes DST: on June 1 the zone
-        # is UTC-6, so 05:00 local becomes 11:00 UTC.
-        self.assertEqual(hourly["datetime"].iloc[0].hour, 11)
+        # tz_cd names the offset in effect: MST is UTC-7 all year, so 05:00 local becomes 12:00 UTC.
+        self.assertEqual(hourly["datetime"].iloc[0].hour, 12)
 
 
 if __name__ == "__main__":
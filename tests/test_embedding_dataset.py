@@ -0,0 +1,136 @@
+"""
+Offline tests for the batched NWIS daily-values fetch and the prefetch in the embedding collection.
+"""
+from datetime import datetime
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import requests
+
+import embedding_dataset
+from embedding_dataset import get_daily_flow, get_daily_flow_batch, run_state_collection
+from host_limits import CircuitOpenError
+from http_fakes import FakeResponse, reset_host_limits
+
+
+def dv_block(site: str, ts_id: str, values) -> str:
+    """
+    Builds the daily-values RDB table of one site as NWIS emits it inside a multi-site response.
+
+    :param site: The site number.
+    :type site: str
+    :param ts_id: The discharge time-series id.
+    :type ts_id: str
+    :param values: (date, daily mean) pairs.
+    :type values: list
+    :return: The RDB text of the site's table.
+    :rtype: str
+    """
+    lines = ["# Data provided for site " + site,
+             "#    TS_ID       Parameter Statistic     Description",
+             "#    " + ts_id + "       00060     00003     Discharge, cubic feet per second (Mean)",
+             "#",
+             "agency_cd\tsite_no\tdatetime\t{0}_00060_00003\t{0}_00060_00003_cd".format(ts_id),
+             "5s\t15s\t20d\t14n\t10s"]
+    lines += ["USGS\t%s\t%s\t%s\tA" % (site, date, value) for date, value in values]
+    return "\n".join(lines) + "\n"
+
+
+MULTI_SITE_DV = ("# retrieved: 2025-05-18\n#\n" +
+                 dv_block("06752260", "1001", [("2024-01-01", "12.5"), ("2024-01-02", "Ice"),
+                                               ("2024-01-03", "13")]) +
+                 dv_block("06752280", "2002", [("2024-01-01", "4.1")]))
+
+
+def requested_sites(url: str) -> list:
+    return url.split("sites=")[1].split("&")[0].split(",")
+
+
+class TestDailyValuesBatch(unittest.TestCase):
+    """Batched dv requests over a stubbed NWIS service."""
+
+    def setUp(self):
+        reset_host_limits(self)
+
+    def test_multi_site_response_is_split_per_gauge(self):
+        response = FakeResponse(MULTI_SITE_DV)
+        with patch.object(embedding_dataset.requests, "get", return_value=response) as mocked:
+            histories = get_daily_flow_batch(["06752260", "06752280", "06753000"], datetime(2024, 1, 1),
+                                             datetime(2024, 1, 3))
+        self.assertEqual(mocked.call_count, 1)
+        self.assertEqual(requested_sites(mocked.call_args.args[0]), ["06752260", "06752280", "06753000"])
+        self.assertEqual(list(histories["06752260"]["date"]), ["2024-01-01", "2024-01-02", "2024-01-03"])
+        np.testing.assert_array_equal(histories["06752260"]["cfs"].to_numpy(), [12.5, np.nan, 13.0])
+        self.assertEqual(histories["06752280"]["cfs"].tolist(), [4.1])
+        self.assertTrue(histories["06753000"].empty)
+
+    def test_failed_batch_is_split_and_failing_gauge_left_out(self):
+        requested = []
+
+        def fake_get(url, timeout=None, stream=False):
+            sites = requested_sites(url)
+            requested.append(sites)
+            if len(sites) > 1 or sites == ["06753000"]:
+                raise requests.Timeout("read timed out")
+            return FakeResponse(MULTI_SITE_DV)
+
+        with patch.object(embedding_dataset.requests, "get", side_effect=fake_get):
+            histories = get_daily_flow_batch(["06752260", "06753000"], datetime(2024, 1, 1),
+                                             datetime(2024, 1, 3))
+        self.assertEqual(requested, [["06752260", "06753000"], ["06752260"], ["06753000"]])
+        self.assertEqual(list(histories), ["06752260"])
+
+    def test_open_circuit_stops_the_fleet(self):
+        throttled = FakeResponse("", status_code=429, headers={"Retry-After": "600"})
+        with patch.object(embedding_dataset.requests, "get", return_value=throttled) as mocked:
+            with self.assertRaises(CircuitOpenError):
+                get_daily_flow_batch(["06752260", "06753000"], datetime(2024, 1, 1), datetime(2024, 1, 3))
+        self.assertEqual(mocked.call_count, 1)
+
+    def test_single_gauge_fetch_raises_and_handles_404(self):
+        with patch.object(embedding_dataset.requests, "get", return_value=FakeResponse("", 404)):
+            self.assertTrue(get_daily_flow("06752260", datetime(2024, 1, 1), datetime(2024, 1, 3)).empty)
+        with patch.object(embedding_dataset.requests, "get", return_value=FakeResponse("", 500)):
+            with self.assertRaises(requests.HTTPError):
+                get_daily_flow("06752260", datetime(2024, 1, 1), datetime(2024, 1, 3))
+
+
+class TestStateCollectionPrefetch(unittest.TestCase):
+    """The state collection prefetches every pending history before per-gauge work starts."""
+
+    def test_histories_prefetched_once_and_passed_to_gauges(self):
+        gauges = pd.DataFrame({"site_no": ["06752260", "06752280", "09999999"],
+                               "station_nm": ["A", "B", "C"], "dec_lat_va": [40.0, 40.1, 40.2],
+                               "dec_long_va": [-105.0, -105.1, -105.2]})
+        static = pd.DataFrame({"DRAIN_SQKM": [10.0, 20.0]}, index=["06752260", "06752280"])
+        flow = pd.DataFrame({"date": ["2024-01-01"], "cfs": [1.0]})
+        calls = []
+
+        def fake_batch(sites, start, end):
+            calls.append(("batch", list(sites)))
+            return {"06752260": flow}
+
+        def fake_collect(site, *args, flow=None, **kwargs):
+            calls.append(("collect", site, flow))
+            return {"site_no": site, "status": "ok"}
+
+        static_result = (static, ["DRAIN_SQKM"])
+        with tempfile.TemporaryDirectory() as output_root, \
+                patch.object(embedding_dataset, "download_gages2"), \
+                patch.object(embedding_dataset, "build_static_matrix", return_value=static_result), \
+                patch.object(embedding_dataset, "list_state_gauges", return_value=gauges), \
+                patch.object(embedding_dataset, "get_daily_flow_batch", side_effect=fake_batch), \
+                patch.object(embedding_dataset, "collect_gauge_record", side_effect=fake_collect):
+            manifest = run_state_collection("CO", output_root=output_root, gages2_zip_path="unused.zip")
+        self.assertEqual(calls[0], ("batch", ["06752260", "06752280"]))
+        self.assertIs(calls[1][2], flow)
+        self.assertIsNone(calls[2][2])
+        self.assertEqual([call[1] for call in calls[1:]], ["06752260", "06752280", "09999999"])
+        self.assertEqual(len(manifest), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,15 @@ import os
 import tempfile
 import unittest
 import zipfile
+from unittest.mock import patch
 
+import numpy as np
 import pandas as pd
 
-from gages2_functions import (download_gages2, load_gages2_table, get_gages2_attributes,
-                              INNER_ZIP_NAME, DEFAULT_TABLES)
+import gages2_functions
+from embedding_dataset import build_static_matrix
+from gages2_functions import (download_gages2, load_gages2_table, get_gages2_attributes, gauge_in_gages2,
+                              gages2_store_dir, open_gages2_store, INNER_ZIP_NAME, DEFAULT_TABLES)
 
 # Reuse an already-downloaded archive when available (e.g. a local dev cache) to avoid re-downloading
 # the ~55 MB file; CI falls back to a real download once per run.
@@ -57,6 +61,137 @@ class TestGages2Offline(unittest.TestCase):
             get_gages2_attributes("99999999", self.zip_path, tables=["conterm_topo.txt"])
 
 
+def make_fleet_archive(path: str, gauges: int = 3000) -> None:
+    """
+    Builds a GAGES-II-shaped archive with every default table (mixed dtypes, gauges missing from some
+    tables and a column repeated across tables) for the store tests.
+
+    :param path: Where to write the synthetic outer zip.
+    :type path: str
+    :param gauges: The number of gauges, defaults to 3000.
+    :type gauges: int, optional
+    :return: None
+    :rtype: None
+    """
+    rng = np.random.default_rng(0)
+    staids = ["%08d" % (1000000 + number * 7) for number in range(gauges)]
+    inner_buffer = io.BytesIO()
+    with zipfile.ZipFile(inner_buffer, "w") as inner:
+        for position, table_name in enumerate(DEFAULT_TABLES):
+            table = pd.DataFrame({"STAID": staids})
+            for column in range(20):
+                table["ATTR_%d_%d" % (position, column)] = rng.normal(size=gauges).round(3)
+            table["CLASS_%d" % position] = rng.integers(0, 5, gauges)
+            table["NOTE_%d" % position] = rng.choice(["Ref", "Non-ref", None], gauges)
+            if position in (0, 5):
+                table["DRAIN_SQKM"] = rng.uniform(1, 1000, gauges).round(2)
+            inner.writestr(table_name, table.iloc[position:].to_csv(index=False))
+        # A non-default table with a gauge no default table has, like the Alaska/Hawaii/Puerto Rico ones.
+        inner.writestr("AKHIPR_basinid.txt", pd.DataFrame({"STAID": [staids[0], "15000000"],
+                                                           "DRAIN_SQKM": [1.0, 2.0]}).to_csv(index=False))
+    with zipfile.ZipFile(path, "w") as outer:
+        outer.writestr(INNER_ZIP_NAME, inner_buffer.getvalue())
+
+
+def legacy_attributes(site_number: str, zip_path: str, tables):
+    """The previous per-call implementation, kept as the reference of the store."""
+    attributes = {}
+    for table_name in tables:
+        table = load_gages2_table(table_name, zip_path)
+        row = table[table["STAID"] == site_number]
+        if row.empty:
+            raise KeyError(site_number)
+        record = row.iloc[0].to_dict()
+        record.pop("STAID", None)
+        attributes.update(record)
+    return attributes
+
+
+def legacy_static_matrix(zip_path: str):
+    merged = None
+    for table_name in DEFAULT_TABLES:
+        table = load_gages2_table(table_name, zip_path).set_index("STAID")
+        numeric = table.select_dtypes(include=[np.number])
+        merged = numeric if merged is None else merged.join(numeric, how="outer", rsuffix="_dup")
+    return merged
+
+
+class TestGages2Store(unittest.TestCase):
+    """The converted binary store against the nested-zip reads it replaces."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.zip_path = os.path.join(self.temp_dir.name, "gages2.zip")
+        make_fleet_archive(self.zip_path)
+        patcher = patch.dict(gages2_functions._STORES, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_attributes_match_legacy(self):
+        for site in ["01000035", "01000042", "01020993"]:
+            expected = legacy_attributes(site, self.zip_path, DEFAULT_TABLES)
+            attributes = get_gages2_attributes(site, self.zip_path)
+            self.assertEqual(list(attributes), list(expected))
+            for name, value in expected.items():
+                if isinstance(value, float) and np.isnan(value):
+                    self.assertTrue(np.isnan(attributes[name]), name)
+                else:
+                    self.assertEqual(attributes[name], value, name)
+        self.assertIsInstance(attributes["CLASS_0"], int)
+        # Table i skips the first i gauges, so 01000007 is in basinid but not in topo.
+        self.assertTrue(gauge_in_gages2("01000007", self.zip_path))
+        self.assertFalse(gauge_in_gages2("99999999", self.zip_path))
+        with self.assertRaises(KeyError):
+            get_gages2_attributes("01000007", self.zip_path)
+
+    def test_static_matrix_matches_outer_join(self):
+        matrix, columns = build_static_matrix(self.zip_path)
+        expected = legacy_static_matrix(self.zip_path)
+        self.assertEqual(columns, list(expected.columns))
+        self.assertIn("DRAIN_SQKM_dup", columns)
+        np.testing.assert_array_equal(matrix.index.to_numpy(), expected.index.to_numpy())
+        np.testing.assert_allclose(matrix.to_numpy(), expected.to_numpy(dtype=np.float64))
+        self.assertNotIn("15000000", matrix.index)
+        self.assertTrue(open_gages2_store(self.zip_path).contains("15000000", "AKHIPR_basinid.txt"))
+
+    def test_rebuilt_when_archive_changes(self):
+        store = open_gages2_store(self.zip_path)
+        self.assertIs(open_gages2_store(self.zip_path), store)
+        make_synthetic_archive(self.zip_path)
+        os.utime(self.zip_path, ns=(store.manifest["archive"]["mtime_ns"] + 10 ** 9,) * 2)
+        self.assertEqual(get_gages2_attributes("06752260", self.zip_path, tables=["conterm_topo.txt"]),
+                         {"SLOPE_PCT": 21.3})
+        gages2_functions._STORES.clear()
+        self.assertEqual(len(open_gages2_store(self.zip_path).staids), 2)
+        self.assertTrue(os.path.exists(os.path.join(gages2_store_dir(self.zip_path), "manifest.json")))
+
+    def test_rebuild_leaves_open_arrays_readable(self):
+        store = open_gages2_store(self.zip_path)
+        matrix, _ = store.static_matrix()
+        expected = matrix.to_numpy().copy()
+        attributes = store.attributes("01000042", DEFAULT_TABLES)
+        make_synthetic_archive(self.zip_path)
+        os.utime(self.zip_path, ns=(store.manifest["archive"]["mtime_ns"] + 10 ** 9,) * 2)
+        rebuilt = open_gages2_store(self.zip_path)
+        self.assertEqual(rebuilt.manifest["version"], store.manifest["version"] + 1)
+        # The earlier store and its frame keep reading their own (now unlinked) version.
+        np.testing.assert_array_equal(matrix.to_numpy(), expected)
+        pd.testing.assert_series_equal(pd.Series(store.attributes("01000042", DEFAULT_TABLES)),
+                                       pd.Series(attributes))
+        arrays = [name for name in os.listdir(gages2_store_dir(self.zip_path)) if name.endswith(".npy")]
+        self.assertTrue(all(".v%d." % rebuilt.manifest["version"] in name for name in arrays))
+
+    def test_lookups_do_not_reopen_the_archive(self):
+        sites = ["%08d" % (1000000 + number * 7) for number in range(10, 30)]
+        expected = {site: legacy_attributes(site, self.zip_path, ["conterm_topo.txt"]) for site in sites}
+        open_gages2_store(self.zip_path)
+        with patch.object(gages2_functions.zipfile, "ZipFile", side_effect=AssertionError("archive read")):
+            for site in sites:
+                attributes = get_gages2_attributes(site, self.zip_path, tables=["conterm_topo.txt"])
+                pd.testing.assert_series_equal(pd.Series(attributes), pd.Series(expected[site]))
+
+
 class TestGages2Live(unittest.TestCase):
     """Live test against the real USGS archive (downloaded once, or reused via GAGES2_ZIP_PATH)."""
 
@@ -0,0 +1,201 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import host_limits
+import requests
+from http_fakes import FakeResponse, reset_host_limits
+from host_limits import (CircuitBreaker, CircuitOpenError, HostLimiter, circuit_report, configure_host_limits,
+                         get_limiter, host_wait_seconds, limited_get, on_slot_granted)
+
+
+class TestHostLimiter(unittest.TestCase):
+    """Offline tests of the per-host concurrency caps and politeness delays."""
+
+    def test_concurrency_cap_holds_across_threads(self):
+        limiter = HostLimiter(concurrency=2, delay_seconds=0.0)
+
+        def request(_):
+            with limiter.slot():
+                time.sleep(0.05)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(request, range(8)))
+        self.assertEqual(limiter.max_in_flight, 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_request_starts_are_spaced_by_delay(self):
+        limiter = HostLimiter(concurrency=4, delay_seconds=0.05)
+        starts = []
+        lock = threading.Lock()
+
+        def request(_):
+            with limiter.slot():
+                with lock:
+                    starts.append(time.monotonic())
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(request, range(4)))
+        gaps = [later - earlier for earlier, later in zip(sorted(starts), sorted(starts)[1:])]
+        self.assertGreaterEqual(min(gaps), 0.045)
+
+    def test_limiters_are_shared_per_host(self):
+        nwis = get_limiter("https://waterservices.usgs.gov/nwis/iv/?sites=1")
+        self.assertIs(nwis, get_limiter(host_limits.NWIS_HOST))
+        self.assertEqual(nwis.concurrency, host_limits.HOST_LIMITS[host_limits.NWIS_HOST]["concurrency"])
+        self.assertIsNot(nwis, get_limiter(host_limits.MESONET_HOST))
+        with patch.dict(host_limits.HOST_LIMITS, {}), patch.dict(host_limits._LIMITERS, {}):
+            configure_host_limits({"example.org": {"concurrency": 1}})
+            self.assertEqual(get_limiter("example.org").concurrency, 1)
+            self.assertEqual(get_limiter("example.org").delay_seconds, 0.0)
+
+    def test_limited_get_passes_arguments_through(self):
+        with patch.object(host_limits.requests, "get", return_value="response") as mocked:
+            self.assertEqual(limited_get("https://example.org/a", timeout=5), "response")
+            limited_get("https://example.org/b", params={"x": 1})
+        self.assertEqual(mocked.call_args_list[0].kwargs, {"timeout": 5})
+        self.assertEqual(mocked.call_args_list[1].kwargs, {"params": {"x": 1}})
+
+    def test_slot_listener_sees_grants_and_can_abandon_a_request(self):
+        limiter, grants = HostLimiter(concurrency=1, delay_seconds=0.0), []
+        with on_slot_granted(lambda: grants.append(limiter.in_flight)):
+            with limiter.slot():
+                pass
+        with limiter.slot():
+            pass
+        self.assertEqual(grants, [1])
+
+        def refuse():
+            raise RuntimeError("cancelled")
+        with on_slot_granted(refuse), self.assertRaises(RuntimeError):
+            limiter.acquire()
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertTrue(limiter.semaphore.acquire(blocking=False))
+
+    def test_streamed_body_holds_the_slot_until_read_or_closed(self):
+        with patch.dict(host_limits._LIMITERS, clear=True), \
+                patch.object(host_limits.requests, "get", side_effect=lambda url, **kwargs: StreamedResponse()):
+            limiter = get_limiter("example.org")
+            first = limited_get("https://example.org/a", stream=True)
+            second = limited_get("https://example.org/b", stream=True)
+            self.assertEqual(limiter.in_flight, 2)
+            self.assertEqual(b"".join(first.iter_content(2)), b"body")
+            self.assertEqual(limiter.in_flight, 1)
+            second.close()
+            second.close()
+            self.assertEqual(limiter.in_flight, 0)
+            limited_get("https://example.org/c")
+            self.assertEqual(limiter.in_flight, 0)
+
+
+class StreamedResponse(FakeResponse):
+    def iter_content(self, chunk_size=1):
+        yield b"bo"
+        yield b"dy"
+
+    def close(self):
+        pass
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Offline tests of the per-host circuit breakers fed by limited_get."""
+
+    def setUp(self):
+        reset_host_limits(self)
+
+    def test_throttle_opens_only_that_host_honoring_retry_after(self):
+        throttled = FakeResponse(status_code=429, headers={"Retry-After": "120"})
+        with patch.object(host_limits.requests, "get", return_value=throttled):
+            limited_get("https://waterservices.usgs.gov/nwis/iv/")
+        self.assertGreater(host_wait_seconds(host_limits.NWIS_HOST), 100)
+        self.assertEqual(host_wait_seconds(host_limits.MESONET_HOST), 0.0)
+        self.assertEqual(list(circuit_report()), [host_limits.NWIS_HOST])
+        self.assertEqual(circuit_report()[host_limits.NWIS_HOST]["state"], "open")
+        with patch.object(host_limits.requests, "get", return_value=FakeResponse()) as mocked:
+            with self.assertRaises(CircuitOpenError):
+                limited_get("https://waterservices.usgs.gov/nwis/iv/")
+            limited_get("https://mesonet.agron.iastate.edu/cgi-bin/request/asos.py")
+        self.assertEqual(mocked.call_count, 1)
+
+    def test_consecutive_connection_errors_open_the_circuit(self):
+        with patch.object(host_limits.requests, "get", side_effect=requests.ConnectionError("DNS failure")):
+            for _ in range(5):
+                with self.assertRaises(requests.ConnectionError):
+                    limited_get("https://example.org/a")
+        self.assertEqual(get_limiter("example.org").breaker.state(), "open")
+        self.assertIn("DNS failure", circuit_report()["example.org"]["last_error"])
+        self.assertIsInstance(CircuitOpenError("x"), requests.ConnectionError)
+
+    def test_high_error_rate_opens_the_circuit(self):
+        breaker = CircuitBreaker(failure_threshold=100, error_rate_threshold=0.5, window=4)
+        for failed in (False, True, False, True):
+            breaker.record_failure("HTTP 500") if failed else breaker.record_success()
+        self.assertEqual(breaker.state(), "open")
+
+    def test_half_open_probe_closes_or_doubles_backoff(self):
+        breaker = CircuitBreaker(base_backoff_seconds=10.0, max_backoff_seconds=25.0)
+        breaker.record_failure("HTTP 503", throttled=True)
+        self.assertAlmostEqual(breaker.wait_seconds(), 10.0, delta=1.0)
+        breaker.open_until = 0.0
+        self.assertEqual(breaker.state(), "half_open")
+        breaker.record_failure("HTTP 503", throttled=True)
+        self.assertAlmostEqual(breaker.wait_seconds(), 20.0, delta=1.0)
+        breaker.open_until = 0.0
+        breaker.record_failure("timeout")
+        self.assertAlmostEqual(breaker.wait_seconds(), 25.0, delta=1.0)
+        breaker.open_until = 0.0
+        breaker.record_success()
+        self.assertEqual(breaker.state(), "closed")
+        self.assertEqual(breaker.consecutive_opens, 0)
+
+    def test_half_open_circuit_lets_one_probe_through(self):
+        breaker = get_limiter("example.org").breaker
+        breaker.record_failure("HTTP 503", throttled=True)
+        breaker.open_until = 0.0
+        probe_started, finish_probe = threading.Event(), threading.Event()
+        calls = []
+
+        def fake_get(url, **kwargs):
+            calls.append(url)
+            if len(calls) == 1:
+                probe_started.set()
+                finish_probe.wait(5)
+            return FakeResponse()
+        with patch.object(host_limits.requests, "get", side_effect=fake_get), \
+                ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(limited_get, "https://example.org/a")]
+            probe_started.wait(5)
+            futures += [pool.submit(limited_get, "https://example.org/a") for _ in range(3)]
+            time.sleep(0.1)
+            self.assertEqual(len(calls), 1)
+            finish_probe.set()
+            for future in futures:
+                future.result(5)
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(breaker.state(), "closed")
+
+    def test_failed_probe_fails_the_waiters_fast(self):
+        breaker = get_limiter("example.org").breaker
+        breaker.record_failure("HTTP 503", throttled=True)
+        breaker.open_until = 0.0
+        self.assertTrue(breaker.before_request(max_wait_seconds=0.0))
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request(max_wait_seconds=0.05)
+        waiter = ThreadPoolExecutor(max_workers=1)
+        waiting = waiter.submit(breaker.before_request, 5.0)
+        time.sleep(0.05)
+        breaker.record_failure("HTTP 503", throttled=True)
+        with self.assertRaises(CircuitOpenError):
+            waiting.result(5)
+        waiter.shutdown()
+
+    def test_short_backoff_is_waited_out(self):
+        breaker = CircuitBreaker(base_backoff_seconds=0.05)
+        breaker.record_failure("HTTP 429", throttled=True)
+        started = time.monotonic()
+        breaker.before_request(max_wait_seconds=1.0)
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+
+if __name__ == "__main__":
+    unittest.main()
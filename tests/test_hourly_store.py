@@ -0,0 +1,158 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from build_panel_records import load_hourly_flow
+from hourly_store import (HourlyStoreWriter, append_hourly_store, export_hourly_csv, hourly_chunk_index,
+                          last_store_timestamp, load_manifest, read_hourly_chunk, read_hourly_store,
+                          write_hourly_chunk, write_hourly_store)
+
+
+def hourly_record(start: str, periods: int, seed: int = 0) -> pd.DataFrame:
+    """Builds a joined hourly record with numeric, integer and text variables and gaps."""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({"datetime": pd.date_range(start, periods=periods, freq="h", tz="UTC"),
+                          "cfs": rng.gamma(2.0, 50.0, periods).round(2),
+                          "tmpf": rng.normal(50, 20, periods).round(1),
+                          "count": np.arange(periods),
+                          "skyc1": rng.choice(["CLR", "OVC", None], periods)})
+    frame.loc[frame.index % 97 == 0, "cfs"] = np.nan
+    return frame
+
+
+class TestHourlyStore(unittest.TestCase):
+    """Offline tests of the columnar hourly store."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store_dir = os.path.join(self.temp_dir.name, "06752260_hourly")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_roundtrip_matches_csv_read(self):
+        record = hourly_record("2020-01-01", 500)
+        csv_path = os.path.join(self.temp_dir.name, "06752260_hourly_full.csv")
+        record.to_csv(csv_path, index=False)
+        # A shuffled frame with a duplicate hour is stored sorted and deduplicated.
+        write_hourly_store(pd.concat([record.iloc[::-1], record.iloc[:1]]), self.store_dir)
+        stored = read_hourly_store(self.store_dir)
+        from_csv = pd.read_csv(csv_path)
+        self.assertEqual(list(stored.columns), list(record.columns))
+        self.assertTrue((stored["datetime"] == record["datetime"]).all())
+        np.testing.assert_array_equal(stored["cfs"].to_numpy(), from_csv["cfs"].to_numpy())
+        self.assertEqual(stored["count"].dtype, np.int64)
+        self.assertTrue(stored["skyc1"].isna().equals(from_csv["skyc1"].isna()))
+        self.assertEqual(last_store_timestamp(self.store_dir), record["datetime"].iloc[-1])
+        exported = os.path.join(self.temp_dir.name, "exported.csv")
+        self.assertEqual(export_hourly_csv(self.store_dir, exported), 500)
+        pd.testing.assert_frame_equal(pd.read_csv(exported), from_csv)
+
+    def test_selected_columns_and_time_range(self):
+        write_hourly_store(hourly_record("2020-01-01", 500), self.store_dir)
+        window = read_hourly_store(self.store_dir, columns=["tmpf"], start="2020-01-02",
+                                   end="2020-01-03 06:00")
+        self.assertEqual(list(window.columns), ["datetime", "tmpf"])
+        self.assertEqual(len(window), 30)
+        self.assertEqual(window["datetime"].iloc[0], pd.Timestamp("2020-01-02", tz="UTC"))
+        self.assertTrue(read_hourly_store(self.store_dir, start="2021-01-01").empty)
+        with self.assertRaises(KeyError):
+            read_hourly_store(self.store_dir, columns=["missing"])
+
+    def test_append_keeps_only_newer_hours(self):
+        write_hourly_store(hourly_record("2020-01-01", 48), self.store_dir)
+        update = hourly_record("2020-01-02", 36, seed=1).drop(columns=["count"])
+        update["new_column"] = 1.0
+        self.assertEqual(append_hourly_store(update, self.store_dir), 12)
+        stored = read_hourly_store(self.store_dir)
+        self.assertEqual(len(stored), 60)
+        self.assertEqual(load_manifest(self.store_dir)["rows"], 60)
+        self.assertNotIn("new_column", stored.columns)
+        self.assertTrue(stored["count"].iloc[48:].isna().all())
+        self.assertTrue(stored["datetime"].is_monotonic_increasing)
+        self.assertEqual(append_hourly_store(update, self.store_dir), 0)
+
+    def test_writes_publish_a_new_version(self):
+        write_hourly_store(hourly_record("2020-01-01", 48), self.store_dir)
+        first = load_manifest(self.store_dir)
+        reader_view = read_hourly_store(self.store_dir)
+        append_hourly_store(hourly_record("2020-01-03", 24), self.store_dir)
+        second = load_manifest(self.store_dir)
+        # The arrays of the first version are never modified, only replaced and then removed.
+        self.assertEqual(second["version"], first["version"] + 1)
+        referenced = {second["hours_file"]} | {entry["file"] for entry in second["columns"]}
+        self.assertEqual({name for name in os.listdir(self.store_dir) if name.endswith(".npy")}, referenced)
+        self.assertFalse(referenced & ({first["hours_file"]} | {entry["file"] for entry in first["columns"]}))
+        self.assertEqual(len(reader_view), 48)
+        self.assertEqual(len(read_hourly_store(self.store_dir)), 72)
+
+    def test_read_retries_when_a_version_is_replaced(self):
+        write_hourly_store(hourly_record("2020-01-01", 48), self.store_dir)
+        stale = load_manifest(self.store_dir)
+        write_hourly_store(hourly_record("2020-01-01", 60), self.store_dir)
+        manifests = iter([stale, load_manifest(self.store_dir)])
+        with patch("hourly_store.load_manifest", side_effect=lambda store_dir: next(manifests)):
+            self.assertEqual(len(read_hourly_store(self.store_dir)), 60)
+
+    def test_writer_batches_match_a_whole_frame_write(self):
+        record = hourly_record("2020-01-01", 300)
+        # Early batches have no text and no missing flow, so their dtypes differ from the whole frame's.
+        record.loc[:99, "skyc1"] = None
+        record.loc[:99, "cfs"] = 1.0
+        reference = os.path.join(self.temp_dir.name, "reference_hourly")
+        write_hourly_store(record, reference)
+        writer = HourlyStoreWriter(self.store_dir, list(record.columns))
+        for first in range(0, 200, 50):
+            writer.add(pd.read_csv(io.StringIO(record.iloc[first:first + 50].to_csv(index=False))))
+        writer.close()
+        writer = HourlyStoreWriter(self.store_dir, [], append=True)
+        writer.add(record.iloc[200:].drop(columns=["tmpf"]).assign(extra=1.0))
+        with self.assertRaises(ValueError):
+            writer.add(record.iloc[250:260])
+        writer.close(block_rows=7)
+        expected = read_hourly_store(reference)
+        expected.loc[200:, "tmpf"] = np.nan
+        pd.testing.assert_frame_equal(read_hourly_store(self.store_dir), expected)
+        self.assertEqual([entry["dtype"] for entry in load_manifest(self.store_dir)["columns"]],
+                         [entry["dtype"] for entry in load_manifest(reference)["columns"]])
+        self.assertEqual(sorted(name for name in os.listdir(self.store_dir) if name.endswith(".raw")), [])
+
+    def test_chunk_file_roundtrip(self):
+        record = hourly_record("2020-01-01", 100)
+        path = os.path.join(self.temp_dir.name, "06752260_20200101.npz")
+        write_hourly_chunk(pd.concat([record.iloc[::-1], record.iloc[:1]]), path)
+        header, hours = hourly_chunk_index(path)
+        self.assertEqual(header, list(record.columns))
+        self.assertEqual(len(hours), 100)
+        self.assertTrue(np.all(np.diff(hours) == 1))
+        write_hourly_store(record, self.store_dir)
+        pd.testing.assert_frame_equal(read_hourly_chunk(path), read_hourly_store(self.store_dir))
+        self.assertFalse(os.path.exists(path + ".tmp.npz"))
+
+
+class TestHourlyStoreFlowLoad(unittest.TestCase):
+    """Loading a 40-year hourly record from the store gives the same flow as the CSV it replaces."""
+
+    def test_forty_year_flow_load(self):
+        record = hourly_record("1985-01-01", 40 * 8766)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_path = os.path.join(temp_dir, "06752260_hourly_full.csv")
+            store_dir = os.path.join(temp_dir, "06752260_hourly")
+            record.to_csv(csv_path, index=False)
+            write_hourly_store(record, store_dir)
+            from_csv = pd.read_csv(csv_path, usecols=["datetime", "cfs"], parse_dates=["datetime"])
+            stored = read_hourly_store(store_dir, columns=["cfs"])
+            np.testing.assert_array_equal(stored["cfs"].to_numpy(), from_csv["cfs"].to_numpy())
+            flow_csv = load_hourly_flow(csv_path, end_date="2000-01-01")
+            flow_store = load_hourly_flow(store_dir, end_date="2000-01-01")
+            # Only the datetime resolution differs (parsed text vs whole hours).
+            pd.testing.assert_series_equal(flow_csv, flow_store, check_freq=False,
+                                           check_index_type=False)
+
+if __name__ == "__main__":
+    unittest.main()
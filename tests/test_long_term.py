@@ -1,12 +1,22 @@
 from datetime import datetime
+import io
 import json
 import os
 import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 
 import pandas as pd
+import requests
 
-from long_term_scrape import chunk_bounds, run_long_term_scrape
+import long_term_scrape
+from host_limits import CircuitOpenError
+from hourly_store import read_hourly_store, write_hourly_store
+from long_term_scrape import (ChunkPlanner, FleetUsgsPrefetch, chunk_bounds, last_stored_timestamp,
+                              list_chunk_files, merge_chunk_files, run_long_term_scrape, write_chunk_file)
 from usgs_scraping_functions import get_period_of_record
 
 
@@ -31,6 +41,427 @@ class TestChunkBounds(unittest.TestCase):
         self.assertEqual(len(bounds), 3)
 
 
+def hourly_frame(start: str, periods: int) -> pd.DataFrame:
+    """Builds a joined hourly frame like :func:`catchment_dataset.fetch_hourly_chunk` returns."""
+    datetimes = pd.date_range(start, periods=periods, freq="h", tz="UTC")
+    return pd.DataFrame({"datetime": datetimes, "cfs": range(periods), "tmpf": 50.0})
+
+
+class TestIncrementalUpdate(unittest.TestCase):
+    """Offline tests of the append-since-last-scrape mode."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.out_dir = self.temp_dir.name
+        os.makedirs(os.path.join(self.out_dir, "chunks"))
+        self.combined_path = os.path.join(self.out_dir, "06752260_hourly_full.csv")
+        hourly_frame("2024-05-01", 48).to_csv(self.combined_path, index=False)
+        self.store_dir = os.path.join(self.out_dir, "06752260_hourly")
+        write_hourly_store(hourly_frame("2024-05-01", 48), self.store_dir)
+        with open(os.path.join(self.out_dir, "06752260_scrape_summary.json"), "w") as f:
+            json.dump({"start": "2024-05-01", "combined_rows": 48}, f)
+        with open(os.path.join(self.out_dir, "06752260_static.json"), "w") as f:
+            json.dump({"data_availability": {"usgs_hourly_begin": "1987-12-31"}}, f)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_last_stored_timestamp_reads_tail(self):
+        self.assertEqual(last_stored_timestamp(self.combined_path),
+                         pd.Timestamp("2024-05-02 23:00", tz="UTC"))
+        header_only = os.path.join(self.out_dir, "empty.csv")
+        with open(header_only, "w") as f:
+            f.write("datetime,cfs\n")
+        self.assertIsNone(last_stored_timestamp(header_only))
+
+    def test_appends_only_new_hours_in_stored_column_order(self):
+        # The fetched window overlaps the stored hours and carries an extra, reordered column.
+        fetched = hourly_frame("2024-05-02", 36)[["tmpf", "datetime", "cfs"]]
+        fetched["new_column"] = 1.0
+        with patch.object(long_term_scrape, "discover_catchment", return_value={"static": {}}), \
+                patch.object(long_term_scrape, "fetch_hourly_chunk", return_value=fetched) as mocked, \
+                patch.object(long_term_scrape, "get_period_of_record", side_effect=AssertionError):
+            summary = run_long_term_scrape("06752260", output_dir=self.out_dir,
+                                           end_time=datetime(2024, 5, 3, 12), include_nldas=False,
+                                           backup=False, incremental=True)
+        self.assertEqual(mocked.call_args[0][1], datetime(2024, 5, 1, 23))
+        self.assertEqual(summary["mode"], "incremental")
+        self.assertEqual(summary["appended_rows"], 12)
+        self.assertEqual(summary["combined_rows"], 60)
+        self.assertEqual(summary["data_availability"], {"usgs_hourly_begin": "1987-12-31"})
+        combined = pd.read_csv(self.combined_path)
+        self.assertEqual(list(combined.columns), ["datetime", "cfs", "tmpf"])
+        self.assertEqual(len(combined), 60)
+        self.assertFalse(combined["datetime"].duplicated().any())
+        self.assertTrue(pd.to_datetime(combined["datetime"]).is_monotonic_increasing)
+        stored = read_hourly_store(self.store_dir)
+        self.assertEqual(list(stored.columns), ["datetime", "cfs", "tmpf"])
+        self.assertEqual(len(stored), 60)
+        appended_chunk = os.path.join(self.out_dir, "chunks", "06752260_20240503T00.npz")
+        self.assertTrue(os.path.exists(appended_chunk))
+
+    def test_next_full_merge_appends_after_the_incremental_chunk(self):
+        chunks_dir = os.path.join(self.out_dir, "chunks")
+        write_chunk_file(hourly_frame("2024-05-01", 48), os.path.join(chunks_dir, "06752260_20240501.npz"))
+        merge_chunk_files(list_chunk_files(chunks_dir), self.store_dir, csv_path=self.combined_path)
+        with patch.object(long_term_scrape, "discover_catchment", return_value={"static": {}}), \
+                patch.object(long_term_scrape, "fetch_hourly_chunk", return_value=hourly_frame("2024-05-02", 36)):
+            run_long_term_scrape("06752260", output_dir=self.out_dir, end_time=datetime(2024, 5, 3, 12),
+                                 include_nldas=False, backup=False, incremental=True)
+        with patch.object(long_term_scrape, "_write_merged_rows") as rebuild:
+            rows = merge_chunk_files(list_chunk_files(chunks_dir), self.store_dir, csv_path=self.combined_path)
+        rebuild.assert_not_called()
+        self.assertEqual(rows, 60)
+
+
+class FakeChunkFetcher:
+    """Returns a chunk's hourly frame after a delay, recording peak concurrency; one chunk can fail."""
+
+    def __init__(self, delay: float = 0.1, failing_start: datetime = None) -> None:
+        self.delay = delay
+        self.failing_start = failing_start
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, site_number, start_time, end_time, discovery, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        if start_time == self.failing_start:
+            raise ConnectionError("NWIS reset")
+        return hourly_frame(start_time.strftime("%Y-%m-%d"), 24)
+
+
+class ChunkScrapeTestCase(unittest.TestCase):
+    """Runs :func:`run_long_term_scrape` offline into a temporary directory with a fake chunk fetcher."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.out_dir = self.temp_dir.name
+        discovery = {"static": {}, "basin_geometry": None}
+        for patcher in (patch.object(long_term_scrape, "discover_catchment", return_value=discovery),
+                        patch.object(long_term_scrape, "get_data_availability", return_value={})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def scrape(self, fetcher, start=datetime(2023, 1, 1), end=datetime(2023, 7, 1), chunk_months=1,
+               include_nldas=False, **kwargs):
+        with patch.object(long_term_scrape, "fetch_hourly_chunk", side_effect=fetcher):
+            return run_long_term_scrape("06752260", start_time=start, end_time=end, output_dir=self.out_dir,
+                                        chunk_months=chunk_months, include_nldas=include_nldas, backup=False,
+                                        write_csv=False, **kwargs)
+
+
+class TestParallelChunks(ChunkScrapeTestCase):
+    """Offline tests of the bounded-parallel chunk pipeline and its resume semantics."""
+
+    def setUp(self):
+        super().setUp()
+        # The fake chunks (24 rows x 3 columns) sit inside the target band, so windows keep their size.
+        patcher = patch.object(long_term_scrape, "TARGET_CHUNK_CELLS", 72)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_chunks_fetched_in_parallel_and_resumed(self):
+        fetcher = FakeChunkFetcher(failing_start=datetime(2023, 3, 1))
+        summary = self.scrape(fetcher, max_parallel_chunks=3)
+        self.assertEqual(fetcher.peak, 3)
+        self.assertEqual(summary["chunks_fetched"], 5)
+        self.assertEqual([failure["chunk"] for failure in summary["chunk_failures"]], ["2023-03-01"])
+        chunk_names = sorted(set(os.listdir(os.path.join(self.out_dir, "chunks"))) - {"chunk_plan.json"})
+        self.assertEqual(len(chunk_names), 5)
+        self.assertNotIn("06752260_20230301.npz", chunk_names)
+        self.assertTrue(all(name.endswith(".npz") for name in chunk_names))
+        self.assertEqual(summary["combined_rows"], 5 * 24)
+        resumed = self.scrape(FakeChunkFetcher(delay=0.0))
+        self.assertEqual((resumed["chunks_fetched"], resumed["chunks_skipped_existing"]), (1, 5))
+        self.assertEqual(resumed["combined_rows"], 6 * 24)
+
+    def test_max_chunks_bounds_submissions(self):
+        fetcher = FakeChunkFetcher(delay=0.0, failing_start=datetime(2023, 1, 1))
+        summary = self.scrape(fetcher, max_parallel_chunks=3, max_chunks=2)
+        self.assertEqual(summary["chunks_fetched"], 2)
+        self.assertEqual(len(summary["chunk_failures"]), 1)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.out_dir, "chunks"))),
+                         ["06752260_20230201.npz", "06752260_20230301.npz", "chunk_plan.json"])
+
+    def test_chunks_missing_a_source_are_refetched_on_resume(self):
+        def partial_fetcher(site_number, start_time, end_time, discovery, **kwargs):
+            chunk = hourly_frame(start_time.strftime("%Y-%m-%d"), 24)
+            if start_time == datetime(2023, 2, 1):
+                chunk.attrs["failed_sources"] = {"nldas": TimeoutError("nldas source exceeded 900 s")}
+            return chunk
+        summary = self.scrape(partial_fetcher, max_chunks=3)
+        self.assertEqual(summary["source_failures"],
+                         [{"chunk": "2023-02-01", "source": "nldas",
+                           "error": "TimeoutError: nldas source exceeded 900 s"}])
+        self.assertEqual(summary["partial_chunks"], ["2023-02-01"])
+        fetcher = WindowRecorder()
+        resumed = self.scrape(fetcher)
+        self.assertEqual(fetcher.windows[0], (datetime(2023, 2, 1), datetime(2023, 3, 1)))
+        self.assertEqual(len(fetcher.windows), 4)
+        self.assertEqual((resumed["chunks_skipped_existing"], resumed["partial_chunks"]), (2, []))
+        with open(os.path.join(self.out_dir, "chunks", "chunk_plan.json")) as f:
+            recorded = json.load(f)
+        self.assertEqual((len(recorded["chunks"]), recorded["partial"]), (6, {}))
+
+    def test_provider_forcing_reaches_each_chunk(self):
+        forcing = {}
+
+        def provider(start_time, end_time):
+            forcing[start_time] = hourly_frame(start_time.strftime("%Y-%m-%d"), 24)
+            return forcing[start_time]
+
+        passed = {}
+
+        def fetcher(site_number, start_time, end_time, discovery, **kwargs):
+            passed[start_time] = kwargs["nldas_forcing"]
+            return hourly_frame(start_time.strftime("%Y-%m-%d"), 24)
+        self.scrape(fetcher, max_chunks=2, include_nldas=True, nldas_provider=provider)
+        self.assertEqual(sorted(passed), [datetime(2023, 1, 1), datetime(2023, 2, 1)])
+        for start_time, frame in passed.items():
+            self.assertIs(frame, forcing[start_time])
+
+    def test_asos_prefetch_precedes_each_grid_chunk(self):
+        prefetched, fetcher = [], WindowRecorder()
+        discovery = {"static": {}, "basin_geometry": None, "asos_station": {"station_id": "FNL"}}
+        with patch.object(long_term_scrape, "discover_catchment", return_value=discovery):
+            self.scrape(fetcher, max_chunks=2, asos_prefetch=lambda *window: prefetched.append(window))
+        self.assertEqual(sorted(prefetched), [(datetime(2023, 1, 1), datetime(2023, 2, 1)),
+                                              (datetime(2023, 2, 1), datetime(2023, 3, 1))])
+        self.assertEqual(sorted(fetcher.windows), sorted(prefetched))
+
+
+class WindowRecorder:
+    """Records requested windows; windows longer than ``max_days`` time out like a stalled NWIS read."""
+
+    def __init__(self, max_days: float = None) -> None:
+        self.max_days = max_days
+        self.windows = []
+
+    def __call__(self, site_number, start_time, end_time, discovery, **kwargs):
+        self.windows.append((start_time, end_time))
+        if self.max_days is not None and (end_time - start_time).days > self.max_days:
+            raise requests.ReadTimeout("Read timed out. (read timeout=180)")
+        return hourly_frame(start_time.strftime("%Y-%m-%d"), 24)
+
+
+class TestAdaptiveChunks(ChunkScrapeTestCase):
+    """Offline tests of feedback-sized windows and their recorded boundaries."""
+
+    def scrape(self, fetcher, start, end, chunk_months):
+        return super().scrape(fetcher, start, end, chunk_months, max_parallel_chunks=1)
+
+    def test_small_chunks_grow_windows(self):
+        fetcher = WindowRecorder()
+        summary = self.scrape(fetcher, datetime(2020, 1, 1), datetime(2022, 1, 1), chunk_months=1)
+        self.assertEqual([start for start, _ in fetcher.windows],
+                         [datetime(2020, 1, 1), datetime(2020, 2, 1), datetime(2020, 4, 1),
+                          datetime(2020, 8, 1), datetime(2021, 4, 1)])
+        self.assertEqual(fetcher.windows[-1][1], datetime(2022, 1, 1))
+        self.assertEqual(summary["chunk_months"], 32)
+
+    def test_timeouts_split_and_resume_reuses_boundaries(self):
+        fetcher = WindowRecorder(max_days=40)
+        summary = self.scrape(fetcher, datetime(2023, 1, 1), datetime(2023, 4, 1), chunk_months=3)
+        self.assertEqual(summary["chunk_failures"], [])
+        with open(os.path.join(self.out_dir, "chunks", "chunk_plan.json")) as f:
+            recorded = [(datetime.fromisoformat(start), datetime.fromisoformat(end))
+                        for start, end in json.load(f)["chunks"]]
+        self.assertEqual(recorded[0], (datetime(2023, 1, 1), datetime(2023, 1, 23)))
+        self.assertTrue(all((end - start).days <= 40 for start, end in recorded))
+        for previous, current in zip(recorded, recorded[1:]):
+            self.assertEqual(previous[1], current[0])
+        self.assertEqual(recorded[-1][1], datetime(2023, 4, 1))
+        extended = WindowRecorder(max_days=40)
+        resumed = self.scrape(extended, datetime(2023, 1, 1), datetime(2023, 5, 1), chunk_months=3)
+        self.assertEqual(resumed["chunks_skipped_existing"], len(recorded))
+        self.assertEqual(extended.windows, [(datetime(2023, 4, 1), datetime(2023, 5, 1))])
+
+    def test_dropped_connections_split_but_open_circuits_do_not(self):
+        for error in (requests.ConnectionError("Connection reset by peer"),
+                      requests.exceptions.ChunkedEncodingError("Connection broken: IncompleteRead"),
+                      requests.ReadTimeout("Read timed out.")):
+            self.assertTrue(long_term_scrape.is_oversize_error(error), error)
+        self.assertFalse(long_term_scrape.is_oversize_error(CircuitOpenError("Circuit open for another 60s")))
+        self.assertFalse(long_term_scrape.is_oversize_error(ValueError("bad payload")))
+
+    def test_optional_source_timeouts_shrink_windows(self):
+        def slow_forcing(site_number, start_time, end_time, discovery, **kwargs):
+            chunk = hourly_frame(start_time.strftime("%Y-%m-%d"), 24)
+            chunk.attrs["failed_sources"] = {"nldas": TimeoutError("nldas source exceeded 900 s")}
+            return chunk
+        summary = self.scrape(slow_forcing, datetime(2020, 1, 1), datetime(2021, 1, 1), chunk_months=8)
+        # The small fake chunks alone would double the windows; the NLDAS timeouts halve them instead.
+        self.assertEqual(summary["partial_chunks"], ["2020-01-01", "2020-09-01"])
+        self.assertEqual(summary["chunk_months"], 2)
+
+    def test_planner_shrinks_after_large_chunks(self):
+        planner = ChunkPlanner([(datetime(2020, 1, 1), datetime(2030, 1, 1))], 12)
+        self.assertEqual(planner.next_window(), (datetime(2020, 1, 1), datetime(2021, 1, 1)))
+        planner.record(long_term_scrape.TARGET_CHUNK_CELLS * 3)
+        self.assertEqual(planner.next_window(), (datetime(2021, 1, 1), datetime(2021, 7, 1)))
+        self.assertFalse(planner.split((datetime(2021, 1, 1, 12), datetime(2021, 1, 2))))
+
+
+class TestStreamingMerge(unittest.TestCase):
+    """Offline tests of the k-way chunk merge against the former in-memory concat, dedupe and sort."""
+
+    suffix = ".npz"
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.chunks_dir = os.path.join(self.temp_dir.name, "chunks")
+        os.makedirs(self.chunks_dir)
+        self.store_dir = os.path.join(self.temp_dir.name, "06752260_hourly")
+        self.csv_path = os.path.join(self.temp_dir.name, "06752260_hourly_full.csv")
+        # Consecutive chunks repeat their boundary hour with different values; the earlier chunk wins.
+        self.frames = [hourly_frame("2023-01-01", 25), hourly_frame("2023-01-02", 49),
+                       hourly_frame("2023-01-04", 30)]
+        self.frames[1]["cfs"] += 1000
+        self.written = {}
+
+    def write_chunk(self, frame: pd.DataFrame, name: str, suffix: str = "") -> str:
+        path = os.path.join(self.chunks_dir, name + (suffix or self.suffix))
+        if path.endswith(".csv"):
+            frame.to_csv(path, index=False)
+        else:
+            write_chunk_file(frame, path)
+        self.written[path] = frame
+        return path
+
+    def legacy_combined(self, paths) -> pd.DataFrame:
+        # The former merge concatenated the chunk CSVs as read back from text.
+        frames = [pd.read_csv(io.StringIO(self.written[path].to_csv(index=False))) for path in paths]
+        return pd.concat(frames, ignore_index=True).drop_duplicates(subset="datetime").sort_values("datetime")
+
+    def assert_matches_legacy(self, paths, rows):
+        legacy = self.legacy_combined(paths).reset_index(drop=True)
+        self.assertEqual(rows, len(legacy))
+        pd.testing.assert_frame_equal(pd.read_csv(self.csv_path), legacy)
+        legacy_store = os.path.join(self.temp_dir.name, "legacy_hourly")
+        write_hourly_store(legacy, legacy_store)
+        pd.testing.assert_frame_equal(read_hourly_store(self.store_dir), read_hourly_store(legacy_store))
+
+    def test_merge_matches_concat_dedupe_sort(self):
+        self.frames[2]["sky_cover"] = "OVC"
+        paths = [self.write_chunk(frame, "06752260_2023010%d" % (position + 1))
+                 for position, frame in enumerate(self.frames)]
+        rows = merge_chunk_files(paths, self.store_dir, csv_path=self.csv_path, batch_rows=10)
+        self.assertEqual(rows, 24 + 48 + 30)
+        self.assert_matches_legacy(paths, rows)
+        self.assertEqual(pd.read_csv(self.csv_path)["cfs"].iloc[24], 24)
+
+    def test_new_chunks_are_appended(self):
+        paths = [self.write_chunk(frame, "06752260_2023010%d" % (position + 1))
+                 for position, frame in enumerate(self.frames[:2])]
+        merge_chunk_files(paths, self.store_dir, csv_path=self.csv_path)
+        paths.append(self.write_chunk(self.frames[2], "06752260_20230104"))
+        with patch.object(long_term_scrape, "_load_chunk", wraps=long_term_scrape._load_chunk) as read:
+            rows = merge_chunk_files(paths, self.store_dir, csv_path=self.csv_path, batch_rows=7)
+        # Only the new chunk is read; the merged ones are already in the store.
+        self.assertEqual({call.args[0] for call in read.call_args_list}, {paths[2]})
+        self.assert_matches_legacy(paths, rows)
+
+    def test_filled_gap_rebuilds_the_record(self):
+        paths = [self.write_chunk(self.frames[0], "06752260_20230101"),
+                 self.write_chunk(self.frames[2], "06752260_20230104")]
+        merge_chunk_files(paths, self.store_dir, csv_path=self.csv_path)
+        paths.insert(1, self.write_chunk(self.frames[1], "06752260_20230102"))
+        rows = merge_chunk_files(paths, self.store_dir, csv_path=self.csv_path)
+        self.assertEqual(rows, 24 + 48 + 30)
+        self.assert_matches_legacy(paths, rows)
+
+    def test_new_columns_rebuild_the_record(self):
+        paths = [self.write_chunk(self.frames[0], "06752260_20230101")]
+        merge_chunk_files(paths, self.store_dir, csv_path=self.csv_path)
+        self.frames[1]["soil_moisture"] = 0.25
+        paths.append(self.write_chunk(self.frames[1], "06752260_20230102"))
+        rows = merge_chunk_files(paths, self.store_dir, csv_path=self.csv_path)
+        self.assertEqual(list(pd.read_csv(self.csv_path).columns),
+                         ["datetime", "cfs", "tmpf", "soil_moisture"])
+        self.assert_matches_legacy(paths, rows)
+        self.assertFalse(os.path.exists(self.csv_path + ".tmp"))
+        self.assertEqual(merge_chunk_files(paths, self.store_dir), rows)
+
+    def test_legacy_csv_chunks_merge_with_binary_ones(self):
+        paths = [self.write_chunk(self.frames[0], "06752260_20230101", suffix=".csv"),
+                 self.write_chunk(self.frames[1], "06752260_20230102", suffix=".npz")]
+        merge_chunk_files(paths, self.store_dir, csv_path=self.csv_path)
+        paths.append(self.write_chunk(self.frames[2], "06752260_20230104", suffix=".csv"))
+        rows = merge_chunk_files(paths, self.store_dir, csv_path=self.csv_path, batch_rows=7)
+        self.assert_matches_legacy(paths, rows)
+        # A chunk rewritten by a resumed scrape replaces its legacy CSV.
+        rewritten = os.path.join(self.chunks_dir, "06752260_20230101.npz")
+        write_chunk_file(self.frames[0], rewritten)
+        self.assertEqual(list_chunk_files(self.chunks_dir), [rewritten] + paths[1:])
+
+
+class TestLegacyCsvMerge(TestStreamingMerge):
+    """The same merge tests on chunk CSVs written before chunks were binary."""
+
+    suffix = ".csv"
+
+
+class TestFleetUsgsPrefetch(unittest.TestCase):
+    """Offline tests of the per-window batched NWIS fetch shared by a group of gauges."""
+
+    def test_windows_fetched_for_gauges_in_flight_and_pruned(self):
+        calls = []
+
+        def fake_fleet(site_numbers, start_date, end_date, batch_size=10):
+            calls.append((list(site_numbers), start_date))
+            return {site: pd.DataFrame({"site_no": [site]}) for site in site_numbers if site != "03"}
+
+        january, february = datetime(2023, 1, 1), datetime(2023, 2, 1)
+        prefetch = FleetUsgsPrefetch(chunk_bounds(january, datetime(2023, 3, 1), chunk_months=1))
+        views = {site: prefetch.for_site(site) for site in ["01", "02", "03", "04"]}
+        with patch.object(long_term_scrape, "fetch_usgs_fleet", side_effect=fake_fleet):
+            for site in ["01", "02", "03"]:
+                views[site].join()
+            self.assertEqual(views["01"].get(january)["site_no"].iloc[0], "01")
+            self.assertEqual(views["02"].get(january)["site_no"].iloc[0], "02")
+            self.assertIsNone(views["03"].get(january))
+            self.assertIsNone(views["01"].get(datetime(2023, 1, 15)))
+            # Every frame of January has been taken, so the window is gone.
+            self.assertEqual(prefetch._frames, {})
+            views["02"].release()
+            views["04"].join()
+            views["01"].get(february)
+            # A gauge that started late fetches the windows the others already had on its own.
+            self.assertEqual(views["04"].get(january)["site_no"].iloc[0], "04")
+            self.assertEqual(list(prefetch._frames), [february])
+            views["04"].release()
+        self.assertEqual(calls, [(["01", "02", "03"], january), (["01", "03", "04"], february),
+                                 (["04"], january)])
+        self.assertEqual(prefetch._frames, {})
+
+    def test_gauges_waiting_on_a_window_share_its_download(self):
+        calls = []
+
+        def slow_fleet(site_numbers, start_date, end_date, batch_size=10):
+            calls.append(sorted(site_numbers))
+            time.sleep(0.1)
+            return {site: pd.DataFrame({"site_no": [site]}) for site in site_numbers}
+
+        prefetch = FleetUsgsPrefetch(chunk_bounds(datetime(2023, 1, 1), datetime(2023, 2, 1), chunk_months=1))
+        views = [prefetch.for_site("%02d" % number) for number in range(4)]
+        for view in views:
+            view.join()
+        with patch.object(long_term_scrape, "fetch_usgs_fleet", side_effect=slow_fleet), \
+                ThreadPoolExecutor(max_workers=4) as pool:
+            frames = list(pool.map(lambda view: view.get(datetime(2023, 1, 1)), views))
+        self.assertEqual(calls, [["00", "01", "02", "03"]])
+        self.assertEqual([frame["site_no"].iloc[0] for frame in frames], ["00", "01", "02", "03"])
+        self.assertEqual(prefetch._frames, {})
+
+
 class TestPeriodOfRecord(unittest.TestCase):
     """Live test of the NWIS series catalog lookup."""
 
@@ -0,0 +1,131 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+import metadata_cache
+import weather_scraping_functions
+from metadata_cache import cached_metadata, evict, invalidate
+from weather_scraping_functions import get_asos_stations
+
+ASOS_GEOJSON = {"features": [
+    {"geometry": {"coordinates": [-105.0, 40.5]},
+     "properties": {"sid": "FNL", "sname": "Fort Collins", "elevation": 1529.0,
+                    "archive_begin": "1998-01-01", "online": True}},
+    {"geometry": {"coordinates": [-104.7, 39.8]},
+     "properties": {"sid": "DEN", "sname": "Denver", "elevation": None,
+                    "archive_begin": "1994-07-01", "online": True}},
+]}
+
+
+class FakeJsonResponse:
+    """A minimal stand-in for :class:`requests.Response` carrying a JSON payload."""
+
+    def __init__(self, payload) -> None:
+        self.payload = payload
+
+    def raise_for_status(self) -> None:
+        return None
+
+    def json(self):
+        return self.payload
+
+
+class TestMetadataCache(unittest.TestCase):
+    """Offline tests of the on-disk metadata cache."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.settings = patch.dict(metadata_cache._SETTINGS, {"cache_dir": self.temp_dir.name})
+        self.settings.start()
+        self.calls = []
+
+        @cached_metadata("nwis_site")
+        def lookup(site_number, suffix="a"):
+            self.calls.append(site_number)
+            if site_number == "bad":
+                raise ValueError("no data")
+            return {"site_no": site_number, "suffix": suffix}
+        self.lookup = lookup
+
+    def tearDown(self):
+        self.settings.stop()
+        self.temp_dir.cleanup()
+
+    def test_second_call_is_served_from_disk(self):
+        first = self.lookup("06752260")
+        second = self.lookup("06752260")
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, ["06752260"])
+        self.lookup("06752260", suffix="b")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_expired_entry_is_refetched(self):
+        self.lookup("06752260")
+        ttl_seconds = metadata_cache.ENDPOINT_TTL_DAYS["nwis_site"] * 86400
+        with patch.object(metadata_cache.time, "time", return_value=time.time() + ttl_seconds + 1):
+            self.lookup("06752260")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_refresh_and_invalidate(self):
+        self.lookup("06752260")
+        self.lookup("06752260", refresh=True)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(invalidate("nwis_site", "06752260"), 1)
+        self.lookup("06752260")
+        self.lookup("01010500")
+        self.assertEqual(len(self.calls), 4)
+        self.assertEqual(invalidate("nwis_site"), 2)
+        self.assertEqual(invalidate(), 0)
+
+    def test_exceptions_are_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                self.lookup("bad")
+        self.assertEqual(self.calls, ["bad", "bad"])
+
+    def test_eviction_drops_least_recently_used(self):
+        for site_number in ["1", "2", "3"]:
+            self.lookup(site_number)
+        directory = os.path.join(self.temp_dir.name, "nwis_site")
+        paths = sorted(os.listdir(directory))
+        # Age every entry, then read "1" so it becomes the most recently used.
+        for age, name in enumerate(paths):
+            os.utime(os.path.join(directory, name), (1000 + age, 1000 + age))
+        self.lookup("1")
+        entry_size = os.path.getsize(os.path.join(directory, paths[0]))
+        self.assertEqual(evict(max_bytes=entry_size + 1), 2)
+        self.lookup("1")
+        self.assertEqual(self.calls, ["1", "2", "3"])
+
+    def test_disabled_cache_passes_through(self):
+        with patch.dict(metadata_cache._SETTINGS, {"cache_dir": ""}):
+            self.lookup("06752260")
+            self.lookup("06752260")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_default_directory_is_outside_the_working_directory(self):
+        with patch.dict(os.environ, {"XDG_CACHE_HOME": self.temp_dir.name}), \
+                patch.dict(metadata_cache._SETTINGS, clear=True):
+            os.environ.pop("METADATA_CACHE_DIR", None)
+            self.assertEqual(metadata_cache.cache_dir(),
+                             os.path.join(self.temp_dir.name, "water", "metadata_cache"))
+
+    def test_asos_station_listing_roundtrips_dataframe(self):
+        with patch.object(weather_scraping_functions.requests, "get",
+                          return_value=FakeJsonResponse(ASOS_GEOJSON)) as mocked:
+            fetched = get_asos_stations("CO")
+            cached = get_asos_stations("CO")
+        self.assertEqual(mocked.call_count, 1)
+        pd.testing.assert_frame_equal(fetched, cached)
+        entry_dir = os.path.join(self.temp_dir.name, "mesonet_asos_stations")
+        with open(os.path.join(entry_dir, os.listdir(entry_dir)[0])) as f:
+            self.assertEqual(json.load(f)["payload"]["kind"], "dataframe")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,21 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import os
+import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 
+import numpy as np
+import pandas as pd
+
+import host_limits
+import nldas_cache
+import nldas_functions
+from http_fakes import FakeResponse, reset_host_limits
 from nldas_functions import (parse_giovanni_csv, get_nldas_forcing, get_earthdata_token,
-                             NLDAS_FORCING_VARIABLES, summarize_missing)
+                             NLDAS_FORCING_VARIABLES, summarize_missing, split_period)
 
 SAMPLE_GIOVANNI_CSV = """Title,NLDAS2 time series
 Data id,NLDAS_FORA0125_H_2_0_SWdown
@@ -50,6 +62,141 @@ class TestGiovanniParsing(unittest.TestCase):
             self.assertIn(needed, NLDAS_FORCING_VARIABLES)
 
 
+class FakeGiovanniSession:
+    """Serves Giovanni CSVs of deterministic hourly values, recording requests and peak concurrency."""
+
+    def __init__(self, delay: float = 0.05) -> None:
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, **kwargs):
+        with self.lock:
+            self.requests.append(params)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        first, last = params["time"].split("/")
+        hours = pd.date_range(first, last, freq="h")
+        # Every variable but precipitation skips the first hour, so the index is a union.
+        if not params["data"].endswith("Rainf"):
+            hours = hours[1:]
+        values = hours.hour + len(params["data"])
+        body = "\n".join("%s,%s" % (hour.strftime("%Y-%m-%dT%H:%M:%S"), value)
+                         for hour, value in zip(hours, values))
+        with self.lock:
+            self.active -= 1
+        return FakeResponse("Title,NLDAS2\n\nTimestamp (UTC),Data\n" + body + "\n")
+
+
+class TestConcurrentForcing(unittest.TestCase):
+    """Offline tests of the concurrent variable fetch and the single-index alignment."""
+
+    def setUp(self):
+        self.session = FakeGiovanniSession()
+        giovanni_limit = {host_limits.GIOVANNI_HOST: {"concurrency": 4, "delay_seconds": 0.0}}
+        reset_host_limits(self, patch.object(nldas_functions, "giovanni_session", return_value=self.session),
+                          patch.dict(nldas_cache._SETTINGS, {"cache_dir": ""}), limits=giovanni_limit)
+
+    def test_variables_fetched_concurrently_and_aligned(self):
+        start, end = datetime(2023, 6, 1), datetime(2023, 6, 3, 23)
+        df = get_nldas_forcing(40.0, -105.0, start, end)
+        self.assertEqual(len(self.session.requests), len(NLDAS_FORCING_VARIABLES))
+        self.assertEqual(self.session.peak, 4)
+        self.assertEqual(list(df.columns), ["datetime"] + list(NLDAS_FORCING_VARIABLES))
+        self.assertEqual(len(df), 72)
+        self.assertEqual(str(df["datetime"].dt.tz), "UTC")
+        self.assertTrue(np.isnan(df["temperature"].iloc[0]))
+        self.assertEqual(df["precipitation"].iloc[5], 5 + len(NLDAS_FORCING_VARIABLES["precipitation"]))
+
+    def test_long_period_split_into_windows(self):
+        start, end = datetime(2023, 1, 1), datetime(2023, 3, 31, 23)
+        variables = ["precipitation", "temperature"]
+        windowed = get_nldas_forcing(40.0, -105.0, start, end, variables=variables, window_days=30)
+        self.assertEqual(len(self.session.requests), 2 * 3)
+        self.assertEqual(split_period(start, end, 30)[1], (datetime(2023, 1, 31), datetime(2023, 3, 1, 23)))
+        daily = split_period(datetime(2023, 1, 1), datetime(2023, 3, 31), 30, step=timedelta(days=1))
+        self.assertEqual(daily[1], (datetime(2023, 1, 31), datetime(2023, 3, 1)))
+        whole = get_nldas_forcing(40.0, -105.0, start, end, variables=variables)
+        self.assertEqual(len(whole), 90 * 24)
+        # Only the window starts differ: the fake drops each window's first temperature hour.
+        pd.testing.assert_frame_equal(windowed[["datetime", "precipitation"]],
+                                      whole[["datetime", "precipitation"]])
+        self.assertEqual(int(windowed["temperature"].isna().sum()), 3)
+
+
+class TestNldasCellCache(unittest.TestCase):
+    """Gauges in one NLDAS-2 cell share its cached series; only uncovered hours are requested."""
+
+    def setUp(self):
+        self.session = FakeGiovanniSession(delay=0.0)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        reset_host_limits(self, patch.object(nldas_functions, "giovanni_session", return_value=self.session),
+                          patch.dict(nldas_cache._SETTINGS, {"cache_dir": self.temp_dir.name}))
+
+    def test_gauges_in_one_cell_share_requests(self):
+        variables = ["precipitation", "temperature"]
+        first = get_nldas_forcing(40.5887, -105.0695, datetime(2023, 6, 1), datetime(2023, 6, 3, 23),
+                                  variables=variables)
+        self.assertEqual(len(self.session.requests), 2)
+        self.assertEqual(self.session.requests[0]["location"], "[40.5625,-105.0625]")
+        neighbour = get_nldas_forcing(40.5520, -105.0180, datetime(2023, 6, 2), datetime(2023, 6, 3, 23),
+                                      variables=variables)
+        self.assertEqual(len(self.session.requests), 2)
+        pd.testing.assert_frame_equal(neighbour, first.iloc[24:].reset_index(drop=True))
+        get_nldas_forcing(40.5520, -105.0180, datetime(2023, 6, 3), datetime(2023, 6, 5, 23),
+                          variables=variables)
+        self.assertEqual([request["time"] for request in self.session.requests[2:]],
+                         ["2023-06-04T00:00:00/2023-06-05T23:00:00"] * 2)
+
+    def test_recent_hours_are_refetched(self):
+        end = datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+        for _ in range(2):
+            get_nldas_forcing(40.0, -105.0, end - timedelta(days=10), end, variables=["precipitation"])
+        self.assertEqual(len(self.session.requests), 2)
+        refetched_from = datetime.fromisoformat(self.session.requests[1]["time"].split("/")[0])
+        self.assertGreaterEqual(refetched_from, end - timedelta(days=6))
+
+    def test_parallel_chunks_of_a_cell_download_concurrently(self):
+        self.session.delay = 0.1
+        months = [(datetime(2023, month, 1), datetime(2023, month + 1, 1) - timedelta(hours=1))
+                  for month in range(1, 5)]
+
+        def chunk(window):
+            return get_nldas_forcing(40.0, -105.0, *window, variables=["precipitation"])
+
+        def gauge(_):
+            return get_nldas_forcing(40.01, -105.01, datetime(2023, 6, 1), datetime(2023, 6, 2),
+                                     variables=["precipitation"])
+        giovanni_limit = {host_limits.GIOVANNI_HOST: {"concurrency": 4, "delay_seconds": 0.0}}
+        with patch.dict(host_limits.HOST_LIMITS, giovanni_limit), ThreadPoolExecutor(max_workers=4) as pool:
+            frames = list(pool.map(chunk, months))
+            self.assertEqual(self.session.peak, 4)
+            self.assertEqual(len(self.session.requests), 4)
+            self.assertEqual(sum(len(frame) for frame in frames), (31 + 28 + 31 + 30) * 24)
+            # Gauges of the cell asking for the same window wait for one download.
+            list(pool.map(gauge, range(4)))
+        self.assertEqual(len(self.session.requests), 5)
+
+    def test_uncovered_windows_download_concurrently(self):
+        self.session.delay = 0.1
+        giovanni_limit = {host_limits.GIOVANNI_HOST: {"concurrency": 4, "delay_seconds": 0.0}}
+        with patch.dict(host_limits.HOST_LIMITS, giovanni_limit):
+            frame = get_nldas_forcing(40.0, -105.0, datetime(2023, 6, 1), datetime(2023, 6, 4, 23),
+                                      variables=["precipitation"], window_days=1, max_workers=4)
+        self.assertEqual(len(self.session.requests), 4)
+        self.assertEqual(self.session.peak, 4)
+        self.assertEqual(len(frame), 4 * 24)
+
+    def test_default_directory_is_outside_the_working_directory(self):
+        with patch.dict(nldas_cache._SETTINGS, clear=True), patch.dict(os.environ, {"XDG_CACHE_HOME": "/cache"}):
+            os.environ.pop("NLDAS_CACHE_DIR", None)
+            self.assertEqual(nldas_cache.cache_dir(), os.path.join("/cache", "water", "nldas_cache"))
+
+
 @unittest.skipUnless(os.environ.get("EARTHDATA_TOKEN"), "EARTHDATA_TOKEN not set")
 class TestGiovanniLive(unittest.TestCase):
     """Live NLDAS-2 fetch through Giovanni; runs only when an Earthdata token is configured."""
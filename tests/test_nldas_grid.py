@@ -0,0 +1,148 @@
+"""
+Offline tests of the bulk NLDAS-2 grid extraction on small synthetic hourly files.
+
+``per_gauge_forcing`` is the straightforward one-file-read-per-gauge reference the single gather must
+reproduce.
+"""
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import netCDF4
+import numpy as np
+import pandas as pd
+
+from nldas_functions import NLDAS_FORCING_VARIABLES
+from nldas_grid_extract import (NLDAS_FILE_VARIABLES, FleetGridForcing, build_gauge_cells,
+                                extract_gauge_forcing, load_gauge_cells, nldas_file_path, read_hour_forcing)
+
+LATS = 39.0625 + 0.125 * np.arange(12)
+LONS = -106.9375 + 0.125 * np.arange(16)
+HOURS = pd.date_range("2023-06-01 00:00", "2023-06-01 05:00", freq="h")
+
+
+def write_hour_file(path: str, hour: pd.Timestamp) -> None:
+    """Writes one synthetic forcing file whose values encode variable, hour and cell."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with netCDF4.Dataset(path, "w") as dataset:
+        dataset.createDimension("time", 1)
+        dataset.createDimension("lat", len(LATS))
+        dataset.createDimension("lon", len(LONS))
+        dataset.createVariable("lat", "f4", ("lat",))[:] = LATS
+        dataset.createVariable("lon", "f4", ("lon",))[:] = LONS
+        for offset, name in enumerate(NLDAS_FILE_VARIABLES.values()):
+            variable = dataset.createVariable(name, "f4", ("time", "lat", "lon"), fill_value=9.999e20)
+            grid = np.arange(len(LATS) * len(LONS), dtype=float).reshape(len(LATS), len(LONS))
+            grid = grid + 1000.0 * offset + 10000.0 * hour.hour
+            masked = np.ma.masked_array(grid, mask=np.zeros(grid.shape, dtype=bool))
+            masked[0, 0] = np.ma.masked
+            variable[0] = masked
+
+
+def per_gauge_forcing(path: str, latitude: float, longitude: float):
+    row = int(np.rint((latitude - LATS[0]) / 0.125))
+    column = int(np.rint((longitude - LONS[0]) / 0.125))
+    with netCDF4.Dataset(path) as dataset:
+        return [float(np.ma.filled(dataset[name][0, row, column], np.nan))
+                for name in NLDAS_FILE_VARIABLES.values()]
+
+
+class TestNldasGridExtraction(unittest.TestCase):
+    """One gather per hourly file against direct per-gauge reads."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.grid_dir = cls.temp_dir.name
+        for hour in HOURS:
+            if hour.hour != 3:
+                write_hour_file(nldas_file_path(hour.to_pydatetime(), cls.grid_dir), hour)
+        cls.reference = nldas_file_path(HOURS[0].to_pydatetime(), cls.grid_dir)
+        rng = np.random.default_rng(0)
+        cls.gauges = pd.DataFrame({"site_no": ["%08d" % number for number in range(40)],
+                                   "dec_lat_va": rng.uniform(39.0, 40.4, 40),
+                                   "dec_long_va": rng.uniform(-107.0, -105.1, 40)})
+        cls.gauges.loc[0, ["dec_lat_va", "dec_long_va"]] = [39.07, -106.93]  # the masked corner cell
+        cls.gauges.loc[1, "dec_lat_va"] = 45.0  # outside the grid
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_file_layout(self):
+        self.assertEqual(nldas_file_path(datetime(2024, 2, 1, 13), "root"),
+                         os.path.join("root", "2024", "032", "NLDAS_FORA0125_H.A20240201.1300.020.nc"))
+        self.assertEqual(list(NLDAS_FILE_VARIABLES), list(NLDAS_FORCING_VARIABLES))
+        self.assertEqual(NLDAS_FILE_VARIABLES["precipitation"], "Rainf")
+
+    def test_point_gauges_match_direct_reads(self):
+        cells_path = os.path.join(self.grid_dir, "cells", "gauge_cells.npz")
+        build_gauge_cells(self.gauges, self.reference, cells_path=cells_path)
+        cells, shape = load_gauge_cells(cells_path)
+        self.assertEqual(shape, (len(LATS), len(LONS)))
+        self.assertNotIn("00000001", cells)
+        frames = extract_gauge_forcing(cells, HOURS[0], HOURS[-1], grid_dir=self.grid_dir,
+                                       expected_shape=shape)
+        self.assertEqual(len(frames), 39)
+        frame = frames["00000007"]
+        self.assertEqual(list(frame.columns), ["datetime"] + list(NLDAS_FORCING_VARIABLES))
+        self.assertEqual(str(frame["datetime"].dt.tz), "UTC")
+        self.assertEqual(len(frame), len(HOURS))
+        self.assertTrue(frame.iloc[3, 1:].isna().all())
+        for site in ["00000000", "00000007", "00000023"]:
+            gauge = self.gauges[self.gauges["site_no"] == site].iloc[0]
+            for position in [0, 4]:
+                path = nldas_file_path(HOURS[position].to_pydatetime(), self.grid_dir)
+                expected = per_gauge_forcing(path, gauge["dec_lat_va"], gauge["dec_long_va"])
+                np.testing.assert_array_equal(frames[site].iloc[position, 1:].to_numpy(dtype=float), expected)
+        self.assertTrue(frames["00000000"]["temperature"].isna().all())
+
+    def test_basin_mask_means_skip_fill_values(self):
+        geometry = {"type": "Polygon", "coordinates": [[[-107.0, 39.0], [-106.7, 39.0], [-106.7, 39.2],
+                                                        [-107.0, 39.2], [-107.0, 39.0]]]}
+        cells = build_gauge_cells(self.gauges.iloc[:3], self.reference, geometries={"00000000": geometry})
+        self.assertEqual(len(cells["00000000"]), 4)
+        frames = extract_gauge_forcing(cells, HOURS[0], HOURS[0], grid_dir=self.grid_dir,
+                                       variables=["precipitation"])
+        # Cells (0,1), (1,0), (1,1) of the 2x2 block are valid; (0,0) is a fill value.
+        expected = np.mean([1.0, 16.0, 17.0]) + 1000.0 * list(NLDAS_FILE_VARIABLES).index("precipitation")
+        self.assertAlmostEqual(frames["00000000"]["precipitation"].iloc[0], expected, places=3)
+        self.assertEqual(list(frames["00000002"].columns), ["datetime", "precipitation"])
+        with self.assertRaises(KeyError):
+            extract_gauge_forcing(cells, HOURS[0], HOURS[0], grid_dir=self.grid_dir, variables=["snow"])
+
+    def test_grid_shape_change_raises(self):
+        cells = build_gauge_cells(self.gauges.iloc[2:4], self.reference)
+        with self.assertRaises(ValueError):
+            read_hour_forcing(self.reference, np.concatenate(list(cells.values())), np.array([0, 1]),
+                              ["temperature"], expected_shape=(224, 464))
+
+    def test_fleet_forcing_extracts_each_window_once_for_the_gauges_in_flight(self):
+        cells = build_gauge_cells(self.gauges.iloc[2:5], self.reference)
+        fleet = FleetGridForcing(cells, grid_dir=self.grid_dir)
+        calls = []
+
+        def counting_extract(wanted, start_time, end_time, **kwargs):
+            calls.append(sorted(wanted))
+            return extract_gauge_forcing(wanted, start_time, end_time, **kwargs)
+
+        providers = {site: fleet.for_site(site) for site in cells}
+        for provider in providers.values():
+            provider.join()
+        with patch("nldas_grid_extract.extract_gauge_forcing", side_effect=counting_extract):
+            first = providers["00000002"](HOURS[0], HOURS[1])
+            providers["00000003"](HOURS[0], HOURS[1])
+            providers["00000004"].release()
+            providers["00000002"](HOURS[2], HOURS[2])
+            providers["00000003"](HOURS[2], HOURS[2])
+            self.assertIsNone(providers["00000002"](HOURS[0], HOURS[1]))
+        self.assertEqual(calls, [["00000002", "00000003", "00000004"], ["00000002", "00000003"]])
+        self.assertEqual(len(first), 2)
+        # Each window is dropped once its frames are taken or their gauge is released.
+        self.assertEqual(fleet._frames, {})
+        self.assertIsNone(FleetGridForcing({}, grid_dir=self.grid_dir).take("00000002", HOURS[0], HOURS[1]))
+
+if __name__ == "__main__":
+    unittest.main()
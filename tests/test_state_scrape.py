@@ -1,8 +1,56 @@
+import asyncio
 import os
 import tempfile
+import threading
+import time
 import unittest
+from datetime import datetime
+from unittest.mock import patch
 
-from state_scrape import list_state_gauges, load_registry, save_registry, registry_report
+import numpy as np
+import pandas as pd
+
+import asos_cache
+import catchment_dataset
+import host_limits
+import long_term_scrape
+import metadata_cache
+import nldas_grid_extract
+import state_scrape
+import usgs_scraping_functions
+import weather_scraping_functions
+from catchment_dataset import discover_catchment, get_data_availability
+from long_term_scrape import chunk_bounds
+from state_scrape import (fleet_cell_sharing, list_state_gauges, load_circuits, load_registry, save_circuits,
+                          save_registry, registry_report, run_state_scrape, scrape_fleet_async)
+from station_index import StationIndex
+from usgs_scraping_functions import get_state_site_index
+
+SITE_RDB = """# expanded site output
+agency_cd\tsite_no\tstation_nm\tstate_cd\tdec_lat_va\tdec_long_va\tdrain_area_va
+5s\t15s\t50s\t2s\t16s\t16s\t12s
+USGS\t06752260\tCACHE LA POUDRE RIVER AT FORT COLLINS, CO\t08\t40.588\t-105.069\t1127
+USGS\t06752280\tCACHE LA POUDRE RV ABV BOXELDER CRK NR TIMNATH, CO\t08\t40.551\t-105.011\t
+"""
+
+CATALOG_RDB = """# series catalog
+agency_cd\tsite_no\tdata_type_cd\tparm_cd\tbegin_date\tend_date\tcount_nu
+5s\t15s\t2s\t5s\t20d\t20d\t5n
+USGS\t06752260\tdv\t00060\t1975-10-01\t2025-05-01\t18000
+USGS\t06752260\tuv\t00060\t1990-01-01\t2025-05-01\t12000
+USGS\t06752260\tuv\t00060\t1987-12-31\t1989-12-31\t700
+USGS\t06752280\tuv\t00060\t2001-10-01\t2025-05-01\t8000
+"""
+
+
+class FakeTextResponse:
+    """A minimal stand-in for :class:`requests.Response` carrying a text payload."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def raise_for_status(self) -> None:
+        return None
 
 
 class TestGaugeEnumeration(unittest.TestCase):
@@ -28,6 +76,195 @@ class TestRegistry(unittest.TestCase):
             self.assertEqual(load_registry(path), registry)
             self.assertEqual(registry_report(registry), {"completed": 2, "failed": 1})
 
+    def test_circuits_roundtrip_into_report(self):
+        circuits = {host_limits.NWIS_HOST: {"state": "open", "wait_seconds": 60.0,
+                                            "open_until": time.time() + 60, "last_error": "HTTP 503"},
+                    host_limits.MESONET_HOST: {"state": "open", "wait_seconds": 0.0,
+                                               "open_until": time.time() - 5, "last_error": "HTTP 429"}}
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                patch.object(state_scrape, "circuit_report", return_value=circuits):
+            path = os.path.join(temp_dir, "circuits.json")
+            save_circuits(path)
+            loaded = load_circuits(path)
+        self.assertEqual(list(loaded), [host_limits.NWIS_HOST])
+        report = registry_report({"111": {"status": "completed"}}, loaded)
+        self.assertEqual(report["completed"], 1)
+        self.assertEqual(report["circuits"][host_limits.NWIS_HOST]["last_error"], "HTTP 503")
+
+    def test_report_shows_nldas_cell_sharing(self):
+        # Two gauges on the Poudre share a 0.125 degree cell; the third is in another.
+        gauges = pd.DataFrame({"dec_lat_va": ["40.5887", "40.5520", "39.7392"],
+                               "dec_long_va": ["-105.0695", "-105.0180", "-104.9903"]})
+        report = registry_report({"111": {"status": "completed"}}, nldas_cells=fleet_cell_sharing(gauges))
+        self.assertEqual(report["nldas_cells"], {"gauges": 3, "cells": 2, "sharing_ratio": 1.5})
+
+
+class TestFleetEngine(unittest.TestCase):
+    """Offline tests of the concurrent fleet engine with a stubbed per-gauge scrape."""
+
+    def test_gauges_run_concurrently_and_registry_is_complete(self):
+        in_flight, peak, lock = [0], [0], threading.Lock()
+
+        def fake_scrape(site, output_dir=None, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+            if site == "bad":
+                raise RuntimeError("503 Service Unavailable")
+            os.makedirs(os.path.join(output_dir, "chunks"), exist_ok=True)
+            return {"combined_rows": 10, "start": "2020-01-01", "chunk_failures": [],
+                    "data_availability": {}}
+
+        pending = [("%08d" % number, "Gauge %d" % number) for number in range(7)] + [("bad", "Bad")]
+        with tempfile.TemporaryDirectory() as state_dir:
+            registry_path = os.path.join(state_dir, "registry.json")
+            registry = {}
+            with patch.object(state_scrape, "run_long_term_scrape", side_effect=fake_scrape):
+                asyncio.run(scrape_fleet_async(pending, state_dir, registry, registry_path,
+                                               max_concurrent_gauges=3, include_nldas=False))
+            self.assertEqual(peak[0], 3)
+            self.assertEqual(load_registry(registry_path), registry)
+            self.assertEqual(registry_report(registry), {"completed": 7, "failed": 1})
+            self.assertIn("503", registry["bad"]["error"])
+            self.assertTrue(os.path.isdir(os.path.join(state_dir, "00000000", "chunks")))
+
+    def test_common_start_batches_nwis_windows(self):
+        requests_made, received, lock = [], {}, threading.Lock()
+        # Each pair of gauges holding the two slots starts together, so both are in flight for every window.
+        started_together = threading.Barrier(2)
+
+        def fake_fleet(site_numbers, start_date, end_date, batch_size=10):
+            with lock:
+                requests_made.append((tuple(sorted(site_numbers)), start_date))
+            return {site: pd.DataFrame({"site_no": [site]}) for site in site_numbers}
+
+        def fake_scrape(site, output_dir=None, start_time=None, end_time=None, chunk_months=None,
+                        usgs_prefetch=None, **kwargs):
+            started_together.wait(timeout=5)
+            frames = [usgs_prefetch.get(start) for start, _ in chunk_bounds(start_time, end_time, chunk_months)]
+            received[site] = [frame["site_no"].iloc[0] for frame in frames]
+            return {"combined_rows": 1, "start": str(start_time.date()), "chunk_failures": [],
+                    "data_availability": {}}
+
+        gauges = pd.DataFrame({"site_no": ["01", "02", "03", "04"], "station_nm": list("ABCD")})
+        with tempfile.TemporaryDirectory() as output_root, \
+                patch.object(state_scrape, "list_state_gauges", return_value=gauges), \
+                patch.object(state_scrape, "get_state_site_index", return_value={}), \
+                patch.object(state_scrape, "fleet_asos_stations", return_value={}), \
+                patch.object(state_scrape, "run_long_term_scrape", side_effect=fake_scrape), \
+                patch.object(long_term_scrape, "fetch_usgs_fleet", side_effect=fake_fleet):
+            report = run_state_scrape("CO", output_root=output_root, include_nldas=False, backup=False,
+                                      max_concurrent_gauges=2, start_time=datetime(2024, 1, 1))
+        self.assertEqual(report["completed"], 4)
+        windows = len(received["01"])
+        self.assertEqual(received, {site: [site] * windows for site in gauges["site_no"]})
+        # One batched request per window for the gauges in flight; gauges not started yet are left out.
+        self.assertEqual(len(requests_made), 2 * windows)
+        self.assertEqual({sites for sites, _ in requests_made}, {("01", "02"), ("03", "04")})
+
+    def test_grid_dir_extracts_forcing_once_per_window_in_flight(self):
+        extracted, received, lock = [], {}, threading.Lock()
+        started_together = threading.Barrier(2)
+
+        def fake_extract(cells, start_time, end_time, **kwargs):
+            with lock:
+                extracted.append(tuple(sorted(cells)))
+            return {site: pd.DataFrame({"datetime": [start_time], "temperature": [float(site)]})
+                    for site in cells}
+
+        def fake_scrape(site, start_time=None, nldas_provider=None, **kwargs):
+            started_together.wait(timeout=5)
+            received[site] = nldas_provider(start_time, start_time)["temperature"].iloc[0]
+            return {"combined_rows": 1, "start": str(start_time.date()), "chunk_failures": [],
+                    "data_availability": {}}
+
+        gauges = pd.DataFrame({"site_no": ["01", "02", "03", "04"], "station_nm": list("ABCD"),
+                               "dec_lat_va": 40.0, "dec_long_va": -105.0})
+        cells = {site: np.array([int(site)]) for site in gauges["site_no"]}
+        with tempfile.TemporaryDirectory() as output_root, \
+                patch.object(state_scrape, "list_state_gauges", return_value=gauges), \
+                patch.object(state_scrape, "get_state_site_index", return_value={}), \
+                patch.object(state_scrape, "load_gauge_cells", return_value=(cells, (2, 2))), \
+                patch.object(state_scrape, "FleetUsgsPrefetch"), \
+                patch.object(state_scrape, "fleet_asos_stations", return_value={}), \
+                patch.object(state_scrape, "run_long_term_scrape", side_effect=fake_scrape), \
+                patch.object(nldas_grid_extract, "extract_gauge_forcing", side_effect=fake_extract):
+            report = run_state_scrape("CO", output_root=output_root, include_nldas=True, backup=False,
+                                      max_concurrent_gauges=2, start_time=datetime(2024, 1, 1),
+                                      nldas_grid_dir=output_root)
+        self.assertEqual(report["completed"], 4)
+        self.assertEqual(received, {"01": 1.0, "02": 2.0, "03": 3.0, "04": 4.0})
+        self.assertEqual(sorted(extracted), [("01", "02"), ("03", "04")])
+
+    def test_common_start_shares_the_fleet_asos_stations(self):
+        received = {}
+
+        def fake_scrape(site, start_time=None, asos_prefetch=None, site_index=None, **kwargs):
+            received[site] = (asos_prefetch.station_ids,
+                              site_index["asos_station"].get(site, {}).get("station_id"))
+            return {"combined_rows": 1, "start": str(start_time.date()), "chunk_failures": [],
+                    "data_availability": {}}
+
+        gauges = pd.DataFrame({"site_no": ["01", "02", "03"], "station_nm": list("ABC"),
+                               "dec_lat_va": ["40.0", "40.1", ""], "dec_long_va": ["-105.0", "-104.1", ""]})
+        stations = StationIndex(pd.DataFrame({"station_id": ["FNL", "GXY", "DEN"],
+                                              "latitude": [40.0, 40.1, 39.8],
+                                              "longitude": [-105.0, -104.1, -104.7]}))
+        with tempfile.TemporaryDirectory() as output_root, \
+                patch.object(state_scrape, "list_state_gauges", return_value=gauges), \
+                patch.object(state_scrape, "get_state_site_index", return_value={}), \
+                patch.object(weather_scraping_functions, "get_asos_station_index", return_value=stations), \
+                patch.dict(asos_cache._SETTINGS, {"cache_dir": output_root}), \
+                patch.object(state_scrape, "run_long_term_scrape", side_effect=fake_scrape):
+            report = run_state_scrape("CO", output_root=output_root, include_nldas=False, backup=False,
+                                      start_time=datetime(2024, 1, 1))
+        self.assertEqual(report["completed"], 3)
+        # One index query finds every located gauge's station, for its discovery and the fleet prefetch.
+        self.assertEqual(received, {"01": (["FNL", "GXY"], "FNL"), "02": (["FNL", "GXY"], "GXY"),
+                                    "03": (["FNL", "GXY"], None)})
+
+
+class TestStateSiteIndex(unittest.TestCase):
+    """Offline tests of the state-wide metadata prefetch and its use by discovery."""
+
+    def setUp(self):
+        def fake_get(url, timeout=None):
+            return FakeTextResponse(CATALOG_RDB if "seriesCatalogOutput" in url else SITE_RDB)
+        with patch.dict(metadata_cache._SETTINGS, {"cache_dir": ""}), \
+                patch.object(usgs_scraping_functions.requests, "get", side_effect=fake_get) as mocked:
+            self.index = get_state_site_index("CO")
+        self.request_count = mocked.call_count
+
+    def test_two_requests_index_every_gauge(self):
+        self.assertEqual(self.request_count, 2)
+        self.assertEqual(sorted(self.index["metadata"]), ["06752260", "06752280"])
+        self.assertAlmostEqual(self.index["metadata"]["06752260"]["drain_area_va"], 1127.0)
+        self.assertIsNone(self.index["metadata"]["06752280"]["drain_area_va"])
+        catalog = self.index["period_of_record"]["06752260"]
+        self.assertEqual(catalog["uv_00060"]["begin_date"], "1987-12-31")
+        self.assertEqual(catalog["dv_00060"]["begin_date"], "1975-10-01")
+
+    def test_discovery_uses_index_without_metadata_requests(self):
+        with patch.object(catchment_dataset, "get_site_metadata", side_effect=AssertionError), \
+                patch.object(catchment_dataset, "get_period_of_record", side_effect=AssertionError):
+            discovery = discover_catchment("06752260", include_basin=False, include_asos=False,
+                                           include_soil_moisture=False, site_index=self.index)
+            availability = get_data_availability("06752260", discovery=discovery,
+                                                 include_sentinel=False, include_camera=False)
+        self.assertEqual(discovery["static"]["station_nm"], "CACHE LA POUDRE RIVER AT FORT COLLINS, CO")
+        self.assertEqual(availability["usgs_hourly_begin"], "1987-12-31")
+
+    def test_discovery_uses_the_fleet_asos_station(self):
+        station = {"station_id": "FNL", "distance_km": 5.0}
+        with patch.object(catchment_dataset, "find_nearest_asos_station", side_effect=AssertionError):
+            discovery = discover_catchment("06752260", include_basin=False, include_soil_moisture=False,
+                                           site_index=dict(self.index, asos_station={"06752260": station}))
+        self.assertEqual(discovery["asos_station"], station)
+        self.assertEqual(discovery["static"]["asos_station_id"], "FNL")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,120 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import requests
+
+import metadata_cache
+import weather_scraping_functions
+from station_index import StationIndex, haversine_km
+from weather_scraping_functions import (find_nearest_asos_station, find_nearest_asos_stations,
+                                        get_national_asos_stations)
+
+
+def random_stations(count: int, seed: int = 0) -> pd.DataFrame:
+    """Builds a station table scattered over the conterminous United States."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"station_id": ["S%04d" % number for number in range(count)],
+                         "latitude": rng.uniform(25, 49, count), "longitude": rng.uniform(-124, -67, count)})
+
+
+class TestStationIndex(unittest.TestCase):
+    """Offline tests of the k-nearest station search against brute-force haversine distances."""
+
+    def test_matches_brute_force(self):
+        stations = random_stations(500)
+        index = StationIndex(stations)
+        points = random_stations(50, seed=1)
+        distances, positions = index.query(points["latitude"], points["longitude"], k=3)
+        brute = haversine_km(points[["latitude"]].to_numpy(), points[["longitude"]].to_numpy(),
+                             stations["latitude"].to_numpy(), stations["longitude"].to_numpy())
+        np.testing.assert_array_equal(positions, np.argsort(brute, axis=1)[:, :3])
+        np.testing.assert_allclose(distances, np.sort(brute, axis=1)[:, :3], rtol=1e-9)
+
+    def test_distance_cap_and_long_table(self):
+        stations = pd.DataFrame({"station_id": ["A", "B", "C"], "latitude": [40.0, 40.5, None],
+                                 "longitude": [-105.0, -105.0, -105.0]})
+        index = StationIndex(stations)
+        self.assertEqual(len(index), 2)
+        nearest = index.nearest([40.1, 45.0], [-105.0, -105.0], k=2, max_distance_km=100.0)
+        self.assertEqual(list(nearest["station_id"]), ["A", "B"])
+        self.assertEqual(list(nearest["query"]), [0, 0])
+        self.assertEqual(list(nearest["rank"]), [0, 1])
+        self.assertAlmostEqual(nearest["distance_km"].iloc[0], 11.12, places=1)
+
+    def test_fleet_query_shape(self):
+        index = StationIndex(random_stations(3000))
+        gauges = random_stations(10000, seed=2)
+        distances, positions = index.query(gauges["latitude"], gauges["longitude"], k=5)
+        self.assertEqual(distances.shape, (10000, 5))
+        self.assertTrue((np.diff(distances, axis=1) >= 0).all())
+        self.assertTrue((positions < 3000).all())
+
+
+class TestNationalAsosIndex(unittest.TestCase):
+    """The national ASOS index searches across state networks."""
+
+    def setUp(self):
+        self.networks = {"CO": pd.DataFrame({"station_id": ["DEN"], "name": ["Denver"], "latitude": [39.85],
+                                             "longitude": [-104.66]}),
+                         "WY": pd.DataFrame({"station_id": ["CYS"], "name": ["Cheyenne"],
+                                             "latitude": [41.15], "longitude": [-104.81]})}
+        for patcher in (patch.dict(metadata_cache._SETTINGS, {"cache_dir": ""}),
+                        patch.dict(weather_scraping_functions._ASOS_INDEXES, clear=True),
+                        patch.object(weather_scraping_functions, "get_asos_stations",
+                                     side_effect=self.stations)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stations(self, state, network_type="ASOS"):
+        return self.networks.get(state, pd.DataFrame())
+
+    def test_border_gauge_gets_station_across_state_line(self):
+        # A gauge just south of the Colorado-Wyoming line is closer to Cheyenne than to Denver.
+        nearest = find_nearest_asos_station(40.95, -104.8)
+        self.assertEqual(nearest["station_id"], "CYS")
+        self.assertEqual(nearest["state"], "WY")
+        self.assertNotIn("rank", nearest)
+        self.assertEqual(find_nearest_asos_station(40.95, -104.8, "CO")["station_id"], "DEN")
+
+    def test_index_is_reused(self):
+        find_nearest_asos_station(40.95, -104.8)
+        find_nearest_asos_station(40.0, -105.0)
+        calls = weather_scraping_functions.get_asos_stations.call_count
+        self.assertEqual(calls, len(set(weather_scraping_functions.FIPS_TO_STATE.values())))
+
+    def test_concurrent_lookups_build_the_index_once(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            found = list(pool.map(lambda _: find_nearest_asos_station(40.95, -104.8)["station_id"], range(8)))
+        self.assertEqual(found, ["CYS"] * 8)
+        calls = weather_scraping_functions.get_asos_stations.call_count
+        self.assertEqual(calls, len(set(weather_scraping_functions.FIPS_TO_STATE.values())))
+
+    def test_fleet_lookup_is_one_query(self):
+        nearest = find_nearest_asos_stations([40.95, 39.9, 41.3], [-104.8, -104.7, -104.8], k=2)
+        self.assertEqual(list(nearest["station_id"]), ["CYS", "DEN", "DEN", "CYS", "CYS", "DEN"])
+        self.assertEqual(list(nearest["query"]), [0, 0, 1, 1, 2, 2])
+        self.assertEqual(list(nearest["rank"]), [0, 1] * 3)
+
+    def test_failed_state_is_skipped_and_retried(self):
+        def flaky(state, network_type="ASOS"):
+            if state == "WY":
+                raise requests.ConnectionError("Mesonet reset")
+            return self.stations(state)
+        weather_scraping_functions.get_asos_stations.side_effect = flaky
+        national = get_national_asos_stations()
+        self.assertEqual(list(national["station_id"]), ["DEN"])
+        self.assertEqual(national.attrs["failed_states"], ["WY"])
+        self.assertEqual(find_nearest_asos_station(40.95, -104.8)["station_id"], "DEN")
+        # The incomplete index is served briefly, then the networks are listed again.
+        weather_scraping_functions.get_asos_stations.side_effect = self.stations
+        self.assertEqual(find_nearest_asos_station(40.95, -104.8)["station_id"], "DEN")
+        retry_at = time.time() + weather_scraping_functions.ASOS_PARTIAL_INDEX_RETRY_SECONDS + 1
+        with patch.object(weather_scraping_functions.time, "time", return_value=retry_at):
+            self.assertEqual(find_nearest_asos_station(40.95, -104.8)["station_id"], "CYS")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from swe_assimilation import (equal_area_bands, estimate_band_swe_series, fit_swe_elevation_profile,
+                              fit_swe_elevation_profiles)
+
+
+def legacy_fit_swe_elevation_profile(samples, band_elevations_m):
+    """The previous per-day implementation, kept as the reference of the array fit."""
+    if samples.empty:
+        return [0.0] * len(band_elevations_m)
+    snowy = samples[samples["swe_mm"] > 1.0]
+    dry = samples[samples["swe_mm"] <= 1.0]
+    if snowy.empty:
+        return [0.0] * len(band_elevations_m)
+    if dry.empty:
+        snow_line = float(snowy["elevation_m"].min()) - 200.0
+    else:
+        highest_dry = float(dry["elevation_m"].max())
+        lowest_snowy = float(snowy["elevation_m"].min())
+        snow_line = (highest_dry + min(lowest_snowy, highest_dry + 400.0)) / 2.0 \
+            if lowest_snowy > highest_dry else highest_dry
+    above = np.clip((snowy["elevation_m"] - snow_line).to_numpy(), 1.0, None)
+    slope = max(float((above * snowy["swe_mm"].to_numpy()).sum() / (above * above).sum()), 0.0)
+    return [max(0.0, slope * (z - snow_line)) for z in band_elevations_m]
+
+
+def season_samples(days: int, sites: int, seed: int = 0):
+    """Builds site elevations and a day x site SWE matrix with a rising snow line and missing values."""
+    rng = np.random.default_rng(seed)
+    elevations = rng.uniform(2400, 3600, sites)
+    snow_line = np.linspace(2300, 3800, days)[:, None]
+    swe = np.clip((elevations - snow_line) * 0.4 + rng.normal(0, 20, (days, sites)), 0, None)
+    swe[rng.random((days, sites)) < 0.15] = np.nan
+    return elevations, swe
+
+
+class TestSweProfileFit(unittest.TestCase):
+    """The array profile fit against the per-day implementation."""
+
+    def test_matches_per_day_fit(self):
+        elevations, swe = season_samples(120, 12)
+        swe[5] = 0.0
+        swe[6] = np.nan
+        swe[7, :] = 50.0
+        bands = [2500.0, 2900.0, 3300.0, 3700.0]
+        fitted = fit_swe_elevation_profiles(elevations, swe, bands)
+        for day in range(len(swe)):
+            observed = ~np.isnan(swe[day])
+            samples = pd.DataFrame({"elevation_m": elevations[observed], "swe_mm": swe[day, observed]})
+            np.testing.assert_allclose(fitted[day], legacy_fit_swe_elevation_profile(samples, bands),
+                                       rtol=1e-9, atol=1e-9)
+        np.testing.assert_array_equal(fitted[6], 0.0)
+        samples = pd.DataFrame({"elevation_m": [2500.0, 3000.0], "swe_mm": [0.0, 300.0]})
+        self.assertEqual(fit_swe_elevation_profile(samples, bands),
+                         legacy_fit_swe_elevation_profile(samples, bands))
+
+    def test_fleet_season_from_one_matrix(self):
+        elevations, swe = season_samples(365, 300, seed=1)
+        rng = np.random.default_rng(2)
+        sites = pd.DataFrame({"triplet": ["%d:CO:SNTL" % number for number in range(300)],
+                              "elevation_m": elevations, "latitude": rng.uniform(37, 41, 300),
+                              "longitude": rng.uniform(-108, -104, 300)})
+        days = pd.date_range("2023-10-01", periods=365)
+        matrix = pd.DataFrame(swe.T, index=sites["triplet"], columns=days)
+        statics = {"%08d" % gauge: {"basin_bbox": [-108 + gauge * 0.2, 37 + gauge * 0.2, -107 + gauge * 0.2,
+                                                   38 + gauge * 0.2],
+                                    "gages2_ELEV_MEAN_M_BASIN": 3000.0, "gages2_ELEV_STD_M_BASIN": 300.0}
+                   for gauge in range(15)}
+        with patch("swe_assimilation.sample_snotel_swe_matrix", return_value=(sites, matrix)) as sampler:
+            estimates = estimate_band_swe_series(statics, datetime(2023, 10, 1), datetime(2024, 9, 29))
+        self.assertEqual(sampler.call_count, 1)
+        self.assertEqual(len(sampler.call_args[0][0]), 15)
+        gauge_id, static = "00000003", statics["00000003"]
+        min_lon, min_lat, max_lon, max_lat = static["basin_bbox"]
+        inside = ((sites.longitude >= min_lon) & (sites.longitude <= max_lon) &
+                  (sites.latitude >= min_lat) & (sites.latitude <= max_lat)).to_numpy()
+        bands = equal_area_bands(3000.0, 300.0)
+        day = 100
+        observed = inside & ~np.isnan(swe[day])
+        samples = pd.DataFrame({"elevation_m": elevations[observed], "swe_mm": swe[day, observed]})
+        band_swe = estimates[gauge_id]["band_swe_mm"]
+        self.assertEqual(band_swe.shape, (365, 5))
+        np.testing.assert_allclose(band_swe.iloc[day].to_numpy(),
+                                   legacy_fit_swe_elevation_profile(samples, bands["elevations_m"]))
+        self.assertAlmostEqual(estimates[gauge_id]["basin_mean_swe_mm"].iloc[day], band_swe.iloc[day].mean())
+
+
+if __name__ == "__main__":
+    unittest.main()
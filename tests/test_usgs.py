@@ -22,7 +22,8 @@ class TestUsgsScraping(unittest.TestCase):
         self.assertIn("p01m", self.scraper.asos_df.columns)
 
     def test_make_usgs_data(self):
-        self.assertEqual(len(self.scraper.usgs_df), 97)
+        # 96 fifteen minute readings; the RDB format line is no longer kept as a junk first row.
+        self.assertEqual(len(self.scraper.usgs_df), 96)
         self.assertGreater(len(self.scraper.final_usgs), 17)
         self.assertEqual(len(self.scraper.final_usgs), 24)
 
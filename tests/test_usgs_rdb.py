@@ -0,0 +1,292 @@
+"""
+Offline tests for the in-memory NWIS RDB parser and the batched multi-site instantaneous-values fetch.
+
+The multi-site RDB payload below mirrors the NWIS layout (one comment block, header, format line and
+table per site); requests are stubbed so the adaptive batch sizing runs without network access.
+"""
+from datetime import datetime
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+import pytz
+import requests
+
+from catchment_dataset import usgs_to_hourly_utc
+from scrape_text import timezone_map
+
+import usgs_scraping_functions
+from host_limits import CircuitOpenError
+from http_fakes import FakeResponse, reset_host_limits
+from usgs_scraping_functions import (create_csv, fetch_usgs_fleet, make_usgs_data, process_response_text,
+                                     read_usgs_rdb, rename_cols, split_rdb_sites)
+
+TEST_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def site_block(site: str, ts_id: str, values) -> str:
+    """
+    Builds the RDB table of one site as NWIS emits it inside a multi-site response.
+
+    :param site: The site number.
+    :type site: str
+    :param ts_id: The discharge time-series id.
+    :type ts_id: str
+    :param values: (local timestamp, discharge) pairs.
+    :type values: list
+    :return: The RDB text of the site's table.
+    :rtype: str
+    """
+    lines = ["# Data provided for site " + site,
+             "#    TS_ID       Parameter Description",
+             "#    " + ts_id + "       00060     Discharge, cubic feet per second",
+             "#",
+             "agency_cd\tsite_no\tdatetime\ttz_cd\t{0}_00060\t{0}_00060_cd".format(ts_id),
+             "5s\t15s\t20d\t6s\t14n\t10s"]
+    lines += ["USGS\t%s\t%s\tMST\t%s\tP" % (site, stamp, value) for stamp, value in values]
+    return "\n".join(lines) + "\n"
+
+
+MULTI_SITE_RDB = ("# retrieved: 2025-05-18\n#\n" +
+                  site_block("06752260", "1001", [("2024-06-01 00:00", "100"), ("2024-06-01 00:15", "101")]) +
+                  site_block("06752280", "2002", [("2024-06-01 00:00", "55")]))
+
+
+# Set to run the timing benchmarks, e.g. RUN_BENCHMARKS=1 python -m pytest -s tests/test_usgs_rdb.py
+BENCHMARK_ENV_VAR = "RUN_BENCHMARKS"
+
+
+class TestReadUsgsRdb(unittest.TestCase):
+    """The single-pass parser against the legacy file round trip on a recorded response."""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+
+    def test_matches_legacy_file_round_trip(self):
+        with open(os.path.join(TEST_DIR, "01010000.txt")) as f:
+            parsed = read_usgs_rdb(f)
+        raw_copy = os.path.join(self.work_dir, "01010000.txt")
+        shutil.copy(os.path.join(TEST_DIR, "01010000.txt"), raw_copy)
+        cwd = os.getcwd()
+        os.chdir(self.work_dir)
+        try:
+            tsv_path, params = process_response_text("01010000.txt")
+            legacy = create_csv(tsv_path, params, "01010000").iloc[1:].reset_index(drop=True)
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(list(parsed.columns), list(legacy.columns))
+        self.assertEqual(len(parsed), len(legacy))
+        self.assertEqual(parsed["site_no"].iloc[0], "01010000")
+        pd.testing.assert_series_equal(parsed["datetime"], legacy["datetime"], check_dtype=False)
+        pd.testing.assert_series_equal(parsed["65330_00060"],
+                                       pd.to_numeric(legacy["65330_00060"]), check_dtype=False)
+        self.assertTrue(pd.api.types.is_numeric_dtype(parsed["65331_00065"]))
+
+    def test_comment_only_response_is_empty(self):
+        self.assertTrue(read_usgs_rdb(["# No data", "#"]).empty)
+
+    def test_non_numeric_markers_become_nan(self):
+        text = site_block("06752260", "1001", [("2024-01-01 00:00", "Ice"), ("2024-01-01 00:15", "12")])
+        df = read_usgs_rdb(text.splitlines())
+        self.assertTrue(pd.isna(df["1001_00060"].iloc[0]))
+        self.assertEqual(df["1001_00060"].iloc[1], 12)
+
+    def test_legacy_ts_table_labels_copied(self):
+        text = ("#            TS   parameter     Description\n"
+                "#         69928       00060     Discharge, cubic feet per second\n#\n"
+                "agency_cd\tsite_no\tdatetime\ttz_cd\t69928_00060\n5s\t15s\t20d\t6s\t14n\n"
+                "USGS\t01646500\t2024-01-01 00:00\tEST\t9000\n")
+        df = read_usgs_rdb(text.splitlines())
+        self.assertEqual(df["cfs"].iloc[0], 9000)
+
+    def test_no_files_written_unless_debug(self):
+        cwd = os.getcwd()
+        os.chdir(self.work_dir)
+        try:
+            with patch.object(usgs_scraping_functions.requests, "get",
+                              return_value=FakeResponse(MULTI_SITE_RDB)):
+                df = make_usgs_data(datetime(2024, 6, 1), datetime(2024, 6, 2), "06752260")
+                self.assertEqual(os.listdir(self.work_dir), [])
+                make_usgs_data(datetime(2024, 6, 1), datetime(2024, 6, 2), "06752260", debug_dir="debug")
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(len(df), 2)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.work_dir, "debug"))),
+                         ["06752260.txt", "06752260_flow_data.csv"])
+
+    def test_error_bodies_are_not_parsed(self):
+        reset_host_limits(self)
+        with patch.object(usgs_scraping_functions.requests, "get",
+                          return_value=FakeResponse("<html>Service Unavailable</html>", status_code=503)):
+            with self.assertRaises(requests.HTTPError):
+                make_usgs_data(datetime(2024, 6, 1), datetime(2024, 6, 2), "06752260")
+        with patch.object(usgs_scraping_functions.requests, "get",
+                          return_value=FakeResponse("No sites found", status_code=404)):
+            self.assertTrue(make_usgs_data(datetime(2024, 6, 1), datetime(2024, 6, 2), "06752260").empty)
+
+
+class TestSplitRdbSites(unittest.TestCase):
+    """Splitting a multi-site response into per-site frames."""
+
+    def test_one_typed_frame_per_site(self):
+        frames = split_rdb_sites(MULTI_SITE_RDB.splitlines())
+        self.assertEqual(sorted(frames), ["06752260", "06752280"])
+        self.assertEqual(len(frames["06752260"]), 2)
+        self.assertEqual(frames["06752260"]["tz_cd"].iloc[0], "MST")
+        renamed = rename_cols(frames["06752280"])
+        self.assertEqual(renamed["cfs"].iloc[0], 55)
+
+    def test_comment_only_response_is_empty(self):
+        self.assertEqual(split_rdb_sites(["# No data", "#"]), {})
+
+
+class TestFleetBatching(unittest.TestCase):
+    """Adaptive batch sizing over a stubbed NWIS service."""
+
+    def setUp(self):
+        # Injected timeouts and 503s feed the NWIS circuit breaker; keep them out of other tests.
+        reset_host_limits(self)
+
+    def test_timeout_splits_batch_and_missing_sites_are_empty(self):
+        requested = []
+
+        def fake_get(url, timeout=None, stream=False):
+            sites = url.split("sites=")[1].split("&")[0].split(",")
+            requested.append(sites)
+            if len(sites) > 2:
+                raise requests.Timeout("read timed out")
+            return FakeResponse(MULTI_SITE_RDB)
+
+        sites = ["06752260", "06752280", "06753000", "06754000"]
+        with patch.object(usgs_scraping_functions.requests, "get", side_effect=fake_get):
+            frames = fetch_usgs_fleet(sites, datetime(2024, 6, 1), datetime(2024, 6, 2), batch_size=4)
+        self.assertEqual(requested[0], sites)
+        self.assertEqual(requested[1], sites[:2])
+        self.assertEqual(sorted(frames), sorted(sites))
+        self.assertTrue(frames["06754000"].empty)
+        self.assertIsInstance(frames["06752260"], pd.DataFrame)
+
+    def test_small_responses_grow_batch(self):
+        sizes = []
+
+        def fake_get(url, timeout=None, stream=False):
+            sizes.append(len(url.split("sites=")[1].split("&")[0].split(",")))
+            return FakeResponse(MULTI_SITE_RDB)
+
+        sites = ["%08d" % number for number in range(7)]
+        with patch.object(usgs_scraping_functions.requests, "get", side_effect=fake_get):
+            fetch_usgs_fleet(sites, datetime(2024, 6, 1), datetime(2024, 6, 2), batch_size=1)
+        self.assertEqual(sizes, [1, 2, 4])
+
+    def test_open_circuit_stops_the_fleet(self):
+        requested = []
+
+        def fake_get(url, timeout=None, stream=False):
+            requested.append(url)
+            return FakeResponse("", status_code=429, headers={"Retry-After": "600"})
+
+        with patch.object(usgs_scraping_functions.requests, "get", side_effect=fake_get):
+            with self.assertRaises(CircuitOpenError):
+                fetch_usgs_fleet(["06752260", "06752280"], datetime(2024, 6, 1), datetime(2024, 6, 2))
+        self.assertEqual(len(requested), 1)
+
+    def test_single_site_failure_is_left_out(self):
+        with patch.object(usgs_scraping_functions.requests, "get",
+                          return_value=FakeResponse("", status_code=503)):
+            frames = fetch_usgs_fleet(["06752260"], datetime(2024, 6, 1), datetime(2024, 6, 2))
+        self.assertEqual(frames, {})
+
+
+def synthetic_multi_year_rdb(start: str, years: int) -> str:
+    """
+    Builds a single-site 15-minute RDB response spanning several years with EST/EDT labels.
+
+    :param start: The first local timestamp, e.g. "2018-01-01".
+    :type start: str
+    :param years: The number of years to cover.
+    :type years: int
+    :return: The RDB text.
+    :rtype: str
+    """
+    stamps = pd.date_range(start, periods=years * 365 * 96, freq="15min")
+    # NWIS labels each reading with the offset in effect; the repeated fall-back hour is labeled EST.
+    dst = stamps.tz_localize("America/New_York", ambiguous=False, nonexistent="NaT")
+    keep = ~dst.isna()
+    stamps, dst = stamps[keep], dst[keep]
+    codes = ["EDT" if offset.dst() else "EST" for offset in dst]
+    flow = (100 + (pd.Series(range(len(stamps))) % 500)).astype(str)
+    lines = ["# synthetic", "agency_cd\tsite_no\tdatetime\ttz_cd\t1_00060\t1_00060_cd",
+             "5s\t15s\t20d\t6s\t14n\t10s"]
+    lines += ["USGS\t01646500\t%s\t%s\t%s\tA" % row
+              for row in zip(stamps.strftime("%Y-%m-%d %H:%M"), codes, flow)]
+    return "\n".join(lines) + "\n"
+
+
+def legacy_hourly_utc(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The previous row-by-row conversion of ``usgs_to_hourly_utc``, kept as the reference.
+
+    :param df: A renamed raw frame without the format row.
+    :type df: pd.DataFrame
+    :return: The hourly UTC frame.
+    :rtype: pd.DataFrame
+    """
+    df = df.copy()
+    local_zone = pytz.timezone(timezone_map[df["tz_cd"].iloc[0]])
+    df["datetime"] = df["datetime"].map(
+        lambda x: local_zone.localize(datetime.strptime(x, "%Y-%m-%d %H:%M")).astimezone(pytz.UTC))
+    df["cfs"] = pd.to_numeric(df["cfs"], errors="coerce")
+    hourly = df[df["datetime"].map(lambda x: x.minute) == 0].reset_index(drop=True)
+    return hourly[["datetime", "cfs"]]
+
+
+class TestUtcConversion(unittest.TestCase):
+    """Vectorized local-to-UTC conversion against the row-by-row reference on a multi-year record."""
+
+    def test_multi_year_matches_row_by_row_reference(self):
+        raw = rename_cols(read_usgs_rdb(synthetic_multi_year_rdb("2018-01-01", 3).splitlines()))
+        reference = legacy_hourly_utc(raw)
+        hourly = usgs_to_hourly_utc(raw)
+        self.assertEqual(len(hourly), len(reference))
+        self.assertTrue((hourly["datetime"] == reference["datetime"]).all())
+        self.assertTrue(hourly["cfs"].equals(reference["cfs"].astype(hourly["cfs"].dtype)))
+
+    def test_mixed_zone_codes_use_their_own_offsets(self):
+        raw = pd.DataFrame({"tz_cd": ["EDT", "EST", "EST", "MST"],
+                            "datetime": ["2023-11-05 01:00", "2023-11-05 01:00", "2023-11-05 02:00",
+                                         "2023-06-01 05:00"],
+                            "cfs": [1.0, 2.0, 3.0, 4.0]})
+        hourly = usgs_to_hourly_utc(raw)
+        # The repeated fall-back hour keeps both readings: EDT 01:00 and EST 01:00 are an hour apart.
+        self.assertEqual([stamp.hour for stamp in hourly["datetime"]], [5, 6, 7, 12])
+        with self.assertRaises(KeyError):
+            usgs_to_hourly_utc(raw.assign(tz_cd="XYZ"))
+
+
+@unittest.skipUnless(os.environ.get(BENCHMARK_ENV_VAR), BENCHMARK_ENV_VAR + " not set")
+class TestUtcConversionBenchmark(unittest.TestCase):
+    """Reports the parse and conversion time of a multi-year record against the row-by-row reference."""
+
+    def test_multi_year_conversion_timing(self):
+        text = synthetic_multi_year_rdb("2015-01-01", 5)
+        started = time.perf_counter()
+        raw = rename_cols(read_usgs_rdb(text.splitlines()))
+        parse_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        legacy_hourly_utc(raw)
+        legacy_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        hourly = usgs_to_hourly_utc(raw)
+        vectorized_seconds = time.perf_counter() - started
+        print("\n%d rows: read_usgs_rdb %.2fs, usgs_to_hourly_utc %.3fs (row-by-row %.2fs)"
+              % (len(raw), parse_seconds, vectorized_seconds, legacy_seconds))
+        self.assertEqual(len(hourly), len(raw) // 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
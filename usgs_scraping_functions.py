@@ -1,39 +1,115 @@
 
+import io
+import os
+import re
 import pandas as pd
 from datetime import datetime
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Iterable, Iterator, List, Optional
 import requests
 import boto3
 from botocore import UNSIGNED
 from botocore.config import Config
 
+from host_limits import CircuitOpenError, limited_get
+from metadata_cache import cached_metadata
 
-def make_usgs_data(start_date: datetime, end_date: datetime, site_number: str):
+# UTC offset in hours of each NWIS ``tz_cd``; a reading's code names the offset in effect at that time.
+NWIS_TZ_OFFSETS = {"UTC": 0, "GMT": 0, "AST": -4, "ADT": -3, "EST": -5, "EDT": -4, "CST": -6, "CDT": -5,
+                   "MST": -7, "MDT": -6, "PST": -8, "PDT": -7, "AKST": -9, "AKDT": -8, "HST": -10,
+                   "SST": -11, "ChST": 10}
+IV_BATCH_URL = ("http://waterservices.usgs.gov/nwis/iv/?format=rdb,1.0&sites={}&startDT={}&endDT={}"
+                "&parameterCd=00060,00065,00045&siteStatus=all")
+
+
+def make_usgs_data(start_date: datetime, end_date: datetime, site_number: str,
+                   debug_dir: Optional[str] = None) -> pd.DataFrame:
     """
     Function that scrapes data from gages from a specified start_time THROUGH
-    a specified end_time. Returns hourly df of river flow data. For instance:
+    a specified end_time. Returns a typed df of the fifteen minute river flow data. For instance:
 
     ..
     from datetime import datetime
-    df = make_usgs_data(datetime(2020, 5, 1), datetime(2021, 5, 1) "01010500")
-    df[1:] # would return time stamps of 5/1 in fifteen minute increments (e.g 97)
-    len(df[1:]) # 96 The first row is a junk row and real data starts second row (e.g. 96)
+    df = make_usgs_data(datetime(2020, 5, 1), datetime(2020, 5, 2), "01010500")
+    len(df) # 96 time stamps of 5/1 in fifteen minute increments
     ..
 
+    The response is streamed through :func:`read_usgs_rdb` in memory; nothing is written to disk
+    unless ``debug_dir`` is given, so parallel scrapes in one directory cannot clobber each other.
+
+    :param start_date: The start of the window.
+    :type start_date: datetime
+    :param end_date: The end of the window.
+    :type end_date: datetime
+    :param site_number: The USGS gauge site number.
+    :type site_number: str
+    :param debug_dir: When set, the raw response and the parsed frame are written to
+        ``<debug_dir>/<site>.txt`` and ``<debug_dir>/<site>_flow_data.csv``, defaults to None.
+    :type debug_dir: str, optional
+    :return: The typed instantaneous-values dataframe (empty when the window has no data).
+    :rtype: pd.DataFrame
     """
     # //waterservices.usgs.gov/nwis/iv/?format=rdb,1.0&sites={}&startDT={}&endDT={}&parameterCd=00060,00065,00045&siteStatus=all
-    base_url = "http://waterservices.usgs.gov/nwis/iv/?format=rdb,1.0&sites={}&startDT={}&endDT={}&parameterCd=00060,00065,00045&siteStatus=all"
-    full_url = base_url.format(site_number, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+    full_url = IV_BATCH_URL.format(site_number, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
     print("Getting request from USGS")
     print(full_url)
     # Bounded read timeout: a silently stalled NWIS connection would otherwise hang the whole
     # fleet scrape indefinitely (no bytes ever arrive, no error). 180s tolerates large multi-year
     # chunks while turning a dead connection into a retryable per-chunk timeout.
-    r = requests.get(full_url, timeout=180)
-    with open(site_number + ".txt", "w") as f:
-        f.write(r.text)
-    response_data = process_response_text(site_number + ".txt")
-    return create_csv(response_data[0], response_data[1], site_number)
+    r = limited_get(full_url, timeout=180, stream=True)
+    # NWIS answers 404 when the gauge has no data in the window; any other error body is not RDB.
+    if r.status_code == 404:
+        r.close()
+        return pd.DataFrame()
+    try:
+        r.raise_for_status()
+        lines: Optional[List[str]] = [] if debug_dir is not None else None
+        df = read_usgs_rdb(_stream_lines(r, lines))
+    finally:
+        r.close()
+    if debug_dir is not None:
+        _write_debug_files(debug_dir, site_number, lines, df)
+    return df
+
+
+def drop_rdb_format_row(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drops the RDB format line (e.g. "5s  15s  20d  6s ...") when a frame still carries it as row 0.
+
+    Frames from :func:`create_csv` keep the format line as a junk first row; frames from
+    :func:`read_usgs_rdb` do not. Callers that accept both use this instead of ``df.iloc[1:]``.
+
+    :param df: A raw instantaneous-values dataframe.
+    :type df: pd.DataFrame
+    :return: The frame without the format row.
+    :rtype: pd.DataFrame
+    """
+    if len(df) > 0 and "tz_cd" in df.columns and re.fullmatch(r"\d+[sdn]", str(df["tz_cd"].iloc[0])):
+        return df.iloc[1:]
+    return df
+
+
+def local_to_utc(datetimes: pd.Series, tz_codes: pd.Series) -> pd.Series:
+    """
+    Converts NWIS local "YYYY-MM-DD HH:MM" timestamps to tz-aware UTC in a few array operations.
+
+    Each row's ``tz_cd`` names the offset in effect for that reading (EST, EDT, MST, ...), so the fixed
+    offset of :data:`NWIS_TZ_OFFSETS` is subtracted row by row in one vectorized step. Unlike localizing
+    in a named zone, the repeated fall-back hour stays two distinct hours (EDT 01:00 is 05:00 UTC, EST
+    01:00 is 06:00 UTC) and a standard-time code keeps its offset all year (e.g. Arizona's MST).
+
+    :param datetimes: The local timestamp strings.
+    :type datetimes: pd.Series
+    :param tz_codes: The NWIS time zone codes aligned with ``datetimes``.
+    :type tz_codes: pd.Series
+    :return: A tz-aware UTC series with the same index.
+    :rtype: pd.Series
+    :raises KeyError: If a time zone code is not in :data:`NWIS_TZ_OFFSETS`.
+    """
+    parsed = pd.to_datetime(datetimes, format="%Y-%m-%d %H:%M")
+    offsets = tz_codes.map(NWIS_TZ_OFFSETS)
+    if offsets.isna().any():
+        raise KeyError("Unknown NWIS time zone code(s): " + str(sorted(set(tz_codes[offsets.isna()]))))
+    return (parsed - pd.to_timedelta(offsets, unit="h")).dt.tz_localize("UTC")
 
 
 def column_renamer(x):
@@ -130,6 +206,322 @@ def create_csv(file_path: str, params_names: dict, site_number: str):
     return df
 
 
+def iter_rdb_tables(lines: Iterable[str]) -> Iterator[pd.DataFrame]:
+    """
+    Parses an NWIS RDB stream in a single pass, yielding one typed dataframe per table.
+
+    Comment lines are scanned for the TS parameter table (same rules as :func:`process_response_text`)
+    while they stream by; the format line following each header drives the column types, so numeric
+    ("n") columns come out as floats (non-numeric markers such as "Ice" become NaN) and the format line
+    itself is not kept as a junk row. Multi-site responses hold one table per site.
+
+    :param lines: The response lines, e.g. ``response.iter_lines(decode_unicode=True)`` or an open
+        file; trailing newlines are optional.
+    :type lines: Iterable[str]
+    :return: An iterator of dataframes, one per RDB table, with the TS labels copied into named
+        columns.
+    :rtype: Iterator[pd.DataFrame]
+    """
+    comments: List[str] = []
+    header: Optional[List[str]] = None
+    formats: Optional[List[str]] = None
+    rows: List[str] = []
+    params: Dict[str, str] = {}
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.startswith("#"):
+            if header is not None:
+                yield _rdb_frame(header, formats, rows, params)
+                header, formats, rows = None, None, []
+            comments.append(line)
+        elif header is None:
+            if line.strip():
+                header = line.split("\t")
+                params = _ts_params(comments)
+                comments = []
+        elif formats is None:
+            formats = line.split("\t")
+        elif line.strip():
+            rows.append(line)
+    if header is not None:
+        yield _rdb_frame(header, formats, rows, params)
+
+
+def _rdb_frame(header: List[str], formats: Optional[List[str]], rows: List[str],
+               params: Dict[str, str]) -> pd.DataFrame:
+    """
+    Builds a typed dataframe from the parsed pieces of one RDB table.
+
+    :param header: The column names.
+    :type header: List[str]
+    :param formats: The RDB format specs (e.g. "15s", "20d", "14n"), or None when missing.
+    :type formats: List[str], optional
+    :param rows: The tab-separated data lines.
+    :type rows: List[str]
+    :param params: The TS column name to label mapping from the comment header.
+    :type params: Dict[str, str]
+    :return: The typed dataframe (empty with the header columns when there are no rows).
+    :rtype: pd.DataFrame
+    """
+    formats = formats or ["s"] * len(header)
+    numeric = [name for name, spec in zip(header, formats) if spec.endswith("n")]
+    df = pd.read_csv(io.StringIO("\n".join(rows)), sep="\t", header=None, names=header,
+                     dtype={name: str for name in header if name not in numeric}) \
+        if rows else pd.DataFrame(columns=header)
+    for name in numeric:
+        df[name] = pd.to_numeric(df[name], errors="coerce")
+    for key, value in params.items():
+        if key in df.columns:
+            df[value] = df[key]
+    return df
+
+
+def read_usgs_rdb(lines: Iterable[str]) -> pd.DataFrame:
+    """
+    Parses a single-site NWIS RDB stream into a typed dataframe (see :func:`iter_rdb_tables`).
+
+    :param lines: The response lines.
+    :type lines: Iterable[str]
+    :return: The typed dataframe, or an empty dataframe when the response holds no data rows.
+    :rtype: pd.DataFrame
+    """
+    for df in iter_rdb_tables(lines):
+        if len(df) > 0:
+            return df
+    return pd.DataFrame()
+
+
+def split_rdb_sites(lines: Iterable[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Splits a multi-site NWIS instantaneous-values RDB stream into one typed frame per site.
+
+    NWIS emits one table per site, each preceded by its own comment block (with the TS parameter
+    table) and its own header and format lines.
+
+    :param lines: The response lines of a (possibly) multi-site iv request.
+    :type lines: Iterable[str]
+    :return: A dict of site number to dataframe; sites without data in the window are absent.
+    :rtype: Dict[str, pd.DataFrame]
+    """
+    return {df["site_no"].iloc[0]: df for df in iter_rdb_tables(lines) if len(df) > 0}
+
+
+def _ts_params(comment_lines: List[str]) -> Dict[str, str]:
+    """
+    Extracts the TS parameter table from RDB comment lines (same rules as :func:`process_response_text`).
+
+    :param comment_lines: The "#" lines preceding a table.
+    :type comment_lines: List[str]
+    :return: A dict of "<ts>_<parameter>" column name to friendly label.
+    :rtype: Dict[str, str]
+    """
+    extractive_params = {}
+    params = False
+    for line in comment_lines:
+        the_split_line = line.split()[1:]
+        if params:
+            if len(the_split_line) < 2:
+                params = False
+            else:
+                extractive_params[the_split_line[0] + "_" + the_split_line[1]] = df_label(the_split_line[2])
+        if len(the_split_line) > 2 and the_split_line[0] == "TS":
+            params = True
+    return extractive_params
+
+
+def _stream_lines(response: requests.Response, sink: Optional[List[str]] = None,
+                  size: Optional[List[int]] = None) -> Iterator[str]:
+    """
+    Yields the decoded lines of a streamed response, optionally teeing them into a list.
+
+    :param response: A response opened with ``stream=True``.
+    :type response: requests.Response
+    :param sink: A list that receives every line (for the debug dump), defaults to None.
+    :type sink: List[str], optional
+    :param size: A one-element counter that the characters read (including line breaks) are added to,
+        defaults to None.
+    :type size: List[int], optional
+    :return: An iterator over the response lines.
+    :rtype: Iterator[str]
+    """
+    response.encoding = response.encoding or "utf-8"
+    for line in response.iter_lines(decode_unicode=True):
+        if sink is not None:
+            sink.append(line)
+        if size is not None:
+            size[0] += len(line) + 1
+        yield line
+
+
+def _write_debug_files(debug_dir: str, site_number: str, lines: List[str], df: pd.DataFrame) -> None:
+    """
+    Writes the raw response and the parsed frame of a request for debugging.
+
+    :param debug_dir: The directory to write ``<site>.txt`` and ``<site>_flow_data.csv`` into.
+    :type debug_dir: str
+    :param site_number: The gauge site number (or batch label) used in the file names.
+    :type site_number: str
+    :param lines: The raw response lines.
+    :type lines: List[str]
+    :param df: The parsed dataframe.
+    :type df: pd.DataFrame
+    :return: None
+    :rtype: None
+    """
+    os.makedirs(debug_dir, exist_ok=True)
+    with open(os.path.join(debug_dir, site_number + ".txt"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+    df.to_csv(os.path.join(debug_dir, site_number + "_flow_data.csv"))
+
+
+def make_usgs_data_batch(start_date: datetime, end_date: datetime, site_numbers: List[str],
+                         timeout: float = 180) -> Tuple[Dict[str, pd.DataFrame], int]:
+    """
+    Fetches the instantaneous values of several gauges for one window in a single NWIS request.
+
+    :param start_date: The start of the window.
+    :type start_date: datetime
+    :param end_date: The end of the window.
+    :type end_date: datetime
+    :param site_numbers: The gauge site numbers to request together.
+    :type site_numbers: List[str]
+    :param timeout: The read timeout in seconds, defaults to 180.
+    :type timeout: float, optional
+    :return: A tuple of (site number -> dataframe as returned by :func:`make_usgs_data`, response
+        size in characters). Sites without data in the window map to an empty dataframe.
+    :rtype: Tuple[Dict[str, pd.DataFrame], int]
+    """
+    full_url = IV_BATCH_URL.format(",".join(site_numbers), start_date.strftime("%Y-%m-%d"),
+                                   end_date.strftime("%Y-%m-%d"))
+    print("Getting batched request from USGS for %d sites" % len(site_numbers))
+    r = limited_get(full_url, timeout=timeout, stream=True)
+    # NWIS answers 404 when none of the requested sites has data in the window.
+    try:
+        if r.status_code == 404:
+            return {site: pd.DataFrame() for site in site_numbers}, 0
+        r.raise_for_status()
+        size = [0]
+        frames = split_rdb_sites(_stream_lines(r, size=size))
+    finally:
+        r.close()
+    return {site: frames.get(site, pd.DataFrame()) for site in site_numbers}, size[0]
+
+
+def fetch_usgs_fleet(site_numbers: List[str], start_date: datetime, end_date: datetime,
+                     batch_size: int = 10, max_batch_size: int = 100,
+                     target_bytes: int = 20_000_000, timeout: float = 180) -> Dict[str, pd.DataFrame]:
+    """
+    Fetches one window of instantaneous values for a whole fleet in adaptively sized batches.
+
+    A batch that times out, fails with a server error or returns more than ``target_bytes`` halves
+    the batch size (a failed batch is retried split in two); batches well under the target double
+    it, up to ``max_batch_size``. A single gauge that still fails is left out of the result so the
+    caller can fall back to :func:`make_usgs_data` for it. An open circuit stops the fetch.
+
+    :param site_numbers: The gauge site numbers.
+    :type site_numbers: List[str]
+    :param start_date: The start of the window.
+    :type start_date: datetime
+    :param end_date: The end of the window.
+    :type end_date: datetime
+    :param batch_size: The initial number of gauges per request, defaults to 10.
+    :type batch_size: int, optional
+    :param max_batch_size: The largest batch the size may grow to, defaults to 100.
+    :type max_batch_size: int, optional
+    :param target_bytes: The response size the batch size is steered towards, defaults to 20 MB.
+    :type target_bytes: int, optional
+    :param timeout: The per-request read timeout in seconds, defaults to 180.
+    :type timeout: float, optional
+    :return: A dict of site number to raw dataframe for every gauge that was fetched.
+    :rtype: Dict[str, pd.DataFrame]
+    :raises CircuitOpenError: If the NWIS circuit is open (see :mod:`host_limits`), so the caller waits
+        for it instead of the fleet being dropped gauge by gauge.
+    """
+    pending = list(site_numbers)
+    frames: Dict[str, pd.DataFrame] = {}
+    while pending:
+        batch = pending[:batch_size]
+        try:
+            batch_frames, size = make_usgs_data_batch(start_date, end_date, batch, timeout=timeout)
+        except CircuitOpenError:
+            # The host is backing off; splitting the batch would only fail every gauge in turn.
+            raise
+        except (requests.Timeout, requests.ConnectionError, requests.HTTPError) as error:
+            if len(batch) == 1:
+                print("USGS batch fetch failed for " + batch[0] + ": " + str(error)[:200])
+                pending = pending[1:]
+                continue
+            batch_size = max(1, len(batch) // 2)
+            continue
+        frames.update(batch_frames)
+        pending = pending[len(batch):]
+        if size > target_bytes:
+            batch_size = max(1, len(batch) // 2)
+        elif size < target_bytes // 2 and len(batch) == batch_size:
+            batch_size = min(max_batch_size, batch_size * 2)
+    return frames
+
+
+SITE_NUMERIC_FIELDS = {"dec_lat_va", "dec_long_va", "alt_va", "drain_area_va", "contrib_drain_area_va"}
+STATE_SITE_URL = ("https://waterservices.usgs.gov/nwis/site/?format=rdb&stateCd={}&siteType=ST"
+                  "&siteStatus=active&hasDataTypeCd=uv&parameterCd=00060&siteOutput=expanded")
+STATE_CATALOG_URL = ("https://waterservices.usgs.gov/nwis/site/?format=rdb&stateCd={}&siteType=ST"
+                     "&siteStatus=active&hasDataTypeCd=uv&seriesCatalogOutput=true")
+
+
+def parse_site_row(header: List[str], values: List[str]) -> Dict:
+    """
+    Builds the metadata dict of one NWIS expanded site-service row.
+
+    :param header: The RDB column names.
+    :type header: List[str]
+    :param values: The row's tab-separated values.
+    :type values: List[str]
+    :return: A dict of the site's attributes with numeric fields parsed to floats where possible.
+    :rtype: Dict
+    """
+    metadata: Dict = {}
+    for key, value in zip(header, values):
+        if key in SITE_NUMERIC_FIELDS:
+            try:
+                metadata[key] = float(value)
+            except ValueError:
+                metadata[key] = None
+        else:
+            metadata[key] = value
+    return metadata
+
+
+def parse_series_catalog(lines: List[str]) -> Dict[str, Dict[str, Dict[str, str]]]:
+    """
+    Parses the non-comment lines of an NWIS series catalog response into per-site catalogs.
+
+    :param lines: The RDB lines with comment lines removed (header, format line, rows).
+    :type lines: List[str]
+    :return: A dict of site number to the catalog described in :func:`get_period_of_record`.
+    :rtype: Dict[str, Dict[str, Dict[str, str]]]
+    """
+    if not lines:
+        return {}
+    header = lines[0].split("\t")
+    idx = {name: header.index(name) for name in
+           ("site_no", "data_type_cd", "parm_cd", "begin_date", "end_date", "count_nu")}
+    catalogs: Dict[str, Dict[str, Dict[str, str]]] = {}
+    for line in lines[2:]:
+        fields = line.split("\t")
+        if len(fields) < len(header) or not fields[idx["parm_cd"]]:
+            continue
+        catalog = catalogs.setdefault(fields[idx["site_no"]], {})
+        key = fields[idx["data_type_cd"]] + "_" + fields[idx["parm_cd"]]
+        entry = {"begin_date": fields[idx["begin_date"]], "end_date": fields[idx["end_date"]],
+                 "count": fields[idx["count_nu"]]}
+        # A site can have multiple entries per series (e.g. multiple sensors); keep the earliest begin.
+        if key not in catalog or entry["begin_date"] < catalog[key]["begin_date"]:
+            catalog[key] = entry
+    return catalogs
+
+
+@cached_metadata("nwis_site")
 def get_site_metadata(site_number: str) -> Dict:
     """
     Fetches static gauge attributes from the NWIS site service (expanded output).
@@ -143,26 +535,15 @@ def get_site_metadata(site_number: str) -> Dict:
     :rtype: Dict
     """
     base_url = "https://waterservices.usgs.gov/nwis/site/?format=rdb&sites={}&siteOutput=expanded"
-    response = requests.get(base_url.format(site_number), timeout=60)
+    response = limited_get(base_url.format(site_number), timeout=60)
     response.raise_for_status()
     lines = [line for line in response.text.splitlines() if not line.startswith("#")]
     if len(lines) < 3:
         raise ValueError("NWIS returned no site data for " + site_number)
-    header = lines[0].split("\t")
-    values = lines[2].split("\t")
-    metadata: Dict = {}
-    numeric_fields = {"dec_lat_va", "dec_long_va", "alt_va", "drain_area_va", "contrib_drain_area_va"}
-    for key, value in zip(header, values):
-        if key in numeric_fields:
-            try:
-                metadata[key] = float(value)
-            except ValueError:
-                metadata[key] = None
-        else:
-            metadata[key] = value
-    return metadata
+    return parse_site_row(lines[0].split("\t"), lines[2].split("\t"))
 
 
+@cached_metadata("nwis_period_of_record")
 def get_period_of_record(site_number: str) -> Dict[str, Dict[str, str]]:
     """
     Fetches the period of record per parameter and data type from the NWIS series catalog.
@@ -179,26 +560,45 @@ def get_period_of_record(site_number: str) -> Dict[str, Dict[str, str]]:
     """
     base_url = ("https://waterservices.usgs.gov/nwis/site/?format=rdb&sites={}"
                 "&seriesCatalogOutput=true&siteStatus=all")
-    response = requests.get(base_url.format(site_number), timeout=60)
+    response = limited_get(base_url.format(site_number), timeout=60)
     response.raise_for_status()
     lines = [line for line in response.text.splitlines() if not line.startswith("#")]
-    header = lines[0].split("\t")
-    idx = {name: header.index(name) for name in
-           ("data_type_cd", "parm_cd", "begin_date", "end_date", "count_nu")}
-    catalog: Dict[str, Dict[str, str]] = {}
-    for line in lines[2:]:
-        fields = line.split("\t")
-        if len(fields) < len(header) or not fields[idx["parm_cd"]]:
-            continue
-        key = fields[idx["data_type_cd"]] + "_" + fields[idx["parm_cd"]]
-        entry = {"begin_date": fields[idx["begin_date"]], "end_date": fields[idx["end_date"]],
-                 "count": fields[idx["count_nu"]]}
-        # A site can have multiple entries per series (e.g. multiple sensors); keep the earliest begin.
-        if key not in catalog or entry["begin_date"] < catalog[key]["begin_date"]:
-            catalog[key] = entry
-    return catalog
+    return parse_series_catalog(lines).get(site_number, {})
+
+
+@cached_metadata("nwis_state_index")
+def get_state_site_index(state_abbrev: str) -> Dict[str, Dict]:
+    """
+    Prefetches the site metadata and period-of-record catalogs of every gauge of a state.
+
+    Two state-wide NWIS site-service requests (expanded site output and the series catalog, which the
+    service does not return together) replace the per-gauge :func:`get_site_metadata` and
+    :func:`get_period_of_record` calls of a fleet scrape. The gauge filter matches
+    ``state_scrape.list_state_gauges``.
+
+    :param state_abbrev: The two-letter state abbreviation, e.g. "CO".
+    :type state_abbrev: str
+    :return: A dict with "metadata" (site number -> :func:`get_site_metadata` dict) and
+        "period_of_record" (site number -> :func:`get_period_of_record` catalog).
+    :rtype: Dict[str, Dict]
+    """
+    response = limited_get(STATE_SITE_URL.format(state_abbrev), timeout=300)
+    response.raise_for_status()
+    lines = [line for line in response.text.splitlines() if not line.startswith("#")]
+    metadata: Dict[str, Dict] = {}
+    if lines:
+        header = lines[0].split("\t")
+        for line in lines[2:]:
+            row = parse_site_row(header, line.split("\t"))
+            if row.get("site_no"):
+                metadata[row["site_no"]] = row
+    response = limited_get(STATE_CATALOG_URL.format(state_abbrev), timeout=300)
+    response.raise_for_status()
+    lines = [line for line in response.text.splitlines() if not line.startswith("#")]
+    return {"metadata": metadata, "period_of_record": parse_series_catalog(lines)}
 
 
+@cached_metadata("nldi_basin")
 def get_basin_boundary(site_number: str) -> Dict:
     """
     Fetches the upstream basin boundary polygon for a gauge from the USGS NLDI service.
@@ -212,7 +612,7 @@ def get_basin_boundary(site_number: str) -> Dict:
     :rtype: Dict
     """
     base_url = "https://api.water.usgs.gov/nldi/linked-data/nwissite/USGS-{}/basin?f=json"
-    response = requests.get(base_url.format(site_number), timeout=120)
+    response = limited_get(base_url.format(site_number), timeout=120)
     response.raise_for_status()
     features = response.json().get("features", [])
     if not features:
@@ -1,9 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import math
+import io
+import threading
+import time
 import requests
 import pandas as pd
 import pytz
 import json
+from typing import Dict, List, Optional, Set, Tuple
+
+import asos_cache
+from host_limits import limited_get
+from metadata_cache import ENDPOINT_TTL_DAYS, cached_metadata
+from station_index import StationIndex
 
 ASOS_BASE_URL = ("https://mesonet.agron.iastate.edu/cgi-bin/request/asos.py?station={}&data=tmpf&data=dwpf"
                  "&data=relh&data=feel&data=sknt&data=sped&data=alti&data=mslp&data=drct"
@@ -24,6 +33,21 @@ FIPS_TO_STATE = {
 }
 
 
+# Threads listing the state ASOS networks of the national table; the Mesonet host cap bounds the requests.
+ASOS_NETWORK_WORKERS = 8
+# The most stations requested from asos.py at once (repeated "station=" parameters).
+ASOS_STATIONS_PER_REQUEST = 25
+# ASOS variables parsed as floats; "M" (missing) and "T" (trace) markers become NaN at parse time.
+ASOS_NUMERIC_COLUMNS = ["tmpf", "dwpf", "relh", "feel", "sknt", "sped", "alti", "mslp", "drct",
+                        "ice_accretion_1hr", "vsby", "gust", "peak_wind_gust", "snowdepth"]
+# Hourly aggregation: precipitation accumulates, temperatures average, everything else keeps the first
+# report of the hour (the column order is that of the aggregated frame).
+ASOS_HOURLY_AGG = {"p01m": "sum", "valid": "first", "tmpf": "mean", "dwpf": "mean",
+                   "ice_accretion_1hr": "first", "mslp": "first", "drct": "first", "sped": "first",
+                   "alti": "first", "relh": "first", "sknt": "first", "feel": "first", "vsby": "first",
+                   "gust": "first", "skyc1": "first", "peak_wind_gust": "first", "snowdepth": "first"}
+
+
 def get_asos_data_from_url(station_id, base_url, start_time, end_time, station={}, stations_explored={}):
     """
     end_time: End date should always be plus one of the date scraped by the USGS function.
@@ -34,9 +58,7 @@ def get_asos_data_from_url(station_id, base_url, start_time, end_time, station={
     print("Getting request from ASOS")
     print(base_url.format(station_id, start_time.year, start_time.month, start_time.day, end_time.year, end_time.month, end_time.day))
     response = requests.get(base_url.format(station_id, start_time.year, start_time.month, start_time.day, end_time.year, end_time.month, end_time.day))
-    with open("temp_weather_data.csv", "w+") as f:
-        f.write(response.text)
-    df, missing_precip, missing_temp = process_asos_csv("temp_weather_data.csv")
+    df, missing_precip, missing_temp = process_asos_csv(io.StringIO(response.text))
     station["missing_precip"] = missing_precip
     station["missing_temp"] = missing_temp
     stations_explored["saved_complete"][station_id] = station
@@ -48,40 +70,121 @@ def get_asos_data_from_url(station_id, base_url, start_time, end_time, station={
     # stations_list.append(station)
 
 
-def process_asos_csv(path: str):
-    df = pd.read_csv(path)  # , parse_dates=['valid']
+def get_asos_data_from_stations(station_ids: List[str], base_url: str, start_time: datetime,
+                                end_time: datetime, station: Optional[dict] = None,
+                                stations_explored: Optional[dict] = None) -> Tuple[str, pd.DataFrame, int, int]:
+    """
+    Finds the first candidate station with reports in a window and returns its hourly data, requesting
+    the candidates together (repeated ``station=`` parameters, :data:`ASOS_STATIONS_PER_REQUEST` at a
+    time) instead of one request per candidate. Nothing is written to disk.
+
+    :param station_ids: The candidate station ids in order of preference.
+    :type station_ids: List[str]
+    :param base_url: The asos.py URL template (station, then start and end year/month/day).
+    :type base_url: str
+    :param start_time: The first requested day (UTC).
+    :type start_time: datetime
+    :param end_time: The day the request ends on (UTC).
+    :type end_time: datetime
+    :param station: A metadata dict that receives "missing_precip" and "missing_temp", defaults to None.
+    :type station: dict, optional
+    :param stations_explored: A dict whose "saved_complete" entry records the chosen station, defaults
+        to None.
+    :type stations_explored: dict, optional
+    :return: A tuple of (chosen station id, hourly dataframe as returned by :func:`process_asos_csv`,
+        missing precipitation count, missing temperature count).
+    :rtype: Tuple[str, pd.DataFrame, int, int]
+    :raises ValueError: When no candidate has reports in the window.
+    """
+    station = {} if station is None else station
+    stations_explored = {} if stations_explored is None else stations_explored
+    for position in range(0, len(station_ids), ASOS_STATIONS_PER_REQUEST):
+        batch = station_ids[position:position + ASOS_STATIONS_PER_REQUEST]
+        print("Getting request from ASOS for %d candidate stations" % len(batch))
+        response = limited_get(base_url.format("&station=".join(batch), start_time.year, start_time.month,
+                                               start_time.day, end_time.year, end_time.month, end_time.day),
+                               timeout=300)
+        response.raise_for_status()
+        reports = split_asos_csv(io.StringIO(response.text))
+        for station_id in batch:
+            if station_id not in reports:
+                continue
+            df, missing_precip, missing_temp = aggregate_asos_hourly(reports[station_id])
+            station["missing_precip"] = missing_precip
+            station["missing_temp"] = missing_temp
+            stations_explored.setdefault("saved_complete", {})[station_id] = station
+            return station_id, df, missing_precip, missing_temp
+    raise ValueError("No ASOS reports between %s and %s for any of %s" % (start_time, end_time, station_ids))
+
+
+def read_asos_csv(path) -> pd.DataFrame:
+    """
+    Reads a Mesonet ASOS CSV (``format=onlycomma&missing=M&trace=T``) in one typed pass.
+
+    "M" and "T" markers are NaN in the numeric variables; precipitation is kept as text so its "M"
+    markers can still be counted (see :func:`aggregate_asos_hourly`). Multi-station responses keep their
+    "station" column.
+
+    :param path: The CSV path or a file-like object.
+    :return: The raw reports.
+    :rtype: pd.DataFrame
+    """
+    return pd.read_csv(path, dtype=dict({name: "float64" for name in ASOS_NUMERIC_COLUMNS},
+                                        p01m=str, skyc1=str, valid=str, station=str),
+                       na_values={name: ["M", "T"] for name in ASOS_NUMERIC_COLUMNS})
+
+
+def aggregate_asos_hourly(df: pd.DataFrame) -> Tuple[pd.DataFrame, int, int]:
+    """
+    Aggregates the raw reports of one station (from :func:`read_asos_csv`) to hours.
+
+    Precipitation "M" markers are counted before traces are converted to 0 mm, and report times are
+    ceiled to the hour (a 10:53 report belongs to 11:00) in one vectorized step.
+
+    :param df: The station's raw reports.
+    :type df: pd.DataFrame
+    :return: A tuple of (hourly dataframe with an "hour_updated" column, number of "M" precipitation
+        reports, number of missing temperature reports); an empty dataframe when there are no reports.
+    :rtype: Tuple[pd.DataFrame, int, int]
+    """
     if df.empty:
         return pd.DataFrame(), 0, 0
-    print(df)
-    missing_precip = df['p01m'][df['p01m']=='M'].count()
-    missing_temp = df['tmpf'][df['tmpf']=='M'].count()
-    df['hour_updated'] = df['valid'].map(format_dt)
-    df['tmpf'] = pd.to_numeric(df['tmpf'], errors='coerce')
-    df['dwpf'] = pd.to_numeric(df['dwpf'], errors='coerce')
-    df['p01m'] = pd.to_numeric(df['p01m'], errors='coerce')
-    # feel
-    df["feel"] = pd.to_numeric(df["feel"], errors="coerce")
-    df['relh'] = pd.to_numeric(df['relh'], errors='coerce')
-    df['sknt'] = pd.to_numeric(df['sknt'], errors='coerce')
-    df['sped'] = pd.to_numeric(df['sped'], errors='coerce')
-    df['alti'] = pd.to_numeric(df['alti'], errors='coerce')
-    df['gust'] = pd.to_numeric(df['gust'], errors='coerce')
-    df['mslp'] = pd.to_numeric(df['mslp'], errors='coerce')
-    df['vsby'] = pd.to_numeric(df['vsby'], errors='coerce')
-    df['peak_wind_gust'] = pd.to_numeric(df['peak_wind_gust'], errors='coerce')
-    df['snowdepth'] = pd.to_numeric(df['snowdepth'], errors='coerce')
-    df['ice_accretion_1hr'] = pd.to_numeric(df['ice_accretion_1hr'], errors='coerce')
-    df['drct'] = pd.to_numeric(df['drct'], errors='coerce')
-    df['skyc1'] = df['skyc1'].astype(str)
-    # Replace mising values with an average of the two closest values
-    # Since stations record at different intervals this could
-    # actually cause an overestimation of precip. Instead replace with 0
-    # df['p01m']=(df['p01m'].fillna(method='ffill') + df['p01m'].fillna(method='bfill'))/2
-    # df['p01m'] = df['p01m'].fillna(0)
-    # df['tmpf']=(df['tmpf'].fillna(method='ffill') + df['tmpf'].fillna(method='bfill'))/2
-    df = df.groupby(by=['hour_updated'], as_index=False).agg({'p01m': 'sum', 'valid': 'first', 'tmpf': 'mean', 'dwpf':'mean', 'ice_accretion_1hr':'first', 'mslp':'first', 'drct':'first', 'sped': 'first', 'alti': 'first', 'relh': 'first', 'sknt': 'first', 'feel': 'first', 'vsby': 'first', 'gust': 'first', 'skyc1': 'first', 'peak_wind_gust': 'first', 'snowdepth': 'first'})
-    print("after")
-    return df, int(missing_precip), int(missing_temp)
+    df = df.copy()
+    missing_precip = int((df["p01m"] == "M").sum())
+    missing_temp = int(df["tmpf"].isna().sum())
+    df["p01m"] = pd.to_numeric(df["p01m"].replace("T", "0"), errors="coerce")
+    df["skyc1"] = df["skyc1"].astype(str)
+    df["hour_updated"] = pd.to_datetime(df["valid"], format="%Y-%m-%d %H:%M").dt.ceil("h")
+    df = df.groupby(by="hour_updated", as_index=False).agg(ASOS_HOURLY_AGG)
+    return df, missing_precip, missing_temp
+
+
+def split_asos_csv(path) -> Dict[str, pd.DataFrame]:
+    """
+    Splits a multi-station Mesonet ASOS CSV into the raw reports of each station.
+
+    :param path: The CSV path or a file-like object.
+    :return: Station id -> raw reports; stations without reports are absent.
+    :rtype: Dict[str, pd.DataFrame]
+    """
+    df = read_asos_csv(path)
+    if df.empty:
+        return {}
+    return {station_id: group.reset_index(drop=True)
+            for station_id, group in df.groupby("station", sort=False)}
+
+
+def process_asos_csv(path) -> Tuple[pd.DataFrame, int, int]:
+    """
+    Parses a single-station Mesonet ASOS CSV and aggregates it to hours (see :func:`read_asos_csv` and
+    :func:`aggregate_asos_hourly`).
+
+    :param path: The CSV path or a file-like object.
+    :return: A tuple of (hourly dataframe with an "hour_updated" column, number of "M" precipitation
+        reports, number of missing temperature reports); an empty dataframe when the file has no rows.
+    :rtype: Tuple[pd.DataFrame, int, int]
+    """
+    return aggregate_asos_hourly(read_asos_csv(path))
 
 
 def format_dt(date_time_str: str) -> datetime:
@@ -92,6 +195,7 @@ def format_dt(date_time_str: str) -> datetime:
     return proper_datetime
 
 
+@cached_metadata("mesonet_asos_stations")
 def get_asos_stations(state_abbrev: str, network_type: str = "ASOS") -> pd.DataFrame:
     """
     Lists the stations of a state's ASOS network from the Iowa Mesonet geojson service.
@@ -105,7 +209,7 @@ def get_asos_stations(state_abbrev: str, network_type: str = "ASOS") -> pd.DataF
     """
     url = "https://mesonet.agron.iastate.edu/geojson/network/{}_{}.geojson".format(state_abbrev,
                                                                                   network_type)
-    response = requests.get(url, timeout=60)
+    response = limited_get(url, timeout=60)
     response.raise_for_status()
     records = []
     for feature in response.json()["features"]:
@@ -119,7 +223,86 @@ def get_asos_stations(state_abbrev: str, network_type: str = "ASOS") -> pd.DataF
     return pd.DataFrame(records)
 
 
-def find_nearest_asos_station(latitude: float, longitude: float, state_abbrev: str) -> dict:
+def get_national_asos_stations(network_type: str = "ASOS") -> pd.DataFrame:
+    """
+    Lists the stations of every state's ASOS network (see :func:`get_asos_stations`) as one table.
+
+    The state networks are fetched concurrently (the Mesonet host cap still applies) and each one is
+    cached on its own, so a rebuild only refetches the states that are missing or expired. A state whose
+    request fails is skipped with a warning and listed in ``attrs["failed_states"]`` of the result.
+
+    :param network_type: The Mesonet network suffix, defaults to "ASOS".
+    :type network_type: str, optional
+    :return: The concatenated station tables with an added "state" column.
+    :rtype: pd.DataFrame
+    """
+    states = sorted(set(FIPS_TO_STATE.values()))
+    frames, failed_states = [], []
+    with ThreadPoolExecutor(max_workers=ASOS_NETWORK_WORKERS) as pool:
+        futures = {state: pool.submit(get_asos_stations, state, network_type) for state in states}
+        for state, future in futures.items():
+            try:
+                frame = future.result()
+            except (requests.RequestException, ValueError, KeyError) as error:
+                print("Skipping the %s_%s network: %s" % (state, network_type, error))
+                failed_states.append(state)
+                continue
+            if not frame.empty:
+                frames.append(frame.assign(state=state))
+    if not frames:
+        raise RuntimeError("No %s network could be listed (failed: %s)" % (network_type, failed_states))
+    stations = pd.concat(frames, ignore_index=True)
+    stations.attrs["failed_states"] = failed_states
+    return stations
+
+
+# An index missing some state networks is served this long before the networks are listed again.
+ASOS_PARTIAL_INDEX_RETRY_SECONDS = 600.0
+# In-process national index: network type -> (expiry time, index). A complete index lives for the
+# "mesonet_asos_stations" cache TTL, a partial one for ASOS_PARTIAL_INDEX_RETRY_SECONDS.
+_ASOS_INDEXES: Dict[str, Tuple[float, StationIndex]] = {}
+# Held while an index is built, so concurrent gauges wait for one build instead of each listing networks.
+_ASOS_INDEX_LOCK = threading.Lock()
+
+
+def get_asos_station_index(network_type: str = "ASOS") -> StationIndex:
+    """
+    Returns the spatial index of the national ASOS station table, built once per process and rebuilt
+    when expired: after the "mesonet_asos_stations" cache TTL, or after
+    :data:`ASOS_PARTIAL_INDEX_RETRY_SECONDS` when some state networks could not be listed.
+
+    :param network_type: The Mesonet network suffix, defaults to "ASOS".
+    :type network_type: str, optional
+    :return: The station index.
+    :rtype: StationIndex
+    """
+    with _ASOS_INDEX_LOCK:
+        built = _ASOS_INDEXES.get(network_type)
+        if built is None or time.time() >= built[0]:
+            stations = get_national_asos_stations(network_type)
+            lifetime = (ASOS_PARTIAL_INDEX_RETRY_SECONDS if stations.attrs.get("failed_states")
+                        else ENDPOINT_TTL_DAYS["mesonet_asos_stations"] * 86400)
+            built = (time.time() + lifetime, StationIndex(stations))
+            _ASOS_INDEXES[network_type] = built
+        return built[1]
+
+
+def find_nearest_asos_stations(latitudes, longitudes, k: int = 1) -> pd.DataFrame:
+    """
+    Finds the k nearest ASOS stations of many points (e.g. a fleet of gauges) in one national index query.
+
+    :param latitudes: The latitudes of the points in decimal degrees.
+    :param longitudes: The longitudes of the points in decimal degrees.
+    :param k: The number of stations per point, defaults to 1.
+    :type k: int, optional
+    :return: The station records with "query" (position of the point), "rank" (0 for the nearest) and
+        "distance_km" columns, ordered by point then rank (see :meth:`StationIndex.nearest`).
+    :rtype: pd.DataFrame
+    """
+    return get_asos_station_index().nearest(latitudes, longitudes, k=k)
+
+
+def find_nearest_asos_station(latitude: float, longitude: float, state_abbrev: Optional[str] = None) -> dict:
     """
     Finds the ASOS station closest to a point (e.g. a USGS gauge).
 
@@ -127,30 +310,113 @@ def find_nearest_asos_station(latitude: float, longitude: float, state_abbrev: s
     :type latitude: float
     :param longitude: The longitude of the point in decimal degrees.
     :type longitude: float
-    :param state_abbrev: The two-letter state abbreviation to search in, e.g. "CO".
-    :type state_abbrev: str
+    :param state_abbrev: Restrict the search to one state's network, e.g. "CO", defaults to None which
+        searches the national index.
+    :type state_abbrev: str, optional
     :return: The station record of the nearest station with an added "distance_km" key.
     :rtype: dict
     """
-    stations = get_asos_stations(state_abbrev)
-    lat1, lon1 = math.radians(latitude), math.radians(longitude)
-    lat2 = stations["latitude"].map(math.radians)
-    lon2 = stations["longitude"].map(math.radians)
-    hav = ((lat2 - lat1) / 2).map(math.sin) ** 2 + math.cos(lat1) * lat2.map(math.cos) * \
-        ((lon2 - lon1) / 2).map(math.sin) ** 2
-    distance_km = 2 * 6371.0 * hav.map(math.sqrt).map(math.asin)
-    nearest = stations.iloc[distance_km.idxmin()].to_dict()
-    nearest["distance_km"] = distance_km.min()
-    return nearest
+    if state_abbrev is None:
+        nearest = find_nearest_asos_stations(latitude, longitude)
+    else:
+        nearest = StationIndex(get_asos_stations(state_abbrev)).nearest(latitude, longitude)
+    return nearest.drop(columns=["query", "rank"]).iloc[0].to_dict()
+
+
+def _asos_utc_frame(hourly: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turns an aggregated station frame of :func:`aggregate_asos_hourly` into a UTC "datetime" frame.
+
+    :param hourly: The aggregated frame (requests are made in UTC, so "hour_updated" is UTC).
+    :type hourly: pd.DataFrame
+    :return: The frame with a tz-aware "datetime" column instead of "hour_updated" and "valid".
+    :rtype: pd.DataFrame
+    """
+    if hourly.empty:
+        return pd.DataFrame(columns=["datetime"])
+    hourly["datetime"] = pd.to_datetime(hourly["hour_updated"]).dt.tz_localize("UTC")
+    return hourly.drop(columns=["hour_updated", "valid"])
+
+
+def fetch_asos_days_batch(station_ids: List[str], first_day: datetime, end_day: datetime,
+                          stations_per_request: int = ASOS_STATIONS_PER_REQUEST) -> Dict[str, pd.DataFrame]:
+    """
+    Fetches and aggregates the ASOS reports of many stations from ``first_day`` up to ``end_day`` (UTC)
+    with repeated ``station=`` parameters, splitting each combined CSV by station.
+
+    :param station_ids: The ASOS station ids, e.g. ["FNL", "DEN"].
+    :type station_ids: List[str]
+    :param first_day: The first requested day (UTC).
+    :type first_day: datetime
+    :param end_day: The day the request ends on (UTC).
+    :type end_day: datetime
+    :param stations_per_request: The most stations put in one request, defaults to
+        :data:`ASOS_STATIONS_PER_REQUEST`.
+    :type stations_per_request: int, optional
+    :return: Station id -> hourly dataframe with a tz-aware UTC "datetime" column and the ASOS
+        measurement columns (a "datetime"-only empty frame for stations without reports).
+    :rtype: Dict[str, pd.DataFrame]
+    """
+    frames: Dict[str, pd.DataFrame] = {}
+    for position in range(0, len(station_ids), stations_per_request):
+        batch = station_ids[position:position + stations_per_request]
+        response = limited_get(ASOS_BASE_URL.format("&station=".join(batch), first_day.year, first_day.month,
+                                                    first_day.day, end_day.year, end_day.month, end_day.day),
+                               timeout=300)
+        response.raise_for_status()
+        reports = split_asos_csv(io.StringIO(response.text))
+        for station_id in batch:
+            hourly, _, _ = aggregate_asos_hourly(reports.get(station_id, pd.DataFrame()))
+            frames[station_id] = _asos_utc_frame(hourly)
+    return frames
+
+
+def fetch_asos_days(station_id: str, first_day: datetime, end_day: datetime) -> pd.DataFrame:
+    """
+    Fetches and aggregates the ASOS reports of a station from ``first_day`` up to ``end_day`` (UTC).
+
+    The response is parsed in memory rather than through a shared temporary file, so concurrent gauges
+    cannot clobber each other's downloads.
+
+    :param station_id: The ASOS station id, e.g. "FNL".
+    :type station_id: str
+    :param first_day: The first requested day (UTC).
+    :type first_day: datetime
+    :param end_day: The day the request ends on (UTC).
+    :type end_day: datetime
+    :return: An hourly dataframe with a tz-aware UTC "datetime" column and the ASOS measurement columns.
+    :rtype: pd.DataFrame
+    """
+    return fetch_asos_days_batch([station_id], first_day, end_day)[station_id]
+
+
+def _hourly_window(df: pd.DataFrame, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+    """
+    Restricts an hourly UTC frame to ``start_time`` .. ``end_time`` (inclusive).
+
+    :param df: The hourly frame with a UTC "datetime" column.
+    :type df: pd.DataFrame
+    :param start_time: The start of the window (UTC).
+    :type start_time: datetime
+    :param end_time: The end of the window (UTC).
+    :type end_time: datetime
+    :return: The rows inside the window.
+    :rtype: pd.DataFrame
+    """
+    if df.empty:
+        return pd.DataFrame(columns=["datetime"])
+    return df[(df["datetime"] >= pd.Timestamp(start_time, tz="UTC")) &
+              (df["datetime"] <= pd.Timestamp(end_time, tz="UTC"))].reset_index(drop=True)
 
 
 def get_hourly_asos(station_id: str, start_time: datetime, end_time: datetime) -> pd.DataFrame:
     """
     Fetches hourly ASOS surface observations for a station as a tz-aware UTC dataframe.
 
-    A thin wrapper around :func:`get_asos_data_from_url` / :func:`process_asos_csv` (the request is made
-    in UTC, so the aggregated "hour_updated" timestamps are localized to UTC) that returns a dataframe
-    ready to merge on a "datetime" column.
+    The request is made in UTC, so the aggregated "hour_updated" timestamps of :func:`process_asos_csv`
+    are localized to UTC and returned as a "datetime" column ready to merge. Windows are served through
+    the shared station cache of :mod:`asos_cache` (only hours it does not cover yet are downloaded), so
+    the many gauges of a fleet mapped to the same airport fetch each window once.
 
     :param station_id: The ASOS station id, e.g. "FNL".
     :type station_id: str
@@ -162,15 +428,69 @@ def get_hourly_asos(station_id: str, start_time: datetime, end_time: datetime) -
         (tmpf, dwpf, relh, p01m, sknt, gust, snowdepth, ...).
     :rtype: pd.DataFrame
     """
-    csv_path = get_asos_data_from_url(station_id, ASOS_BASE_URL, start_time,
-                                      end_time + timedelta(days=1))
-    df, _, _ = process_asos_csv(csv_path)
-    if df.empty:
-        return pd.DataFrame(columns=["datetime"])
-    df["datetime"] = pd.to_datetime(df["hour_updated"]).dt.tz_localize("UTC")
-    df = df.drop(columns=["hour_updated", "valid"])
-    return df[(df["datetime"] >= pd.Timestamp(start_time, tz="UTC")) &
-              (df["datetime"] <= pd.Timestamp(end_time, tz="UTC"))].reset_index(drop=True)
+    if asos_cache.cache_dir():
+        df = asos_cache.cached_asos_window(station_id, start_time, end_time, fetch_asos_days)
+    else:
+        df = fetch_asos_days(station_id, start_time, end_time + timedelta(days=1))
+    return _hourly_window(df, start_time, end_time)
+
+
+class FleetAsosPrefetch:
+    """
+    Fills the :mod:`asos_cache` with each chunk window of every ASOS station a fleet needs, so gauges
+    scraped on a shared chunk grid read their window from the cache instead of requesting it station by
+    station.
+
+    The first gauge to reach a window requests it for all the stations still uncovered with multi-station
+    requests (:func:`fetch_asos_days_batch`, :data:`ASOS_STATIONS_PER_REQUEST` stations each); the
+    frames go straight to disk, so nothing is held in memory between gauges. A failed download is
+    reported and not retried for that window: each gauge then fetches its own station as usual.
+    ``FleetAsosPrefetch(stations)`` is passed to :func:`long_term_scrape.run_long_term_scrape` as
+    ``asos_prefetch``.
+    """
+
+    def __init__(self, station_ids: List[str]) -> None:
+        """
+        :param station_ids: The ASOS station ids of the fleet's gauges.
+        :type station_ids: List[str]
+        """
+        self.station_ids = sorted(set(station_ids))
+        self._lock = threading.Lock()
+        self._window_locks: Dict[Tuple[datetime, datetime], threading.Lock] = {}
+        self._done: Set[Tuple[datetime, datetime]] = set()
+
+    def __call__(self, start_time: datetime, end_time: datetime) -> None:
+        """
+        Caches a window for every station of the fleet, once per window.
+
+        :param start_time: The start of the window (UTC).
+        :type start_time: datetime
+        :param end_time: The end of the window (UTC).
+        :type end_time: datetime
+        :return: None
+        :rtype: None
+        """
+        if not asos_cache.cache_dir():
+            return
+        window = (start_time, end_time)
+        with self._lock:
+            if window in self._done:
+                return
+            window_lock = self._window_locks.setdefault(window, threading.Lock())
+        with window_lock:
+            with self._lock:
+                if window in self._done:
+                    return
+            try:
+                fetched = asos_cache.fill_asos_window(self.station_ids, start_time, end_time,
+                                                      fetch_asos_days_batch)
+                print("Cached ASOS %s .. %s for %d stations" % (start_time, end_time, len(fetched)))
+            except requests.RequestException as error:
+                print("WARN fleet ASOS download of %s .. %s failed; gauges fetch their own stations: %s"
+                      % (start_time, end_time, str(error)[:200]))
+            with self._lock:
+                self._done.add(window)
+                del self._window_locks[window]
 
 
 def get_snotel_data(start_time, end_time, station_id) -> pd.DataFrame: